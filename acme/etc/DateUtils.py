@@ -11,6 +11,7 @@
 from __future__ import annotations
 from pydoc import isdata
 from typing import Callable, Union, Tuple
+from threading import Condition
 import time
 from email.utils import formatdate
 from datetime import datetime, timedelta
@@ -158,8 +159,8 @@ def isodateDelta(isoDateTime:str, now:float = None) -> float:
 		return None
 
 
-def waitFor(timeout:float, condition:Callable[[], bool]=None) -> bool:
-	"""	Busy waiting for `timeout` seconds, or until the `condition`
+def waitFor(timeout:float, condition:Callable[[], bool]=None, signal:Condition=None) -> bool:
+	"""	Wait for `timeout` seconds, or until the `condition`
 		callback function returns *True*.
 
 		The functionn returns *True* if the `condition` returns *True* 
@@ -171,6 +172,19 @@ def waitFor(timeout:float, condition:Callable[[], bool]=None) -> bool:
 		If `timeout` is negative then *False* is returned.
 
 		If `condition` is not callable then *False* is returned.
+
+		If a `signal` condition variable is given then the `condition` is only
+		evaluated again after the `signal` was notified, instead of busy waiting. 
+		The `condition` is evaluated while holding the `signal`'s lock.
+		Whoever changes the state that the `condition` checks must call
+		`notify_all()` on the `signal`.
+
+		Args:
+			timeout: Maximum time in seconds to wait.
+			condition: Callback function that returns *True* when the wait is over.
+			signal: Optional condition variable that is notified when the `condition` may have changed.
+		Return:
+			The result of the last evaluation of `condition`.
 	"""
 	if timeout < 0.0:
 		return False
@@ -180,6 +194,9 @@ def waitFor(timeout:float, condition:Callable[[], bool]=None) -> bool:
 	else:
 		if not callable(condition):
 			return False
+		if signal:
+			with signal:
+				return signal.wait_for(condition, timeout)
 		toTs = time.time() + timeout
 		while not (res := condition()) and toTs > time.time():
 			time.sleep(0.01)
@@ -163,6 +163,12 @@ def requestFromResult(inResult:Result, originator:str = None, ty:T = None, op:Op
 		if (ec := inResult.request.parameters.get(C.hfEC)):			# Event Category, copy from the original request
 			req['ec'] = ec
 	
+	# Content Status and Offset of a partial response
+	if inResult.contentStatus:
+		req['cnst'] = int(inResult.contentStatus)
+		if inResult.contentOffset:
+			req['cnot'] = inResult.contentOffset
+
 	# If the response contains a request (ie. for polling), then add that request to the pc
 	pc = None
 	# L.isDebug and L.logDebug(inResult)
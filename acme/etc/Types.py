@@ -680,6 +680,12 @@ class DesiredIdentifierResultType(ACMEIntEnum):
 	unstructured	= 2
 
 
+class ContentStatus(ACMEIntEnum):
+	""" Content Status of a response """
+	fullContent		= 1
+	partialContent	= 2
+
+
 ##############################################################################
 #
 #	CSE related
@@ -1086,6 +1092,8 @@ class Result:
 	request:CSERequest				= None  	# may contain the processed incoming request object
 	embeddedRequest:CSERequest 		= None		# May contain a request as a response, e.g. when polling
 	status:bool 					= None
+	contentStatus:ContentStatus		= None		# Content status of a partial response
+	contentOffset:str				= None		# Continuation token of a partial response, to be used as the offset of the next request
 
 
 	def errorResultCopy(self) -> Result:
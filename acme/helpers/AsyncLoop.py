@@ -0,0 +1,256 @@
+#
+#	AsyncLoop.py
+#
+#	(c) 2022 by Andreas Kraft
+#	License: BSD 3-Clause License. See the LICENSE file for further details.
+#
+#	This class implements an asyncio event loop that runs in a background thread,
+#	together with a bounded pool of worker threads for blocking work.
+#
+
+from __future__ import annotations
+import asyncio, logging
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from functools import partial
+from itertools import count
+from queue import SimpleQueue
+from threading import Lock, Thread, local
+from typing import Any, Awaitable, Callable, Iterator, Optional, Tuple
+
+
+_workerPool = local()
+""" The *WorkerPoolExecutor* of the current thread, if the thread is a worker. """
+
+
+@contextmanager
+def blockingWait() -> Iterator[None]:
+	"""	Mark a section in which the current thread may wait for a long time, e.g. for a long-polling request.
+
+		If the thread is a worker of a `WorkerPoolExecutor` then an additional worker is started for
+		the duration of the wait. Waiting requests therefore can't use up the pool, and can't block the
+		requests they are waiting for. Otherwise nothing happens.
+	"""
+	if (executor := getattr(_workerPool, 'executor', None)) is None:
+		yield
+		return
+	executor._startBlocking()
+	try:
+		yield
+	finally:
+		executor._endBlocking()
+
+
+class WorkerPoolExecutor(Executor):
+	"""	A fixed-size pool of worker threads.
+
+		Other than the *ThreadPoolExecutor* from the standard library, the workers are daemon threads.
+		They are not joined when the interpreter exits, so that a long running task does not delay
+		the shutdown of the CSE.
+
+		While a worker waits in a `blockingWait()` section an additional worker is running.
+	"""
+
+	def __init__(self, workers:int, name:str = 'Worker', onBlocking:Callable[[], None] = None) -> None:
+		"""	Initialize and start the worker threads.
+
+			Args:
+				workers: Number of worker threads.
+				name: Prefix for the names of the worker threads.
+				onBlocking: Optional callback that is called by a worker when it starts a `blockingWait()` section.
+		"""
+		self.workers = workers
+		self.name = name
+		self.onBlocking = onBlocking
+		self.tasks:SimpleQueue[Optional[Tuple[Future, Callable]]] = SimpleQueue()
+		self.isShutdown = False
+		self.threads = 0				# Number of running worker threads, including the additional ones
+		self.threadsLock = Lock()
+		self.additionalWorkers = count()
+		for i in range(workers):
+			self._startWorker(f'{name}-{i}')
+
+
+	def submit(self, fn:Callable, /, *args:Any, **kwargs:Any) -> Future:	# type: ignore [override]
+		"""	Schedule a callable to be executed by one of the workers.
+
+			Args:
+				fn: The callable.
+				args: Positional arguments for the callable.
+				kwargs: Keyword arguments for the callable.
+			Return:
+				A *Future* for the result of the callable.
+		"""
+		if self.isShutdown:
+			raise RuntimeError('cannot schedule new tasks after shutdown')
+		future:Future = Future()
+		self.tasks.put((future, partial(fn, *args, **kwargs)))
+		return future
+
+
+	def shutdown(self, wait:bool = True, *, cancel_futures:bool = False) -> None:
+		"""	Stop the workers after the already scheduled tasks are done.
+			Waiting for the workers is not supported.
+
+			Args:
+				wait: Ignored.
+				cancel_futures: Ignored.
+		"""
+		if self.isShutdown:
+			return
+		self.isShutdown = True
+		with self.threadsLock:
+			threads = self.threads
+		for _ in range(threads):
+			self.tasks.put(None)
+
+
+	def _startWorker(self, name:str) -> None:
+		with self.threadsLock:
+			self.threads += 1
+		Thread(target = self._worker, name = name, daemon = True).start()
+
+
+	def _startBlocking(self) -> None:
+		if not self.isShutdown:
+			self._startWorker(f'{self.name}-w{next(self.additionalWorkers)}')
+		self.onBlocking and self.onBlocking()
+
+
+	def _endBlocking(self) -> None:
+		self.tasks.put(None)	# The next idle worker ends
+	
+
+	def _worker(self) -> None:
+		_workerPool.executor = self
+		try:
+			while (task := self.tasks.get()):
+				future, fn = task
+				if not future.set_running_or_notify_cancel():
+					continue
+				try:
+					future.set_result(fn())
+				except BaseException as e:
+					future.set_exception(e)
+		finally:
+			with self.threadsLock:
+				self.threads -= 1
+
+
+class AsyncLoop(object):
+	"""	An asyncio event loop that runs in its own background thread.
+
+		Coroutines are scheduled on the loop from any thread with `submit()`. Blocking functions
+		are run from coroutines on a bounded pool of worker threads with `runBlocking()`, so that
+		they don't block the event loop.
+	"""
+
+	# Holds a reference to an specific logging function.
+	# This must have the same signature as the `logging.log` method.
+	_logger:Callable[[int, str], None] = logging.log
+
+
+	def __init__(self, workers:int, name:str = 'AsyncLoop') -> None:
+		"""	Initialize the event loop and the worker pool. The loop is not started yet.
+
+			Args:
+				workers: Number of worker threads for blocking functions.
+				name: Name of the event loop thread. It is also the prefix of the names of the worker threads.
+		"""
+		self.name = name
+		self.loop = asyncio.new_event_loop()
+		self.executor = WorkerPoolExecutor(workers, name = f'{name}Worker')
+		self.loop.set_exception_handler(self._exceptionHandler)
+		self.thread:Thread = None
+
+
+	def start(self) -> AsyncLoop:
+		"""	Start the event loop in a background thread.
+
+			Return:
+				Self.
+		"""
+		if not self.thread:
+			self.thread = Thread(target = self._run, name = self.name, daemon = True)
+			self.thread.start()
+		return self
+
+
+	def stop(self, timeout:float = 5.0) -> bool:
+		"""	Stop the event loop and the worker pool.
+
+			Args:
+				timeout: Maximum time in seconds to wait for the event loop thread to end.
+			Return:
+				Always True.
+		"""
+		if self.thread and self.loop.is_running():
+			self.loop.call_soon_threadsafe(self.loop.stop)
+			self.thread.join(timeout)
+		self.thread = None
+		self.executor.shutdown()
+		return True
+
+
+	def submit(self, coroutine:Awaitable) -> Future:
+		"""	Schedule a coroutine on the event loop. This method can be called from any thread.
+
+			Args:
+				coroutine: The coroutine to run.
+			Return:
+				A *Future* for the result of the coroutine.
+		"""
+		return asyncio.run_coroutine_threadsafe(coroutine, self.loop)	# type: ignore [arg-type]
+
+
+	async def runBlocking(self, fn:Callable, *args:Any, **kwargs:Any) -> Any:
+		"""	Run a blocking callable in the worker pool and wait for its result without
+			blocking the event loop.
+
+			Args:
+				fn: The callable.
+				args: Positional arguments for the callable.
+				kwargs: Keyword arguments for the callable.
+			Return:
+				The result of the callable.
+		"""
+		return await self.loop.run_in_executor(self.executor, partial(fn, *args, **kwargs))
+
+
+	def isLoopThread(self) -> bool:
+		"""	Check whether the caller runs in the event loop's thread.
+
+			Return:
+				True if the current thread is the event loop's thread.
+		"""
+		try:
+			return asyncio.get_running_loop() is self.loop
+		except RuntimeError:
+			return False
+
+
+	def _run(self) -> None:
+		asyncio.set_event_loop(self.loop)
+		try:
+			self.loop.run_forever()
+		finally:
+			# Cancel the remaining tasks, e.g. waiting connections, and wait until they are done
+			if tasks := asyncio.all_tasks(self.loop):
+				for task in tasks:
+					task.cancel()
+				self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions = True))
+			self.loop.close()
+
+
+	def _exceptionHandler(self, loop:asyncio.AbstractEventLoop, context:dict) -> None:
+		AsyncLoop._logger(logging.ERROR, f'{self.name}: {context.get("message")} {context.get("exception", "")}')
+
+
+	@classmethod
+	def setLogger(cls, logger:Callable[[int, str], None]) -> None:
+		"""	Assign a callback for logging.
+
+			Args:
+				logger: Logging function.
+		"""
+		AsyncLoop._logger = logger
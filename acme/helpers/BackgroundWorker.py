@@ -10,7 +10,8 @@
 from __future__ import annotations
 from .TextTools import simpleMatch
 import random, sys, heapq, datetime, traceback, time
-from threading import Thread, Timer, Event, RLock, enumerate as threadsEnumerate
+from itertools import count
+from threading import Thread, Condition, Event, RLock, enumerate as threadsEnumerate
 from typing import Callable, List, Dict, Any, Tuple
 import logging
 
@@ -211,7 +212,7 @@ class BackgroundWorker(object):
 			if not result or (self.maxCount and self.numberOfRuns >= self.maxCount):
 				# False returned, or the numberOfRuns has reached the maxCount
 				self.stop()
-				# Not queued anymore after this run, but the Timer is restarted in stop()
+				# Not queued anymore after this run
 			else:
 				now = _utcTime()
 				while True:
@@ -405,10 +406,21 @@ class BackgroundWorkerPool(object):
 	"""
 	backgroundWorkers:Dict[int, BackgroundWorker]	= {}
 	workerQueue:List 								= []
-	""" Priority queue. Contains tuples (nextExecution timestamp, workerID). """
-	workerTimer:Timer								= None
+	""" Priority queue. Contains entries [nextExecution timestamp, sequence number, workerID, name]. The workerID of a removed entry is None. """
+	queuedWorkers:Dict[int, List]					= {}
+	""" The queue entries of the queued workers, by workerID. """
+	removedEntries:int								= 0
+	""" Number of removed entries that are still in the priority queue. """
+	queueSequence									= count()
+	""" Sequence numbers keep the queue entries with the same timestamp in order. """
+	schedulerThread:Thread							= None
 
-	queueLock:RLock					 				= RLock()
+	queueLock:Condition				 				= Condition()	# Notified when the next execution time may have changed
+
+	# Schedule lag: time between the scheduled and the actual start of workers
+	scheduleLagCount:int							= 0
+	scheduleLagSum:float							= 0.0
+	scheduleLagMax:float							= 0.0
 
 
 	def __new__(cls, *args:str, **kwargs:str) -> BackgroundWorkerPool:
@@ -569,6 +581,17 @@ class BackgroundWorkerPool(object):
 		# job.setName(name if name else str(job.native_id))
 
 
+	@classmethod
+	def schedulerStatistics(cls) -> Tuple[int, int, float, float]:
+		"""	Return the number of queued workers and the schedule lag, ie. the time between the 
+			scheduled and the actual start of the workers.
+
+			Return:
+				Tuple (queued workers, number of started workers, sum of the lags, maximum lag). Lags are in seconds.
+		"""
+		return (len(cls.queuedWorkers), cls.scheduleLagCount, cls.scheduleLagSum, cls.scheduleLagMax)
+
+
 	@classmethod
 	def countJobs(cls) -> Tuple[int, int]:
 		"""	Return the number of running and paused Jobs.
@@ -609,17 +632,23 @@ class BackgroundWorkerPool(object):
 
 	@classmethod
 	def _queueWorker(cls, delay:float, worker:BackgroundWorker) -> None:
-		"""	Queue a `worker` for execution after `delay` seconds.
+		"""	Queue a `worker` for execution at the timestamp `delay`. A previous
+			queue entry of the worker is replaced.
 
 			Args:
-				delay: Time in seconds after which the worker shall be executed
-				worker: Backgroundworker to unqueue
+				delay: Timestamp at which the worker shall be executed
+				worker: Backgroundworker to queue
 		"""
-		top = cls.workerQueue[0] if cls.workerQueue else None
 		with cls.queueLock:
-			heapq.heappush(cls.workerQueue, (delay, worker.id, worker.name	))
-			cls._stopTimer()
-		cls._startTimer()
+			cls._removeQueueEntry(worker.id)
+			entry = [ delay, next(cls.queueSequence), worker.id, worker.name ]
+			cls.queuedWorkers[worker.id] = entry
+			heapq.heappush(cls.workerQueue, entry)
+			if not cls.schedulerThread:
+				cls.schedulerThread = Thread(target = cls._runScheduler, name = 'WorkerScheduler', daemon = True)
+				cls.schedulerThread.start()
+			elif cls.workerQueue[0] is entry:		# Only wake up the scheduler if the next execution is earlier now
+				cls.queueLock.notify()
 
 
 	@classmethod
@@ -630,41 +659,60 @@ class BackgroundWorkerPool(object):
 				worker: Backgroundworker to unqueue
 		"""
 		with cls.queueLock:
-			cls._stopTimer()
-			for h in cls.workerQueue:
-				if h[1] == worker.id:
-					cls.workerQueue.remove(h)
-					heapq.heapify(cls.workerQueue)
-					break	# Only 1 worker
-			cls._startTimer()
+			cls._removeQueueEntry(worker.id)
 
 
 	@classmethod
-	def _startTimer(cls) -> None:
-		""" Start the workers queue timer.
-		"""
-		if cls.workerQueue:
-			cls.workerTimer = Timer(cls.workerQueue[0][0] - _utcTime(), cls._execQueue)
-			cls.workerTimer.setDaemon(True)	# Make the Timer thread a daemon of the main thread
-			cls.workerTimer.start()
-	
+	def _removeQueueEntry(cls, workerID:int) -> None:
+		"""	Mark the queue entry of a worker as removed. Removed entries are skipped by
+			the scheduler, and the queue is compacted when it contains too many of them.
+			The caller must hold the `queueLock`.
 
-	@classmethod
-	def _stopTimer(cls) -> None:
-		"""	Cancel/interrupt the workers queue timer.
+			Args:
+				workerID: ID of the worker to remove.
 		"""
-		if cls.workerTimer:
-			cls.workerTimer.cancel()
+		if (entry := cls.queuedWorkers.pop(workerID, None)) is None:
+			return
+		entry[2] = None
+		cls.removedEntries += 1
+		if cls.removedEntries > 1000 and cls.removedEntries > len(cls.workerQueue) // 2:
+			cls.workerQueue = [ e for e in cls.workerQueue if e[2] is not None ]
+			heapq.heapify(cls.workerQueue)
+			cls.removedEntries = 0
 
 
 	@classmethod
-	def _execQueue(cls) -> None:
-		"""	Execute the actual BackgroundWorker's callback in a thread.
+	def _runScheduler(cls) -> None:
+		"""	The scheduler thread. It waits until the next worker is due and executes it in a Job thread.
 		"""
-		with cls.queueLock:
-			if cls.workerQueue:
-				_, workerID, name = heapq.heappop(cls.workerQueue)
-				if worker := cls.backgroundWorkers.get(workerID):
-					cls.runJob(worker._work, name)
-			cls._startTimer()	# start timer again
-
+		while True:
+			due:List[BackgroundWorker] = []
+			with cls.queueLock:
+				while not due:
+					# Skip removed entries
+					while cls.workerQueue and cls.workerQueue[0][2] is None:
+						heapq.heappop(cls.workerQueue)
+						cls.removedEntries -= 1
+					if not cls.workerQueue:
+						cls.queueLock.wait()
+						continue
+					now = _utcTime()
+					if (delay := cls.workerQueue[0][0] - now) > 0:
+						cls.queueLock.wait(delay)
+						continue
+					# Take all due workers
+					while cls.workerQueue and cls.workerQueue[0][0] <= now:
+						entry = heapq.heappop(cls.workerQueue)
+						if entry[2] is None:
+							cls.removedEntries -= 1
+							continue
+						del cls.queuedWorkers[entry[2]]
+						lag = now - entry[0]
+						cls.scheduleLagCount += 1
+						cls.scheduleLagSum += lag
+						cls.scheduleLagMax = max(cls.scheduleLagMax, lag)
+						if worker := cls.backgroundWorkers.get(entry[2]):
+							due.append(worker)
+
+			for worker in due:
+				cls.runJob(worker._work, worker.name)
@@ -8,8 +8,12 @@
 #
 
 from __future__ import annotations
-from typing import Callable, Any, cast
-from ..etc import Utils as Utils
+import logging, traceback
+from functools import partial
+from itertools import count
+from queue import SimpleQueue
+from threading import Lock, Thread
+from typing import Callable, Any, Dict, Optional, Tuple, cast
 from ..helpers.BackgroundWorker import BackgroundWorkerPool
 
 # TODO: create/delete each resource to count! resourceCreate(ty)
@@ -34,9 +38,17 @@ class Event(list):	# type:ignore[type-arg]
 	An event is raised by calling the event: anEvent(anArgument). It may have an
 	arbitrary number of arguments which are passed to the functions.
 
-	The function will be called in a separate thread in order to prevent waiting
-	for the returns. This might lead to some race conditions, so the synchronizations
-	must be done inside the functions.
+	The functions will be called by one of the event manager's dispatcher threads in order 
+	to prevent waiting for the returns. This might lead to some race conditions, so the
+	synchronizations must be done inside the functions. All calls for an event are made by
+	the same dispatcher thread, in the order in which the event was raised. The dispatcher
+	threads are shared by all events, so handlers that might block, e.g. because they send
+	requests or run scripts, must be added as *blocking* handlers. They are called in a
+	separate background job for each raised event. Cheap handlers, e.g. counters, can
+	be added as *inline* handlers. They are called directly in the thread that raises the
+	event. Handlers that only need to know that an event happened, e.g. to refresh a display,
+	can be added as *coalescing* handlers. As long as a call of such a handler is still waiting
+	to be dispatched, further raised events only replace its arguments.
 
 	Attention: Since the parent class is *list* `isInstance(obj, list)` will yield True.
 	"""
@@ -44,33 +56,68 @@ class Event(list):	# type:ignore[type-arg]
 	def __init__(self, runInBackground:bool = True, manager:EventManager = None):
 		self.runInBackground = runInBackground
 		self.manager = manager
+		self.inlineHandlers:set[Callable] = set()
+		self.coalescingHandlers:set[Callable] = set()
+		self.blockingHandlers:set[Callable] = set()
+		self.dispatchKey = next(manager._eventKeys) if manager else 0	# Selects the dispatcher thread
 
 
 	def __call__(self, *args:Any, **kwargs:Any) -> None:
 		"""	Handle calling an event. This calls any of the registered callback functions for this
-			event. If the event was created with `runInBackground` as True, then the callbacks
-			are called sequentially (not individually!) as a thread.
+			event. If the event was created with `runInBackground` as True, then the inline handlers
+			are called directly, the blocking handlers are called sequentially in a background job,
+			and the other callbacks are called sequentially (not individually!) by a dispatcher thread.
 		"""
-
-		def _runner(*args:Any, **kwargs:Any) -> None:
-			"""	Call all registered function for this event object. Pass on any argument
-			"""
+		if not self.manager._running:
+			return
+		if not self.runInBackground:
 			for function in self:
 				function(*args, **kwargs)
-
-		if not self.manager._running:
 			return
-		if self.runInBackground:
-			# Call the handlers in a thread so that we don't block everything
-			BackgroundWorkerPool.runJob(lambda args = args, kwargs = kwargs: _runner(*args, **kwargs))
-		else:
-			_runner(*args, **kwargs)
+
+		handlers = []
+		blockingHandlers = []
+		for function in self:
+			if function in self.inlineHandlers:
+				function(*args, **kwargs)
+			elif function in self.coalescingHandlers:
+				self.manager._dispatchCoalesced(function, args, kwargs)
+			elif function in self.blockingHandlers:
+				blockingHandlers.append(function)
+			else:
+				handlers.append(function)
+		if handlers:
+			self.manager._dispatch(partial(self._runner, handlers, args, kwargs), self.dispatchKey)
+		if blockingHandlers:
+			# Call the blocking handlers in a thread so that they don't block the dispatchers
+			BackgroundWorkerPool.runJob(partial(self._runner, blockingHandlers, args, kwargs))
+
+
+	def remove(self, function:Callable) -> None:	# type:ignore[override]
+		"""	Remove a handler function and its handling options.
+
+			Args:
+				function: The handler function to remove.
+		"""
+		super().remove(function)
+		if function not in self:
+			self.inlineHandlers.discard(function)
+			self.coalescingHandlers.discard(function)
+			self.blockingHandlers.discard(function)
 
 
 	def __repr__(self) -> str:
 		return f'Event({list.__repr__(self)})' 
 
 
+	@staticmethod
+	def _runner(handlers:list[Callable], args:Tuple[Any, ...], kwargs:Dict[str, Any]) -> None:
+		"""	Call all the given handler functions for an event. Pass on any argument.
+		"""
+		for function in handlers:
+			function(*args, **kwargs)
+
+
 
 class EventManager(object):
 	"""Event topics are added as new methods of the handler class with the given name and can be raised by calling those new methods, e.g.
@@ -78,15 +125,50 @@ class EventManager(object):
 		- manager.addEvent("someName") : add new event topic
 		- manager.addHandler(manager.someName, handlerFunction) : add an event handler
 		- handler.someName() : raises the event
+
+	Events that are raised in the background are queued and handled by a small, fixed number of
+	dispatcher threads. The threads are started when the first event is dispatched. Each event
+	and each coalescing handler is always handled by the same dispatcher thread.
 	"""
 
-	def __init__(self) -> None:
+	# Holds a reference to an specific logging function.
+	# This must have the same signature as the `logging.log` method.
+	_logger:Callable[[int, str], None] = logging.log
+
+
+	def __init__(self, dispatchers:int = 1) -> None:
+		"""	Initialize the event manager.
+
+			Args:
+				dispatchers: Number of dispatcher threads for events that are raised in the background.
+		"""
 		self._running = True
+		self.dispatchers = dispatchers
+		self._dispatcherThreads:list[Thread] = []
+		self._dispatchQueues:list[SimpleQueue[Optional[Callable]]] = []
+		self._dispatchLock = Lock()
+		self._coalescedCalls:Dict[Callable, Tuple[Tuple[Any, ...], Dict[str, Any]]] = {}
+		self._eventKeys = count()		# Events are assigned to the dispatcher threads round-robin
+
 
 	def shutdown(self) -> bool:
 		self._running = False
+		with self._dispatchLock:
+			for queue in self._dispatchQueues:
+				queue.put(None)
+			self._dispatcherThreads.clear()
 		return True
 
+
+	def setDispatchers(self, dispatchers:int) -> None:
+		"""	Set the number of dispatcher threads. This only has an effect before the
+			first event is dispatched.
+
+			Args:
+				dispatchers: Number of dispatcher threads.
+		"""
+		self.dispatchers = dispatchers
+
 	#########################################################################
 
 	def addEvent(self, name:str, runInBackground:bool = True) -> Event:
@@ -131,14 +213,24 @@ class EventManager(object):
 		return name in self.__dict__
 
 
-	def addHandler(self, event:Event|list[Event], func:Callable) -> None:		# type:ignore[type-arg]
+	def addHandler(self, event:Event|list[Event], func:Callable, inline:bool = False, coalesce:bool = False, blocking:bool = False) -> None:		# type:ignore[type-arg]
 		"""	Add a new event handler for an `event` or a list of events.
 
 			Args:
 				event: Either a single Event or a list of Event objects
 				func: The function callback to call when the event is raised.
+				inline: Call the function directly in the thread that raises the event. This should only be used for cheap functions that don't block.
+				coalesce: Call the function only once for events that are raised while a previous call is still waiting to be dispatched. The function then receives the arguments of the latest event.
+				blocking: Call the function in a background job instead of a dispatcher thread. This must be used for functions that might block, e.g. because they send requests or run scripts.
 		"""
-		list(map(lambda e: e.append(func), [event] if isinstance(event, Event) else event))
+		for e in [event] if isinstance(event, Event) else event:
+			if inline:
+				e.inlineHandlers.add(func)
+			elif coalesce:
+				e.coalescingHandlers.add(func)
+			elif blocking:
+				e.blockingHandlers.add(func)
+			e.append(func)
 	
 
 	def hasHandler(self, event:Event|list[Event], func:Callable) -> bool:
@@ -160,3 +252,78 @@ class EventManager(object):
 				func: The function callback to remove from the even t.
 		"""
 		list(map(lambda e: e.remove(func), [event] if isinstance(event, Event) else event))
+
+
+	@classmethod
+	def setLogger(cls, logger:Callable[[int, str], None]) -> None:
+		"""	Assign a callback for logging.
+
+			Args:
+				logger: Logging function.
+		"""
+		EventManager._logger = logger
+
+
+	#########################################################################
+	#
+	#	Dispatching
+	#
+
+	def _dispatch(self, task:Callable, key:int) -> None:
+		"""	Queue a task for a dispatcher thread. Start the threads if necessary.
+
+			Args:
+				task: The callable to run. This must include arguments.
+				key: Tasks with the same key are run by the same dispatcher thread, in the order in which they were queued.
+		"""
+		if not self._dispatcherThreads:
+			with self._dispatchLock:
+				if not self._dispatcherThreads and self._running:
+					self._dispatchQueues = [ SimpleQueue() for _ in range(self.dispatchers) ]
+					for i, queue in enumerate(self._dispatchQueues):
+						thread = Thread(target = self._dispatcher, args = (queue,), name = f'EventDispatcher-{i}', daemon = True)
+						thread.start()
+						self._dispatcherThreads.append(thread)
+		if self._dispatchQueues:
+			self._dispatchQueues[key % len(self._dispatchQueues)].put(task)
+
+
+	def _dispatchCoalesced(self, func:Callable, args:Tuple[Any, ...], kwargs:Dict[str, Any]) -> None:
+		"""	Queue a call of a coalescing handler, or only replace its arguments
+			if a call is already waiting to be dispatched.
+
+			Args:
+				func: The handler function.
+				args: Positional arguments of the event.
+				kwargs: Keyword arguments of the event.
+		"""
+		with self._dispatchLock:
+			isWaiting = func in self._coalescedCalls
+			self._coalescedCalls[func] = (args, kwargs)
+		if not isWaiting:
+			self._dispatch(partial(self._runCoalesced, func), hash(func))
+
+
+	def _runCoalesced(self, func:Callable) -> None:
+		"""	Call a coalescing handler with the arguments of the latest event.
+
+			Args:
+				func: The handler function.
+		"""
+		with self._dispatchLock:
+			if not (call := self._coalescedCalls.pop(func, None)):
+				return
+		func(*call[0], **call[1])
+
+
+	def _dispatcher(self, queue:SimpleQueue[Optional[Callable]]) -> None:
+		"""	Dispatcher thread. Run the queued tasks until a *None* task is received.
+
+			Args:
+				queue: The queue of the dispatcher thread.
+		"""
+		while (task := queue.get()) is not None:
+			try:
+				task()
+			except Exception as e:
+				EventManager._logger(logging.ERROR, f'Exception in event handler: {str(e)}\n{"".join(traceback.format_exception(type(e), value = e, tb = e.__traceback__))}')
@@ -9,11 +9,15 @@
 
 from __future__ import annotations
 import ssl, time
+from concurrent.futures import Future
+from functools import partial
+from threading import Condition
 from dataclasses import dataclass
 from typing import Callable, Any, Tuple
 import logging
 
 from .BackgroundWorker import BackgroundWorkerPool, BackgroundWorker
+from .AsyncLoop import AsyncLoop
 from .TextTools import simpleMatch
 
 import paho.mqtt.client as mqtt
@@ -90,7 +94,8 @@ class MQTTConnection(object):
 					clientID:str=None, username:str=None, password:str=None,
 					useTLS:bool=False, caFile:str=None, verifyCertificate:bool=False, certfile: str = None, keyfile: str = None,
 					lowLevelLogging:bool=True,
-					messageHandler:MQTTHandler=None
+					messageHandler:MQTTHandler=None,
+					asyncLoop:AsyncLoop=None
 				) -> None:
 		self.address								= address
 		self.port									= port if port else 8883 if useTLS else 1883
@@ -109,10 +114,12 @@ class MQTTConnection(object):
 		self.isStopped								= True
 		self.isConnected							= False
 		self.subscribedCount 						= 0
+		self.stateChanged							= Condition()	# Notified when the connection or subscription state changes
 
 
 		self.mqttClient:mqtt.Client 				= None
 		self.messageHandler:MQTTHandler				= messageHandler
+		self.asyncLoop:AsyncLoop					= asyncLoop
 		self.actor:BackgroundWorker 				= None
 		self.subscribedTopics:dict[str, MQTTTopic]	= {}
 
@@ -201,6 +208,7 @@ class MQTTConnection(object):
 			if self.messageHandler:
 				self.messageHandler.logging(self, logging.ERROR, f'MQTT: Cannot connect to broker. Result code: {rc} ({mqtt.error_string(rc)})')
 				self.messageHandler.onError(self, rc)
+		self._notifyStateChanged()
 
 
 	def _onDisconnect(self, client:mqtt.Client, userdata:Any, rc:int) -> None:
@@ -222,6 +230,7 @@ class MQTTConnection(object):
 				self.messageHandler.logging(self, logging.ERROR, f'MQTT: Cannot disconnect from broker. Result code: {rc} ({mqtt.error_string(rc)})')
 				self.messageHandler.onDisconnect(self)
 				self.messageHandler.onError(self, rc)
+		self._notifyStateChanged()
 
 
 	def _onLog(self, client:mqtt.Client, userdata:Any, level:int, buf:str) -> None:
@@ -237,6 +246,7 @@ class MQTTConnection(object):
 				t.isSubscribed = True
 				self.messageHandler and self.messageHandler.onSubscribed(self, t.topic)
 				break
+		self._notifyStateChanged()
 	
 
 	def _onUnsubscribe(self, client:mqtt.Client, userdata:Any, mid:int) -> None:
@@ -249,24 +259,49 @@ class MQTTConnection(object):
 				del self.subscribedTopics[t.topic]
 				self.messageHandler and self.messageHandler.onUnsubscribed(self, t.topic)
 				break
+		self._notifyStateChanged()
+
+
+	def _notifyStateChanged(self) -> None:
+		"""	Wake up all threads that wait for a change of the connection or subscription state.
+		"""
+		with self.stateChanged:
+			self.stateChanged.notify_all()
 
 
 	def _onMessage(self, client:mqtt.Client, userdata:Any, message:mqtt.MQTTMessage) -> None:
-		"""	Handle a received message. Forward it to the apropriate handler callback (in a Thread)
+		"""	Handle a received message. Forward it to the apropriate handler callback (in a Thread, or
+			in a worker of the asyncio event loop if one is set)
 		"""
 		self.lowLevelLogging and self.messageHandler and self.messageHandler.logging(self, logging.DEBUG, f'MQTT: received topic:{message.topic}, payload:{message.payload}')
 		for t in self.subscribedTopics.keys():
 			if simpleMatch(message.topic, t, star='#'):
 				if (topic := self.subscribedTopics[t]).callback:
-					# Run actual request handling in a thread
-					# For some reasons mid is not initialized in the on on_message callback, so we use the timestamp for the actor name
-					BackgroundWorkerPool.newActor(topic.callback, name=f'mid_{message.timestamp}').start(	connection=self,
-																											topic=message.topic,
-																											data=message.payload, 
-																											**topic.callbackArgs)
+					if self.asyncLoop:
+						# Run actual request handling in a worker of the event loop
+						self.asyncLoop.submit(self.asyncLoop.runBlocking(topic.callback, connection = self,
+																						 topic = message.topic,
+																						 data = message.payload,
+																						 **topic.callbackArgs)
+											 ).add_done_callback(partial(self._onMessageHandled, message.topic))
+					else:
+						# Run actual request handling in a thread
+						# For some reasons mid is not initialized in the on on_message callback, so we use the timestamp for the actor name
+						BackgroundWorkerPool.newActor(topic.callback, name=f'mid_{message.timestamp}').start(	connection=self,
+																												topic=message.topic,
+																												data=message.payload, 
+																												**topic.callbackArgs)
 					break	# break at first occurence
 
 
+	def _onMessageHandled(self, topic:str, future:Future) -> None:
+		"""	Log an exception that was raised while handling a received message in a worker of the
+			asyncio event loop.
+		"""
+		if not future.cancelled() and (e := future.exception()):
+			self.messageHandler and self.messageHandler.logging(self, logging.ERROR, f'MQTT: error handling message for topic:{topic}: {e!r}')
+
+
 	#
 	#	MQTT messaging methods
 	#
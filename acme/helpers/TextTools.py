@@ -8,6 +8,7 @@
 #
 
 import re
+from typing import Optional
 commentPattern = r'(\".*?(?<!\\)\"|\'.*?(?<!\\)\')|(/\*.*?\*/|//[^\r\n]*$|#[^\r\n]*$)'	# recognized escaped comments
 commentRegex = re.compile(commentPattern, re.MULTILINE|re.DOTALL)
 
@@ -172,3 +173,37 @@ def simpleMatch(st:str, pattern:str, star:str='*') -> bool:
 		return stIndex == stLen-1
 	
 	return _simpleMatch(st, pattern)
+
+
+def compileSimpleMatch(pattern:str, star:str='*') -> Optional[re.Pattern]:
+	"""	Compile a pattern for `simpleMatch()` into a regular expression.
+
+		This is faster when the same pattern is matched against many strings. Use the
+		*fullmatch()* method of the returned object to test a string.
+
+		Parameter:
+			- pattern : the pattern string
+			- star : optionally specify a different character as the star character
+
+		Return:
+			The compiled regular expression, or None if the pattern doesn't contain any expression operator.
+	"""
+	if not any(c in pattern for c in ('?', star, '+', '\\')):
+		return None
+	result = ''
+	escaped = False
+	for c in pattern:
+		if escaped:
+			result += re.escape(c)
+			escaped = False
+		elif c == '\\':
+			escaped = True
+		elif c == '?':
+			result += '.'
+		elif c == star:
+			result += '.*'
+		elif c == '+':
+			result += '.+'
+		else:
+			result += re.escape(c)
+	return re.compile(result, re.DOTALL)
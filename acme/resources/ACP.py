@@ -99,6 +99,27 @@ class ACP(AnnounceableResource):
 				r.dbUpdate()
 
 
+	def dbCreate(self, overwrite:bool = False) -> Result:
+		# Inherited
+		if (res := super().dbCreate(overwrite)).status:
+			CSE.security.updateACP(self)
+		return res
+
+
+	def dbUpdate(self) -> Result:
+		# Inherited
+		if (res := super().dbUpdate()).status:
+			CSE.security.updateACP(self)
+		return res
+
+
+	def dbDelete(self) -> Result:
+		# Inherited
+		res = super().dbDelete()
+		CSE.security.removeACP(self.ri)
+		return res
+
+
 	def validateAnnouncedDict(self, dct:JSON) -> JSON:
 		# Inherited
 		if acr := Utils.findXPath(dct, f'{T.ACPAnnc.tpe()}/pvs/acr'):
@@ -57,10 +57,22 @@ class CIN(AnnounceableResource):
 		self.setAttribute('cs', Utils.getAttributeSize(self.con))
 		self.setAttribute('st', 0, overwrite = False)
 
+		# Indicates that the <cin> is created in a bulk CREATE. The parent container's stateTag
+		# is then updated once for all instances. Not stored in the DB.
+		self.bulkCreate = False
+
 	def activate(self, parentResource:Resource, originator:str) -> Result:
 		if not (res := super().activate(parentResource, originator)).status:
 			return res
 
+		# In a bulk CREATE the parent container's stateTag is only counted up in memory. 
+		# It is stored once for all instances after they were added to the DB.
+		if self.bulkCreate:
+			st = parentResource.st + 1
+			parentResource.setAttribute('st', st)
+			self.setAttribute('st', st)
+			return Result.successResult()
+
 		# increment parent container's state tag
 		parentResource = parentResource.dbReload().resource	# Read the resource again in case it was updated in the DB
 		st = parentResource.st + 1
@@ -8,7 +8,6 @@
 #
 
 from __future__ import annotations
-from typing import List
 from ..etc.Types import AttributePolicyDict, ResourceTypes as T, Result, ResponseStatusCode as RC, JSON
 from ..etc import Utils, DateUtils
 from ..services import CSE as CSE
@@ -16,6 +15,7 @@ from ..services.Logging import Logging as L
 from ..services.Configuration import Configuration
 from ..resources.Resource import *
 from .AnnounceableResource import AnnounceableResource
+from .CIN import CIN
 from ..resources import Factory
 
 
@@ -144,6 +144,40 @@ class CNT(AnnounceableResource):
 			self.validate(originator)
 
 
+	def prepareBulkInstances(self, instances:list[CIN]) -> None:
+		"""	Prepare a number of new <cin> before they are created together in a bulk CREATE.
+
+			This marks the <cin> as part of a bulk CREATE and applies the *mia* to the <cin>'s
+			expiration times. The stateTags are assigned when a <cin> is activated, and the
+			container's stateTag is stored once in `childrenAdded()`.
+
+			Args:
+				instances: List of new <cin> resources.
+		"""
+		maxEt = None
+		if self.mia is not None:
+			# Take either mia or the maxExpirationDelta, whatever is smaller
+			maxEt = DateUtils.getResourceDate(self.mia if self.mia <= (med := Configuration.get('cse.maxExpirationDelta')) else med)
+		for cin in instances:
+			cin.bulkCreate = True
+			# Only replace the <cin>'s et if it is greater than the calculated maxEt
+			if maxEt and cin.et > maxEt:
+				cin.setAttribute('et', maxEt)
+
+
+	# Handle the addition of multiple CIN in a bulk CREATE. Check the subscriptions and limits only once.
+	def childrenAdded(self, childResources:list[Resource], originator:str) -> None:
+		if L.isDebug: L.logDebug(f'Child resources added: {len(childResources)}')
+		super().childrenAdded(childResources, originator)
+		if (sts := [ each.st for each in childResources if each.ty == T.CIN ]):
+			# Store the stateTag that was counted up while the <cin> were activated
+			if (st := max(sts)) > self.st:
+				self.setAttribute('st', st)
+				self.dbUpdate()
+		if any(each.ty == T.CIN for each in childResources):
+			self.validate(originator)
+
+
 	# Handle the removal of a CIN. 
 	def childRemoved(self, childResource:Resource, originator:str) -> None:
 		if L.isDebug: L.logDebug(f'Child resource removed: {childResource.ri}')
@@ -152,6 +186,11 @@ class CNT(AnnounceableResource):
 			self._validateChildren()
 
 
+	# Validate cni and cbs after the instance counters were rebuilt.
+	def validateInstances(self) -> None:
+		self._validateChildren()
+
+
 	# Validating the Container. This means recalculating cni, cbs as well as
 	# removing ContentInstances when the limits are met.
 	def validate(self, originator:str=None, create:bool = False, dct:JSON = None, parentResource:Resource = None) -> Result:
@@ -173,38 +212,35 @@ class CNT(AnnounceableResource):
 			return
 		self.__validating = True
 
-		# Only get the CINs in raw format. Instantiate them as resources if needed
-		cinsRaw = cast(List[JSON], sorted(CSE.storage.directChildResources(self.ri, T.CIN, raw = True), key = lambda x: x['ct']))
-		cni = len(cinsRaw)			
+		# cni and cbs are maintained by the storage's instance index while <cin> are added and removed.
+		cni, cbs = CSE.storage.instanceCounters(self.ri, T.CIN)
 			
 		# Check number of instances
 		if (mni := self.mni) is not None:
 			while cni > mni and cni > 0:
-				# Only instantiate the <cin> when needed here for deletion
-				cin = Factory.resourceFromDict(cinsRaw[0]).resource
+				# Only instantiate the oldest <cin> when needed here for deletion
+				if not (cin := CSE.dispatcher.retrieveLatestOldestInstance(self.ri, T.CIN, oldest = True)):
+					break
 				L.isDebug and L.logDebug(f'cni > mni: Removing <cin>: {cin.ri}')
 				# remove oldest
 				# Deleting a child must not cause a notification for 'deleteDirectChild'.
 				# Don't do a delete check means that CNT.childRemoved() is not called, where subscriptions for 'deleteDirectChild'  is tested.
 				CSE.dispatcher.deleteResource(cin, parentResource = self, doDeleteCheck = False)
-				del cinsRaw[0]	# Remove from list
 				cni -= 1	# decrement cni when deleting a <cin>
-
-		# Calculate cbs of remaining cins
-		cbs = sum([ each['cs'] for each in cinsRaw])
+				cbs -= cin.cs
 
 		# check size
 		if (mbs := self.mbs) is not None:
 			while cbs > mbs and cbs > 0:
-				# Only instantiate the <cin> when needed here for deletion
-				cin = Factory.resourceFromDict(cinsRaw[0]).resource
+				# Only instantiate the oldest <cin> when needed here for deletion
+				if not (cin := CSE.dispatcher.retrieveLatestOldestInstance(self.ri, T.CIN, oldest = True)):
+					break
 				L.isDebug and L.logDebug(f'cbs > mbs: Removing <cin>: {cin.ri}')
 				# remove oldest
 				cbs -= cin.cs
 				# Deleting a child must not cause a notification for 'deleteDirectChild'.
 				# Don't do a delete check means that CNT.childRemoved() is not called, where subscriptions for 'deleteDirectChild'  is tested.
 				CSE.dispatcher.deleteResource(cin, parentResource = self, doDeleteCheck = False)
-				del cinsRaw[0]	# Remove from list
 				cni -= 1	# decrement cni when deleting a <cin>
 
 		# Some attributes may have been updated, so store the resource 
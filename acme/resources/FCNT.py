@@ -140,6 +140,11 @@ class FCNT(AnnounceableResource):
 			self._validateChildren(originator, deletingFCI=True)
 
 
+	# Validate cni and cbs after the instance counters were rebuilt. Don't add a FCIN for this.
+	def validateInstances(self) -> None:
+		self._validateChildren(CSE.cseOriginator, deletingFCI=True)
+
+
 	# Checking the presence of cnd and calculating the size
 	def validate(self, originator:str = None, create:bool = False, dct:JSON = None, parentResource:Resource = None) -> Result:
 		if not (res := super().validate(originator, create, dct, parentResource)).status:
@@ -186,33 +191,35 @@ class FCNT(AnnounceableResource):
 			if not deletingFCI and (_updateCustomAttributes or dct is None or not self[self._hasFCI]):
 				self.addFlexContainerInstance(originator)
 			
-			fcis = self.flexContainerInstances()
-			cni = len(fcis)	# number of instances
+			# cni and cbs are maintained by the storage's instance index while <fci> are added and removed.
+			cni, cbs = CSE.storage.instanceCounters(self.ri, T.FCI)
 
 			# check mni
 			if (mni := self.mni) is not None:	# is an int
-				mni = self.mni
 				while cni > mni and cni > 0:
-					L.isDebug and L.logDebug(f'cni > mni: Removing <fci>: {fcis[0].ri}')
+					# Only instantiate the oldest <fci> when needed here for deletion
+					if not (fci := CSE.dispatcher.retrieveLatestOldestInstance(self.ri, T.FCI, oldest = True)):
+						break
+					L.isDebug and L.logDebug(f'cni > mni: Removing <fci>: {fci.ri}')
 					# remove oldest
 					# Deleting a child must not cause a notification for 'deleteDirectChild'.
 					# Don't do a delete check means that FCNT.childRemoved() is not called, where subscriptions for 'deleteDirectChild'  is tested.
-					CSE.dispatcher.deleteResource(fcis[0], parentResource = self, doDeleteCheck = False)
-					del fcis[0]	# Remove from list
+					CSE.dispatcher.deleteResource(fci, parentResource = self, doDeleteCheck = False)
 					cni -= 1	# decrement cni when deleting a <fci>
-
-			# Calculate cbs
-			cbs = sum([ each.cs for each in fcis])
+					cbs -= fci.cs
 
 			# check size
 			if (mbs := self.mbs) is not None:
 				while cbs > mbs and cbs > 0:
-					L.isDebug and L.logDebug(f'cbs > mbs: Removing <fci>: {fcis[0].ri}')
+					# Only instantiate the oldest <fci> when needed here for deletion
+					if not (fci := CSE.dispatcher.retrieveLatestOldestInstance(self.ri, T.FCI, oldest = True)):
+						break
+					L.isDebug and L.logDebug(f'cbs > mbs: Removing <fci>: {fci.ri}')
 					# remove oldest
-					cbs -= fcis[0].cs			
+					cbs -= fci.cs
 					# Deleting a child must not cause a notification for 'deleteDirectChild'.
 					# Don't do a delete check means that FCNT.childRemoved() is not called, where subscriptions for 'deleteDirectChild'  is tested.
-					CSE.dispatcher.deleteResource(fcis[0], parentResource = self, doDeleteCheck = False)
+					CSE.dispatcher.deleteResource(fci, parentResource = self, doDeleteCheck = False)
 					cni -= 1	# again, decrement cbi when deleting a cni
 
 				# Add "current" atribute, if it is not there
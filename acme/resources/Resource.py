@@ -404,6 +404,20 @@ class Resource(object):
 		CSE.notification.checkSubscriptions(self, NotificationEventType.createDirectChild, childResource)
 
 
+	def childrenAdded(self, childResources:list[Resource], originator:str) -> None:
+		""" Called after a number of child resources were added together to the resource, e.g.
+			in a bulk CREATE request. It is called instead of `childAdded()` for each child resource.
+
+			This method is implemented in some sub-classes.
+
+			Args:
+				childResources: The child resources that were added to the resource.
+				originator: The request originator.
+		"""
+		# Check Subscriptions
+		CSE.notification.checkSubscriptionsForCreatedChildren(self, childResources)
+
+
 	def childUpdated(self, childResource:Resource, updatedAttributes:JSON, originator:str) -> None:
 		"""	Called when a child resource was updated.
 					
@@ -429,6 +443,16 @@ class Resource(object):
 		CSE.notification.checkSubscriptions(self, NotificationEventType.deleteDirectChild, childResource)
 
 
+	def validateInstances(self) -> None:
+		""" Called after the storage's counters of the instance resources of the resource were rebuilt
+			by a consistency check. The resource validates its *cni* and *cbs* attributes and the limits
+			of its instance resources again.
+
+			This method is implemented in some sub-classes.
+		"""
+		pass
+
+
 	def canHaveChild(self, resource:Resource) -> bool:
 		""" Check whether *resource* is a valild child resource for this resource. 
 
@@ -257,6 +257,11 @@ class TS(AnnounceableResource):
 				CSE.timeSeries.removeSubscription(self, childResource)
 
 
+	# Validate cni and cbs after the instance counters were rebuilt.
+	def validateInstances(self) -> None:
+		self._validateChildren()
+
+
 	# handle eventuel updates of subscriptions
 	def childUpdated(self, childResource:Resource, updatedAttributes:JSON, originator:str) -> None:
 		super().childUpdated(childResource, updatedAttributes, originator)
@@ -273,34 +278,35 @@ class TS(AnnounceableResource):
 			return
 		self.__validating = True
 
-		# TODO Optimize: Do we really need the resources?
-		tsis = self.timeSeriesInstances()	# retrieve TIS child resources
-		cni = len(tsis)			
+		# cni and cbs are maintained by the storage's instance index while <tsi> are added and removed.
+		cni, cbs = CSE.storage.instanceCounters(self.ri, T.TSI)
 			
 		# Check number of instances
 		if (mni := self.mni) is not None:	# mni is an int
 			while cni > mni and cni > 0:
-				L.isDebug and L.logDebug(f'cni > mni: Removing <tsi>: {tsis[0].ri}')
+				# Only instantiate the oldest <tsi> when needed here for deletion
+				if not (tsi := CSE.dispatcher.retrieveLatestOldestInstance(self.ri, T.TSI, oldest = True)):
+					break
+				L.isDebug and L.logDebug(f'cni > mni: Removing <tsi>: {tsi.ri}')
 				# remove oldest
 				# Deleting a child must not cause a notification for 'deleteDirectChild'.
 				# Don't do a delete check means that TS.childRemoved() is not called, where subscriptions for 'deleteDirectChild'  is tested.
-				CSE.dispatcher.deleteResource(tsis[0], parentResource = self, doDeleteCheck = False)
-				del tsis[0]
-				cni -= 1	# decrement cni when deleting a <cin>
-
-		# Calculate cbs
-		cbs = sum([ each.cs for each in tsis])
+				CSE.dispatcher.deleteResource(tsi, parentResource = self, doDeleteCheck = False)
+				cni -= 1	# decrement cni when deleting a <tsi>
+				cbs -= tsi.cs
 
 		# check size
 		if (mbs := self.mbs) is not None:
 			while cbs > mbs and cbs > 0:
-				L.isDebug and L.logDebug(f'cbs > mbs: Removing <tsi>: {tsis[0].ri}')
+				# Only instantiate the oldest <tsi> when needed here for deletion
+				if not (tsi := CSE.dispatcher.retrieveLatestOldestInstance(self.ri, T.TSI, oldest = True)):
+					break
+				L.isDebug and L.logDebug(f'cbs > mbs: Removing <tsi>: {tsi.ri}')
 				# remove oldest
-				cbs -= tsis[0]['cs']
+				cbs -= tsi.cs
 				# Deleting a child must not cause a notification for 'deleteDirectChild'.
 				# Don't do a delete check means that TS.childRemoved() is not called, where subscriptions for 'deleteDirectChild'  is tested.
-				CSE.dispatcher.deleteResource(tsis[0], parentResource = self, doDeleteCheck = False)
-				del tsis[0]
+				CSE.dispatcher.deleteResource(tsi, parentResource = self, doDeleteCheck = False)
 				cni -= 1	# decrement cni when deleting a <tsi>
 
 		# Some attributes may have been updated, so store the resource 
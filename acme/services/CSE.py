@@ -13,6 +13,7 @@ from threading import Lock
 from typing import Dict, Any
 
 from ..helpers.BackgroundWorker import BackgroundWorkerPool
+from ..helpers.AsyncLoop import AsyncLoop
 from ..etc.Types import CSEStatus, CSEType, ContentSerializationType
 from ..services.Configuration import Configuration
 from ..services.Console import Console
@@ -41,6 +42,7 @@ from .AnnouncementManager import AnnouncementManager
 # singleton main components. These variables will hold all the various manager
 # components that are used throughout the CSE implementation.
 announce:AnnouncementManager					= None
+asyncLoop:AsyncLoop								= None
 console:Console									= None
 dispatcher:Dispatcher							= None
 event:EventManager								= None
@@ -85,7 +87,7 @@ _cseResetLock									= Lock()	# lock for resetting the CSE
 
 
 def startup(args:argparse.Namespace, **kwargs: Dict[str, Any]) -> bool:
-	global announce, console, dispatcher, event, group, httpServer, importer, mqttClient, notification, registration
+	global announce, asyncLoop, console, dispatcher, event, group, httpServer, importer, mqttClient, notification, registration
 	global remote, request, script, security, statistics, storage, time, timeSeries, validator
 	global aeStatistics
 	global supportedReleaseVersions, cseType, defaultSerialization, cseCsi, cseCsiSlash, cseCsiRelative, cseSpid, cseRi, cseRn, releaseVersion
@@ -143,6 +145,15 @@ def startup(args:argparse.Namespace, **kwargs: Dict[str, Any]) -> bool:
 										balanceLatency = Configuration.get('cse.operation.jobBalanceLatency'),
 										balanceReduceFactor = Configuration.get('cse.operation.jobBalanceReduceFactor'))
 
+	# Events raised in the background are handled by a fixed number of dispatcher threads
+	EventManager.setLogger(lambda l,m: L.logWithLevel(l, m, stackOffset = 2))
+	event.setDispatchers(Configuration.get('cse.operation.eventDispatchers'))
+
+	# Start the asyncio event loop if requests are received on it
+	if Configuration.get('http.engine') == 'asyncio' or (Configuration.get('mqtt.enable') and Configuration.get('mqtt.asyncio')):
+		AsyncLoop.setLogger(lambda l,m: L.logWithLevel(l, m, stackOffset = 2))
+		asyncLoop = AsyncLoop(Configuration.get('cse.operation.asyncioWorkers')).start()
+
 	console = Console()						# Start the console
 
 	storage = Storage()						# Initiatlize the resource storage
@@ -233,6 +244,7 @@ def _shutdown() -> None:
 	remote and remote.shutdown()
 	mqttClient and mqttClient.shutdown()
 	httpServer and httpServer.shutdown()
+	asyncLoop and asyncLoop.stop()
 	script and script.shutdown()
 	announce and announce.shutdown()
 	timeSeries and timeSeries.shutdown()
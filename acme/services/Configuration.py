@@ -18,7 +18,7 @@ from InquirerPy import prompt, inquirer
 import isodate
 
 from ..etc.Constants import Constants as C
-from ..etc.Types import CSEType, ContentSerializationType, Permission
+from ..etc.Types import CSEType, ContentSerializationType, Permission, ResourceTypes
 
 
 class Configuration(object):
@@ -32,6 +32,7 @@ class Configuration(object):
 	_argsConfigfile:str 			= None
 	_argsLoglevel:str				= None
 	_argsDBReset:bool				= None
+	_argsDBMigrate:bool				= None
 	_argsDBStorageMode:str			= None
 	_argsHeadless:bool				= None
 	_argsHttpAddress:str			= None
@@ -61,6 +62,7 @@ class Configuration(object):
 		Configuration._argsConfigfile			= args.configfile if args and 'configfile' in args else C.defaultUserConfigFile
 		Configuration._argsLoglevel				= args.loglevel if args and 'loglevel' in args else None
 		Configuration._argsDBReset				= args.dbreset if args and 'dbreset' in args else False
+		Configuration._argsDBMigrate			= args.dbmigrate if args and 'dbmigrate' in args else False
 		Configuration._argsDBStorageMode		= args.dbstoragemode if args and 'dbstoragemode' in args else None
 		Configuration._argsHeadless				= args.headless if args and 'headless' in args else False
 		Configuration._argsHttpAddress			= args.httpaddress if args and 'httpaddress' in args else None
@@ -130,6 +132,7 @@ class Configuration(object):
 				'cse.originator'						: config.get('cse', 'originator',									fallback = 'CAdmin'),
 				'cse.enableRemoteCSE'					: config.getboolean('cse', 'enableRemoteCSE', 						fallback = True),
 				'cse.sortDiscoveredResources'			: config.getboolean('cse', 'sortDiscoveredResources',				fallback = True),
+				'cse.maxDiscoveredResources'			: config.getint('cse', 'maxDiscoveredResources',					fallback = 0),		# 0 = no limit
 				'cse.checkExpirationsInterval'			: config.getint('cse', 'checkExpirationsInterval',					fallback = 60),		# Seconds
 				'cse.flexBlockingPreference'			: config.get('cse', 'flexBlockingPreference',						fallback = 'blocking'),
 				'cse.supportedReleaseVersions'			: config.getlist('cse', 'supportedReleaseVersions',					fallback = ['2a', '3', '4']), # type: ignore [attr-defined]
@@ -142,6 +145,7 @@ class Configuration(object):
 
 				'cse.security.enableACPChecks'			: config.getboolean('cse.security', 'enableACPChecks',			 	fallback = True),
 				'cse.security.fullAccessAdmin'			: config.getboolean('cse.security', 'fullAccessAdmin',			 	fallback = True),
+				'cse.security.acpDecisionCacheSize'		: config.getint('cse.security', 'acpDecisionCacheSize',			 	fallback = 10000),
 
 				#
 				#	CSE Operation
@@ -150,6 +154,11 @@ class Configuration(object):
 				'cse.operation.jobBalanceTarget'		: config.getfloat('cse.operation', 'jobBalanceTarget',			 	fallback = 3.0),
 				'cse.operation.jobBalanceLatency'		: config.getint('cse.operation', 'jobBalanceLatency', 				fallback = 1000),
 				'cse.operation.jobBalanceReduceFactor'	: config.getfloat('cse.operation', 'jobBalanceReduceFactor', 		fallback = 2.0),
+				'cse.operation.asyncSubscriptionNotifications'	: config.getboolean('cse.operation', 'asyncSubscriptionNotifications',	fallback = False),
+				'cse.operation.notificationSenders'		: config.getint('cse.operation', 'notificationSenders', 			fallback = 4),
+				'cse.operation.notificationQueueSize'	: config.getint('cse.operation', 'notificationQueueSize', 			fallback = 1000),
+				'cse.operation.asyncioWorkers'			: config.getint('cse.operation', 'asyncioWorkers', 				fallback = 32),
+				'cse.operation.eventDispatchers'		: config.getint('cse.operation', 'eventDispatchers', 				fallback = 2),
 
 				#
 				#	HTTP Server
@@ -160,8 +169,19 @@ class Configuration(object):
 				'http.root'								: config.get('server.http', 'root', 								fallback = ''),
 				'http.address'							: config.get('server.http', 'address', 								fallback = 'http://127.0.0.1:8080'),
 				'http.enableStructureEndpoint'			: config.getboolean('server.http', 'enableStructureEndpoint', 		fallback = False),
+				'http.enableStatisticsEndpoint'			: config.getboolean('server.http', 'enableStatisticsEndpoint', 		fallback = False),
+				'http.enableMetricsEndpoint'			: config.getboolean('server.http', 'enableMetricsEndpoint', 		fallback = False),
+				'http.metricsInterval'					: config.getfloat('server.http', 'metricsInterval', 				fallback = 5.0),	# Seconds
 				'http.enableUpperTesterEndpoint'		: config.getboolean('server.http', 'enableUpperTesterEndpoint', 	fallback = False),
 				'http.allowPatchForDelete'				: config.getboolean('server.http', 'allowPatchForDelete', 			fallback = False),
+				'http.clientPoolSize'					: config.getint('server.http', 'clientPoolSize', 					fallback = 10),
+				'http.clientTimeout'					: config.getfloat('server.http', 'clientTimeout', 					fallback = 10.0),	# Seconds
+				'http.engine'							: config.get('server.http', 'engine', 								fallback = 'werkzeug'),
+				'http.workers'							: config.getint('server.http', 'workers', 							fallback = 16),
+				'http.backlog'							: config.getint('server.http', 'backlog', 							fallback = 128),
+				'http.keepAliveTimeout'					: config.getfloat('server.http', 'keepAliveTimeout', 				fallback = 5.0),	# Seconds
+				'http.maxKeepAliveRequests'				: config.getint('server.http', 'maxKeepAliveRequests', 				fallback = 100),
+				'http.drainTimeout'						: config.getfloat('server.http', 'drainTimeout', 					fallback = 10.0),	# Seconds
 
 				#
 				#	HTTP Server Security
@@ -184,6 +204,7 @@ class Configuration(object):
 				'mqtt.listenIF' 						: config.get('client.mqtt', 'listenIF',								fallback = '127.0.0.1'),
 				'mqtt.topicPrefix' 						: config.get('client.mqtt', 'topicPrefix',							fallback = ''),
 				'mqtt.timeout' 							: config.getfloat('client.mqtt', 'timeout',							fallback = 5.0),
+				'mqtt.asyncio' 							: config.getboolean('client.mqtt', 'asyncio',						fallback = False),
 
 				#
 				#	MQTT Client Security
@@ -200,10 +221,20 @@ class Configuration(object):
 				#	Database
 				#
 
+				'db.backend'							: config.get('database', 'backend', 								fallback = 'tinydb'),
 				'db.path'								: config.get('database', 'path', 									fallback = './data'),
 				'db.inMemory'							: config.getboolean('database', 'inMemory', 						fallback = False),
 				'db.cacheSize'							: config.getint('database', 'cacheSize', 							fallback = 0),		# Default: no caching
+				'db.identifierCacheSize'				: config.getint('database', 'identifierCacheSize', 					fallback = 10000),
+				'db.resourceCacheSize'					: config.getint('database', 'resourceCacheSize', 					fallback = 1000),	# per resource type
+				'db.resourceCacheTypeSizes'				: config.getlist('database', 'resourceCacheTypeSizes', 				fallback = ['CIN:100', 'TSI:100', 'FCI:100']),	# type: ignore [attr-defined]
 				'db.resetOnStartup' 					: config.getboolean('database', 'resetOnStartup',					fallback = False),
+				'db.writeBehind' 						: config.getboolean('database', 'writeBehind',						fallback = False),
+				'db.journalCompactionInterval'			: config.getfloat('database', 'journalCompactionInterval',			fallback = 60.0),	# Seconds
+				'db.journalMaxSize'						: config.getint('database', 'journalMaxSize',						fallback = 10485760),	# Bytes
+				'db.journalSync'						: config.get('database', 'journalSync',								fallback = 'always'),
+				'db.journalSyncInterval'				: config.getfloat('database', 'journalSyncInterval',				fallback = 1.0),	# Seconds
+				'db.migrate' 							: False,	# Only set by the command line
 
 				#
 				#	Logging
@@ -218,6 +249,9 @@ class Configuration(object):
 				'logging.stackTraceOnError'				: config.getboolean('logging', 'stackTraceOnError',					fallback = True),
 				'logging.enableBindingsLogging'			: config.getboolean('logging', 'enableBindingsLogging',				fallback = False),
 				'logging.queueSize'						: config.getint('logging', 'queueSize', 							fallback = 5000),	# Size of the log queue
+				'logging.queueOverflow'					: config.get('logging', 'queueOverflow', 							fallback = 'block'),	# Policy when the log queue is full
+				'logging.queueSampleRate'				: config.getint('logging', 'queueSampleRate', 						fallback = 10),		# Keep one of n debug and info records when sampling
+				'logging.batchSize'						: config.getint('logging', 'batchSize', 							fallback = 100),	# Max number of log records written at once
 
 				#
 				#	Registrar CSE
@@ -400,9 +434,16 @@ class Configuration(object):
 		# Test for correct logging queue size
 		if (queueSize := Configuration._configuration['logging.queueSize']) < 0:
 			return False, f'Configuration Error: \[logging]:queueSize must be 0 or greater'
+		if Configuration._configuration['logging.queueOverflow'] not in [ 'block', 'dropDebug', 'sample' ]:
+			return False, f'Configuration Error: \[logging]:queueOverflow must be "block", "dropDebug" or "sample"'
+		if Configuration._configuration['logging.queueSampleRate'] < 1:
+			return False, f'Configuration Error: \[logging]:queueSampleRate must be 1 or greater'
+		if Configuration._configuration['logging.batchSize'] < 1:
+			return False, f'Configuration Error: \[logging]:batchSize must be 1 or greater'
 
 
 		if Configuration._argsDBReset is True:					Configuration._configuration['db.resetOnStartup'] = True									# Override DB reset from command line
+		if Configuration._argsDBMigrate is True:				Configuration._configuration['db.migrate'] = True											# Migrate the DB from command line
 		if Configuration._argsDBStorageMode is not None:		Configuration._configuration['db.inMemory'] = Configuration._argsDBStorageMode == 'memory'					# Override DB storage mode from command line
 		if Configuration._argsHttpAddress is not None:			Configuration._configuration['http.address'] = Configuration._argsHttpAddress								# Override server http address
 		if Configuration._argsHttpPort is not None:				Configuration._configuration['http.port'] = Configuration._argsHttpPort									# Override server http port
@@ -448,6 +489,39 @@ class Configuration(object):
 			return False, f'Configuration Error: \[cse.operation]:jobBalanceLatency must be >= 0'
 		if Configuration._configuration['cse.operation.jobBalanceReduceFactor'] < 1.0:
 			return False, f'Configuration Error: \[cse.operation]:jobBalanceReduceFactor must be >= 1.0'
+		if Configuration._configuration['cse.operation.notificationSenders'] < 1:
+			return False, f'Configuration Error: \[cse.operation]:notificationSenders must be > 0'
+		if Configuration._configuration['cse.operation.notificationQueueSize'] < 1:
+			return False, f'Configuration Error: \[cse.operation]:notificationQueueSize must be > 0'
+		if Configuration._configuration['cse.operation.asyncioWorkers'] < 1:
+			return False, f'Configuration Error: \[cse.operation]:asyncioWorkers must be > 0'
+		if Configuration._configuration['cse.operation.eventDispatchers'] < 1:
+			return False, f'Configuration Error: \[cse.operation]:eventDispatchers must be > 0'
+
+		# HTTP client
+		if Configuration._configuration['http.clientPoolSize'] < 1:
+			return False, f'Configuration Error: \[server.http]:clientPoolSize must be > 0'
+		if Configuration._configuration['http.clientTimeout'] <= 0.0:
+			return False, f'Configuration Error: \[server.http]:clientTimeout must be > 0.0'
+
+		# HTTP metrics endpoint
+		if Configuration._configuration['http.metricsInterval'] <= 0.0:
+			return False, f'Configuration Error: \[server.http]:metricsInterval must be > 0.0'
+
+		# HTTP server engine
+		Configuration._configuration['http.engine'] = (engine := Configuration._configuration['http.engine'].lower())
+		if engine not in [ 'werkzeug', 'pooled', 'asyncio' ]:
+			return False, f'Configuration Error: \[server.http]:engine must be "werkzeug", "pooled" or "asyncio"'
+		if Configuration._configuration['http.workers'] < 1:
+			return False, f'Configuration Error: \[server.http]:workers must be > 0'
+		if Configuration._configuration['http.backlog'] < 1:
+			return False, f'Configuration Error: \[server.http]:backlog must be > 0'
+		if Configuration._configuration['http.keepAliveTimeout'] <= 0.0:
+			return False, f'Configuration Error: \[server.http]:keepAliveTimeout must be > 0.0'
+		if Configuration._configuration['http.maxKeepAliveRequests'] < 1:
+			return False, f'Configuration Error: \[server.http]:maxKeepAliveRequests must be > 0'
+		if Configuration._configuration['http.drainTimeout'] < 0.0:
+			return False, f'Configuration Error: \[server.http]:drainTimeout must be >= 0.0'
 
 
 		#
@@ -493,6 +567,45 @@ class Configuration(object):
 			if len(Configuration._configuration['cse.registrar.csi']) > 0 and len(Configuration._configuration['cse.registrar.rn']) == 0:
 				return False, 'Configuration Error: Missing configuration \[cse.registrar]:resourceName'
 
+		# Database backend
+		Configuration._configuration['db.backend'] = (backend := Configuration._configuration['db.backend'].lower())
+		if backend not in [ 'tinydb', 'sqlite' ]:
+			return False, 'Configuration Error: \[database]:backend must be "tinydb" or "sqlite"'
+		if Configuration._configuration['db.migrate'] and backend != 'sqlite':
+			return False, 'Configuration Error: Migrating the database requires \[database]:backend to be "sqlite"'
+		if Configuration._configuration['db.journalCompactionInterval'] <= 0.0:
+			return False, 'Configuration Error: \[database]:journalCompactionInterval must be greater than 0.0'
+		if Configuration._configuration['db.journalMaxSize'] < 0:
+			return False, 'Configuration Error: \[database]:journalMaxSize must be 0 or greater'
+		Configuration._configuration['db.journalSync'] = (journalSync := Configuration._configuration['db.journalSync'].lower())
+		if journalSync not in [ 'always', 'interval', 'none' ]:
+			return False, 'Configuration Error: \[database]:journalSync must be "always", "interval" or "none"'
+		if Configuration._configuration['db.journalSyncInterval'] <= 0.0:
+			return False, 'Configuration Error: \[database]:journalSyncInterval must be greater than 0.0'
+		if Configuration._configuration['db.identifierCacheSize'] < 0:
+			return False, 'Configuration Error: \[database]:identifierCacheSize must be 0 or greater'
+		if Configuration._configuration['db.resourceCacheSize'] < 0:
+			return False, 'Configuration Error: \[database]:resourceCacheSize must be 0 or greater'
+		if isinstance(entries := Configuration._configuration['db.resourceCacheTypeSizes'], list):	# not yet converted
+			typeSizes:dict[int, int] = {}
+			resourceTypeNames = { n.lower(): t for n, t in ResourceTypes.__members__.items() }
+			for entry in entries:
+				if not entry:
+					continue
+				try:
+					name, value = entry.split(':')
+					ty = int(name) if name.strip().lstrip('-').isdigit() else resourceTypeNames[name.strip().lower()]
+					if (size := int(value)) < 0:
+						raise ValueError()
+					typeSizes[int(ty)] = size
+				except (ValueError, KeyError):
+					return False, f'Configuration Error: Invalid entry in \[database]:resourceCacheTypeSizes: {entry}. Must be <resource type>:<size>'
+			Configuration._configuration['db.resourceCacheTypeSizes'] = typeSizes
+
+		# Security settings
+		if Configuration._configuration['cse.security.acpDecisionCacheSize'] < 0:
+			return False, 'Configuration Error: \[cse.security]:acpDecisionCacheSize must be 0 or greater'
+
 		# Check default subscription duration
 		if Configuration._configuration['cse.sub.dur'] < 1:
 			return False, 'Configuration Error: \[cse.resource.sub]:batchNotifyDuration must be > 0'
@@ -518,6 +631,10 @@ class Configuration(object):
 		if Configuration._configuration['cse.console.refreshInterval'] <= 0.0:
 			return False, 'Configuration Error: \[cse.console]:refreshInterval must be greater than 0.0'
 
+		# Check discovery limit
+		if Configuration._configuration['cse.maxDiscoveredResources'] < 0:
+			return False, 'Configuration Error: \[cse]:maxDiscoveredResources must be 0 or greater'
+
 		# Console settings
 		from ..services.Console import TreeMode
 		if isinstance(tm := Configuration._configuration['cse.console.treeMode'], str):
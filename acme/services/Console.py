@@ -123,6 +123,7 @@ class Console(object):
 			'k'		: self.katalogScripts,
 			'l'     : self.toggleScreenLogging,
 			'L'     : self.toggleLogging,
+			'P'		: self.measurements,
 			'Q'		: self.shutdownCSE,		# See handler below
 			'r'		: self.cseRegistrations,
 			'R'		: self.runScript,
@@ -132,6 +133,7 @@ class Console(object):
 			'\x14'	: self.continuesTree,
 			'T'		: self.childResourceTree,
 			'u'		: self.openWebUI,
+			'V'		: self.validateInstanceCounters,
 			'w'		: self.workers,
 			#'Z'		: self.resetCSE,
 		}
@@ -188,6 +190,7 @@ class Console(object):
 			('k', 'Catalog of scripts'),
 			('l', 'Toggle screen logging on/off'),
 			('L', 'Toggle through log levels'),
+			('P', 'Show request latencies and notification delivery times'),
 			('r', 'Show CSE registrations'),
 			('s', 'Show statistics'),
 			('^S', 'Show & refresh statistics continuously'),
@@ -195,6 +198,7 @@ class Console(object):
 			('T', 'Show child resource tree'),
 			('^T', 'Show & refresh resource tree continuously'),
 			('u', 'Open web UI'),
+			('V', 'Validate instance counters (cni, cbs)'),
 			('w', 'Show workers and threads status'),
 		]
 
@@ -299,6 +303,16 @@ Available under the BSD 3-Clause License
 		table.add_row('Paused', str(p))
 		L.console(table, nl = True)
 
+		# Scheduler
+		table = Table(row_styles = [ '', L.tableRowStyle])
+		table.add_column('Scheduler', no_wrap = True)
+		table.add_column('Value', no_wrap = True, justify = 'right')
+		q, lagCount, lagSum, lagMax = BackgroundWorkerPool.schedulerStatistics()
+		table.add_row('Queued Workers', str(q))
+		table.add_row('Avg Lag (ms)', f'{lagSum / lagCount * 1000:.3f}' if lagCount else '')
+		table.add_row('Max Lag (ms)', f'{lagMax * 1000:.3f}' if lagCount else '')
+		L.console(table, nl = True)
+
 
 
 
@@ -367,7 +381,7 @@ Available under the BSD 3-Clause License
 				live.update(self.getResourceTreeRich(style = L.terminalStyle), refresh = True)
 			
 			# Register events for which the tree is refreshed
-			CSE.event.addHandler([CSE.event.createResource, CSE.event.deleteResource, CSE.event.updateResource],  _updateTree)		# type:ignore[attr-defined]
+			CSE.event.addHandler([CSE.event.createResource, CSE.event.deleteResource, CSE.event.updateResource],  _updateTree, coalesce = True)		# type:ignore[attr-defined]
 
 			while (ch := waitForKeypress(self.refreshInterval)) in [None, '\x14']:
 				if ch == '\x14':	# Toggle through tree modes
@@ -400,6 +414,14 @@ Available under the BSD 3-Clause License
 		L.console()
 
 
+	def measurements(self, _:str) -> None:
+		""" Render the request latencies, request sizes and notification delivery times.
+		"""
+		L.console('Request Latencies', isHeader=True)
+		L.console(self.getMeasurementsRich())
+		L.console()
+
+
 	def continuesStatistics(self, key:str) -> None:
 		L.off()
 		self.interruptContinous = False
@@ -431,6 +453,19 @@ Available under the BSD 3-Clause License
 		L.on()
 
 
+	def validateInstanceCounters(self, _:str) -> None:
+		"""	Rebuild and validate the *cni* and *cbs* attributes of a <container>, <flexContainer> or <timeSeries>, or of all of them.
+		"""
+		L.console('Validate Instance Counters', isHeader = True)
+		L.off()
+		if (ri := L.consolePrompt('ri (empty for all)')) is not None:
+			if not (res := CSE.dispatcher.validateInstanceCounters(ri)).status:
+				L.console(res.dbg, isError = True)
+			else:
+				L.console(f'ok ({res.data} resource(s) validated)')
+		L.on()
+
+
 	previousInspectRi = ''
 	def inspectResource(self, _:str) -> None:
 		"""	Show a resource.
@@ -717,6 +752,7 @@ Available under the BSD 3-Clause License
 			logs += f'LogLevel : {str(L.logLevel)}\n'
 			logs += f'Errors   : {stats.get(Statistics.logErrors, 0)}\n'
 			logs += f'Warnings : {stats.get(Statistics.logWarnings, 0)}\n'
+			logs += f'Dropped  : {L.droppedRecords}\n'
 
 		else:
 			resourceOps  = '\n[dim]statistics are disabled[/dim]\n'
@@ -736,10 +772,14 @@ Available under the BSD 3-Clause License
 			misc += '\n'
 		misc += f'Platform  : {sys.platform}\n'
 		misc += f'Python    : {sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}\n'
+		cached, hits, misses = CSE.storage.identifierCacheStatistics()
+		misc += f'ID Cache  : {cached} | {hits} hits | {misses} misses\n'
+		cached, hits, misses = CSE.storage.resourceCacheStatistics()
+		misc += f'Res Cache : {cached} | {(hits * 100 // (hits + misses)) if hits + misses else 0}% hits\n'
 
 		# Adapt the following line when adding resources to keep formatting. 
 		# It fills up the right columns to match the length of the left column.
-		misc += '\n' * ( 2 if CSE.statistics.statisticsEnabled else 7)
+		misc += '\n' * ( 0 if CSE.statistics.statisticsEnabled else 5)
 
 		requestsGrid = Table.grid(expand = True)
 		requestsGrid.add_column(ratio = 28)
@@ -789,6 +829,37 @@ Available under the BSD 3-Clause License
 		return result
 
 
+	def getMeasurementsRich(self) -> Table|str:
+		"""	Generate a table with the summaries of the measured request latencies, request sizes
+			and notification delivery times.
+		"""
+		if not CSE.statistics.statisticsEnabled:
+			return '[dim]statistics are disabled[/dim]'
+		names = {
+			Statistics.requestLatency		: 'Latency (ms)',
+			Statistics.requestLatencyByType	: 'Latency by Type (ms)',
+			Statistics.requestSize			: 'Request Size (bytes)',
+			Statistics.notificationDelivery	: 'Notification Delivery (ms)',
+		}
+		table = Table(row_styles = [ '', L.tableRowStyle])
+		table.add_column('Measurement', no_wrap = True)
+		table.add_column('Labels', no_wrap = True)
+		for column in [ 'Count', 'Mean', 'p50', 'p95', 'p99' ]:
+			table.add_column(column, no_wrap = True, justify = 'right')
+		measurements = CSE.statistics.getMeasurements()
+		for name, title in names.items():
+			for i, (labels, summary) in enumerate(measurements.get(name, {}).items()):
+				table.add_row(title if i == 0 else '', 
+							  labels, 
+							  str(summary['count']), 
+							  f'{summary["mean"]:.3f}', 
+							  f'{summary["p50"]:.3f}', 
+							  f'{summary["p95"]:.3f}', 
+							  f'{summary["p99"]:.3f}',
+							  end_section = i == len(measurements[name]) - 1)
+		return table
+
+
 	def getResourceTreeRich(self, maxLevel:int=0, parent:str=None, style:Style=Style()) -> Tree:
 		"""	This function will generate a Rich tree of a CSE's resource structure.
 		"""
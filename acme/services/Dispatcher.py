@@ -9,10 +9,11 @@
 
 from __future__ import annotations
 from cgitb import reset
-import operator
 import sys
 from copy import deepcopy
-from typing import Any, List, Tuple, Dict, cast
+from itertools import islice
+from typing import Any, List, Tuple, Dict, Iterator, cast
+from tinydb.table import Document
 
 from ..helpers import TextTools as TextTools
 from ..etc.Constants import Constants as C
@@ -21,6 +22,7 @@ from ..etc.Types import FilterOperation
 from ..etc.Types import Permission
 from ..etc.Types import DesiredIdentifierResultType as DRT
 from ..etc.Types import ResultContentType as RCN
+from ..etc.Types import ContentStatus
 from ..etc.Types import ResponseStatusCode as RC
 from ..etc.Types import Result
 from ..etc.Types import CSERequest
@@ -34,11 +36,17 @@ from ..resources import Factory as Factory
 from ..resources.Resource import Resource
 
 
+# Maximum number of candidates that a discovery takes from the type or label index. With more candidates
+# the resource tree below the target resource is walked instead.
+maxIndexCandidates = 1000
+
+
 class Dispatcher(object):
 
 	def __init__(self) -> None:
 		self.csiSlashLen 				= len(CSE.cseCsiSlash)
 		self.sortDiscoveryResources 	= Configuration.get('cse.sortDiscoveredResources')
+		self.maxDiscoveredResources		= Configuration.get('cse.maxDiscoveredResources')
 		L.isInfo and L.log('Dispatcher initialized')
 
 
@@ -155,9 +163,14 @@ class Dispatcher(object):
 				return res
 
 
+		# Limit the number of discovered resources. The client can continue with the returned content offset
+		handling = request.args.handling
+		if self.maxDiscoveredResources and handling.get('lim', sys.maxsize) > self.maxDiscoveredResources:
+			handling = { **handling, 'lim': self.maxDiscoveredResources }
+
 		# do discovery
 		# TODO simplify arguments
-		if not (res := self.discoverResources(id, originator, request.args.handling, request.args.fo, request.args.conditions, request.args.attributes, permission=permission)).status:	# not found?
+		if not (res := self.discoverResources(id, originator, handling, request.args.fo, request.args.conditions, request.args.attributes, permission=permission)).status:	# not found?
 			return res.errorResultCopy()				
 
 		# check and filter by ACP. After this allowedResources only contains the resources that are allowed
@@ -175,26 +188,26 @@ class Dispatcher(object):
 
 		if request.args.rcn == RCN.attributesAndChildResources:
 			self.resourceTreeDict(allowedResources, resource)	# the function call add attributes to the target resource
-			return Result(status = True, rsc = RC.OK, resource = resource)
+			return Result(status = True, rsc = RC.OK, resource = resource, contentStatus = res.contentStatus, contentOffset = res.contentOffset)
 
 		elif request.args.rcn == RCN.attributesAndChildResourceReferences:
 			self._resourceTreeReferences(allowedResources, resource, request.args.drt, 'ch')	# the function call add attributes to the target resource
-			return Result(status = True, rsc = RC.OK, resource = resource)
+			return Result(status = True, rsc = RC.OK, resource = resource, contentStatus = res.contentStatus, contentOffset = res.contentOffset)
 
 		elif request.args.rcn == RCN.childResourceReferences: 
 			#childResourcesRef:JSON = { resource.tpe: {} }  # Root resource with no attribute
 			#childResourcesRef = self._resourceTreeReferences(allowedResources,  None, request.args.drt, 'm2m:rrl')
 			# self._resourceTreeReferences(allowedResources, childResourcesRef[resource.tpe], request.args.drt, 'm2m:rrl')
 			childResourcesRef = self._resourceTreeReferences(allowedResources, None, request.args.drt, 'm2m:rrl')
-			return Result(status = True, rsc = RC.OK, resource = childResourcesRef)
+			return Result(status = True, rsc = RC.OK, resource = childResourcesRef, contentStatus = res.contentStatus, contentOffset = res.contentOffset)
 
 		elif request.args.rcn == RCN.childResources:
 			childResources:JSON = { resource.tpe : {} } #  Root resource as a dict with no attribute
 			self.resourceTreeDict(allowedResources, childResources[resource.tpe]) # Adding just child resources
-			return Result(status = True, rsc = RC.OK, resource = childResources)
+			return Result(status = True, rsc = RC.OK, resource = childResources, contentStatus = res.contentStatus, contentOffset = res.contentOffset)
 
 		elif request.args.rcn == RCN.discoveryResultReferences: # URIList
-			return Result(status = True, rsc = RC.OK, resource = self._resourcesToURIList(allowedResources, request.args.drt))
+			return Result(status = True, rsc = RC.OK, resource = self._resourcesToURIList(allowedResources, request.args.drt), contentStatus = res.contentStatus, contentOffset = res.contentOffset)
 
 		else:
 			return Result.errorResult(dbg = 'wrong rcn for RETRIEVE')
@@ -258,13 +271,16 @@ class Dispatcher(object):
 				return Result.errorResult(rsc = RC.notFound, dbg = res.dbg)
 			rootResource = res.resource
 
-		# get all direct children
-		dcrs = self.directChildResources(id)
-
-		# Slice the page (offset and limit)
+		# The page of discovered resources (offset and limit). The offset is either the number of the first resource,
+		# or the content offset of a previous partial result, which is the resource ID of the last resource returned.
 		offset = handling['ofst'] if 'ofst' in handling else 1			# default: 1 (first resource
+		after:Tuple[int, ...] = ()
+		if isinstance(offset, str):
+			if not (after := self._continuationPosition(rootResource.ri, offset)):
+				L.logDebug(dbg := f'Invalid content offset: {offset}')
+				return Result.errorResult(dbg = dbg)
+			offset = 1
 		limit = handling['lim'] if 'lim' in handling else sys.maxsize	# default: system max size or "maxint"
-		dcrs = dcrs[offset-1:offset-1+limit]							# now dcrs only contains the desired child resources for ofst and lim
 
 		# Get level
 		level = handling['lvl'] if 'lvl' in handling else sys.maxsize	# default: system max size or "maxint"
@@ -278,8 +294,13 @@ class Dispatcher(object):
 			  (len(conditions.get('lbl'))-1 if 'lbl' in conditions else 0) 		# -1 : compensate for len(conditions) in line 1 
 			)
 
-		# Discover the resources
-		discoveredResources = self._discoverResources(rootResource, originator, level, fo, allLen, dcrs=dcrs, conditions=conditions, attributes=attributes, permission=permission)
+		# Discover the resources. Take one more than the limit to determine whether the result is partial
+		discovered = self._discoverResources(rootResource, originator, level, fo, allLen, conditions = conditions, attributes = attributes, permission = permission, offset = offset, after = after)
+		discoveredResources = list(islice(discovered, limit))
+		contentOffset:str = None
+		if 0 < limit == len(discoveredResources) and next(discovered, None) is not None:
+			contentOffset = discoveredResources[-1].ri
+			L.isDebug and L.logDebug(f'Discovery result is partial. Continue after resource: {contentOffset}')
 
 		# NOTE: this list contains all results in the order they could be found while
 		#		walking the resource tree.
@@ -297,7 +318,10 @@ class Dispatcher(object):
 					result.append(res.resource)
 			discoveredResources = result	# re-assign the new resources to discoveredResources
 
-		return Result(status = True, data = discoveredResources)
+		return Result(status = True, 
+					  data = discoveredResources, 
+					  contentStatus = ContentStatus.partialContent if contentOffset else None, 
+					  contentOffset = contentOffset)
 
 
 	def _discoverResources(self, rootResource:Resource,
@@ -305,43 +329,205 @@ class Dispatcher(object):
 								 level:int, 
 								 fo:int, 
 								 allLen:int, 
-								 dcrs:list[Resource] = None, 
 								 conditions:Conditions = None, 
 								 attributes:Parameters = None, 
-								 permission:Permission = Permission.DISCOVERY) -> list[Resource]:
-		if not rootResource or level == 0:		# no resource or level == 0
-			return []
+								 permission:Permission = Permission.DISCOVERY,
+								 offset:int = 1,
+								 after:Tuple[int, ...] = ()) -> Iterator[Resource]:
+		"""	Discover the resources in the resource tree below a root resource.
+
+			The candidate resources are matched as raw documents, and only the matching resources are
+			instantiated and checked for access. The resources are produced one by one, so that the
+			caller can stop the discovery as soon as it has enough resources.
+
+			Args:
+				rootResource: The resource to start the discovery from. It is not part of the result.
+				originator: The originator of the request.
+				level: Maximum depth of the discovered resources below *rootResource*.
+				fo: Filter operation.
+				allLen: Number of conditions and attributes that all must match for *fo* = AND.
+				conditions: The filter conditions.
+				attributes: The attributes to match.
+				permission: The permission the originator must have for the discovered resources.
+				offset: Number of the first matching and accessible resource to return, starting with 1.
+				after: Position of the last resource of a previous partial result. Only resources after it are returned.
+			Return:
+				Iterator over the discovered resources, in the order of a depth-first walk through the resource tree.
+		"""
+		if not rootResource or level <= 0:		# no resource or level == 0
+			return
 
-		# get all direct children, if not provided
-		if not dcrs:
-			if len(dcrs := self.directChildResources(rootResource.ri)) == 0:
-				return []
+		skip = offset - 1
+		for doc in self._discoveryCandidates(rootResource.ri, level, fo, conditions, attributes, after):
 
-		# Filter and add those left to the result
-		discoveredResources = []
-		for r in dcrs:
+			# Exclude virtual resources, and match on the raw document first
+			if T.isVirtualResource(doc.get('ty')) or not self._matchDocument(doc, conditions, attributes, fo, allLen):
+				continue
 
-			# Exclude virtual resources
-			if r.isVirtual():
+			# Only then instantiate the resource and check the permissions (with all the overhead)
+			if not (resource := Factory.resourceFromDict(doc).resource) or not CSE.security.hasAccess(originator, resource, permission):
+				continue
+			if skip > 0:
+				skip -= 1
 				continue
+			yield resource
 
-			# check permissions and filter. Only then add a resource
-			# First match then access. bc if no match then we don't need to check permissions (with all the overhead)
-			if self._matchResource(r, conditions, attributes, fo, allLen) and CSE.security.hasAccess(originator, r, permission):
-				discoveredResources.append(r)
 
-			# Iterate recursively over all (not only the filtered) direct child resources
-			discoveredResources.extend(self._discoverResources(r, originator, level-1, fo, allLen, conditions=conditions, attributes=attributes))
+	def _discoveryCandidates(self, ri:str, level:int, fo:int, conditions:Conditions, attributes:Parameters = None, after:Tuple[int, ...] = ()) -> Iterator[Document]:
+		"""	Plan the discovery and return the candidate resource documents below a resource.
 
-		return discoveredResources
+			If labels or resource types to discover are given and must match (*fo* = AND) then the candidates
+			are taken from the storage's label or type index. If the only conditions are labels and
+			resource types and any of them may match (*fo* = OR) then the candidates are the union of
+			both indexes. Otherwise the resource tree is walked.
+
+			The indexes cover the whole CSE, and their candidates must be ordered before the first one can
+			be returned. They are therefore only used if they return at most `maxIndexCandidates` candidates.
+			Otherwise the walk through the resource tree is cheaper, because it stops as soon as the caller
+			has enough resources, and below another resource than the CSEBase the tree might be much smaller.
+
+			Args:
+				ri: Resource ID of the root resource.
+				level: Maximum depth of the candidates below the root resource.
+				fo: Filter operation.
+				conditions: The filter conditions.
+				attributes: The attribute filter conditions.
+				after: Position of the last resource of a previous partial result. Only candidates after it are returned.
+			Return:
+				Iterator over the candidate documents, in the order of a depth-first walk through the resource tree.
+		"""
+		if not conditions:
+			return self._walkCandidates(ri, level, after)
+
+		tys:set[T] = None
+		if _tys := conditions.get('ty'):
+			try:
+				tys = { T(int(ty)) for ty in _tys }
+			except (ValueError, TypeError):
+				return self._walkCandidates(ri, level, after)
+		lbls = conditions.get('lbl')
+
+		def _countLabels() -> int:
+			return len(CSE.storage.resourceIDsByLabels(lbls)) if lbls else 0
+
+		def _countTypes() -> int:
+			return sum(CSE.storage.countResources(ty) for ty in tys) if tys else 0
+
+		docs:List[Document] = []
+		if fo == FilterOperation.AND:
+			if lbls and _countLabels() <= maxIndexCandidates:	# Labels are OR'ed among themselves
+				docs = CSE.storage.retrieveResourcesByLabels(lbls)
+				if tys:
+					docs = [ doc for doc in docs if doc.get('ty') in tys ]
+				return self._orderedCandidates(ri, level, docs, after)
+			if tys and _countTypes() <= maxIndexCandidates:
+				for ty in tys:
+					docs.extend(CSE.storage.retrieveResourcesByType(ty))
+				return self._orderedCandidates(ri, level, docs, after)
+
+		elif fo == FilterOperation.OR and (tys or lbls) and not attributes and conditions.keys() <= { 'ty', 'lbl' }:
+			if _countLabels() + _countTypes() <= maxIndexCandidates:
+				if lbls:
+					docs = CSE.storage.retrieveResourcesByLabels(lbls)
+				if tys:
+					seen = { doc['ri'] for doc in docs }
+					for ty in tys:
+						docs.extend(doc for doc in CSE.storage.retrieveResourcesByType(ty) if doc['ri'] not in seen)
+				return self._orderedCandidates(ri, level, docs, after)
+
+		return self._walkCandidates(ri, level, after)
+
+
+	def _walkCandidates(self, ri:str, level:int, after:Tuple[int, ...] = ()) -> Iterator[Document]:
+		"""	Walk the resource tree depth-first and return all resource documents below a resource.
+
+			Args:
+				ri: Resource ID of the root resource.
+				level: Maximum depth of the returned documents below the root resource.
+				after: Position of a resource below the root resource. The walk continues after it.
+			Return:
+				Iterator over the documents.
+		"""
+		if level <= 0:
+			return
+		for doc in cast(List[Document], CSE.storage.directChildResources(ri, raw = True)):
+			if after:
+				if doc.doc_id < after[0]:		# walked before
+					continue
+				if doc.doc_id == after[0]:		# the resource itself or one of its ancestors. Continue below it
+					yield from self._walkCandidates(doc['ri'], level - 1, after[1:])
+					continue
+				after = ()
+			yield doc
+			yield from self._walkCandidates(doc['ri'], level - 1)
 
 
-	def _matchResource(self, r:Resource, conditions:Conditions, attributes:Parameters, fo:int, allLen:int) -> bool:	
-		""" Match a filter to a resource. """
+	def _orderedCandidates(self, ri:str, level:int, docs:List[Document], after:Tuple[int, ...] = ()) -> Iterator[Document]:
+		"""	Return those of a set of resource documents that are below a resource, in the order of a
+			depth-first walk through the resource tree.
+
+			Siblings are ordered by their storage document IDs, so the position of a resource in the walk is
+			determined by the document IDs of its ancestors.
+
+			Args:
+				ri: Resource ID of the root resource.
+				level: Maximum depth of the returned documents below the root resource.
+				docs: The documents to filter and order.
+				after: Position of a resource below the root resource. Only documents after it are returned.
+			Return:
+				Iterator over the documents.
+		"""
+		parents:Dict[str, Document] = {}	# ri -> document of visited ancestors
+		positions = [ (position, doc) for doc in docs if (position := self._treePosition(ri, level, doc, parents)) and position > after ]
+		positions.sort(key = lambda each: each[0])
+		return (doc for _, doc in positions)
+
+
+	def _treePosition(self, ri:str, level:int, doc:Document, parents:Dict[str, Document]) -> Tuple[int, ...]:
+		"""	Determine the position of a resource document in a depth-first walk through the resource tree below a resource.
+
+			Args:
+				ri: Resource ID of the root resource.
+				level: Maximum depth of the document below the root resource.
+				doc: The resource document.
+				parents: Cache of the documents of already visited ancestors, mapping their resource IDs to the documents.
+			Return:
+				Tuple of the document IDs of the resource's ancestors below the root resource and of the resource itself, or None if the resource is not below the root resource within *level*.
+		"""
+		position = [ doc.doc_id ]
+		pi = doc.get('pi')
+		while pi != ri:
+			if len(position) >= level:
+				return None
+			if (parent := parents.get(pi)) is None:
+				if not (parent := CSE.storage.retrieveResource(ri = pi, raw = True).resource):
+					return None		# reached the top of the tree
+				parents[pi] = parent
+			position.append(parent.doc_id)
+			pi = parent.get('pi')
+		return tuple(reversed(position))
+
+
+	def _continuationPosition(self, ri:str, contentOffset:str) -> Tuple[int, ...]:
+		"""	Determine the position of the last resource of a partial discovery result.
+
+			Args:
+				ri: Resource ID of the root resource of the discovery.
+				contentOffset: The content offset of the partial result, which is the resource ID of its last resource.
+			Return:
+				The position of the resource in a depth-first walk through the resource tree below the root resource, or None if the resource doesn't exist or is not below the root resource.
+		"""
+		if not (doc := CSE.storage.retrieveResource(ri = contentOffset, raw = True).resource):
+			return None
+		return self._treePosition(ri, sys.maxsize, doc, {})
+
+
+	def _matchDocument(self, r:JSON, conditions:Conditions, attributes:Parameters, fo:int, allLen:int) -> bool:	
+		""" Match a filter to the raw document of a resource. """
 
 		# TODO: Implement a couple of optimizations. Can we determine earlier that a match will fail?
 
-		ty = r.ty
+		ty = r.get('ty')
 
 		# get the parent resource
 		#
@@ -364,24 +550,24 @@ class Dispatcher(object):
 			# ty's to found (to indicate that the whole set matches)
 			if tys := conditions.get('ty'):
 				found += len(tys) if ty in tys or str(ty) in tys else 0	# TODO simplify after refactoring requests. ty should only be an int
-			if ct := r.ct:
+			if ct := r.get('ct'):
 				found += 1 if (c_crb := conditions.get('crb')) and (ct < c_crb) else 0
 				found += 1 if (c_cra := conditions.get('cra')) and (ct > c_cra) else 0
 
-			if lt := r.lt:
+			if lt := r.get('lt'):
 				found += 1 if (c_ms := conditions.get('ms')) and (lt > c_ms) else 0
 				found += 1 if (c_us := conditions.get('us')) and (lt < c_us) else 0
 
-			if (st := r.st) is not None:	# st is an int
+			if (st := r.get('st')) is not None:	# st is an int
 				found += 1 if (c_sts := conditions.get('sts')) is not None and (st > c_sts) else 0	# st is an int
 				found += 1 if (c_stb := conditions.get('stb')) is not None and (st < c_stb) else 0
 
-			if et := r.et:
+			if et := r.get('et'):
 				found += 1 if (c_exb := conditions.get('exb')) and (et < c_exb) else 0
 				found += 1 if (c_exa := conditions.get('exa')) and (et > c_exa) else 0
 
 			# Check labels similar to types
-			resourceLbl = r.lbl
+			resourceLbl = r.get('lbl')
 			if resourceLbl and (lbls := conditions.get('lbl')):
 				for l in lbls:
 					if l in resourceLbl:
@@ -389,7 +575,7 @@ class Dispatcher(object):
 						break
 
 			if ty in [ T.CIN, T.FCNT ]:	# special handling for CIN, FCNT
-				if (cs := r.cs) is not None:	# cs is an int
+				if (cs := r.get('cs')) is not None:	# cs is an int
 					found += 1 if (sza := conditions.get('sza')) is not None and (int(cs) >= int(sza)) else 0	# sizes ares ints
 					found += 1 if (szb := conditions.get('szb')) is not None and (int(cs) < int(szb)) else 0
 
@@ -399,7 +585,7 @@ class Dispatcher(object):
 			# Similar to types.
 			if ty in [ T.CIN ]:	# special handling for CIN
 				if cnfs := conditions.get('cty'):
-					found += len(cnfs) if r.cnf in cnfs else 0
+					found += len(cnfs) if r.get('cnf') in cnfs else 0
 
 		# TODO childLabels
 		# TODO parentLabels
@@ -412,9 +598,9 @@ class Dispatcher(object):
 			for name in attributes:
 				val = attributes[name]
 				if isinstance(val, str) and '*' in val:
-					found += 1 if (rval := r[name]) is not None and TextTools.simpleMatch(str(rval), val) else 0
+					found += 1 if (rval := Utils.findXPath(r, name)) is not None and TextTools.simpleMatch(str(rval), val) else 0
 				else:
-					found += 1 if (rval := r[name]) is not None and str(val) == str(rval) else 0
+					found += 1 if (rval := Utils.findXPath(r, name)) is not None and str(val) == str(rval) else 0
 
 		# TODO childAttribute
 		# TODO parentAttribute
@@ -489,6 +675,10 @@ class Dispatcher(object):
 		if parentResource.isVirtual():
 			return parentResource.handleCreateRequest(request, id, originator)	# type: ignore[no-any-return]
 
+		# Check for a bulk CREATE of <cin>. This is an ACME specific extension.
+		if ty == T.CIN and request.pc and isinstance(request.pc.get('m2m:cin'), list):
+			return self.processBulkCreateRequest(request, parentResource, originator)
+
 		# Create resource from the dictionary
 		if not (nres := Factory.resourceFromDict(deepcopy(request.pc), pi=parentResource.ri, ty=ty)).resource:	# something wrong, perhaps wrong type
 			return Result.errorResult(dbg=nres.dbg)
@@ -593,6 +783,148 @@ class Dispatcher(object):
 		return Result(status = True, resource = resource, rsc = RC.created) 	# everything is fine. resource created.
 
 
+	def processBulkCreateRequest(self, request:CSERequest, parentResource:Resource, originator:str) -> Result:
+		"""	Process a bulk CREATE request for a <container>. The request's primitive content contains
+			a list of <cin> resources instead of a single <cin> (e.g. *{ "m2m:cin" : [ {...}, {...} ] }*).
+
+			The <cin> are validated against the parent resource and then stored together in a 
+			single storage transaction. The container's limits are checked and the subscriptions
+			are notified only once for all new <cin>.
+
+			The originator's privileges for the parent resource must already have been checked.
+
+			Args:
+				request: The incoming request.
+				parentResource: The target <container> resource.
+				originator: The requests originator.
+			Return:
+				Result object. The resource is an aggregated response (*m2m:agr*) with a response for each <cin>, in the order of the request.
+		"""
+		if parentResource.ty != T.CNT:
+			return Result.errorResult(rsc = RC.operationNotAllowed, dbg = 'bulk CREATE is only supported for <container>')
+		if (rcn := request.args.rcn) not in [ None, RCN.attributes, RCN.nothing ]:
+			return Result.errorResult(dbg = 'wrong rcn for bulk CREATE')
+		if not (dcts := request.pc['m2m:cin']):
+			return Result.errorResult(dbg = 'empty list of <cin> in bulk CREATE')
+		L.isDebug and L.logDebug(f'Bulk CREATE of {len(dcts)} <cin> for: {parentResource.ri}')
+
+		results:list[Result] = [ None ] * len(dcts)
+		indexes:list[int] = []
+		resources:list[Resource] = []
+		srns:set[str] = set()
+		parentSrn = parentResource.__srn__
+
+		for i, dct in enumerate(dcts):
+			# Create resource from the dictionary
+			if not isinstance(dct, dict):
+				results[i] = Result.errorResult(dbg = 'wrong <cin> representation')
+				continue
+			if not (nres := Factory.resourceFromDict({ 'm2m:cin' : deepcopy(dct) }, pi = parentResource.ri, ty = T.CIN)).resource:
+				results[i] = Result.errorResult(dbg = nres.dbg)
+				continue
+			nresource = nres.resource
+
+			# Check whether the parent allows the adding
+			if not (res := parentResource.childWillBeAdded(nresource, originator)).status:
+				results[i] = res.errorResultCopy()
+				continue
+
+			# Check resource creation
+			if not (res := CSE.registration.checkResourceCreation(nresource, originator, parentResource)).status:
+				results[i] = res.errorResultCopy()
+				continue
+
+			# Check whether the resource already exists, either via ri or srn, also in this request
+			nresource[nresource._srn] = f'{parentSrn}/{nresource.rn}'
+			if nresource.__srn__ in srns or CSE.storage.hasResource(ri = nresource.ri, srn = nresource.__srn__):
+				L.logWarn(dbg := f'Resource with structured id: {nresource.__srn__} already exists')
+				results[i] = Result.errorResult(rsc = RC.conflict, dbg = dbg)
+				continue
+
+			srns.add(nresource.__srn__)
+			indexes.append(i)
+			resources.append(nresource)
+		
+		# Create the resources
+		if resources:
+			parentResource.prepareBulkInstances(resources)
+			for i, res in zip(indexes, self.createResources(resources, parentResource, originator)):
+				results[i] = res
+
+		# Construct aggregated response
+		items = []
+		for res in results:
+			item:JSON = { 'rsc' : res.rsc,
+						  'rqi' : request.headers.requestIdentifier,
+						  'rvi'	: CSE.releaseVersion
+						}
+			if res.status:
+				item['to'] = res.resource.__srn__
+				if rcn != RCN.nothing:
+					item['pc'] = res.resource.asDict()
+			else:
+				item['pc'] = { 'm2m:dbg' : res.dbg }
+			items.append(item)
+		return Result(status = True, rsc = RC.OK, resource = { 'm2m:agr' : { 'm2m:rsp' : items }}) # Response Status Code is OK regardless of the individual results
+
+
+	def createResources(self, resources:list[Resource], parentResource:Resource, originator:str = None) -> list[Result]:
+		"""	Create multiple new child resources of the same parent resource together.
+
+			In contrast to `createResource()` the resources are activated *before* they are 
+			stored, so that all resources can be written in a single storage transaction. The
+			parent resource is notified once via `Resource.childrenAdded()`.
+
+			Args:
+				resources: List of new resources. The structured resource names must be set.
+				parentResource: The parent resource.
+				originator: The requests originator.
+			Return:
+				List of Result objects, one for each resource in the order of *resources*.
+		"""
+		L.isDebug and L.logDebug(f'CREATING {len(resources)} resources for parent ri: {parentResource.ri}')
+		results:list[Result] = []
+		activated:list[Resource] = []
+
+		for resource in resources:
+			if not parentResource.canHaveChild(resource):
+				L.logWarn(dbg := f'Invalid child resource type: {T(resource.ty).value}')
+				results.append(Result.errorResult(rsc = RC.invalidChildResourceType, dbg = dbg))
+				continue
+			if not (res := resource.activate(parentResource, originator)).status:
+				CSE.registration.checkResourceDeletion(resource) # deregister resource. Ignore result, we take this from the activation
+				results.append(res.errorResultCopy())
+				continue
+			activated.append(resource)
+			results.append(Result(status = True, resource = resource, rsc = RC.created))
+		if not activated:
+			return results
+
+		# add the resources to storage. Undo the activation if this fails
+		if not (res := CSE.storage.createResources(activated)).status:
+			for resource in activated:
+				resource.deactivate(originator)
+				CSE.registration.checkResourceDeletion(resource) # deregister resource. Ignore result, we take this from the storage
+			return [ res if each.status else each for each in results ]
+
+		# send create events
+		for resource in activated:
+			CSE.event.createResource(resource)	# type: ignore
+
+		parentResource = parentResource.dbReload().resource		# Read the resource again in case it was updated in the DB
+		if not parentResource:
+			L.logWarn(dbg := 'Parent resource not found. Probably removed in between?')
+			for resource in activated:
+				self.deleteResource(resource)
+			return [ Result.errorResult(rsc = RC.internalServerError, dbg = dbg) ] * len(results)
+		parentResource.childrenAdded(activated, originator)		# notify the parent resource
+
+		# Send event for parent resource
+		CSE.event.createChildResource(parentResource)	# type: ignore
+
+		return results
+
+
 	#########################################################################
 	#
 	#	Update resources
@@ -899,8 +1231,8 @@ class Dispatcher(object):
 	def retrieveLatestOldestInstance(self, pi:str, ty:T, oldest:bool = False) -> Resource:
 		"""	Get the latest or oldest x-Instance resource for a parent.
 
-			This is done by searching through all resources once to find the fitting resource 
-			(parent + type)	with the latest or oldest `ct` attribute.
+			This is done by looking up the fitting resource (parent + type) with the latest 
+			or oldest `ct` attribute in the storage's ordered instance index.
 
 			Args:
 				pi: parent resourceIdentifier
@@ -910,27 +1242,37 @@ class Dispatcher(object):
 			Return:
 				Resource
 		"""
-		hit:Tuple[JSON, str] = None
-		op = operator.gt if oldest else operator.lt
-
-		# This function used as a mapper to search through all resources and
-		# determines the newest CIN resource for this parent
-		# This should be a bit faster than getting all the CIN, instantiating them, 
-		# and throwig them all away etc
-		def determineLatest(res:JSON) -> bool:
-			nonlocal hit
-			if res['pi'] == pi and res['ty'] == ty:
-				ct = res['ct']
-				if not hit or op(hit[1], ct):
-					hit = ( res, ct )
-			return False
-
-		# Search through the resources with the mapping functions
-		CSE.storage.searchByFilter(filter = determineLatest)
-		if not hit:
+		if not (res := CSE.storage.retrieveLatestOldestInstance(pi, ty, oldest)).status:
 			return None
-		# Instantiate and return resource
-		return Factory.resourceFromDict(hit[0]).resource
+		return res.resource
+
+
+	def validateInstanceCounters(self, ri:str = None) -> Result:
+		"""	Check the *cni* and *cbs* attributes of a <container>, <flexContainer> or <timeSeries> resource, or of all of them.
+
+			The counters are rebuilt from the instance resources in the database, and the resources are 
+			validated again with the rebuilt counters. This also removes instance resources that exceed
+			the limits of their parent resources.
+
+			Args:
+				ri: Resource ID of a <container>, <flexContainer> or <timeSeries> resource. If None then all of these resources are checked.
+			Return:
+				Result object with the number of checked resources in *data*, or an error result.
+		"""
+		if ri:
+			if not (res := self.retrieveLocalResource(ri)).status:
+				return res
+			if res.resource.ty not in [ T.CNT, T.FCNT, T.TS ]:
+				return Result.errorResult(dbg = 'resource must be a <container>, <flexContainer> or <timeSeries>')
+			resources = [ res.resource ]
+		else:
+			resources = [ resource for ty in [ T.CNT, T.FCNT, T.TS ] for resource in self.retrieveResourcesByType(ty) ]
+		
+		CSE.storage.rebuildInstanceCounters(ri)
+		for resource in resources:
+			resource.validateInstances()
+		L.isDebug and L.logDebug(f'Validated instance counters of {len(resources)} resource(s)')
+		return Result(status = True, data = len(resources))
 
 
 	def discoverChildren(self, id:str, resource:Resource, originator:str, handling:JSON, permission:Permission) -> list[Resource]:
@@ -956,13 +1298,10 @@ class Dispatcher(object):
 		
 		# Count all resources of the given types
 		if isinstance(ty, tuple):
-			cnt = 0
-			for t in ty:
-				cnt += len(CSE.storage.retrieveResourcesByType(t))
-			return cnt
+			return sum(CSE.storage.countResources(t) for t in ty)
 
 		# Count all resources of a specific type
-		return len(CSE.storage.retrieveResourcesByType(ty))
+		return CSE.storage.countResources(ty)
 
 
 	def retrieveResourcesByType(self, ty:T) -> list[Resource]:
@@ -8,18 +8,24 @@
 #
 
 from __future__ import annotations
-import logging, sys, urllib3
+import asyncio, logging, sys, time, urllib3, socket
 from sqlite3 import Date
 from copy import deepcopy
 from typing import Any, Callable, cast, Tuple
+from threading import Lock, BoundedSemaphore, Condition, get_ident, local
+from io import BytesIO
+from urllib.parse import urlparse, unquote_to_bytes
+from http.cookiejar import DefaultCookiePolicy
 
 
 import flask
 from flask import Flask, Request, request
 from werkzeug.wrappers import Response
-from werkzeug.serving import WSGIRequestHandler
+from werkzeug.serving import WSGIRequestHandler, BaseWSGIServer
+from werkzeug.wsgi import LimitedStream
 from werkzeug.datastructures import MultiDict
 import requests
+from requests.adapters import HTTPAdapter
 import isodate
 
 from ..etc.Constants import Constants as C
@@ -32,6 +38,7 @@ from ..services.Logging import Logging as L, LogLevel
 from ..webui.webUI import WebUI
 from ..helpers import TextTools as TextTools
 from ..helpers.BackgroundWorker import *
+from ..helpers.AsyncLoop import AsyncLoop, WorkerPoolExecutor
 from ..etc import DateUtils
 
 
@@ -57,7 +64,16 @@ class HttpServer(object):
 		self.allowPatchForDelete= Configuration.get('http.allowPatchForDelete')
 		self.webuiRoot 			= Configuration.get('cse.webui.root')
 		self.webuiDirectory 	= f'{Configuration.get("packageDirectory")}/webui'
+		self.clientPoolSize		= Configuration.get('http.clientPoolSize')
+		self.clientTimeout		= Configuration.get('http.clientTimeout')
+		self.engine				= Configuration.get('http.engine')
+		self.drainTimeout		= Configuration.get('http.drainTimeout')
 		self.isStopped			= False
+		self.wsgiServer:PooledWSGIServer|AsyncWSGIServer = None		# Only for the "pooled" and "asyncio" engines
+
+		# Pooled sessions for outgoing requests, one per target authority (scheme, host, port)
+		self.sessions:dict[Tuple[str, str], requests.Session] = {}
+		self.sessionsLock		= Lock()
 
 
 		self.backgroundActor:BackgroundWorker = None
@@ -93,6 +109,18 @@ class HttpServer(object):
 			self.addEndpoint(structureEndpoint, handler = self.handleStructure, methods  =['GET'], strictSlashes = False)
 			self.addEndpoint(f'{structureEndpoint}/<path:path>', handler = self.handleStructure, methods = ['GET', 'PUT'])
 
+		# Enable the statistics endpoint
+		if Configuration.get('http.enableStatisticsEndpoint'):
+			statisticsEndpoint = f'{self.rootPath}/__stats__'
+			L.isInfo and L.log(f'Registering statistics endpoint at: {statisticsEndpoint}')
+			self.addEndpoint(statisticsEndpoint, handler = self.handleStatistics, methods = ['GET'], strictSlashes = False)
+
+		# Enable the metrics endpoint
+		if Configuration.get('http.enableMetricsEndpoint'):
+			metricsEndpoint = f'{self.rootPath}/__metrics__'
+			L.isInfo and L.log(f'Registering metrics endpoint at: {metricsEndpoint}')
+			self.addEndpoint(metricsEndpoint, handler = self.handleMetrics, methods = ['GET'], strictSlashes = False)
+
 		# Enable the upper tester endpoint
 		if Configuration.get('http.enableUpperTesterEndpoint'):
 			upperTesterEndpoint = f'{self.rootPath}/__ut__'
@@ -132,14 +160,20 @@ class HttpServer(object):
 		"""
 		L.isInfo and L.log('HttpServer shut down')
 		self.isStopped = True
+		if self.wsgiServer:
+			self.wsgiServer.stop(self.drainTimeout)
+		self.closeSessions()
 		return True
 	
 
 	def pause(self) -> None:
-		"""	Stop handling requests.
+		"""	Stop handling requests. For the "pooled" and "asyncio" engines wait until
+			the requests currently being processed are finished.
 		"""
 		L.isInfo and L.log('HttpServer paused')
 		self.isStopped = True
+		if self.wsgiServer and not self.wsgiServer.drain(self.drainTimeout):
+			L.isWarn and L.logWarn('Not all http requests finished before pausing')
 		
 	
 	def unpause(self) -> None:
@@ -147,6 +181,7 @@ class HttpServer(object):
 		"""
 		L.isInfo and L.log('HttpServer unpaused')
 		self.isStopped = False
+		self.wsgiServer and self.wsgiServer.resume()
 
 	
 	def _run(self) -> None:
@@ -161,12 +196,35 @@ class HttpServer(object):
 			cli.show_server_banner = lambda *x: None 	# type: ignore
 			# Start the server
 			try:
-				self.flaskApp.run(host=self.listenIF, 
-								  port=self.port,
-								  threaded=True,
-								  request_handler=ACMERequestHandler,
-								  ssl_context=CSE.security.getSSLContext(),
-								  debug=False)
+				if self.engine == 'pooled':
+					self.wsgiServer = PooledWSGIServer(self.listenIF, 
+													   self.port, 
+													   self.flaskApp,
+													   workers = Configuration.get('http.workers'),
+													   backlog = Configuration.get('http.backlog'),
+													   keepAliveTimeout = Configuration.get('http.keepAliveTimeout'),
+													   maxKeepAliveRequests = Configuration.get('http.maxKeepAliveRequests'),
+													   sslContext = CSE.security.getSSLContext())
+					L.isInfo and L.log(f'HTTP server uses the pooled engine with {self.wsgiServer.workers} workers')
+					self.wsgiServer.serve_forever()
+				elif self.engine == 'asyncio':
+					self.wsgiServer = AsyncWSGIServer(self.listenIF, 
+													  self.port, 
+													  self.flaskApp,
+													  asyncLoop = CSE.asyncLoop,
+													  backlog = Configuration.get('http.backlog'),
+													  keepAliveTimeout = Configuration.get('http.keepAliveTimeout'),
+													  maxKeepAliveRequests = Configuration.get('http.maxKeepAliveRequests'),
+													  sslContext = CSE.security.getSSLContext())
+					self.wsgiServer.serve()
+					L.isInfo and L.log(f'HTTP server uses the asyncio engine with {self.wsgiServer.workers} workers')
+				else:
+					self.flaskApp.run(host=self.listenIF, 
+									  port=self.port,
+									  threaded=True,
+									  request_handler=ACMERequestHandler,
+									  ssl_context=CSE.security.getSSLContext(),
+									  debug=False)
 			except Exception as e:
 				# No logging for headless, nevertheless print the reason what happened
 				if CSE.isHeadless:
@@ -191,6 +249,7 @@ class HttpServer(object):
 			build the internal strutures. Then, depending on the operation,
 			call the associated request handler.
 		"""
+		startTime = time.perf_counter()
 		L.isDebug and L.logDebug(f'==> HTTP Request: {path}') 	# path = request.path  w/o the root
 		L.isDebug and L.logDebug(f'Operation: {operation.name}')
 		L.isDebug and L.logDebug(f'Headers: \n{str(request.headers).rstrip()}')
@@ -215,7 +274,13 @@ class HttpServer(object):
 			responseResult = CSE.request.handleRequest(dissectResult.request)
 		except Exception as e:
 			responseResult = Utils.exceptionToResult(e)
-		return self._prepareResponse(responseResult, dissectResult.request)
+		response = self._prepareResponse(responseResult, dissectResult.request)
+		CSE.statistics.recordRequest(dissectResult.request.op, 
+									 'http', 
+									 time.perf_counter() - startTime, 
+									 request.content_length or 0, 
+									 getattr(responseResult.resource, 'ty', None))
+		return response
 
 
 	def handleGET(self, path:str=None) -> Response:
@@ -301,6 +366,23 @@ class HttpServer(object):
 		return Response(response='unsupported', status=422, headers=self._responseHeaders)
 
 
+	def handleStatistics(self, path:str = None) -> Response:
+		"""	Handle a statistics request. Return the CSE's counters and the summaries of the 
+			measured request latencies, request sizes and notification delivery times as JSON.
+		"""
+		if self.isStopped:
+			return Response('Service not available', status=503)
+		return flask.jsonify(statistics = CSE.statistics.getStats(), measurements = CSE.statistics.getMeasurements())
+
+
+	def handleMetrics(self, path:str = None) -> Response:
+		"""	Handle a metrics request. Return the CSE's cached metrics in the Prometheus text exposition format.
+		"""
+		if self.isStopped:
+			return Response('Service not available', status=503)
+		return Response(response = CSE.statistics.getMetrics(), content_type = 'text/plain; version=0.0.4; charset=utf-8')
+
+
 	def handleUpperTester(self, path:str = None) -> Response:
 		"""	Handle a Upper Tester request. See TS-0019 for details.
 		"""
@@ -344,13 +426,62 @@ class HttpServer(object):
 	#
 
 	operation2method = {
-		Operation.CREATE	: requests.post,
-		Operation.RETRIEVE	: requests.get,
-		Operation.UPDATE 	: requests.put,
-		Operation.DELETE 	: requests.delete,
-		Operation.NOTIFY 	: requests.post
+		Operation.CREATE	: 'POST',
+		Operation.RETRIEVE	: 'GET',
+		Operation.UPDATE 	: 'PUT',
+		Operation.DELETE 	: 'DELETE',
+		Operation.NOTIFY 	: 'POST'
 	}
 
+
+	def _getSession(self, url:str) -> requests.Session:
+		"""	Get the pooled session for the target authority of a URL. 
+		
+			A new session is created if there is none yet for that authority.
+			The connections of a session are kept alive and reused for following requests
+			to the same target.
+
+			Args:
+				url: The target URL.
+			Return:
+				*requests.Session* object.
+		"""
+		u = urlparse(url)
+		authority = (u.scheme, u.netloc)
+		with self.sessionsLock:
+			if not (session := self.sessions.get(authority)):
+				L.isDebug and L.logDebug(f'Creating http session for: {u.scheme}://{u.netloc}')
+				session = requests.Session()
+				session.cookies.set_policy(DefaultCookiePolicy(allowed_domains = []))	# Don't store cookies between requests
+				session.mount(f'{u.scheme}://', HTTPAdapter(pool_connections = 1, pool_maxsize = self.clientPoolSize))
+				self.sessions[authority] = session
+			return session
+
+
+	def _requestTimeout(self, hds:dict) -> float:
+		"""	Determine the timeout for an outgoing request. A request with a request or result expiration
+			timestamp times out when it expires. Otherwise the configured client timeout is used.
+
+			Args:
+				hds: The http headers of the request.
+			Return:
+				The timeout in seconds. It is 0.0 or less if the request is already expired.
+		"""
+		expirations = [ ts for h in [ C.hfRET, C.hfRST ] if (v := hds.get(h)) and (ts := DateUtils.fromAbsRelTimestamp(v)) ]
+		if not expirations:
+			return self.clientTimeout
+		return min(expirations) - DateUtils.utcTime()
+
+
+	def closeSessions(self) -> None:
+		"""	Close all pooled sessions and their connections.
+		"""
+		with self.sessionsLock:
+			for session in self.sessions.values():
+				session.close()
+			self.sessions.clear()
+
+
 	def _prepContent(self, content:bytes|str|Any, ct:CST) -> str:
 		if not content:	return ''
 		if isinstance(content, str): return content
@@ -372,7 +503,7 @@ class HttpServer(object):
 			The result is returned in *Result.data*.
 		"""
 		# Set the request method
-		method:Callable = self.operation2method[operation]
+		method = self.operation2method[operation]
 
 		# Make the URL a valid http URL (escape // and ///)
 		url = RequestUtils.toHttpUrl(url)
@@ -454,14 +585,17 @@ class HttpServer(object):
 		# ! Don't forget: requests are done through the request library, not flask.
 		# ! The attribute names are different
 		try:
-			L.isDebug and L.logDebug(f'Sending request: {method.__name__.upper()} {url}')
+			L.isDebug and L.logDebug(f'Sending request: {method} {url}')
 			if ct == CST.CBOR:
 				L.isDebug and L.logDebug(f'HTTP Request ==>:\nHeaders: {hds}\nBody: \n{self._prepContent(content, ct)}\n=>\n{str(data) if data else ""}\n')
 			else:
 				L.isDebug and L.logDebug(f'HTTP Request ==>:\nHeaders: {hds}\nBody: \n{self._prepContent(content, ct)}\n')
 			
 			# Actual sending the request
-			r = method(url, data = content, headers = hds, verify = CSE.security.verifyCertificateHttp)
+			if (timeout := self._requestTimeout(hds)) <= 0.0:
+				L.isDebug and L.logDebug(dbg := 'request expired before sending')
+				return Result.errorResult(rsc = RC.requestTimeout, dbg = dbg)
+			r = self._getSession(url).request(method, url, data = content, headers = hds, verify = CSE.security.verifyCertificateHttp, timeout = timeout)
 
 			# Construct CSERequest object from the result
 			resp = CSERequest(isResponse = True)
@@ -545,6 +679,10 @@ class HttpServer(object):
 			headers[C.hfRVI] = rvi
 		if vsi := Utils.findXPath(cast(JSON, outResult.data), 'vsi'):
 			headers[C.hfVSI] = vsi
+		if cnst := Utils.findXPath(cast(JSON, outResult.data), 'cnst'):
+			headers[C.hfCTS] = f'{cnst}'
+		if cnot := Utils.findXPath(cast(JSON, outResult.data), 'cnot'):
+			headers[C.hfCTO] = f'{cnot}'
 		headers[C.hfOT] = DateUtils.getResourceDate()
 
 		# HTTP status code
@@ -732,3 +870,520 @@ class ACMERequestHandler(WSGIRequestHandler):
 		L.enableBindingsLogging and L.isDebug and L.logDebug(f'HTTP: {format % args}')
 	
 
+
+
+##########################################################################
+#
+#	Draining of active requests
+#
+
+class ActiveRequests(object):
+	"""	Keeps track of the threads that are processing a request, so that other threads
+		can wait until the requests are finished.
+	"""
+
+	def __init__(self) -> None:
+		self.threads:set[int]	= set()
+		self.condition			= Condition()
+		self.isDraining			= False
+
+
+	def started(self) -> None:
+		"""	Register the current thread as processing a request.
+		"""
+		with self.condition:
+			self.threads.add(get_ident())
+
+
+	def finished(self) -> None:
+		"""	Unregister the current thread when it finished processing a request.
+		"""
+		with self.condition:
+			self.threads.discard(get_ident())
+			self.condition.notify_all()
+
+
+	def drain(self, timeout:float) -> bool:
+		"""	Wait until the requests that are currently processed are finished. 
+			A request that is processed by the calling thread itself (e.g. a CSE reset by the
+			upper tester endpoint) is not waited for. Connections are not kept alive while draining.
+
+			Args:
+				timeout: Maximum time in seconds to wait.
+			Return:
+				True if all requests finished in time.
+		"""
+		self.isDraining = True
+		ownThread = get_ident()
+		with self.condition:
+			return self.condition.wait_for(lambda: not (self.threads - { ownThread }), timeout)
+
+
+	def resume(self) -> None:
+		"""	Keep connections alive again after draining.
+		"""
+		self.isDraining = False
+
+
+##########################################################################
+#
+#	Pooled http server engine.
+#
+
+class PooledRequestHandler(ACMERequestHandler):
+	"""	Request handler for the `PooledWSGIServer`. 
+
+		Other than the werkzeug request handler it keeps connections alive, up to a maximum
+		number of requests per connection and as long as the connection is not idle for longer
+		than the keep-alive timeout. Unread request bodies are drained before the next request
+		is read from a kept-alive connection.
+	"""
+	protocol_version = 'HTTP/1.1'
+
+	def setup(self) -> None:
+		self.timeout = cast(PooledWSGIServer, self.server).keepAliveTimeout		# type: ignore [misc]
+		self.requestCount = 0
+		self.requestInput:LimitedStream = None
+		super().setup()
+
+
+	def make_environ(self) -> dict:		# type: ignore [override]
+		environ = super().make_environ()
+		self.requestInput = None
+		if 'wsgi.input_terminated' not in environ:	# Only for requests with a known content length
+			try:
+				self.requestInput = LimitedStream(self.rfile, int(environ.get('CONTENT_LENGTH') or 0))
+				environ['wsgi.input'] = self.requestInput
+			except ValueError:
+				pass
+		return environ
+
+
+	def run_wsgi(self) -> None:
+		self.requestCount += 1
+		server = cast(PooledWSGIServer, self.server)
+		server.activeRequests.started()
+		try:
+			super().run_wsgi()
+			if not self.close_connection and self.requestInput:
+				self.requestInput.exhaust()		# Drain the rest of the request body
+		finally:
+			server.activeRequests.finished()
+
+
+	def send_header(self, keyword:str, value:str) -> None:
+		# werkzeug always closes the connection after a response. Keep it alive instead if possible
+		if keyword.lower() == 'connection' and value == 'close' and self._keepAlive():
+			value = 'keep-alive'
+		super().send_header(keyword, value)
+
+
+	def _keepAlive(self) -> bool:
+		server = cast(PooledWSGIServer, self.server)
+		return (not server.activeRequests.isDraining and 
+				self.requestInput is not None and
+				self.requestCount < server.maxKeepAliveRequests and
+				self.request_version == 'HTTP/1.1' and
+				self.headers.get('Connection', '').lower() != 'close')
+
+
+class PooledWSGIServer(BaseWSGIServer):
+	"""	WSGI server that handles the connections in a bounded pool of worker threads.
+
+		When all workers are busy then new connections are not accepted, but wait in the
+		listen backlog of the server socket.
+	"""
+	multithread = True
+
+	def __init__(self, host:str, 
+					   port:int, 
+					   app:Flask, 
+					   workers:int, 
+					   backlog:int, 
+					   keepAliveTimeout:float, 
+					   maxKeepAliveRequests:int, 
+					   sslContext:Any = None) -> None:
+		"""	Initialize the server and bind it to the listening socket.
+
+			Args:
+				host: Interface to listen to.
+				port: Port to listen to.
+				app: The WSGI application.
+				workers: Number of worker threads.
+				backlog: Size of the listen backlog for connections that are not yet accepted.
+				keepAliveTimeout: Time in seconds after which an idle connection is closed.
+				maxKeepAliveRequests: Maximum number of requests per connection.
+				sslContext: Optional SSL context for https.
+		"""
+		self.request_queue_size		= backlog	# Must be set before the socket is activated
+		self.workers				= workers
+		self.keepAliveTimeout		= keepAliveTimeout
+		self.maxKeepAliveRequests	= maxKeepAliveRequests
+		self.activeRequests			= ActiveRequests()
+		self.workerSlots			= BoundedSemaphore(workers)
+		self.workerSlot				= local()	# Whether the current worker has released its slot during a blocking wait
+		self.connections:set[socket.socket] = set()
+		self.connectionsLock		= Lock()
+		super().__init__(host, port, app, handler = PooledRequestHandler, ssl_context = sslContext)
+
+		# The workers are daemon threads, so that idle kept-alive connections don't delay the CSE's exit
+		self.executor = WorkerPoolExecutor(workers, name = 'HTTPWorker', onBlocking = self._releaseWorkerSlot)
+
+
+	def process_request(self, request:socket.socket, client_address:Tuple[str, int]) -> None:	# type: ignore [override]
+		# Wait for a free worker. The server doesn't accept new connections in the meantime
+		while not self.workerSlots.acquire(timeout = 0.5):
+			if self.activeRequests.isDraining:
+				self.shutdown_request(request)
+				return
+		with self.connectionsLock:
+			self.connections.add(request)
+		self.executor.submit(self._processConnection, request, client_address)
+
+
+	def _processConnection(self, request:socket.socket, client_address:Tuple[str, int]) -> None:
+		self.workerSlot.released = False
+		try:
+			self.finish_request(request, client_address)
+		except Exception:
+			self.handle_error(request, client_address)
+		finally:
+			with self.connectionsLock:
+				self.connections.discard(request)
+			self.shutdown_request(request)
+			if not self.workerSlot.released:
+				self.workerSlots.release()
+
+
+	def _releaseWorkerSlot(self) -> None:
+		"""	Accept another connection while a worker waits for a long time, e.g. for a long-polling request.
+			The executor runs an additional worker for it. The slot is not released again when the waiting
+			worker's connection is closed.
+		"""
+		if not self.workerSlot.released:
+			self.workerSlot.released = True
+			self.workerSlots.release()
+
+
+	def drain(self, timeout:float) -> bool:
+		"""	Wait until the requests that are currently processed are finished. 
+
+			Args:
+				timeout: Maximum time in seconds to wait.
+			Return:
+				True if all requests finished in time.
+		"""
+		return self.activeRequests.drain(timeout)
+
+
+	def resume(self) -> None:
+		"""	Keep connections alive again after draining.
+		"""
+		self.activeRequests.resume()
+
+
+	def stop(self, timeout:float) -> None:
+		"""	Stop accepting new connections, drain the current requests, and close the remaining connections.
+
+			Args:
+				timeout: Maximum time in seconds to wait for the current requests.
+		"""
+		self.activeRequests.isDraining = True
+		self.shutdown()		# Stop the serve_forever() loop. This also closes the server socket
+		if not self.drain(timeout):
+			L.isWarn and L.logWarn('Not all http requests finished before shutdown')
+		with self.connectionsLock:
+			for connection in self.connections:	# Wake up idle kept-alive connections
+				try:
+					connection.shutdown(socket.SHUT_RDWR)
+				except OSError:
+					pass
+		self.executor.shutdown()
+
+
+##########################################################################
+#
+#	Asyncio http server engine.
+#
+
+class AsyncWSGIServer(object):
+	"""	WSGI server that reads and parses the http requests on an asyncio event loop, and
+		runs the WSGI application for each request on the event loop's bounded pool of workers.
+
+		Connections are kept alive, up to a maximum number of requests per connection and as long
+		as the connection is not idle for longer than the keep-alive timeout. Idle connections
+		don't occupy a worker.
+	"""
+
+	maxHeaderSize = 65536
+	"""	Maximum size of the request line and headers of a request. """
+
+	def __init__(self, host:str, 
+					   port:int, 
+					   app:Flask, 
+					   asyncLoop:AsyncLoop,
+					   backlog:int, 
+					   keepAliveTimeout:float, 
+					   maxKeepAliveRequests:int, 
+					   sslContext:Any = None) -> None:
+		"""	Initialize the server. The server is started with `serve()`.
+
+			Args:
+				host: Interface to listen to.
+				port: Port to listen to.
+				app: The WSGI application.
+				asyncLoop: The event loop and worker pool to use.
+				backlog: Size of the listen backlog for connections that are not yet accepted.
+				keepAliveTimeout: Time in seconds after which an idle connection is closed.
+				maxKeepAliveRequests: Maximum number of requests per connection.
+				sslContext: Optional SSL context for https.
+		"""
+		self.host					= host
+		self.port					= port
+		self.app					= app
+		self.asyncLoop				= asyncLoop
+		self.workers				= asyncLoop.executor.workers
+		self.backlog				= backlog
+		self.keepAliveTimeout		= keepAliveTimeout
+		self.maxKeepAliveRequests	= maxKeepAliveRequests
+		self.sslContext				= sslContext
+		self.activeRequests			= ActiveRequests()
+		self.server:asyncio.Server = None
+		self.writers:set[asyncio.StreamWriter] = set()
+		self.busyWriters:set[asyncio.StreamWriter] = set()	# Connections with a request in progress
+
+
+	def serve(self) -> None:
+		"""	Start listening for connections on the event loop. This method returns when the server
+			is listening.
+		"""
+		self.server = self.asyncLoop.submit(asyncio.start_server(self._handleConnection, 
+																 self.host, 
+																 self.port, 
+																 backlog = self.backlog, 
+																 ssl = self.sslContext,
+																 limit = self.maxHeaderSize)).result()
+
+
+	def drain(self, timeout:float) -> bool:
+		"""	Wait until the requests that are currently processed are finished. 
+
+			Args:
+				timeout: Maximum time in seconds to wait.
+			Return:
+				True if all requests finished in time.
+		"""
+		return self.activeRequests.drain(timeout)
+
+
+	def resume(self) -> None:
+		"""	Keep connections alive again after draining.
+		"""
+		self.activeRequests.resume()
+
+
+	def stop(self, timeout:float) -> None:
+		"""	Stop accepting new connections, drain the current requests, and close the remaining connections.
+
+			Args:
+				timeout: Maximum time in seconds to wait for the current requests.
+		"""
+		async def _closeServer() -> None:
+			self.server.close()
+		
+		async def _closeConnections() -> None:
+			# Connections with a request in progress are closed after the response
+			for writer in list(self.writers - self.busyWriters):
+				writer.close()
+
+		self.activeRequests.isDraining = True
+		if self.server:
+			self.asyncLoop.submit(_closeServer()).result()
+		if not self.drain(timeout):
+			L.isWarn and L.logWarn('Not all http requests finished before shutdown')
+		self.asyncLoop.submit(_closeConnections()).result()
+
+
+	async def _handleConnection(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter) -> None:
+		"""	Read, process and answer the requests of a connection until it is closed.
+		"""
+		self.writers.add(writer)
+		try:
+			requestCount = 0
+			while True:
+				# Wait for the next request
+				try:
+					head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.keepAliveTimeout)
+				except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+					return
+				requestCount += 1
+				self.busyWriters.add(writer)
+
+				if not (request := self._parseHead(head)):
+					await self._writeResponse(writer, '400 Bad Request', [], b'', False)
+					return
+				method, target, version, headers = request
+				if headers.get('EXPECT', '').lower() == '100-continue':
+					writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+				try:
+					body = await self._readBody(reader, headers)
+				except ValueError:
+					await self._writeResponse(writer, '400 Bad Request', [], b'', False)
+					return
+
+				# Run the application in a worker
+				environ = self._environ(method, target, version, headers, body, writer)
+				status, responseHeaders, content = await self.asyncLoop.runBlocking(self._runApplication, environ)
+
+				# Check whether the server is draining only after the request was processed
+				keepAlive = (not self.activeRequests.isDraining and
+							 requestCount < self.maxKeepAliveRequests and
+							 version == 'HTTP/1.1' and
+							 headers.get('CONNECTION', '').lower() != 'close')
+				await self._writeResponse(writer, status, responseHeaders, b'' if method == 'HEAD' else content, keepAlive)
+				if not keepAlive:
+					return
+				self.busyWriters.discard(writer)
+		except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+			pass
+		finally:
+			self.writers.discard(writer)
+			self.busyWriters.discard(writer)
+			writer.close()
+
+
+	def _parseHead(self, head:bytes) -> Tuple[str, str, str, dict[str, str]]:
+		"""	Parse the request line and the header fields of a request.
+
+			Args:
+				head: The request line and header fields, including the terminating empty line.
+			Return:
+				Tuple (method, request target, http version, dictionary of header fields), or None in case of an error.
+				The names of the header fields are upper-case.
+		"""
+		lines = head.decode('latin-1').split('\r\n')
+		try:
+			method, target, version = lines[0].split(' ')
+		except ValueError:
+			return None
+		if not version.startswith('HTTP/'):
+			return None
+		headers:dict[str, str] = {}
+		for line in lines[1:]:
+			if not line:
+				continue
+			name, found, value = line.partition(':')
+			if not found:
+				return None
+			name = name.strip().upper()
+			value = value.strip()
+			headers[name] = f'{headers[name]},{value}' if name in headers else value
+		return method, target, version, headers
+
+
+	async def _readBody(self, reader:asyncio.StreamReader, headers:dict[str, str]) -> bytes:
+		"""	Read the body of a request, either with a content length or chunked.
+
+			Args:
+				reader: The connection's stream reader.
+				headers: The request's header fields.
+			Return:
+				The body.
+			Raises:
+				ValueError: If the content length or a chunk size is invalid.
+		"""
+		if headers.get('TRANSFER-ENCODING', '').lower() == 'chunked':
+			chunks:list[bytes] = []
+			while (size := int((await reader.readline()).split(b';')[0], 16)) > 0:
+				chunks.append(await reader.readexactly(size))
+				await reader.readline()	# CRLF after the chunk
+			while (await reader.readline()) not in (b'\r\n', b''):	# Trailer fields
+				pass
+			return b''.join(chunks)
+		if (length := int(headers.get('CONTENT-LENGTH', 0))) < 0:
+			raise ValueError('negative content length')
+		return await reader.readexactly(length) if length else b''
+
+
+	def _environ(self, method:str, target:str, version:str, headers:dict[str, str], body:bytes, writer:asyncio.StreamWriter) -> dict:
+		"""	Build the WSGI environment for a request.
+		"""
+		path, _, query = target.partition('?')
+		peer = writer.get_extra_info('peername') or ('', 0)
+		environ = {
+			'wsgi.version':			(1, 0),
+			'wsgi.url_scheme':		'https' if self.sslContext else 'http',
+			'wsgi.input':			BytesIO(body),
+			'wsgi.errors':			sys.stderr,
+			'wsgi.multithread':		True,
+			'wsgi.multiprocess':	False,
+			'wsgi.run_once':		False,
+			'REQUEST_METHOD':		method,
+			'SCRIPT_NAME':			'',
+			'PATH_INFO':			unquote_to_bytes(path).decode('latin-1'),
+			'QUERY_STRING':			query,
+			'REQUEST_URI':			target,
+			'SERVER_NAME':			self.host,
+			'SERVER_PORT':			str(self.port),
+			'SERVER_PROTOCOL':		version,
+			'REMOTE_ADDR':			peer[0],
+			'REMOTE_PORT':			peer[1],
+			'CONTENT_LENGTH':		str(len(body)),
+		}
+		for name, value in headers.items():
+			key = name.replace('-', '_')
+			if key == 'CONTENT_TYPE':
+				environ[key] = value
+			elif key not in ('CONTENT_LENGTH', 'TRANSFER_ENCODING'):
+				environ[f'HTTP_{key}'] = value
+		return environ
+
+
+	def _runApplication(self, environ:dict) -> Tuple[str, list[Tuple[str, str]], bytes]:
+		"""	Run the WSGI application for a request. This method is executed by a worker.
+
+			Args:
+				environ: The WSGI environment of the request.
+			Return:
+				Tuple (status, list of header fields, body).
+		"""
+		response:list = [ '500 Internal Server Error', [] ]
+		body:list[bytes] = []
+
+		def startResponse(status:str, headers:list[Tuple[str, str]], exc_info:Any = None) -> Callable[[bytes], None]:
+			response[0] = status
+			response[1] = headers
+			return body.append
+
+		self.activeRequests.started()
+		try:
+			result = self.app(environ, startResponse)
+			try:
+				body.extend(result)
+			finally:
+				if hasattr(result, 'close'):
+					result.close()	# type: ignore [union-attr]
+		except Exception as e:
+			L.logErr(f'Error processing http request: {e}', exc = e)
+			return '500 Internal Server Error', [], b''
+		finally:
+			self.activeRequests.finished()
+		return response[0], response[1], b''.join(body)
+
+
+	async def _writeResponse(self, writer:asyncio.StreamWriter, status:str, headers:list[Tuple[str, str]], content:bytes, keepAlive:bool) -> None:
+		"""	Write a response to a connection.
+
+			Args:
+				writer: The connection's stream writer.
+				status: The http status line, without the http version.
+				headers: List of header fields.
+				content: The body.
+				keepAlive: Whether the connection is kept alive after the response.
+		"""
+		lines = [ f'HTTP/1.1 {status}' ]
+		lines.extend(f'{name}: {value}' for name, value in headers if name.lower() not in ('content-length', 'connection', 'transfer-encoding'))
+		lines.append(f'Content-Length: {len(content)}')
+		lines.append(f'Connection: {"keep-alive" if keepAlive else "close"}')
+		writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + content)
+		await writer.drain()
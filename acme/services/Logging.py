@@ -12,9 +12,9 @@
 
 from __future__ import annotations
 import traceback
-import logging, logging.handlers, os, inspect, sys, datetime, time, threading
-from queue import Queue
-from typing import List, Any, Union
+import logging, logging.handlers, os, sys, datetime, time, threading
+from queue import Queue, Empty, Full
+from typing import List, Any, Tuple, Union, cast
 from logging import LogRecord
 
 
@@ -97,6 +97,11 @@ class Logging:
 	queue:Queue						= None
 	enableQueue						= False		# Can be used to enable/disable the logging queue 
 	queueSize:int					= 0			# max number of items in the logging queue. Might otherwise grow forever on large load
+	queueOverflow:str				= 'block'	# What to do with new records when the queue is full: block, dropDebug, sample
+	queueSampleRate:int				= 10		# When sampling, only one of this number of debug and info records is kept
+	batchSize:int					= 100		# Max number of records that are written at once
+	droppedRecords:int				= 0			# Number of records that were dropped because the queue was full
+	_sampleCount:int				= 0
 
 	_console:Console				= None
 	_richHandler:ACMERichLogHandler	= None
@@ -122,6 +127,9 @@ class Logging:
 		Logging.stackTraceOnError		= Configuration.get('logging.stackTraceOnError')
 		Logging.enableBindingsLogging	= Configuration.get('logging.enableBindingsLogging')
 		Logging.queueSize				= Configuration.get('logging.queueSize')
+		Logging.queueOverflow			= Configuration.get('logging.queueOverflow')
+		Logging.queueSampleRate			= Configuration.get('logging.queueSampleRate')
+		Logging.batchSize				= Configuration.get('logging.batchSize')
 
 		Logging._configureColors(Configuration.get('cse.console.theme'))
 
@@ -147,9 +155,9 @@ class Logging:
 			logpath = Configuration.get('logging.path')
 			os.makedirs(logpath, exist_ok = True)# create log directory if necessary
 			logfile = f'{logpath}/cse-{CSE.cseType.name}.log'
-			logfp = logging.handlers.RotatingFileHandler(logfile,
-														 maxBytes = Configuration.get('logging.size'),
-														 backupCount = Configuration.get('logging.count'))
+			logfp = ACMEFileLogHandler(logfile,
+									   maxBytes = Configuration.get('logging.size'),
+									   backupCount = Configuration.get('logging.count'))
 			logfp.setLevel(Logging.logLevel)
 			logfp.setFormatter(logging.Formatter('%(levelname)s %(asctime)s %(message)s'))
 			Logging.logger.addHandler(logfp) 
@@ -186,6 +194,11 @@ class Logging:
 			# No special action needed
 			if key in [ 'logging.enableScreenLogging', 'logging.stackTraceOnError',	'logging.enableBindingsLogging' ]:
 				return
+			if key in [ 'logging.queueOverflow', 'logging.queueSampleRate', 'logging.batchSize' ]:
+				Logging.queueOverflow	= Configuration.get('logging.queueOverflow')
+				Logging.queueSampleRate	= Configuration.get('logging.queueSampleRate')
+				Logging.batchSize		= Configuration.get('logging.batchSize')
+				return
 			
 			# Use the log level function to perform extra actions
 			if key == 'logging.level':
@@ -210,9 +223,14 @@ class Logging:
 		"""
 		from ..etc.DateUtils import waitFor
 		if Logging.queue:
-			waitFor(5.0, Logging.queue.empty)
+			# Wait until all queued records are written
+			waitFor(5.0, lambda: not Logging.queue.unfinished_tasks, Logging.queue.all_tasks_done)
 		if Logging._logWorker:
 			Logging._logWorker.stop()
+			try:
+				Logging.queue.put_nowait(None)	# Wake up the worker, so that it can end
+			except Full:
+				pass
 		Logging.log('')
 		if Logging.logger:
 			Logging.logger.handlers.clear()
@@ -222,40 +240,93 @@ class Logging:
 
 
 	@staticmethod
-	def _logMessageToLoggerConsole(level:int, msg:str, caller:inspect.Traceback, thread:threading.Thread) -> None:
-		if isinstance(msg, str):
-			Logging.loggerConsole.log(level, f'{os.path.basename(caller.filename)}*{caller.lineno}*{thread.name:<10.10}*{str(msg)}')
-		else:
-			try:
-				richInspect(msg, private = True, docs = False, dunder = False)
-			except:
-				pass
-			
+	def _writeRecords(records:List[Tuple[int, Any, Tuple[str, int], str, float]]) -> None:
+		"""	Format log records and write them to the log handlers.
+
+			Messages are passed to each handler in a single call. Other objects than strings are
+			rendered to the console separately.
+
+			Args:
+				records: List of records (level, message, caller's file name and line number, thread name, timestamp).
+		"""
+		logRecords:List[LogRecord] = []
+		for level, msg, caller, threadName, created in records:
+			if msg is None:
+				continue
+			if isinstance(msg, str):
+				record = Logging.loggerConsole.makeRecord(Logging.loggerConsole.name, level, caller[0], caller[1], f'{os.path.basename(caller[0])}*{caller[1]}*{threadName:<10.10}*{msg}', None, None)
+				record.created = created
+				record.msecs = (created - int(created)) * 1000
+				logRecords.append(record)
+			else:
+				# Write the messages so far to keep the order
+				Logging._emitRecords(logRecords)
+				logRecords = []
+				try:
+					richInspect(msg, private = True, docs = False, dunder = False)
+				except:
+					pass
+		Logging._emitRecords(logRecords)
+
+
+	@staticmethod
+	def _emitRecords(records:List[LogRecord]) -> None:
+		if not records:
+			return
+		for handler in Logging._handlers:
+			handler.emitBatch(records)
+
+
 	@staticmethod
 	def loggingActor() -> bool:
+		"""	Write the queued records. The actor waits for the next record, and then takes
+			all further records that are already queued, up to the batch size.
+		"""
+		queue = Logging.queue
 		while Logging._logWorker.running:
-			# Check queue and give up the CPU
-			if Logging.queue.empty():
-				time.sleep(0.1)
-				continue
-			level, msg, caller, thread = Logging.queue.get(block = True)
-			# if msg is None or (isinstance(msg, str) and not len(msg)):
-			if msg is None:
-				continue
-			Logging._logMessageToLoggerConsole(level, msg, caller, thread)
-
-		# try:
-		# 	while Logging._logWorker.running:
-		# 		level, msg, caller, thread = Logging.queue.get(block = True)
-		# 		if msg is None or (isinstance(msg, str) and not len(msg)):
-		# 			continue
-		# 		Logging._logMessageToLoggerConsole(level, msg, caller, thread)
-		# except Exception as e:
-		# 	# Not much that we can do here
-		# 	pass
+			batch = [ queue.get() ]
+			try:
+				while len(batch) < Logging.batchSize:
+					batch.append(queue.get_nowait())
+			except Empty:
+				pass
+			try:
+				Logging._writeRecords([ each for each in batch if each is not None ])	# None only wakes up the worker
+			finally:
+				for _ in batch:
+					queue.task_done()
 		return True
 
 
+	@staticmethod
+	def _queueRecord(level:int, record:Tuple[int, Any, Tuple[str, int], str, float]) -> None:
+		"""	Add a record to the queue. If the queue is full then the record is handled
+			according to the overflow policy:
+
+			- *block*: Wait until there is space in the queue.
+			- *dropDebug*: Drop debug records. Other records wait.
+			- *sample*: Keep only one of *queueSampleRate* debug and info records. Other records wait.
+
+			Args:
+				level: The record's log level.
+				record: The record to queue.
+		"""
+		try:
+			Logging.queue.put_nowait(record)
+			return
+		except Full:
+			pass
+		if Logging.queueOverflow == 'dropDebug' and level <= logging.DEBUG:
+			Logging.droppedRecords += 1
+			return
+		if Logging.queueOverflow == 'sample' and level <= logging.INFO:
+			Logging._sampleCount += 1
+			if Logging._sampleCount % Logging.queueSampleRate:
+				Logging.droppedRecords += 1
+				return
+		Logging.queue.put(record)
+
+
 	@staticmethod
 	def log(msg:Any, stackOffset:int = 0) -> None:
 		"""Print a log message with level INFO. 
@@ -318,20 +389,23 @@ class Logging:
 		"""	Internally adding various information to the log output. The `stackOffset` is used to determine 
 			the correct caller. It is set by a calling method in case the log information are re-routed.
 
+			Only the caller's file name and line number are taken from the caller's stack frame. 
+			Formatting the message is left to the logging worker.
+
 			Args:
 				level: The log level
 				stackOffset: Offset in the stack frame
 		"""
 		if Logging.logLevel <= level:
 			try:
-				# Queue a log message : (level, message, caller from stackframe, current thread)
-				caller = inspect.getframeinfo(inspect.stack()[stackOffset + 2][0])
-				thread = threading.current_thread()
+				# Queue a log message : (level, message, caller from stackframe, current thread's name, timestamp)
+				frame = sys._getframe(stackOffset + 2)
+				record = (level, msg, (frame.f_code.co_filename, frame.f_lineno), threading.current_thread().name, time.time())
 				if Logging.enableQueue:
-					Logging.queue.put((level, msg, caller, thread))
+					Logging._queueRecord(level, record)
 				else:
 					if msg:
-						Logging._logMessageToLoggerConsole(level, msg, caller, thread)
+						Logging._writeRecords([ record ])
 			except Exception as e:
 				print(e)
 				# sometimes this raises an exception. Just ignore it.
@@ -511,6 +585,17 @@ class ACMERichLogHandler(RichHandler):
 
 		]
 		
+	def emitBatch(self, records:List[LogRecord]) -> None:
+		"""	Render a batch of records with a single output to the console.
+
+			Args:
+				records: The records to render.
+		"""
+		with self.console:	# Buffer the output until all records are rendered
+			for record in records:
+				self.emit(record)
+
+
 	def emit(self, record:LogRecord) -> None:
 		"""	Invoked by logging. """
 		if not Logging.enableScreenLogging or record.levelno < Logging.logLevel:
@@ -542,3 +627,33 @@ class ACMERichLogHandler(RichHandler):
 				line_no		= lineno,
 			)
 		)
+
+
+#
+#	Rotating file handler that writes batches of records
+#
+
+class ACMEFileLogHandler(logging.handlers.RotatingFileHandler):
+
+	def emitBatch(self, records:List[LogRecord]) -> None:
+		"""	Write a batch of records to the log file with a single write.
+			The file is rotated before the batch is written if the batch would exceed the file size.
+
+			Args:
+				records: The records to write.
+		"""
+		if not (text := ''.join(f'{self.format(record)}{self.terminator}' for record in records if record.levelno >= self.level)):
+			return
+		self.acquire()
+		try:
+			if not self.stream:
+				self.stream = self._open()
+			maxBytes = cast(int, self.maxBytes)		# wrongly annotated as str in typeshed
+			if maxBytes > 0 and self.stream.tell() and self.stream.tell() + len(text) >= maxBytes:
+				self.doRollover()
+			self.stream.write(text)
+			self.flush()
+		except Exception:
+			self.handleError(records[0])
+		finally:
+			self.release()
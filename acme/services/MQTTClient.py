@@ -8,12 +8,13 @@
 #
 
 from __future__ import annotations
+import time
 from dataclasses import field
 from sqlite3 import Date
 from typing import ForwardRef, Tuple, cast, Dict
 from urllib.parse import urlparse
 from copy import deepcopy
-from threading import Lock
+from threading import Condition
 
 from ..etc.Constants import Constants as C
 from ..etc.Types import JSON, Operation, CSERequest, ContentSerializationType as CST, ResourceTypes, Result, Parameters, ResponseStatusCode as RC, ResourceTypes as T
@@ -156,6 +157,7 @@ class MQTTClientHandler(MQTTHandler):
 					
 
 		# SP relative of for : /cseid/aei
+		startTime = time.perf_counter()
 		L.isDebug and L.logDebug(f'==> MQTT Request: {topic}')
 
 		# Check correct topic length
@@ -237,6 +239,7 @@ class MQTTClientHandler(MQTTHandler):
 		# TODO Also change in http
 		responseResult.prepareResultFromRequest(dissectResult.request)	# Add some fields from the original request
 		_sendResponse(responseResult)
+		CSE.statistics.recordRequest(dissectResult.request.op, 'mqtt', time.perf_counter() - startTime, len(data), getattr(responseResult.resource, 'ty', None))
 	
 	
 
@@ -256,7 +259,7 @@ class MQTTClient(object):
 		self.topicsCount											= 0
 		self.mqttConnections:Dict[Tuple[str, int], MQTTConnection]	= {}
 		self.receivedResponses:Dict[str, Tuple[Result, str]]		= {}
-		self.receivedResponsesLock									= Lock()
+		self.receivedResponsesLock									= Condition()	# Notified when a response is added
 
 
 		self.mqttConnection = self.connectToMqttBroker(address	= Configuration.get('mqtt.address'),
@@ -311,14 +314,14 @@ class MQTTClient(object):
 	def isFullySubscribed(self) -> bool:
 		"""	Check whether this mqttConnection is fully subscribed.
 		"""
-		return DateUtils.waitFor(self.requestTimeout, lambda:self.mqttConnection.isConnected and self.mqttConnection.subscribedCount == 3)	# currently 3 topics
+		return DateUtils.waitFor(self.requestTimeout, lambda:self.mqttConnection.isConnected and self.mqttConnection.subscribedCount == 3, self.mqttConnection.stateChanged)	# currently 3 topics
 
 
 	def isConnected(self) -> bool:
 		"""	Check whether the MQTT client is connected to a broker. Wait for a moment
 			to take startup connection into account.
 		"""
-		return DateUtils.waitFor(self.requestTimeout, lambda:self.mqttConnection.isConnected)
+		return DateUtils.waitFor(self.requestTimeout, lambda:self.mqttConnection.isConnected, self.mqttConnection.stateChanged)
 
 
 	def connectToMqttBroker(self, address:str, port:int, useTLS:bool, username:str, password:str) -> MQTTConnection:
@@ -339,7 +342,8 @@ class MQTTClient(object):
 												username 			= username,
 												password			= password,
 												lowLevelLogging 	= L.enableBindingsLogging,
-												messageHandler 		= MQTTClientHandler	(self))
+												messageHandler 		= MQTTClientHandler	(self),
+												asyncLoop			= CSE.asyncLoop if Configuration.get('mqtt.asyncio') else None)
 				if mqttConnection:
 					self.mqttConnections[(address, port)] = mqttConnection
 			return mqttConnection
@@ -436,7 +440,7 @@ class MQTTClient(object):
 													  password	= mqttPassword)
 
 			# Wait a moment until we are connected.
-			DateUtils.waitFor(self.requestTimeout, lambda: mqttConnection is not None and mqttConnection.isConnected)
+			mqttConnection and DateUtils.waitFor(self.requestTimeout, lambda: mqttConnection.isConnected, mqttConnection.stateChanged)
 
 		# We are not connected, so -> fail
 		if not mqttConnection or not mqttConnection.isConnected:
@@ -459,6 +463,7 @@ class MQTTClient(object):
 		if (rqi := response.request.headers.requestIdentifier):
 			with self.receivedResponsesLock:
 				self.receivedResponses[rqi] = (response, topic)
+				self.receivedResponsesLock.notify_all()
 
 
 	def waitForResponse(self, rqi:str, timeOut:float) -> Tuple[ Result, str ]:
@@ -469,13 +474,12 @@ class MQTTClient(object):
 
 		def _receivedResponse() -> bool:
 			nonlocal resp, topic
-			with self.receivedResponsesLock:
-				if rqi in self.receivedResponses:
-					resp, topic = self.receivedResponses.pop(rqi)	# return the response (in a Result object), and remove it from the dict.
-					return True
+			if rqi in self.receivedResponses:
+				resp, topic = self.receivedResponses.pop(rqi)	# return the response (in a Result object), and remove it from the dict.
+				return True
 			return False
 			
-		if not DateUtils.waitFor(timeOut, _receivedResponse):
+		if not DateUtils.waitFor(timeOut, _receivedResponse, self.receivedResponsesLock):	# _receivedResponse() is called while holding the lock
 			return Result.errorResult(rsc = RC.targetNotReachable, dbg = 'Target not reachable or timeout'), None
 		CSE.event.responseReceived(resp.request)	# type:ignore [attr-defined]
 		return resp, topic
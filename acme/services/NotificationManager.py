@@ -8,10 +8,11 @@
 #
 
 from __future__ import annotations
-import sys
+import sys, time
 import isodate
-from typing import Callable, Union
-from threading import Lock
+from typing import Any, Callable, Union
+from threading import Lock, RLock, Thread
+from queue import Queue, Full
 from tinydb.utils import V
 
 from ..etc.Constants import Constants as C
@@ -36,13 +37,105 @@ class NotificationManager(object):
 
 	def __init__(self) -> None:
 		self.lockBatchNotification = Lock()	# Lock for batchNotifications
+		self.lockExpirationCounter = RLock()	# Lock for the expiration counters of subscriptions. Re-entrant because deleting a subscription may send further notifications
+		self.senderQueues:list[Queue] = []	# Queues of the notification senders, when subscription notifications are sent asynchronously
+		self._getConfig()
+		self.startNotificationSenders()
+
+		# Add handler for configuration updates
+		CSE.event.addHandler(CSE.event.configUpdate, self.configUpdate)			# type: ignore
 		L.isInfo and L.log('NotificationManager initialized')
 
 
 	def shutdown(self) -> bool:
+		self.stopNotificationSenders()
 		L.isInfo and L.log('NotificationManager shut down')
 		return True
 
+
+	def _getConfig(self) -> None:
+		self.asyncSubscriptionNotifications	= Configuration.get('cse.operation.asyncSubscriptionNotifications')
+		self.notificationSenders			= Configuration.get('cse.operation.notificationSenders')
+		self.notificationQueueSize			= Configuration.get('cse.operation.notificationQueueSize')
+
+
+	def configUpdate(self, key:str = None, value:Any = None) -> None:
+		"""	Callback for the `configUpdate` event. The notification senders are restarted
+			when their configuration changes.
+			
+			Args:
+				key: Name of the updated configuration setting.
+				value: New value for the config setting.
+		"""
+		if key not in [ 'cse.operation.asyncSubscriptionNotifications', 'cse.operation.notificationSenders', 'cse.operation.notificationQueueSize' ]:
+			return
+		self._getConfig()
+		self.stopNotificationSenders()
+		self.startNotificationSenders()
+
+
+	###########################################################################
+	#
+	#	Notification senders
+	#
+
+	def startNotificationSenders(self) -> None:
+		"""	Start the pool of notification senders if subscription notifications are sent asynchronously.
+
+			Each sender runs in its own thread, so that it doesn't occupy a thread of the job pool,
+			and has its own bounded queue. The notifications for a subscription are always
+			handled by the same sender, so that they are sent in the order they were raised.
+		"""
+		if not self.asyncSubscriptionNotifications:
+			return
+		L.isDebug and L.logDebug(f'Starting {self.notificationSenders} notification senders')
+		for i in range(self.notificationSenders):
+			queue:Queue = Queue(maxsize = self.notificationQueueSize)
+			self.senderQueues.append(queue)
+			Thread(target = self._notificationSender, args = (queue, ), name = f'NotificationSender-{i}', daemon = True).start()
+
+
+	def stopNotificationSenders(self) -> None:
+		"""	Stop the notification senders. Notifications that are already queued are still sent.
+		"""
+		for queue in self.senderQueues:
+			queue.put(None)	# Stop marker
+		self.senderQueues = []
+
+
+	def _notificationSender(self, queue:Queue) -> None:
+		"""	Run a notification sender. It takes the notification tasks from its queue
+			and executes them until it receives a stop marker.
+
+			Args:
+				queue: The sender's queue.
+		"""
+		while (task := queue.get()) is not None:
+			try:
+				task()
+			except Exception as e:
+				L.logErr(f'Error sending notification: {str(e)}', exc = e)
+
+
+	def _queueNotification(self, ri:str, task:Callable) -> bool:
+		"""	Queue a notification task for a subscription. If the sender's queue is full then the
+			task is executed immediately by the calling thread.
+
+			Args:
+				ri: Resource ID of the subscription. This determines the sender.
+				task: The notification task.
+			Return:
+				False if there are no notification senders and the task was not handled.
+		"""
+		if not (queues := self.senderQueues):
+			return False
+		try:
+			queues[hash(ri) % len(queues)].put_nowait(task)
+		except Full:
+			L.isWarn and L.logWarn(f'Notification queue is full. Sending notification for: {ri} directly')
+			task()
+		return True
+
 	###########################################################################
 	#
 	#	Subscriptions
@@ -117,21 +210,20 @@ class NotificationManager(object):
 		if resource and resource.isVirtual():
 			return 
 		ri = resource.ri if not ri else ri
-		L.isDebug and L.logDebug(f'Checking subscriptions ({reason.name}) ri: {ri}')
 
 		# ATTN: The "subscription" returned here are NOT the <sub> resources,
 		# but an internal representation from the 'subscription' DB !!!
-		# Access to attributes is different bc the structure is flattened
-		if not (subs := CSE.storage.getSubscriptionsForParent(ri)):
+		# Access to attributes is different bc the structure is flattened.
+		# Only the subscriptions that include the reason are returned.
+		if not (subs := CSE.storage.getSubscriptionsForParent(ri, reason)):
 			return
+		L.isDebug and L.logDebug(f'Checking subscriptions ({reason.name}) ri: {ri}')
 		for sub in subs:
 			# Prevent own notifications for subscriptions 
 			if childResource and \
 				sub['ri'] == childResource.ri and \
 				reason in [ NotificationEventType.createDirectChild, NotificationEventType.deleteDirectChild ]:
 					continue
-			if reason not in sub['net']:	# check whether reason is actually included in the subscription
-				continue
 			if reason in [ NotificationEventType.createDirectChild, NotificationEventType.deleteDirectChild ]:	# reasons for child resources
 				chty = sub['chty']
 				if chty and not childResource.ty in chty:	# skip if chty is set and child.type is not in the list
@@ -140,11 +232,7 @@ class NotificationManager(object):
 			
 			# Check Update and enc/atr vs the modified attributes 
 			elif reason == NotificationEventType.resourceUpdate and (atr := sub['atr']) and modifiedAttributes:
-				found = False
-				for k in atr:
-					if k in modifiedAttributes:
-						found = True
-				if found:
+				if not atr.isdisjoint(modifiedAttributes):
 					self._handleSubscriptionNotification(sub, reason, resource = resource, modifiedAttributes = modifiedAttributes)
 				else:
 					L.isDebug and L.logDebug('Skipping notification: No matching attributes found')
@@ -160,6 +248,31 @@ class NotificationManager(object):
 				self._handleSubscriptionNotification(sub, reason, resource, modifiedAttributes = modifiedAttributes)
 
 
+	def checkSubscriptionsForCreatedChildren(self, resource:Resource, childResources:list[Resource]) -> None:
+		"""	Check the *createDirectChild* subscriptions of a resource for a number of child
+			resources that were created together, e.g. in a bulk CREATE request.
+
+			The subscriptions are retrieved and checked only once for all child resources. A notification
+			is still sent for each child resource, but they are aggregated if a subscription has
+			*batchNotify* set.
+
+			Args:
+				resource: The parent resource.
+				childResources: The created child resources.
+		"""
+		if resource.isVirtual() or not childResources:
+			return
+		if not (subs := CSE.storage.getSubscriptionsForParent(resource.ri, NotificationEventType.createDirectChild)):
+			return
+		L.isDebug and L.logDebug(f'Checking subscriptions ({NotificationEventType.createDirectChild.name}) ri: {resource.ri} for {len(childResources)} child resources')
+		for sub in subs:
+			chty = sub['chty']
+			for childResource in childResources:
+				if sub['ri'] == childResource.ri or (chty and not childResource.ty in chty):
+					continue
+				self._handleSubscriptionNotification(sub, NotificationEventType.createDirectChild, resource = childResource)
+
+
 	def checkPerformBlockingUpdate(self, resource:Resource, originator:str, updatedAttributes:JSON, finished:Callable = None) -> Result:
 		L.isDebug and L.logDebug('check blocking UPDATE')
 
@@ -392,9 +505,39 @@ class NotificationManager(object):
 
 	def _handleSubscriptionNotification(self, sub:JSON, reason:NotificationEventType, resource:Resource = None, modifiedAttributes:JSON = None, missingData:MissingData = None) ->  bool:
 		"""	Send a subscription notification.
+
+			The notification content is determined immediately. The notification is then either sent
+			directly, or it is queued for a notification sender if subscription notifications are sent
+			asynchronously.
 		"""
 		L.isDebug and L.logDebug(f'Handling notification for reason: {reason}')
 
+		# switch to poupate data
+		nct = sub['nct']
+		data = None
+		nct == NotificationContentType.all						and (data := resource.asDict())
+		nct == NotificationContentType.ri 						and (data := { 'm2m:uri' : resource.ri })
+		nct == NotificationContentType.modifiedAttributes		and (data := { resource.tpe : modifiedAttributes })
+		nct == NotificationContentType.timeSeriesNotification	and (data := { 'm2m:tsn' : missingData.asDict() })
+		# TODO nct == NotificationContentType.triggerPayload
+
+		if self._queueNotification(sub['ri'], lambda: self._sendSubscriptionNotification(sub, reason, data)):
+			return True
+		return self._sendSubscriptionNotification(sub, reason, data)
+
+
+	def _sendSubscriptionNotification(self, sub:JSON, reason:NotificationEventType, data:JSON) -> bool:
+		"""	Send a subscription notification with already prepared content to all
+			notification targets of a subscription, and handle the subscription's expiration counter.
+
+			The *sub* document might be older than the subscription, e.g. when the notification was queued.
+			The expiration counter is therefore always taken from the current subscription.
+		"""
+		# A subscription with an expiration counter might have been removed while the notification was queued
+		if sub['exc'] and not CSE.storage.getSubscription(sub['ri']):
+			L.isDebug and L.logDebug(f'Subscription: {sub["ri"]} removed. Notification not sent')
+			return False
+
 		def sender(uri:str) -> bool:
 			"""	Sender callback function for a single normal subscription notifications
 			"""
@@ -409,15 +552,7 @@ class NotificationManager(object):
 				}
 			}
 
-			nct = sub['nct']
 			creator = sub.get('cr')	# creator, might be None
-			# switch to poupate data
-			data = None
-			nct == NotificationContentType.all						and (data := resource.asDict())
-			nct == NotificationContentType.ri 						and (data := { 'm2m:uri' : resource.ri })
-			nct == NotificationContentType.modifiedAttributes		and (data := { resource.tpe : modifiedAttributes })
-			nct == NotificationContentType.timeSeriesNotification	and (data := { 'm2m:tsn' : missingData.asDict() })
-			# TODO nct == NotificationContentType.triggerPayload
 
 			# Add some values to the notification
 			reason is not None and Utils.setXPath(notificationRequest, 'm2m:sgn/nev/net', reason)
@@ -436,18 +571,21 @@ class NotificationManager(object):
 		result = self._sendNotification(sub['nus'], sender)	# ! This is not a <sub> resource, but the internal data structure, therefore 'nus
 
 		# Handle subscription expiration in case of a successful notification
-		if result and (exc := sub['exc']):
-			L.isDebug and L.logDebug(f'Decrement expirationCounter: {exc} -> {exc-1}')
-
-			exc -= 1
-			subResource = CSE.storage.retrieveResource(ri=sub['ri']).resource
-			if exc < 1:
-				L.isDebug and L.logDebug(f'expirationCounter expired. Removing subscription: {subResource.ri}')
-				CSE.dispatcher.deleteResource(subResource)	# This also deletes the internal sub
-			else:
-				subResource.setAttribute('exc', exc)		# Update the exc attribute
-				subResource.dbUpdate()						# Update the real subscription
-				CSE.storage.updateSubscription(subResource)	# Also update the internal sub
+		if result and sub['exc']:
+			with self.lockExpirationCounter:
+				if not (subResource := CSE.storage.retrieveResource(ri=sub['ri']).resource):	# The subscription might have been deleted in the meantime
+					return result
+				if not (exc := subResource.exc):
+					return result
+				L.isDebug and L.logDebug(f'Decrement expirationCounter: {exc} -> {exc-1}')
+				exc -= 1
+				if exc < 1:
+					L.isDebug and L.logDebug(f'expirationCounter expired. Removing subscription: {subResource.ri}')
+					CSE.dispatcher.deleteResource(subResource)	# This also deletes the internal sub
+				else:
+					subResource.setAttribute('exc', exc)		# Update the exc attribute
+					subResource.dbUpdate()						# Update the real subscription
+					CSE.storage.updateSubscription(subResource)	# Also update the internal sub
 		return result								
 
 
@@ -478,12 +616,15 @@ class NotificationManager(object):
 						   ct:ContentSerializationType = None) -> Result:
 		"""	Send a Notification request to a single target.
 		"""
-		return CSE.request.sendNotifyRequest(	uri, 
+		startTime = time.perf_counter()
+		result = CSE.request.sendNotifyRequest(	uri, 
 												originator if originator else CSE.cseCsi,
 												data = notificationRequest,
 												parameters = parameters,
 												ct = ct,
 												noAccessIsError = noAccessIsError)
+		CSE.statistics.recordNotification(time.perf_counter() - startTime)
+		return result
 
 
 	##########################################################################
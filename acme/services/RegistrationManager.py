@@ -8,6 +8,7 @@
 #
 
 from copy import deepcopy
+from threading import RLock
 from typing import List, cast, Any
 
 from ..etc.Types import Permission, ResourceTypes as T, Result, ResponseStatusCode as RC, JSON, CSEType
@@ -28,6 +29,7 @@ class RegistrationManager(object):
 
 		# Start expiration Monitor
 		self.expWorker:BackgroundWorker	= None
+		self.expLock					= RLock()	# Lock for (re)scheduling the expiration monitor
 		self.startExpirationMonitor()
 		
 		# Add handler for configuration updates
@@ -48,6 +50,7 @@ class RegistrationManager(object):
 		self.allowedCSROriginators 		= Configuration.get('cse.registration.allowedCSROriginators')
 		self.allowedAEOriginators		= Configuration.get('cse.registration.allowedAEOriginators')
 		self.checkExpirationsInterval	= Configuration.get('cse.checkExpirationsInterval')
+		self.expirationBatchSize		= 100	# Number of resources to take from the expiration index at a time
 
 
 	def configUpdate(self, key:str = None, value:Any = None) -> None:
@@ -302,36 +305,75 @@ class RegistrationManager(object):
 		# Start background monitor to handle expired resources
 		L.isDebug and L.logDebug('Starting expiration monitor')
 		if self.checkExpirationsInterval > 0:
-			self.expWorker = BackgroundWorkerPool.newWorker(self.checkExpirationsInterval, self.expirationDBMonitor, 'expirationMonitor', runOnTime=False).start()
+			CSE.storage.expirationHandler = self._scheduleExpirationMonitor
+			self._scheduleExpirationMonitor()
 
 
 	def stopExpirationMonitor(self) -> None:
 		# Stop the expiration monitor
 		L.isDebug and L.logDebug('Stopping expiration monitor')
-		if self.expWorker:
-			self.expWorker.stop()
+		with self.expLock:
+			CSE.storage.expirationHandler = None
+			if self.expWorker:
+				self.expWorker.stop()
+				self.expWorker = None
 
 
 	def restartExpirationMonitor(self) -> None:
 		# Stop the expiration monitor
 		L.isDebug and L.logDebug('Restart expiration monitor')
-		if self.expWorker:
-			self.expWorker.restart(self.checkExpirationsInterval)
+		self.stopExpirationMonitor()
+		self.startExpirationMonitor()
+
+
+	def _scheduleExpirationMonitor(self, et:str = None) -> None:
+		"""	Schedule the expiration monitor to run when the next resource expires, but
+			at the latest after *checkExpirationsInterval* seconds.
+			
+			If the monitor is already scheduled to run earlier then nothing is changed.
+
+			Args:
+				et: Optional expiration timestamp of a resource that expires earlier than all other resources. If not given then the next expiration is taken from the storage.
+		"""
+		with self.expLock:
+			runAt = DateUtils.utcTime() + self.checkExpirationsInterval
+			if et or (et := CSE.storage.nextExpiration()):
+				runAt = min(runAt, DateUtils.fromAbsRelTimestamp(et, default = runAt))
+			if self.expWorker and self.expWorker.running:
+				if not self.expWorker.executing and self.expWorker.nextRunTime <= runAt:
+					return	# already scheduled to run earlier
+				self.expWorker.stop()
+			self.expWorker = BackgroundWorkerPool.newActor(self.expirationDBMonitor, at = runAt, name = 'expirationMonitor').start()
 
 
 	def expirationDBMonitor(self) -> bool:
+		"""	Expire all resources whose expiration timestamp has passed, and schedule
+			the next run of the monitor.
+
+			The resources are taken from the storage's expiration index in batches.
+
+			Return:
+				Always True.
+		"""
 		# L.isDebug and L.logDebug('Looking for expired resources')
 		now = DateUtils.getResourceDate()
-		resources = CSE.storage.searchByFilter(lambda r: (et := r.get('et'))  and et < now)
-		for resource in resources:
-			# try to retrieve the resource first bc it might have been deleted as a child resource
-			# of an expired resource
-			if not CSE.storage.hasResource(ri=resource.ri):
-				continue
-			L.isDebug and L.logDebug(f'Expiring resource (and child resouces): {resource.ri}')
-			CSE.dispatcher.deleteResource(resource, withDeregistration = True)	# ignore result
-			CSE.event.expireResource(resource) # type: ignore
-				
+		while ris := CSE.storage.expiredResources(now, limit = self.expirationBatchSize):
+			for ri in ris:
+				# try to retrieve the resource first bc it might have been deleted as a child resource
+				# of an expired resource
+				if not (res := CSE.storage.retrieveResource(ri = ri)).status:
+					continue
+				resource = res.resource
+				L.isDebug and L.logDebug(f'Expiring resource (and child resouces): {resource.ri}')
+				if not (res := CSE.dispatcher.deleteResource(resource, withDeregistration = True)).status:
+					# The resource was already removed from the expiration index. Try again later
+					L.logWarn(f'Cannot remove expired resource: {resource.ri} ({res.dbg}). Retrying in {self.checkExpirationsInterval} seconds')
+					CSE.storage.postponeExpiration(resource.ri, DateUtils.getResourceDate(self.checkExpirationsInterval))
+					continue
+				CSE.event.expireResource(resource) # type: ignore
+		
+		# Schedule the next run
+		self._scheduleExpirationMonitor()
 		return True
 
 
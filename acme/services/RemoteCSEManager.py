@@ -42,14 +42,14 @@ class RemoteCSEManager(object):
 
 		self.connectionMonitor:BackgroundWorker	= None	# BackgroundWorker
 
-		CSE.event.addHandler(CSE.event.registeredToRemoteCSE, self.handleRegistrarRegistration)				# type: ignore
-		CSE.event.addHandler(CSE.event.deregisteredFromRemoteCSE, self.handleRegistrarDeregistration)		# type: ignore
-		CSE.event.addHandler(CSE.event.remoteCSEHasRegistered, self.handleRemoteCSERegistration)			# type: ignore
-		CSE.event.addHandler(CSE.event.remoteCSEHasDeregistered, self.handleRemoteCSEDeregistration)		# type: ignore
-		CSE.event.addHandler(CSE.event.remoteCSEUpdate, self.handleRemoteCSEUpdate)							# type: ignore
+		CSE.event.addHandler(CSE.event.registeredToRemoteCSE, self.handleRegistrarRegistration, blocking = True)				# type: ignore
+		CSE.event.addHandler(CSE.event.deregisteredFromRemoteCSE, self.handleRegistrarDeregistration, blocking = True)		# type: ignore
+		CSE.event.addHandler(CSE.event.remoteCSEHasRegistered, self.handleRemoteCSERegistration, blocking = True)			# type: ignore
+		CSE.event.addHandler(CSE.event.remoteCSEHasDeregistered, self.handleRemoteCSEDeregistration, blocking = True)		# type: ignore
+		CSE.event.addHandler(CSE.event.remoteCSEUpdate, self.handleRemoteCSEUpdate, blocking = True)							# type: ignore
 
 		# Add a handler when the CSE is started
-		CSE.event.addHandler(CSE.event.cseStartup, self.start)	# type: ignore
+		CSE.event.addHandler(CSE.event.cseStartup, self.start, blocking = True)	# type: ignore
 		L.isInfo and L.log('RemoteCSEManager initialized')
 
 
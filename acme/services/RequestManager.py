@@ -8,11 +8,14 @@
 #
 
 from __future__ import annotations
-import re
+import re, heapq, math
 import urllib.parse
-from typing import Any, List, Tuple, cast, Dict
+from typing import Any, List, Optional, Tuple, cast, Dict
 from copy import deepcopy
-from threading import Lock
+from collections import deque
+from dataclasses import dataclass
+from itertools import count
+from threading import Condition, Lock
 
 
 from ..etc.Types import JSON, BasicType, DesiredIdentifierResultType, FilterOperation, FilterUsage, Operation, Permission, ReqResp, RequestCallback, RequestType, ResponseStatusCode, ResultContentType
@@ -33,12 +36,10 @@ from ..services.Configuration import Configuration
 from ..services import CSE as CSE
 from ..resources.REQ import REQ
 from ..resources.PCH import PCH
-from ..helpers.BackgroundWorker import BackgroundWorkerPool
+from ..helpers.BackgroundWorker import BackgroundWorkerPool, BackgroundWorker
+from ..helpers.AsyncLoop import blockingWait
 
 
-# This factor determines how often the monitor looks for expired request resources
-expirationCheckFactor = 2.0
-
 class RequestManager(object):
 
 	def __init__(self) -> None:
@@ -58,10 +59,13 @@ class RequestManager(object):
 		#
 		#	Structures for pollingChannel requests
 		#
-		self._requestLock = Lock()													# Lock to access the following two dictionaries
-		self._requests:Dict[str, List[ Tuple[CSERequest, RequestType] ] ] = {}		# Dictionary to map request originators to a list of reqeusts. Used for handling polling requests.
+		self._requestLock = Lock()													# Lock to access the following structures. The queues have their own locks
+		self._pollingQueues:Dict[str, PollingQueue] = {}							# Dictionary to map request originators to their queue of requests. Used for handling polling requests.
 		self._rqiOriginator:Dict[str, str] = {}										# Dictionary to map requestIdentifiers to an originator of a request. Used for handling of polling requests.
-		self._pcWorker = BackgroundWorkerPool.newWorker(self.requestExpirationDelta * expirationCheckFactor, self._cleanupPollingRequests, name='pollingChannelExpiration').start()
+		self._pollingExpirations:List[Tuple[float, int, PollingRequest]] = []		# Min-heap of the expiration times of the queued requests
+		self._pollingSequence = count()												# Tie-breaker for requests with the same expiration time
+		self._pollingExpirationWorker:BackgroundWorker = None						# Actor that removes the next expired requests
+		self._pollingExpirationRunAt = math.inf										# Time when that actor runs
 
 		# Add a handler when the CSE is reset
 		CSE.event.addHandler(CSE.event.cseReset, self.restart)	# type: ignore
@@ -73,9 +77,11 @@ class RequestManager(object):
 
 
 	def shutdown(self) -> bool:
-		# Stop the PollingChannel Cleanup worker
-		if self._pcWorker:
-			self._pcWorker.stop()
+		# Stop the PollingChannel expiration actor
+		with self._requestLock:
+			if self._pollingExpirationWorker:
+				self._pollingExpirationWorker.stop()
+				self._pollingExpirationWorker = None
 		L.isInfo and L.log('RequestManager shut down')
 		return True
 
@@ -83,14 +89,18 @@ class RequestManager(object):
 	def restart(self) -> None:
 		"""	Restart the registrationManager service.
 		"""
-		# Terminate waiting request and pollingQueue actors
+		# Terminate waiting request actors
 		BackgroundWorkerPool.removeWorkers('request_*')
-		BackgroundWorkerPool.removeWorkers('unqueuePolling_*')
 
 		# empty polling channel queues
 		with self._requestLock:
-			self._requests = {}
+			self._pollingQueues = {}
 			self._rqiOriginator = {}
+			self._pollingExpirations = []
+			if self._pollingExpirationWorker:
+				self._pollingExpirationWorker.stop()
+				self._pollingExpirationWorker = None
+			self._pollingExpirationRunAt = math.inf
 		L.logDebug('RequestManager restarted')
 	
 
@@ -107,10 +117,6 @@ class RequestManager(object):
 		self.flexBlockingBlocking			 = Configuration.get('cse.flexBlockingPreference') == 'blocking'
 		self.requestExpirationDelta			 = Configuration.get('cse.requestExpirationDelta')
 
-		# restart expiration worker
-		if self._pcWorker:
-			self._pcWorker.restart(self.requestExpirationDelta * expirationCheckFactor)
-
 
 	#########################################################################
 	#
@@ -546,12 +552,13 @@ class RequestManager(object):
 
 	def hasPollingRequest(self, originator:str, requestID:str=None, reqType:RequestType=RequestType.REQUEST) -> bool:
 		"""	Check whether there is a pending request or response pending for the tuple (`originator`, `requestID`).
-			This method is also used as a callback for periodic check whether a request or response is queued.
 			If `requestID` is not None then the check is for a request with that ID. 
 			Otherwise, `True` will be returned if there is any request for the `originator`.
 		"""
-		with self._requestLock:
-			return (lst := self._requests.get(originator)) is not None and any(	 (r, t) for r,t in lst if (requestID is None or r.headers.requestIdentifier == requestID) and (t == reqType) )
+		if (queue := self._pollingQueues.get(originator)) is None:
+			return False
+		with queue.lock:
+			return queue.find(requestID, reqType) is not None
 
 	
 	def queuePollingRequest(self, request:CSERequest, reqType:RequestType=RequestType.REQUEST) -> None:
@@ -581,53 +588,37 @@ class RequestManager(object):
 			return
 		
 		# Add to queue
+		entry = PollingRequest(request, reqType, request.id, request.headers._retUTCts)
 		with self._requestLock:
-			if not (originator := request.id) in self._requests:
-				self._requests[originator] = [ (request, reqType) ]
-			else:
-				self._requests[originator].append( (request, reqType) )
+			if (queue := self._pollingQueues.get(entry.originator)) is None:
+				queue = self._pollingQueues[entry.originator] = PollingQueue()
+			with queue.lock:
+				queue.add(entry)	# Also wakes up the waiting pollers and requests
 			# store mapping between RQI and request originator
 			self._rqiOriginator[request.headers.requestIdentifier] = request.headers.originator
 
 			if reqType == RequestType.RESPONSE:
 				del self._rqiOriginator[request.headers.requestIdentifier]
 
-		
-		# Start an actor to remove the request after the timeout		
-		BackgroundWorkerPool.newActor(	lambda: self.unqueuePollingRequest(originator, request.headers.requestIdentifier, reqType), 
-										delay=request.headers._retUTCts - DateUtils.utcTime() + 1.0,	# +1 second delay 
-										name=f'unqueuePolling_{request.headers.requestIdentifier}-{reqType}').start()
+			# Remove the request when it expires
+			heapq.heappush(self._pollingExpirations, (entry.expiration, next(self._pollingSequence), entry))
+			self._schedulePollingExpiration()
 	
 
 	def unqueuePollingRequest(self, originator:str, requestID:str, reqType:RequestType) -> CSERequest:
 		"""	Remove a request for the `originator` and with the `requestID` from the polling request queue. 
 		"""
 		L.isDebug and L.logDebug(f'Unqueuing polling request, originator: {originator}, requestID: {requestID}')
-		with self._requestLock:
-			resultRequest = None
-			if lst := self._requests.get(originator):
-				requests = []
-				
-				# extract the queried request or the first one found, and build a new list for the remaining
-				# Building a new list is faster than extracting and removing elements in place
-				for r,t in lst:	
-					if (requestID is None or requestID == r.headers.requestIdentifier) and t == reqType and not resultRequest:	# Either get an uspecified reuqest, or a specific one
-						resultRequest = r
-					else:
-						requests.append( (r, t) )
-				if requests:
-					self._requests[originator] = requests
-				else:
-					del self._requests[originator]
-				
-			if resultRequest:
-				BackgroundWorkerPool.stopWorkers(f'unqueuePolling_{resultRequest.headers.requestIdentifier}-{reqType}')
-					
-			return resultRequest
+		if (queue := self._pollingQueues.get(originator)) is None:
+			return None
+		with queue.lock:
+			entry = queue.pop(requestID, reqType)
+		self._releasePollingQueue(originator, queue)
+		return entry.request if entry else None
 
 
 	def waitForPollingRequest(self, originator:str, requestID:str, timeout:float, reqType:RequestType = RequestType.REQUEST, aggregate:bool = False) -> Result:
-		"""	Busy waiting for a polling request.
+		"""	Wait for a polling request.
 			The function returns when there is a new or pending matching request in the queue, or when the `timeout` (in seconds)
 			is met.
 			
@@ -641,28 +632,100 @@ class RequestManager(object):
 		"""
 		L.isDebug and L.logDebug(f'Waiting for: {reqType} for originator: {originator}, requestID: {requestID}')
 
-		if DateUtils.waitFor(timeout, lambda:self.hasPollingRequest(originator, requestID, reqType)):	# Wait until timeout, or the request of the correct type was found
-			L.isDebug and L.logDebug(f'Received {reqType} request for originator: {originator}, requestID: {requestID}, aggregate: {aggregate}')
+		# Register as a waiter, so that the queue is kept even while it is empty
+		with self._requestLock:
+			if (queue := self._pollingQueues.get(originator)) is None:
+				queue = self._pollingQueues[originator] = PollingQueue()
+			queue.waiters += 1
+		
+		lst:list[CSERequest] = []
+		try:
+			with queue.lock:	# Take the requests while still holding the lock, so that no other waiter can take them first
+				if not (found := queue.find(requestID, reqType) is not None):
+					with blockingWait():	# The wait doesn't occupy a worker of the bounded http server engines
+						found = DateUtils.waitFor(timeout, lambda:queue.find(requestID, reqType) is not None, queue.lock)	# Wait until timeout, or the request of the correct type was queued
+				if found:
+					while (entry := queue.pop(requestID, reqType)):
+						lst.append(entry.request)
+						if not aggregate:
+							break
+		finally:
+			with self._requestLock:
+				queue.waiters -= 1
+			self._releasePollingQueue(originator, queue)
 
+		if lst:
+			L.isDebug and L.logDebug(f'Received {reqType} request for originator: {originator}, requestID: {requestID}, aggregate: {aggregate}')
 			if aggregate:
-				lst:list[CSERequest] = []
-				while True:
-					if req := self.unqueuePollingRequest(originator, requestID, reqType):
-						lst.append(req)
-						continue
-					# if fall through then there is no further request available.
-					# build the aggregated request
-					agrp = { 'm2m:agrp' : [ RequestUtils.requestFromResult(Result(request = each)).data for each in lst ] }
-					return Result(status = True, resource = agrp, rsc = RC.OK)
-				
-			else:
-				if req := self.unqueuePollingRequest(originator, requestID, reqType):
-					return Result(status = True, request = req, rsc = req.rsc)
-			# fall-through
+				# build the aggregated request
+				agrp = { 'm2m:agrp' : [ RequestUtils.requestFromResult(Result(request = each)).data for each in lst ] }
+				return Result(status = True, resource = agrp, rsc = RC.OK)
+			return Result(status = True, request = lst[0], rsc = lst[0].rsc)
+
 		L.logWarn(dbg := f'Timeout while waiting for: {reqType} for originator: {originator}, requestID: {requestID}')
 		return Result.errorResult(rsc = RC.requestTimeout, dbg = dbg)
 
 
+	def _releasePollingQueue(self, originator:str, queue:PollingQueue) -> None:
+		"""	Remove the queue of an `originator` when it is empty and nobody waits for it.
+
+			Args:
+				originator: The originator of the queue.
+				queue: The queue.
+		"""
+		with self._requestLock:
+			if queue.waiters or self._pollingQueues.get(originator) is not queue:
+				return
+			with queue.lock:
+				if not len(queue):
+					del self._pollingQueues[originator]
+
+
+	def _schedulePollingExpiration(self) -> None:
+		"""	Schedule the expiration actor to run when the next queued request expires. 
+			If the actor is already scheduled to run earlier then nothing is changed.
+			
+			This method must be called while holding the *_requestLock*.
+		"""
+		if not self._pollingExpirations or (runAt := self._pollingExpirations[0][0]) >= self._pollingExpirationRunAt:
+			return
+		if self._pollingExpirationWorker:
+			self._pollingExpirationWorker.stop()
+		self._pollingExpirationRunAt = runAt
+		self._pollingExpirationWorker = BackgroundWorkerPool.newActor(self._expirePollingRequests, at = runAt, name = 'pollingChannelExpiration').start(runAt = runAt)
+
+
+	def _expirePollingRequests(self, runAt:float) -> bool:
+		"""	Remove all queued requests whose expiration time has passed, and schedule
+			the next run of the expiration actor.
+
+			Args:
+				runAt: The time for which this run was scheduled.
+			Return:
+				Always True.
+		"""
+		now = max(DateUtils.utcTime(), runAt)
+		with self._requestLock:
+			if self._pollingExpirationRunAt == runAt:	# Not replaced by an actor that runs earlier
+				self._pollingExpirationWorker = None
+				self._pollingExpirationRunAt = math.inf
+
+			while self._pollingExpirations and self._pollingExpirations[0][0] <= now:
+				entry = heapq.heappop(self._pollingExpirations)[2]
+				if entry.isRemoved or (queue := self._pollingQueues.get(entry.originator)) is None:
+					continue	# Already taken from the queue
+				L.isDebug and L.logDebug(f'Remove old polling request: {entry.request.headers.requestIdentifier}')
+				with queue.lock:
+					queue.remove(entry)
+					if not len(queue) and not queue.waiters:
+						del self._pollingQueues[entry.originator]
+				# Also remove the requestID - originator mapping
+				self._rqiOriginator.pop(entry.request.headers.requestIdentifier, None)
+
+			self._schedulePollingExpiration()
+		return True
+
+
 	def queueRequestForPCH(	self, 
 							pchOriginator:str,
 							operation:Operation = Operation.NOTIFY,
@@ -730,29 +793,6 @@ class RequestManager(object):
 		return Result.errorResult(rsc = RC.requestTimeout, dbg = response.dbg)
 
 
-	def _cleanupPollingRequests(self) -> bool:
-		with self._requestLock:
-			# Search all entries in the queue and remove those that have expired in the past
-			# Remove those requests also from 
-			now = DateUtils.utcTime()
-			for originator, requests in list(self._requests.items()):
-				nList = []
-				for tup in list(requests):				# Test all requests for expiration
-					if tup[0].headers._retUTCts > now:	# not expired
-						nList.append(tup)				# add the request tupple again to the list if it hasnt expired
-					else:
-						L.isDebug and L.logDebug(f'Remove old polling request: {tup}')
-						# Also remove the requestID - originator mapping
-						if (rqi := tup[0].headers.requestIdentifier) in self._rqiOriginator:
-							del self._rqiOriginator[rqi]
-				if len(nList) > 0:	# Add the lists again if there still more requests for this originator
-					self._requests[originator] = nList
-				else:				# remove the entry
-					del self._requests[originator]
-		return True
-					
-		
-
 	###########################################################################
 	#
 	#	Handling sending requests.
@@ -1261,9 +1301,14 @@ class RequestManager(object):
 			#	Discovery and FilterCriteria
 			#
 			if fc:	# only when there is a filterCriteria
-				for h in [ 'lim', 'lvl', 'ofst', 'arp' ]:
+				for h in [ 'lim', 'lvl', 'arp' ]:
 					if (v := gget(fc, h)) is not None:	# may be int
 						cseRequest.args.handling[h] = v
+				if isinstance(ofst := fc.get('ofst'), str) and not ofst.isdigit():	# Content offset of a previous partial discovery result
+					del fc['ofst']
+					cseRequest.args.handling['ofst'] = ofst
+				elif (v := gget(fc, 'ofst')) is not None:
+					cseRequest.args.handling['ofst'] = v
 				for h in [ 'crb', 'cra', 'ms', 'us', 'sts', 'stb', 'exb', 'exa', 'lbq', 'sza', 'szb', 'catr', 'patr', 'cty', 'lbl' ]:
 					if (v := gget(fc, h)) is not None:	# may be int
 						cseRequest.args.conditions[h] = v
@@ -1433,3 +1478,112 @@ class RequestManager(object):
 		return resultList
 
 
+
+##############################################################################
+#
+#	Polling channel queues
+#
+
+@dataclass(eq = False)
+class PollingRequest:
+	"""	A request or response that is queued for a polling channel. Instances are compared by identity.
+	"""
+	request:CSERequest
+	"""	The queued request or response. """
+	reqType:RequestType
+	"""	Whether this is a request or a response. """
+	originator:str
+	"""	The originator whose queue holds this request. """
+	expiration:float
+	"""	UTC timestamp when the request expires. """
+	isRemoved:bool = False
+	"""	True when the request has been taken from the queue or has expired. """
+
+
+class PollingQueue(object):
+	"""	The queued requests and responses for a single originator.
+
+		The requests are kept in order in one deque per request type, and also by request identifier and type, 
+		so that a specific request is found without searching. 
+		Taking a request from the middle of a deque only marks it as removed. Removed requests are skipped when they
+		reach the head of a deque, and are purged when they make up most of a deque.
+
+		All methods must be called while holding the queue's *lock*.
+	"""
+
+	def __init__(self) -> None:
+		self.lock = Condition()		# Notified when a request is added
+		self.queues:Dict[RequestType, deque[PollingRequest]] = {}
+		self.requestIDs:Dict[Tuple[str, RequestType], deque[PollingRequest]] = {}
+		self.count = 0
+		self.waiters = 0			# Number of threads waiting for a request. Protected by the RequestManager's lock
+
+
+	def __len__(self) -> int:
+		return self.count
+
+
+	def add(self, entry:PollingRequest) -> None:
+		"""	Append a request to the queue and wake up all waiting threads.
+
+			Args:
+				entry: The request to add.
+		"""
+		self.queues.setdefault(entry.reqType, deque()).append(entry)
+		self.requestIDs.setdefault((entry.request.headers.requestIdentifier, entry.reqType), deque()).append(entry)
+		self.count += 1
+		self.lock.notify_all()
+
+
+	def find(self, requestID:str, reqType:RequestType) -> Optional[PollingRequest]:
+		"""	Find the oldest request of a type, and optionally with a request identifier.
+
+			Args:
+				requestID: Request identifier to match, or None to match any request.
+				reqType: Request type to match.
+			Return:
+				The request, or None if no request matches.
+		"""
+		if not (queue := self.queues.get(reqType) if requestID is None else self.requestIDs.get((requestID, reqType))):
+			return None
+		while queue and queue[0].isRemoved:
+			queue.popleft()
+		return queue[0] if queue else None
+
+
+	def pop(self, requestID:str, reqType:RequestType) -> Optional[PollingRequest]:
+		"""	Find and remove the oldest request of a type, and optionally with a request identifier.
+
+			Args:
+				requestID: Request identifier to match, or None to match any request.
+				reqType: Request type to match.
+			Return:
+				The request, or None if no request matches.
+		"""
+		if entry := self.find(requestID, reqType):
+			self.remove(entry)
+		return entry
+
+
+	def remove(self, entry:PollingRequest) -> None:
+		"""	Remove a request from the queue.
+
+			Args:
+				entry: The request to remove.
+		"""
+		if entry.isRemoved:
+			return
+		entry.isRemoved = True
+		self.count -= 1
+
+		key = (entry.request.headers.requestIdentifier, entry.reqType)
+		if queue := self.requestIDs.get(key):
+			queue.remove(entry)		# Usually the only entry
+			if not queue:
+				del self.requestIDs[key]
+
+		queue = self.queues[entry.reqType]
+		if queue[0] is entry:
+			queue.popleft()
+		elif len(queue) > 64 and len(queue) > 2 * self.count:
+			self.queues[entry.reqType] = deque(e for e in queue if not e.isRemoved)
@@ -81,6 +81,7 @@ class ACMEPContext(PContext):
 										'csestatus':			self.doCseStatus,
 							 			'hasattribute':			self.doHasAttribute,
 										'isipython':			self.doIsIPython,
+										'resourceswithlabels':	self.doResourcesWithLabels,
 										'storagehas':			self.doStorageHas,
 										'storageget':			self.doStorageGet,
 						 				'__default__':			lambda c, a, l: Configuration.get(a),
@@ -623,6 +624,24 @@ class ACMEPContext(PContext):
 		return str(Utils.runsInIPython()).lower()
 		
 
+	def doResourcesWithLabels(self, pcontext:PContext, arg:str, line:str) -> str:
+		"""	Implementation of the `resourcesWithLabels` macro. Return the resource IDs of all resources
+			that have all of the given labels.
+
+			Example:
+			[resourcesWithLabels <label> [<label>]*]
+			Args:
+				pcontext: Current script context.
+				arg: Remaining arguments, one or more labels.
+			Return:
+				Space separated list of resource IDs, or None in case of an error.
+		"""
+		if not (labels := arg.split()):
+			pcontext.setError(PError.invalid, f'Invalid format: resourcesWithLabels <label> [<label>]*')
+			return None
+		return ' '.join(sorted(CSE.storage.resourceIDsByLabels(labels, matchAll = True)))
+
+
 	def doStorageHas(self, pcontext:PContext, arg:str, line:str) -> str:
 		"""	Implementation of the `storageHas` macro. Test for a key in the persistent storage.
 
@@ -868,11 +887,11 @@ class ScriptManager(object):
 		self.scriptCronWorker:BackgroundWorker = None
 
 		# Also do some internal handling
-		CSE.event.addHandler(CSE.event.cseStartup, self.cseStarted)			# type: ignore
+		CSE.event.addHandler(CSE.event.cseStartup, self.cseStarted, blocking = True)			# type: ignore
 		CSE.event.addHandler(CSE.event.cseReset, self.restart)				# type: ignore
-		CSE.event.addHandler(CSE.event.cseRestarted, self.restartFinished)	# type: ignore
-		CSE.event.addHandler(CSE.event.keyboard, self.onKeyboard)			# type: ignore
-		CSE.event.addHandler(CSE.event.acmeNotification, self.onNotification)	# type: ignore
+		CSE.event.addHandler(CSE.event.cseRestarted, self.restartFinished, blocking = True)	# type: ignore
+		CSE.event.addHandler(CSE.event.keyboard, self.onKeyboard, blocking = True)			# type: ignore
+		CSE.event.addHandler(CSE.event.acmeNotification, self.onNotification, blocking = True)	# type: ignore
 
 		# Add a handler for configuration changes
 		CSE.event.addHandler(CSE.event.configUpdate, self.configUpdate)		# type: ignore
@@ -9,10 +9,13 @@
 
 
 from __future__ import annotations
-import ssl
-from typing import List
+import ssl, re
+from typing import List, Optional, Tuple
+from dataclasses import dataclass, field
+from collections import OrderedDict
+from threading import Lock
 
-from ..etc.Types import ResourceTypes as T, Permission, Result, CSERequest, ResponseStatusCode as RC
+from ..etc.Types import ResourceTypes as T, Permission, Result, CSERequest, ResponseStatusCode as RC, JSON
 from ..etc import Utils as Utils
 from ..services import CSE as CSE
 from ..services.Logging import Logging as L
@@ -23,11 +26,127 @@ from ..resources.PCH_PCU import PCH_PCU
 from ..helpers import TextTools
 
 
+@dataclass
+class AccessControlRule(object):
+	"""	Compiled *accessControlRule* of an <ACP> resource.
+	"""
+	acop:int
+	""" Bitmask of the permitted operations. """
+	allOriginators:bool = False
+	""" True if the rule applies to all originators. """
+	originators:frozenset[str] = frozenset()
+	""" The originators that are matched exactly. """
+	patterns:list[re.Pattern] = field(default_factory = list)
+	""" Compiled wildcard patterns for matching originators. """
+	acod:Optional[list[Tuple[frozenset[int], frozenset[int]]]] = None
+	""" The (*chty*, *ty*) sets of the *accessControlObjectDetails*, or None if there are none. """
+
+
+	def matchesOriginator(self, originator:str) -> bool:
+		"""	Check whether the rule applies to an originator.
+
+			Args:
+				originator: The originator to check.
+			Return:
+				Boolean indicating the match.
+		"""
+		return self.allOriginators or originator in self.originators or any(p.fullmatch(originator) for p in self.patterns)
+
+
+	def grants(self, originator:str, requestedPermission:Permission, ty:T) -> bool:
+		"""	Check whether the rule grants the requested permission to an originator.
+
+			Args:
+				originator: The originator to check.
+				requestedPermission: The permission to check.
+				ty: For CREATE the type of the resource to create, otherwise the type of the target resource.
+			Return:
+				Boolean indicating whether the permission is granted.
+		"""
+		if requestedPermission & self.acop == Permission.NONE:	# permission not fitting at all
+			return False
+		if self.acod is not None:
+			if requestedPermission == Permission.CREATE:
+				if ty is None or not any(ty in chty for chty, _ in self.acod):	# for CREATE: type not in chty
+					return False
+			elif not any(ty in tys for _, tys in self.acod):					# any other permission: type not in ty
+				return False
+			# TODO support acod/specialization
+		return requestedPermission == Permission.NOTIFY or self.matchesOriginator(originator)
+
+
+	@classmethod
+	def compile(cls, acr:JSON) -> AccessControlRule:
+		"""	Compile an *accessControlRule*.
+
+			Args:
+				acr: The *accessControlRule* structure.
+			Return:
+				The compiled rule.
+		"""
+		rule = cls(acop = acr.get('acop', Permission.NONE))
+		originators = set()
+		for each in acr.get('acor', []):
+			if each == 'all':
+				rule.allOriginators = True
+			elif (pattern := TextTools.compileSimpleMatch(each)):
+				rule.patterns.append(pattern)
+			else:
+				originators.add(each)
+		rule.originators = frozenset(originators)
+		if (acod := acr.get('acod')):
+			rule.acod = [ (frozenset(each.get('chty') or []), frozenset(each.get('ty') or [])) for each in acod ]
+		return rule
+
+
+@dataclass
+class CompiledACP(object):
+	"""	Compiled privileges of an <ACP> resource.
+	"""
+	privileges:list[AccessControlRule]
+	""" The compiled rules of the *privileges* attribute. """
+	selfPrivileges:list[AccessControlRule]
+	""" The compiled rules of the *selfPrivileges* attribute. """
+
+
+	def checkPermission(self, originator:str, requestedPermission:Permission, ty:T) -> bool:
+		"""	Check whether an *originator* has the requested permissions. See `ACP.checkPermission()`.
+		"""
+		return any(rule.grants(originator, requestedPermission, ty) for rule in self.privileges)
+
+
+	def checkSelfPermission(self, originator:str, requestedPermission:Permission) -> bool:
+		"""	Check whether an *originator* has the requested permissions to the <ACP> resource itself. See `ACP.checkSelfPermission()`.
+		"""
+		return any(requestedPermission & rule.acop and rule.matchesOriginator(originator) for rule in self.selfPrivileges)
+
+
+	@classmethod
+	def compile(cls, acp:Resource) -> CompiledACP:
+		"""	Compile the privileges of an <ACP> resource.
+
+			Args:
+				acp: The <ACP> resource.
+			Return:
+				The compiled privileges.
+		"""
+		return cls(privileges = [ AccessControlRule.compile(acr) for acr in (acp['pv/acr'] or []) ],
+				   selfPrivileges = [ AccessControlRule.compile(acr) for acr in (acp['pvs/acr'] or []) ])
+
+
 class SecurityManager(object):
 
 	def __init__(self) -> None:
 		self.enableACPChecks 			= Configuration.get('cse.security.enableACPChecks')
 		self.fullAccessAdmin			= Configuration.get('cse.security.fullAccessAdmin')
+		self.acpDecisionCacheSize		= Configuration.get('cse.security.acpDecisionCacheSize')
+
+		# Compiled <ACP> resources and memoized access decisions
+		self.compiledACPs:dict[str, CompiledACP] = {}					# acp.ri -> compiled ACP
+		self.acpDecisions:OrderedDict[tuple, bool] = OrderedDict()		# (originator, acpi, permission, ty, self) -> decision
+		self.acpGeneration = 0											# changes with every change of an <ACP>
+		self.acpLock = Lock()
+		CSE.event.addHandler(CSE.event.cseReset, self.restart)		# type: ignore
 
 		L.isInfo and L.log('SecurityManager initialized')
 		if self.enableACPChecks:
@@ -57,6 +176,13 @@ class SecurityManager(object):
 		return True
 
 
+	def restart(self) -> None:
+		"""	Restart the SecurityManager service.
+		"""
+		self._clearACPs()
+		L.isDebug and L.logDebug('SecurityManager restarted')
+
+
 	def hasAccess(self, originator:str, 
 						resource:Resource, 
 						requestedPermission:Permission, 
@@ -171,14 +297,9 @@ class SecurityManager(object):
 				# FALLTHROUGH to the permission checks below
 			
 			else: # handle the permission checks here
-				for a in macp:
-					if not (acp := CSE.dispatcher.retrieveResource(a).resource):
-						L.isDebug and L.logDebug(f'ACP resource not found: {a}')
-						continue
-					else:
-						if acp.checkPermission(originator, requestedPermission, ty):
-							L.isDebug and L.logDebug('Permission granted')
-							return True
+				if self.checkACPs(originator, macp, requestedPermission, ty):
+					L.isDebug and L.logDebug('Permission granted')
+					return True
 				L.isDebug and L.logDebug('Permission NOT granted')
 				return False
 
@@ -233,24 +354,9 @@ class SecurityManager(object):
 			return False
 
 		# Finally check the acpi
-		for a in acpi:
-			if not (acp := CSE.dispatcher.retrieveResource(a).resource):
-				L.isDebug and L.logDebug(f'ACP resource not found: {a}')
-				continue
-			# if checkSelf:	# forced check for self permissions
-			# 	if acp.checkSelfPermission(originator, requestedPermission):
-			# 		L.isDebug and L.logDebug('Permission granted')
-			# 		return True				
-			# else:
-			# 	# L.isWarn and L.logWarn(acp)
-			# 	if acp.checkPermission(originator, requestedPermission, ty):
-			# 		L.isDebug and L.logDebug('Permission granted')
-			# 		return True
-
-			# L.isWarn and L.logWarn(acp)
-			if acp.checkPermission(originator, requestedPermission, ty):
-				L.isDebug and L.logDebug('Permission granted')
-				return True
+		if self.checkACPs(originator, acpi, requestedPermission, ty):
+			L.isDebug and L.logDebug('Permission granted')
+			return True
 
 		# no fitting permission identified
 		L.isDebug and L.logDebug('Permission NOT granted')
@@ -277,13 +383,7 @@ class SecurityManager(object):
 					pass	# allowed for creating originator
 			else:
 				# test the current acpi whether the originator is allowed to update the acpi
-				for ri in targetResource.acpi:
-					if not (acp := CSE.dispatcher.retrieveResource(ri).resource):
-						L.isWarn and L.logWarn(f'Access Check for acpi: referenced <ACP> resource not found: {ri}')
-						continue
-					if acp.checkSelfPermission(originator, Permission.UPDATE):
-						break
-				else:
+				if not self.checkACPs(originator, targetResource.acpi, Permission.UPDATE, selfPermission = True):
 					L.logDebug(dbg := f'Originator: {originator} has no permission to update acpi for: {targetResource.ri}')
 					return Result.errorResult(rsc = RC.originatorHasNoPrivilege, dbg = dbg)
 
@@ -325,6 +425,112 @@ class SecurityManager(object):
 
 
 
+	##########################################################################
+	#
+	#	Compiled ACPs and access decisions
+	#
+
+	def checkACPs(self, originator:str, acpi:list[str], requestedPermission:Permission, ty:T = None, selfPermission:bool = False) -> bool:
+		"""	Check whether any of a list of <ACP> resources grants the requested permission to an originator.
+
+			The <ACP> resources are compiled when they are used for the first time, and the decisions are
+			memoized until any <ACP> resource changes.
+
+			Args:
+				originator: The originator to check for.
+				acpi: List of <ACP> resource IDs.
+				requestedPermission: The permission to check.
+				ty: For CREATE the type of the resource to create, otherwise the type of the target resource.
+				selfPermission: If True then check the *selfPrivileges* instead of the *privileges*.
+			Return:
+				Boolean indicating access.
+		"""
+		key = (originator, tuple(acpi), int(requestedPermission), ty, selfPermission)
+		if self.acpDecisionCacheSize:
+			with self.acpLock:
+				if (decision := self.acpDecisions.get(key)) is not None:
+					self.acpDecisions.move_to_end(key)
+					return decision
+		generation = self.acpGeneration
+
+		decision = False
+		cacheable = True
+		for a in acpi:
+			acp, isLocal = self._getCompiledACP(a)
+			cacheable = cacheable and isLocal
+			if not acp:
+				L.isDebug and L.logDebug(f'ACP resource not found: {a}')
+				continue
+			if acp.checkSelfPermission(originator, requestedPermission) if selfPermission else acp.checkPermission(originator, requestedPermission, ty):
+				decision = True
+				break
+
+		if self.acpDecisionCacheSize and cacheable:
+			with self.acpLock:
+				if generation == self.acpGeneration:	# Don't memoize decisions based on outdated ACPs
+					self.acpDecisions[key] = decision
+					if len(self.acpDecisions) > self.acpDecisionCacheSize:
+						self.acpDecisions.popitem(last = False)
+		return decision
+
+
+	def updateACP(self, acp:Resource) -> None:
+		"""	Compile an <ACP> resource after it was created or updated, and invalidate the memoized decisions.
+
+			Args:
+				acp: The <ACP> resource.
+		"""
+		compiled = CompiledACP.compile(acp)
+		with self.acpLock:
+			self.compiledACPs[acp.ri] = compiled
+			self.acpDecisions.clear()
+			self.acpGeneration += 1
+
+
+	def removeACP(self, ri:str) -> None:
+		"""	Remove a compiled <ACP> resource after it was deleted, and invalidate the memoized decisions.
+
+			Args:
+				ri: The resource ID of the <ACP> resource.
+		"""
+		with self.acpLock:
+			self.compiledACPs.pop(ri, None)
+			self.acpDecisions.clear()
+			self.acpGeneration += 1
+
+
+	def _clearACPs(self) -> None:
+		"""	Remove all compiled <ACP> resources and memoized decisions.
+		"""
+		with self.acpLock:
+			self.compiledACPs.clear()
+			self.acpDecisions.clear()
+			self.acpGeneration += 1
+
+
+	def _getCompiledACP(self, acpi:str) -> Tuple[CompiledACP, bool]:
+		"""	Get the compiled version of an <ACP> resource.
+
+			Args:
+				acpi: The ID of the <ACP> resource.
+			Return:
+				Tuple (compiled ACP or None if the resource doesn't exist, whether the resource is hosted locally
+				and changes to it are therefore tracked).
+		"""
+		if (compiled := self.compiledACPs.get(acpi)):
+			return compiled, True
+		generation = self.acpGeneration
+		if not (acp := CSE.dispatcher.retrieveResource(acpi).resource):
+			return None, '/' not in acpi
+		compiled = CompiledACP.compile(acp)
+		if acp.ty != T.ACP or acp.ri != acpi:	# Only cache local <ACP> resources that are referenced by their resource ID
+			return compiled, False
+		with self.acpLock:
+			if generation == self.acpGeneration:
+				self.compiledACPs[acpi] = compiled
+		return compiled, True
+
+
 	##########################################################################
 	#
 	#	Certificate handling
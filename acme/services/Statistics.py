@@ -8,13 +8,15 @@
 #
 
 from __future__ import annotations
-from typing import Dict, Union, cast
-import datetime
+from typing import Dict, List, Optional, Tuple, Union, cast
+import datetime, math
+from bisect import bisect_left
+from itertools import count
 from urllib.parse import urlparse
 from copy import deepcopy
-from threading import Lock
+from threading import Lock, local
 
-from ..etc.Types import CSEType, ResourceTypes as T
+from ..etc.Types import CSEType, Operation, ResourceTypes as T
 from ..etc import Utils as Utils, DateUtils as DateUtils
 from ..services import CSE as CSE
 from ..services.Configuration import Configuration
@@ -56,7 +58,75 @@ resourceCount		= 'ctRes'
 
 # TODO  restartcount, 
 
+# Measured distributions
+requestLatency			= 'requestLatency'			# Request processing time per operation and binding
+requestLatencyByType	= 'requestLatencyByType'	# Request processing time per operation and resource type
+requestSize				= 'requestSize'				# Request body size per operation and binding
+notificationDelivery	= 'notificationDelivery'	# Time to deliver a notification to a target
+
+# The operations for which requests are measured. Discovery is measured as RETRIEVE
+measuredOperations = {
+	Operation.RETRIEVE	: 'RETRIEVE',
+	Operation.DISCOVERY	: 'RETRIEVE',
+	Operation.CREATE	: 'CREATE',
+	Operation.UPDATE	: 'UPDATE',
+	Operation.DELETE	: 'DELETE',
+	Operation.NOTIFY	: 'NOTIFY',
+}
+
+# Upper bounds of the histogram buckets. Latencies in seconds from 50 µs to about 2 minutes, 
+# with four buckets per doubling, and sizes in bytes from 64 B to 64 MB.
+latencyBuckets	= tuple(0.00005 * 2 ** (i / 4) for i in range(86))
+sizeBuckets		= tuple(float(2 ** i) for i in range(6, 27))
+
+# Number of shards. Threads are assigned to the shards in turn.
+numberOfShards	= 16
+
+# Counters that are exposed as metrics: stats key -> (metric name, labels)
+metricsCounters = {
+	httpRetrieves		: ('acme_requests_received_total', 'binding="http",operation="RETRIEVE"'),
+	httpCreates			: ('acme_requests_received_total', 'binding="http",operation="CREATE"'),
+	httpUpdates			: ('acme_requests_received_total', 'binding="http",operation="UPDATE"'),
+	httpDeletes			: ('acme_requests_received_total', 'binding="http",operation="DELETE"'),
+	httpNotifies		: ('acme_requests_received_total', 'binding="http",operation="NOTIFY"'),
+	mqttRetrieves		: ('acme_requests_received_total', 'binding="mqtt",operation="RETRIEVE"'),
+	mqttCreates			: ('acme_requests_received_total', 'binding="mqtt",operation="CREATE"'),
+	mqttUpdates			: ('acme_requests_received_total', 'binding="mqtt",operation="UPDATE"'),
+	mqttDeletes			: ('acme_requests_received_total', 'binding="mqtt",operation="DELETE"'),
+	mqttNotifies		: ('acme_requests_received_total', 'binding="mqtt",operation="NOTIFY"'),
+	httpSendRetrieves	: ('acme_requests_sent_total', 'binding="http",operation="RETRIEVE"'),
+	httpSendCreates		: ('acme_requests_sent_total', 'binding="http",operation="CREATE"'),
+	httpSendUpdates		: ('acme_requests_sent_total', 'binding="http",operation="UPDATE"'),
+	httpSendDeletes		: ('acme_requests_sent_total', 'binding="http",operation="DELETE"'),
+	httpSendNotifies	: ('acme_requests_sent_total', 'binding="http",operation="NOTIFY"'),
+	mqttSendRetrieves	: ('acme_requests_sent_total', 'binding="mqtt",operation="RETRIEVE"'),
+	mqttSendCreates		: ('acme_requests_sent_total', 'binding="mqtt",operation="CREATE"'),
+	mqttSendUpdates		: ('acme_requests_sent_total', 'binding="mqtt",operation="UPDATE"'),
+	mqttSendDeletes		: ('acme_requests_sent_total', 'binding="mqtt",operation="DELETE"'),
+	mqttSendNotifies	: ('acme_requests_sent_total', 'binding="mqtt",operation="NOTIFY"'),
+	createdResources	: ('acme_resource_operations_total', 'operation="create"'),
+	updatedResources	: ('acme_resource_operations_total', 'operation="update"'),
+	deletedResources	: ('acme_resource_operations_total', 'operation="delete"'),
+	expiredResources	: ('acme_resource_operations_total', 'operation="expire"'),
+	notifications		: ('acme_notifications_total', ''),
+	logErrors			: ('acme_log_messages_total', 'level="error"'),
+	logWarnings			: ('acme_log_messages_total', 'level="warning"'),
+}
+
+# Measured distributions that are exposed as metric histograms: name -> (metric name, label names, bucket bounds)
+# Only every fourth latency bucket is exposed, ie. one per doubling.
+metricsHistograms:Dict[str, Tuple[str, Tuple[str, ...], Tuple[float, ...]]] = {
+	requestLatency			: ('acme_request_duration_seconds', ('operation', 'binding'), latencyBuckets[::4]),
+	requestLatencyByType	: ('acme_request_duration_by_type_seconds', ('operation', 'type'), latencyBuckets[::4]),
+	requestSize				: ('acme_request_size_bytes', ('operation', 'binding'), sizeBuckets),
+	notificationDelivery	: ('acme_notification_delivery_seconds', (), latencyBuckets[::4]),
+}
+
+# Resource types that are counted for the metrics
+metricsResourceTypes = ( T.AE, T.ACP, T.CSEBase, T.CIN, T.CNT, T.CSR, T.FCNT, T.FCI, T.GRP, T.MGMTOBJ, T.NOD, T.PCH, T.REQ, T.SUB, T.TS, T.TSB, T.TSI )
+
 StatsT = Dict[str, Union[str, int, float]]
+HistogramKeyT = Tuple[str, ...]
 
 class Statistics(object):
 
@@ -66,8 +136,20 @@ class Statistics(object):
 		# create lock
 		self.statLock = Lock()
 
+		# Counters and measurements are collected in a fixed number of shards, each with its own lock.
+		# Every thread is assigned to one shard when it first counts something, so that only the few
+		# threads that share a shard synchronize. The shards are merged when the statistics are 
+		# written or retrieved.
+		self._local = local()
+		self._shards:List[StatisticsShard] = []
+		self._shardsLock = Lock()		# Only for resetting and merging shards
+		self._nextShard = count()		# Assigns the shards to the threads in turn
+		self._generation = 0			# Incremented when the statistics are reset
+		self.histograms:Dict[HistogramKeyT, Histogram] = {}
+		self.metrics:bytes = None		# Cached metrics in text exposition format
+
 		# retrieve or create statistics record, even when statistics are disabled
-		self.stats = self.setupStats()
+		self._resetShards()
 
 		if self.statisticsEnabled:
 
@@ -77,44 +159,49 @@ class Statistics(object):
 
 			# subscripe vto various events
 			# mypy cannot handle dynamically created attributes
-			CSE.event.addHandler(CSE.event.createResource, lambda _: self._handleStatsEvent(createdResources)) 	# type: ignore
-			CSE.event.addHandler(CSE.event.updateResource, lambda _: self._handleStatsEvent(updatedResources))	# type: ignore
-			CSE.event.addHandler(CSE.event.deleteResource, lambda _: self._handleStatsEvent(deletedResources))	# type: ignore
-			CSE.event.addHandler(CSE.event.expireResource, lambda _: self._handleStatsEvent(expiredResources))	# type: ignore
-			CSE.event.addHandler(CSE.event.httpRetrieve, lambda: self._handleStatsEvent(httpRetrieves))			# type: ignore
-			CSE.event.addHandler(CSE.event.httpCreate, lambda: self._handleStatsEvent(httpCreates))				# type: ignore
-			CSE.event.addHandler(CSE.event.httpUpdate, lambda: self._handleStatsEvent(httpUpdates))				# type: ignore
-			CSE.event.addHandler(CSE.event.httpDelete, lambda: self._handleStatsEvent(httpDeletes))				# type: ignore
-			CSE.event.addHandler(CSE.event.httpNotify, lambda: self._handleStatsEvent(httpNotifies))			# type: ignore
-			CSE.event.addHandler(CSE.event.httpSendRetrieve, lambda: self._handleStatsEvent(httpSendRetrieves))	# type: ignore
-			CSE.event.addHandler(CSE.event.httpSendCreate, lambda: self._handleStatsEvent(httpSendCreates))		# type: ignore
-			CSE.event.addHandler(CSE.event.httpSendUpdate, lambda: self._handleStatsEvent(httpSendUpdates))		# type: ignore
-			CSE.event.addHandler(CSE.event.httpSendDelete, lambda: self._handleStatsEvent(httpSendDeletes))		# type: ignore
-			CSE.event.addHandler(CSE.event.httpSendNotify, lambda: self._handleStatsEvent(httpSendNotifies))	# type: ignore
-			CSE.event.addHandler(CSE.event.mqttRetrieve, lambda: self._handleStatsEvent(mqttRetrieves))			# type: ignore
-			CSE.event.addHandler(CSE.event.mqttCreate, lambda: self._handleStatsEvent(mqttCreates))				# type: ignore
-			CSE.event.addHandler(CSE.event.mqttUpdate, lambda: self._handleStatsEvent(mqttUpdates))				# type: ignore
-			CSE.event.addHandler(CSE.event.mqttDelete, lambda: self._handleStatsEvent(mqttDeletes))				# type: ignore
-			CSE.event.addHandler(CSE.event.mqttNotify, lambda: self._handleStatsEvent(mqttNotifies))			# type: ignore
-			CSE.event.addHandler(CSE.event.mqttSendRetrieve, lambda: self._handleStatsEvent(mqttSendRetrieves))	# type: ignore
-			CSE.event.addHandler(CSE.event.mqttSendCreate, lambda: self._handleStatsEvent(mqttSendCreates))		# type: ignore
-			CSE.event.addHandler(CSE.event.mqttSendUpdate, lambda: self._handleStatsEvent(mqttSendUpdates))		# type: ignore
-			CSE.event.addHandler(CSE.event.mqttSendDelete, lambda: self._handleStatsEvent(mqttSendDeletes))		# type: ignore
-			CSE.event.addHandler(CSE.event.mqttSendNotify, lambda: self._handleStatsEvent(mqttSendNotifies))	# type: ignore
-			CSE.event.addHandler(CSE.event.notification, lambda: self._handleStatsEvent(notifications))			# type: ignore
+			CSE.event.addHandler(CSE.event.createResource, lambda _: self._handleStatsEvent(createdResources), inline = True) 	# type: ignore
+			CSE.event.addHandler(CSE.event.updateResource, lambda _: self._handleStatsEvent(updatedResources), inline = True)	# type: ignore
+			CSE.event.addHandler(CSE.event.deleteResource, lambda _: self._handleStatsEvent(deletedResources), inline = True)	# type: ignore
+			CSE.event.addHandler(CSE.event.expireResource, lambda _: self._handleStatsEvent(expiredResources), inline = True)	# type: ignore
+			CSE.event.addHandler(CSE.event.httpRetrieve, lambda: self._handleStatsEvent(httpRetrieves), inline = True)			# type: ignore
+			CSE.event.addHandler(CSE.event.httpCreate, lambda: self._handleStatsEvent(httpCreates), inline = True)				# type: ignore
+			CSE.event.addHandler(CSE.event.httpUpdate, lambda: self._handleStatsEvent(httpUpdates), inline = True)				# type: ignore
+			CSE.event.addHandler(CSE.event.httpDelete, lambda: self._handleStatsEvent(httpDeletes), inline = True)				# type: ignore
+			CSE.event.addHandler(CSE.event.httpNotify, lambda: self._handleStatsEvent(httpNotifies), inline = True)			# type: ignore
+			CSE.event.addHandler(CSE.event.httpSendRetrieve, lambda: self._handleStatsEvent(httpSendRetrieves), inline = True)	# type: ignore
+			CSE.event.addHandler(CSE.event.httpSendCreate, lambda: self._handleStatsEvent(httpSendCreates), inline = True)		# type: ignore
+			CSE.event.addHandler(CSE.event.httpSendUpdate, lambda: self._handleStatsEvent(httpSendUpdates), inline = True)		# type: ignore
+			CSE.event.addHandler(CSE.event.httpSendDelete, lambda: self._handleStatsEvent(httpSendDeletes), inline = True)		# type: ignore
+			CSE.event.addHandler(CSE.event.httpSendNotify, lambda: self._handleStatsEvent(httpSendNotifies), inline = True)	# type: ignore
+			CSE.event.addHandler(CSE.event.mqttRetrieve, lambda: self._handleStatsEvent(mqttRetrieves), inline = True)			# type: ignore
+			CSE.event.addHandler(CSE.event.mqttCreate, lambda: self._handleStatsEvent(mqttCreates), inline = True)				# type: ignore
+			CSE.event.addHandler(CSE.event.mqttUpdate, lambda: self._handleStatsEvent(mqttUpdates), inline = True)				# type: ignore
+			CSE.event.addHandler(CSE.event.mqttDelete, lambda: self._handleStatsEvent(mqttDeletes), inline = True)				# type: ignore
+			CSE.event.addHandler(CSE.event.mqttNotify, lambda: self._handleStatsEvent(mqttNotifies), inline = True)			# type: ignore
+			CSE.event.addHandler(CSE.event.mqttSendRetrieve, lambda: self._handleStatsEvent(mqttSendRetrieves), inline = True)	# type: ignore
+			CSE.event.addHandler(CSE.event.mqttSendCreate, lambda: self._handleStatsEvent(mqttSendCreates), inline = True)		# type: ignore
+			CSE.event.addHandler(CSE.event.mqttSendUpdate, lambda: self._handleStatsEvent(mqttSendUpdates), inline = True)		# type: ignore
+			CSE.event.addHandler(CSE.event.mqttSendDelete, lambda: self._handleStatsEvent(mqttSendDeletes), inline = True)		# type: ignore
+			CSE.event.addHandler(CSE.event.mqttSendNotify, lambda: self._handleStatsEvent(mqttSendNotifies), inline = True)	# type: ignore
+			CSE.event.addHandler(CSE.event.notification, lambda: self._handleStatsEvent(notifications), inline = True)			# type: ignore
 			CSE.event.addHandler(CSE.event.cseStartup, self.handleCseStartup)									# type: ignore
-			CSE.event.addHandler(CSE.event.logError, lambda: self._handleStatsEvent(logErrors))					# type: ignore
-			CSE.event.addHandler(CSE.event.logWarning, lambda: self._handleStatsEvent(logWarnings))				# type: ignore
+			CSE.event.addHandler(CSE.event.logError, lambda: self._handleStatsEvent(logErrors), inline = True)					# type: ignore
+			CSE.event.addHandler(CSE.event.logWarning, lambda: self._handleStatsEvent(logWarnings), inline = True)				# type: ignore
 
 			# Also do some internal handling
 			CSE.event.addHandler(CSE.event.cseReset, self.restart)												# type: ignore
 
+		# Regularly update the metrics for the metrics endpoint after the CSE started
+		if Configuration.get('http.enableMetricsEndpoint'):
+			CSE.event.addHandler(CSE.event.cseStartup, self.startMetricsWorker)									# type: ignore
+
 		L.isInfo and L.log('Statistics initialized')
 
 
 	def shutdown(self) -> bool:
 		"""	Shutdown the statistics service.
 		"""
+		BackgroundWorkerPool.stopWorkers('metricsWorker')
 		if self.statisticsEnabled:
 			# Stop the worker
 			L.isInfo and L.log('Stopping statistics DB thread')
@@ -131,7 +218,7 @@ class Statistics(object):
 		"""	Restart the statistics service.
 		"""
 		self.purgeDBStatistics()
-		self.stats = self.setupStats()
+		self._resetShards()
 		self.handleCseStartup()
 		L.isDebug and L.logDebug('Statistics restarted')
 
@@ -173,7 +260,9 @@ class Statistics(object):
 
 	# Return stats
 	def getStats(self) -> StatsT:			
-		s = deepcopy(self.stats)
+		self.mergeShards()
+		with self.statLock:
+			s = deepcopy(self.stats)
 
 		# Calculate some stats
 		# s[cseUpTime] = str(datetime.timedelta(seconds=int(datetime.datetime.now(datetime.timezone.utc).timestamp() - int(s[cseStartUpTime]))))
@@ -189,16 +278,11 @@ class Statistics(object):
 	#
 
 	def _handleStatsEvent(self, eventType:str) -> None:
-		"""	Generic handling of statist events.
+		"""	Generic handling of statist events. The event is counted in the thread's shard.
 		"""
-		try:
-			with self.statLock:
-				self.stats[eventType] += 1		# type: ignore
-		except KeyError:
-			# In case there is a version update and a new event was added,
-			# the we might just add this event as the first entry
-			with self.statLock:
-				self.stats[eventType] = 1		# type: ignore
+		shard = self._shard()
+		with shard.lock:
+			shard.counters[eventType] = shard.counters.get(eventType, 0) + 1
 
 
 	def handleCseStartup(self) -> None:
@@ -209,6 +293,124 @@ class Statistics(object):
 			self.stats[cseStartUpTime] = DateUtils.utcTime()
 
 
+	#########################################################################
+	#
+	#	Metrics
+	#
+
+	def startMetricsWorker(self) -> None:
+		"""	Start the background worker that regularly updates the metrics.
+		"""
+		L.isInfo and L.log('Starting metrics worker')
+		BackgroundWorkerPool.newWorker(Configuration.get('http.metricsInterval'), self.metricsWorker, 'metricsWorker').start()
+
+
+	def metricsWorker(self) -> bool:
+		"""	Update the cached metrics. Called by the background worker.
+		"""
+		try:
+			self.metrics = self.generateMetrics().encode()
+		except Exception as e:
+			L.logErr(f'Error while generating metrics: {str(e)}', exc = e)
+		return True
+
+
+	def getMetrics(self) -> bytes:
+		"""	Return the cached metrics in the Prometheus text exposition format. They are 
+			generated if they are not available yet.
+
+			Return:
+				The metrics as encoded text.
+		"""
+		if (metrics := self.metrics) is None:
+			metrics = self.metrics = self.generateMetrics().encode()
+		return metrics
+
+
+	def generateMetrics(self) -> str:
+		"""	Generate the metrics in the Prometheus text exposition format: request counters and 
+			histograms, resource counts, queue depths, background workers and jobs, the MQTT 
+			connection state, and the logging queue.
+
+			Return:
+				The metrics as text.
+		"""
+		lines:List[str] = []
+
+		def _metric(name:str, metricType:str, help:str, samples:List[Tuple[str, Union[int, float]]]) -> None:
+			lines.append(f'# HELP {name} {help}')
+			lines.append(f'# TYPE {name} {metricType}')
+			for labels, value in samples:
+				lines.append(f'{name}{{{labels}}} {value}' if labels else f'{name} {value}')
+
+		stats = self.getStats()
+
+		# Counters
+		counters:Dict[str, List[Tuple[str, Union[int, float]]]] = {}
+		for key, (name, labels) in metricsCounters.items():
+			counters.setdefault(name, []).append((labels, cast(int, stats.get(key, 0))))
+		_metric('acme_requests_received_total', 'counter', 'Received requests.', counters['acme_requests_received_total'])
+		_metric('acme_requests_sent_total', 'counter', 'Sent requests.', counters['acme_requests_sent_total'])
+		_metric('acme_resource_operations_total', 'counter', 'Resource operations, including virtual resources.', counters['acme_resource_operations_total'])
+		_metric('acme_notifications_total', 'counter', 'Notifications.', counters['acme_notifications_total'])
+		_metric('acme_log_messages_total', 'counter', 'Logged errors and warnings.', counters['acme_log_messages_total'])
+		_metric('acme_start_time_seconds', 'gauge', 'Start time of the CSE since the epoch.', [ ('', float(self.stats[cseStartUpTime])) ])
+
+		# Histograms
+		histograms = self.histograms
+		for measurement, (name, labelNames, bounds) in metricsHistograms.items():
+			lines.append(f'# HELP {name} {"Request body size in bytes." if measurement == requestSize else "Duration in seconds."}')
+			lines.append(f'# TYPE {name} histogram')
+			for histogramKey, histogram in sorted(histograms.items()):
+				if histogramKey[0] != measurement:
+					continue
+				labelValues = list(histogramKey[1:])
+				if measurement == requestLatencyByType and T.has(int(labelValues[1])):
+					labelValues[1] = T(int(labelValues[1])).name
+				labels = ','.join(f'{n}="{v}"' for n, v in zip(labelNames, labelValues))
+				separator = ',' if labels else ''
+				cumulative = histogram.cumulativeCounts(bounds)
+				for bound, count in zip(bounds, cumulative):
+					lines.append(f'{name}_bucket{{{labels}{separator}le="{bound:g}"}} {count}')
+				lines.append(f'{name}_bucket{{{labels}{separator}le="+Inf"}} {histogram.count}')
+				lines.append(f'{name}_sum{{{labels}}} {histogram.sum}' if labels else f'{name}_sum {histogram.sum}')
+				lines.append(f'{name}_count{{{labels}}} {histogram.count}' if labels else f'{name}_count {histogram.count}')
+
+		# Resources
+		_metric('acme_resources', 'gauge', 'Resources in the database.', [ ('', CSE.dispatcher.countResources()) ])
+		_metric('acme_resources_by_type', 'gauge', 'Resources in the database by resource type.', 
+				[ (f'type="{ty.name}"', CSE.dispatcher.countResources(ty)) for ty in metricsResourceTypes ])
+		_metric('acme_subscriptions', 'gauge', 'Subscriptions.', [ ('', len(CSE.storage.subscriptionIndex)) ])
+
+		# Queues
+		_metric('acme_notification_queue_depth', 'gauge', 'Queued notifications of the notification senders.', 
+				[ (f'sender="{i}"', queue.qsize()) for i, queue in enumerate(CSE.notification.senderQueues) ])
+		_metric('acme_log_queue_depth', 'gauge', 'Queued log entries.', [ ('', L.queue.qsize() if L.queue else 0) ])
+		_metric('acme_log_dropped_total', 'counter', 'Log entries that were dropped because the log queue was full.', [ ('', L.droppedRecords) ])
+
+		# Background workers and jobs
+		workers = BackgroundWorkerPool.findWorkers()
+		runningWorkers = len([ w for w in workers if w.running ])
+		_metric('acme_background_workers', 'gauge', 'Background workers and actors.', [ ('state="running"', runningWorkers), ('state="stopped"', len(workers) - runningWorkers) ])
+		runningJobs, pausedJobs = BackgroundWorkerPool.countJobs()
+		_metric('acme_jobs', 'gauge', 'Job threads.', [ ('state="running"', runningJobs), ('state="paused"', pausedJobs) ])
+		queuedWorkers, lagCount, lagSum, lagMax = BackgroundWorkerPool.schedulerStatistics()
+		_metric('acme_scheduler_queued_workers', 'gauge', 'Background workers waiting for their next execution.', [ ('', queuedWorkers) ])
+		lines.append('# HELP acme_scheduler_lag_seconds Time between the scheduled and the actual start of background workers.')
+		lines.append('# TYPE acme_scheduler_lag_seconds summary')
+		lines.append(f'acme_scheduler_lag_seconds_sum {lagSum}')
+		lines.append(f'acme_scheduler_lag_seconds_count {lagCount}')
+		_metric('acme_scheduler_lag_max_seconds', 'gauge', 'Maximum time between the scheduled and the actual start of background workers.', [ ('', lagMax) ])
+
+		# MQTT
+		if CSE.mqttClient and CSE.mqttClient.enable:
+			_metric('acme_mqtt_connected', 'gauge', 'Whether the connection to an MQTT broker is established.', 
+					[ (f'broker="{address}:{port}"', int(bool(connection.isConnected))) for (address, port), connection in list(CSE.mqttClient.mqttConnections.items()) ])
+
+		lines.append('')
+		return '\n'.join(lines)
+
+
 	#########################################################################
 	#
 	#	Store statistics handling
@@ -217,6 +419,7 @@ class Statistics(object):
 	def statisticsDBWorker(self) -> bool:
 		# L.isDebug and L.logDebug('Writing statistics DB')
 		try:
+			self.mergeShards()
 			self.storeDBStatistics()
 		except Exception as e:
 			L.logErr(f'Error while writing statistics DB Exception: {str(e)}', exc = e)
@@ -239,6 +442,114 @@ class Statistics(object):
 		with self.statLock:
 			CSE.storage.purgeStatistics()
 
+
+	#########################################################################
+	#
+	#	Measurements
+	#
+
+	def recordRequest(self, operation:Operation, binding:str, duration:float, size:int = 0, ty:int = None) -> None:
+		"""	Record the processing time and size of a received request.
+
+			Args:
+				operation: The request's operation. Only RETRIEVE, CREATE, UPDATE, DELETE and NOTIFY (and DISCOVERY as RETRIEVE) are recorded.
+				binding: The binding that received the request, e.g. *http* or *mqtt*.
+				duration: Processing time in seconds.
+				size: Size of the request's body in bytes.
+				ty: Optional type of the target or created resource.
+		"""
+		if not self.statisticsEnabled or not (op := measuredOperations.get(operation)):
+			return
+		shard = self._shard()
+		with shard.lock:
+			self._observe(shard.histograms, (requestLatency, op, binding), latencyBuckets, duration)
+			self._observe(shard.histograms, (requestSize, op, binding), sizeBuckets, size)
+			if ty is not None:
+				self._observe(shard.histograms, (requestLatencyByType, op, str(ty)), latencyBuckets, duration)
+
+
+	def recordNotification(self, duration:float) -> None:
+		"""	Record the time to deliver a notification to a target.
+
+			Args:
+				duration: Delivery time in seconds.
+		"""
+		if self.statisticsEnabled:
+			shard = self._shard()
+			with shard.lock:
+				self._observe(shard.histograms, (notificationDelivery,), latencyBuckets, duration)
+
+
+	def getMeasurements(self) -> Dict[str, Dict[str, Dict[str, Union[int, float]]]]:
+		"""	Return summaries of the measured distributions. Latencies are in milliseconds, sizes in bytes.
+
+			Return:
+				Dictionary with the measured distribution names as keys. Each value is a dictionary with 
+				labels like *RETRIEVE/http* or *CREATE/CNT* as keys and the summaries as values. Each
+				summary contains the number of measurements, and the mean, p50, p95 and p99 values.
+		"""
+		self.mergeShards()
+		result:Dict[str, Dict[str, Dict[str, Union[int, float]]]] = {}
+		for key, histogram in sorted(self.histograms.items()):
+			name, labels = key[0], list(key[1:])
+			if name == requestLatencyByType:
+				labels[1] = T(int(labels[1])).name if T.has(int(labels[1])) else labels[1]
+			result.setdefault(name, {})['/'.join(labels) or 'all'] = histogram.summary(1000.0 if name != requestSize else 1.0)
+		return result
+
+
+	def mergeShards(self) -> None:
+		"""	Merge the counters and measurements of all shards with the base values.
+		
+			Each shard is only locked while it is copied.
+		"""
+		with self._shardsLock:
+			counters = dict(self._baseCounters)
+			histograms:Dict[HistogramKeyT, Histogram] = {}
+			for shard in self._shards:
+				with shard.lock:
+					for name, value in shard.counters.items():
+						counters[name] = counters.get(name, 0) + value
+					for key, histogram in shard.histograms.items():
+						if (merged := histograms.get(key)) is None:
+							merged = histograms[key] = Histogram(histogram.bounds)
+						merged.merge(histogram)
+
+			with self.statLock:
+				self.stats.update(counters)
+			self.histograms = histograms
+
+
+	def _shard(self) -> StatisticsShard:
+		"""	Return the current thread's shard. Assign the next shard if necessary.
+
+			Return:
+				The thread's shard.
+		"""
+		if (shard := getattr(self._local, 'shard', None)) is None or shard.generation != self._generation:
+			shard = self._shards[next(self._nextShard) % numberOfShards]
+			self._local.shard = shard
+		return shard
+
+
+	def _resetShards(self) -> None:
+		"""	Retrieve or create the statistics record, replace the shards with empty ones, and start new 
+			base values from the statistics record.
+		"""
+		with self._shardsLock:
+			self.stats = self.setupStats()
+			self._generation += 1
+			self._shards = [ StatisticsShard(self._generation) for _ in range(numberOfShards) ]
+			self._baseCounters:Dict[str, int] = { name: cast(int, value) for name, value in self.stats.items() if name != cseStartUpTime }
+			self.histograms = {}
+
+
+	@staticmethod
+	def _observe(histograms:Dict[HistogramKeyT, Histogram], key:HistogramKeyT, bounds:Tuple[float, ...], value:float) -> None:
+		if (histogram := histograms.get(key)) is None:
+			histogram = histograms[key] = Histogram(bounds)
+		histogram.observe(value)
+
 	
 	#########################################################################
 	#
@@ -341,3 +652,127 @@ skinparam rectangle {
 		# end
 		result += '@enduml'
 		return result
+
+
+#########################################################################
+#
+#	Shards and histograms
+#
+
+class Histogram(object):
+	"""	A histogram with fixed bucket bounds. Percentiles are interpolated within the buckets
+		and limited to the smallest and largest values.
+	"""
+	__slots__ = ('bounds', 'buckets', 'count', 'sum', 'min', 'max')
+
+	def __init__(self, bounds:Tuple[float, ...]) -> None:
+		"""	Initialize an empty histogram.
+
+			Args:
+				bounds: Sorted upper bounds of the buckets. Larger values are counted in an additional bucket.
+		"""
+		self.bounds = bounds
+		self.buckets = [0] * (len(bounds) + 1)
+		self.count = 0
+		self.sum = 0.0
+		self.min = math.inf
+		self.max = -math.inf
+
+
+	def observe(self, value:float) -> None:
+		"""	Add a value.
+
+			Args:
+				value: The value to add.
+		"""
+		self.buckets[bisect_left(self.bounds, value)] += 1
+		self.count += 1
+		self.sum += value
+		if value < self.min:
+			self.min = value
+		if value > self.max:
+			self.max = value
+
+
+	def merge(self, other:Histogram) -> None:
+		"""	Add the values of another histogram with the same bounds.
+
+			Args:
+				other: The other histogram.
+		"""
+		for i, count in enumerate(list(other.buckets)):
+			self.buckets[i] += count
+		self.count += other.count
+		self.sum += other.sum
+		self.min = min(self.min, other.min)
+		self.max = max(self.max, other.max)
+
+
+	def cumulativeCounts(self, bounds:Tuple[float, ...]) -> List[int]:
+		"""	Return the number of values that are less than or equal to each of the given bounds.
+
+			Args:
+				bounds: Sorted subset of the histogram's bucket bounds.
+			Return:
+				List with a cumulative count for each bound.
+		"""
+		result = []
+		cumulative = 0
+		i = 0
+		for bound in bounds:
+			while i < len(self.bounds) and self.bounds[i] <= bound:
+				cumulative += self.buckets[i]
+				i += 1
+			result.append(cumulative)
+		return result
+
+
+	def percentile(self, p:float) -> float:
+		"""	Estimate a percentile.
+
+			Args:
+				p: The percentile, between 0 and 100.
+			Return:
+				The estimated value, or 0.0 if the histogram is empty.
+		"""
+		if not (total := sum(self.buckets)):
+			return 0.0
+		rank = p / 100.0 * total
+		cumulative = 0
+		for i, count in enumerate(self.buckets):
+			if count and cumulative + count >= rank:
+				lower = max(self.bounds[i - 1] if i > 0 else 0.0, self.min)
+				upper = min(self.bounds[i] if i < len(self.bounds) else self.max, self.max)
+				return lower + (upper - lower) * (rank - cumulative) / count
+			cumulative += count
+		return self.max
+
+
+	def summary(self, scale:float = 1.0) -> Dict[str, Union[int, float]]:
+		"""	Return the number of values, and the mean and the p50, p95 and p99 percentiles.
+
+			Args:
+				scale: Factor for the values, e.g. 1000.0 to convert seconds to milliseconds.
+			Return:
+				Dictionary with the summary.
+		"""
+		return {
+			'count'	: self.count,
+			'mean'	: round(self.sum / self.count * scale, 3) if self.count else 0.0,
+			'p50'	: round(self.percentile(50) * scale, 3),
+			'p95'	: round(self.percentile(95) * scale, 3),
+			'p99'	: round(self.percentile(99) * scale, 3),
+		}
+
+
+class StatisticsShard(object):
+	"""	The counters and histograms of the threads that are assigned to a shard. They must only be
+		accessed while holding the shard's lock.
+	"""
+	__slots__ = ('lock', 'generation', 'counters', 'histograms')
+
+	def __init__(self, generation:int) -> None:
+		self.lock = Lock()
+		self.generation = generation
+		self.counters:Dict[str, int] = {}
+		self.histograms:Dict[HistogramKeyT, Histogram] = {}
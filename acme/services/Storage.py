@@ -4,19 +4,23 @@
 #	(c) 2020 by Andreas Kraft
 #	License: BSD 3-Clause License. See the LICENSE file for further details.
 #
-#	Store, retrieve and manage resources in the database. It currently relies on
-#	the document database TinyDB. It is possible to store resources either on disc
-#	or just in memory.
+#	Store, retrieve and manage resources in the database. It relies either on
+#	the document database TinyDB or on SQLite. It is possible to store resources 
+#	either on disc or just in memory.
 #
 
 from __future__ import annotations
 
-import os, shutil
+import os, shutil, json, sqlite3, bisect, heapq
+from contextlib import contextmanager
+from itertools import count
+from collections import OrderedDict
+from copy import deepcopy
 from threading import Lock
-from typing import Callable, cast, List
+from typing import Any, Callable, cast, Iterable, Iterator, List, TextIO, Tuple
 from tinydb import TinyDB, Query
 from tinydb.storages import MemoryStorage
-from tinydb.table import Document
+from tinydb.table import Document, Table
 from tinydb.operations import delete 
 
 from ..etc.Types import ResourceTypes as T, Result, ResponseStatusCode as RC, JSON
@@ -26,6 +30,7 @@ from ..services.Logging import Logging as L
 from ..services import CSE as CSE
 from ..resources.Resource import Resource
 from ..resources import Factory
+from ..helpers.BackgroundWorker import BackgroundWorkerPool
 
 
 class Storage(object):
@@ -36,6 +41,7 @@ class Storage(object):
 		self.inMemory 	= Configuration.get('db.inMemory')
 		self.dbPath 	= Configuration.get('db.path')
 		self.dbReset 	= Configuration.get('db.resetOnStartup') 
+		self.dbBackend	= Configuration.get('db.backend')
 
 		if not self.inMemory:
 			if self.dbPath:
@@ -46,7 +52,34 @@ class Storage(object):
 				raise RuntimeError('db.path not set')
 
 		# create DB object and open DB
-		self.db = TinyDBBinding(self.dbPath, postfix = f'-{CSE.cseCsi[1:]}') # add CSE CSI as postfix
+		postfix = f'-{CSE.cseCsi[1:]}'	# add CSE CSI as postfix
+		self.db:TinyDBBinding|SQLiteBinding = None
+		if self.dbBackend == 'sqlite':
+			self.db = SQLiteBinding(self.dbPath, postfix = postfix)
+			if Configuration.get('db.migrate') and not self.db.migrateFromTinyDB(self.dbPath, postfix = postfix):
+				raise RuntimeError('DB migration error. Please check the TinyDB database files.')
+		else:
+			self.db = TinyDBBinding(self.dbPath, postfix = postfix)
+		
+		# Ordered index for the instance resources (<cin>, <fci>, <tsi>) of their parents
+		self.instanceIndex = InstanceIndex()
+
+		# Index of the expiration timestamps of all resources.
+		# The expiration handler is called when a resource expires earlier than all other resources.
+		self.expirationIndex = ExpirationIndex()
+		self.expirationHandler:Callable[[str], None] = None
+
+		# Index of the subscriptions by parent resource and notification event type
+		self.subscriptionIndex = SubscriptionIndex()
+
+		# Inverted index of the resource labels
+		self.labelIndex = LabelIndex()
+
+		# Cache for the lookups of resource IDs and structured resource names
+		self.identifierCache = IdentifierCache(Configuration.get('db.identifierCacheSize'))
+
+		# Cache for resource instances
+		self.resourceCache = ResourceCache(Configuration.get('db.resourceCacheSize'), Configuration.get('db.resourceCacheTypeSizes'))
 
 		# Reset dbs?
 		if self.dbReset:
@@ -60,6 +93,9 @@ class Storage(object):
 		# Make backup *after* validation, only when *not* reset
 		if not self.inMemory and not self.dbReset and not self._backupDB():
 			raise RuntimeError('DB Error')
+		
+		# Build the instance, expiration and subscription indexes from the already stored resources
+		self._rebuildIndexes()
 
 		L.isInfo and L.log('Storage initialized')
 
@@ -76,6 +112,12 @@ class Storage(object):
 		"""
 		try:
 			self.db.purgeDB()
+			self.instanceIndex.clear()
+			self.expirationIndex.clear()
+			self.subscriptionIndex.clear()
+			self.labelIndex.clear()
+			self.identifierCache.clear()
+			self.resourceCache.clear()
 		except Exception as e:
 			L.logErr(f'Exception during purge: {e}', exc=e)
 			quit()
@@ -92,7 +134,7 @@ class Storage(object):
 			dbFile = 'identifiers'
 			self.structuredIdentifier('_')
 			dbFile = 'subscription'
-			self.getSubscription('_')
+			self.db.searchSubscriptions(ri = '_')
 			dbFile = 'batch notification'
 			self.countBatchNotifications('_', '_')
 			dbFile = 'statistics'
@@ -110,6 +152,30 @@ class Storage(object):
 		L.isDebug and L.logDebug(f'Creating DB backup in directory: {dir}')
 		os.makedirs(dir, exist_ok = True)
 		return self.db.backupDB(dir)
+
+
+	def _rebuildIndexes(self) -> None:
+		"""	Rebuild the instance, expiration and label indexes in a single pass over all resources in the database,
+			and the subscription index from the stored subscriptions.
+		"""
+		self.instanceIndex.clear()
+		self.expirationIndex.clear()
+		self.subscriptionIndex.clear()
+		self.labelIndex.clear()
+
+		def _index(doc:JSON) -> bool:
+			if T.isInstanceResource(doc['ty']):
+				self.instanceIndex.add(doc['pi'], doc['ty'], doc['ct'], doc['ri'], doc.get('cs'))
+			if et := doc.get('et'):
+				self.expirationIndex.add(doc['ri'], et)
+			if lbl := doc.get('lbl'):
+				self.labelIndex.add(doc['ri'], lbl)
+			return False	# Don't collect the resource
+		
+		self.db.discoverResourcesByFilter(_index)
+		for subscription in self.db.searchSubscriptions():
+			self.subscriptionIndex.add(subscription)
+		L.isDebug and L.logDebug(f'Rebuilt indexes ({len(self.instanceIndex)} instances, {len(self.expirationIndex)} expirations, {len(self.subscriptionIndex)} subscriptions, {len(self.labelIndex)} labels)')
 		
 
 	#########################################################################
@@ -125,38 +191,81 @@ class Storage(object):
 		if overwrite:
 			L.isDebug and L.logDebug('Resource enforced overwrite')
 			self.db.upsertResource(resource)
+			self.resourceCache.invalidate(ri)
 		else: 
 			if not self.hasResource(ri, srn):	# Only when not resource does not exist yet
 				self.db.insertResource(resource)
 			else:
 				L.isWarn and L.logWarn(f'Resource already exists (Skipping): {resource} ri: {ri} srn:{srn}')
 				return Result.errorResult(rsc = RC.conflict, dbg = 'resource already exists')
+		
+		# Add instance resources to the ordered instance index
+		if T.isInstanceResource(resource.ty):
+			self.instanceIndex.add(resource.pi, resource.ty, resource.ct, ri, resource.cs)
+		self._indexExpiration(resource)
+		self.labelIndex.add(ri, resource.lbl)
 
 		# Add path to identifiers db
 		self.db.insertIdentifier(resource, ri, srn)
+		self.identifierCache.remove(ri, srn)
+		return Result(status = True, rsc = RC.created)
+
+
+	def createResources(self, resources:list[Resource]) -> Result:
+		"""	Add multiple new resources to the database in a single transaction, e.g. for a bulk CREATE request.
+
+			The resources must not exist in the database yet, and their structured resource names must be set.
+			Attributes with a None value are removed from the resources before they are stored.
+
+			Args:
+				resources: List of new resources.
+			Return:
+				Result object.
+		"""
+		for resource in resources:
+			for k in [ k for k, v in resource.dict.items() if v is None ]:	# only remove the real None attributes, not those with 0
+				del resource.dict[k]
+		try:
+			self.db.insertResources(resources)
+		except Exception as e:
+			L.logErr(dbg := f'Error storing resources: {e}', exc = e)
+			return Result.errorResult(rsc = RC.internalServerError, dbg = dbg)
+		for resource in resources:
+			self.identifierCache.remove(resource.ri, resource.__srn__)
+			if T.isInstanceResource(resource.ty):
+				self.instanceIndex.add(resource.pi, resource.ty, resource.ct, resource.ri, resource.cs)
+			self._indexExpiration(resource)
+			self.labelIndex.add(resource.ri, resource.lbl)
 		return Result(status = True, rsc = RC.created)
 
 
 	def hasResource(self, ri:str = None, srn:str = None) -> bool:
 		"""	Check whether a resource with either the ri or the srn already exists.
 		"""
-		return (ri is not None and self.db.hasResource(ri = ri)) or (srn is not None and self.db.hasResource(srn = srn))
+		return (ri is not None and self.db.hasResource(ri = ri)) or (srn is not None and len(ids := self.structuredIdentifier(srn)) == 1 and self.db.hasResource(ri = ids[0]['ri']))
 
 
 	def retrieveResource(self, ri:str = None, csi:str = None, srn:str = None, aei:str = None, raw:bool = False) -> Result:
 		""" Return a resource via different addressing methods. 
 		"""
 		resources = []
+		generation:int = None
+
+		if srn and not ri:	# get a resource by its structured rn
+			# L.logDebug(f'Retrieving resource srn: {srn}')
+			# get the ri via the srn from the identifers table
+			if len(ids := self.structuredIdentifier(srn)) != 1:
+				return Result.errorResult(rsc = RC.notFound, dbg = 'resource not found')
+			ri = ids[0]['ri']
 
 		if ri:		# get a resource by its ri
 			# L.logDebug(f'Retrieving resource ri: {ri}')
+			if not raw:
+				if (resource := self.resourceCache.get(ri)):
+					return Result(status = True, rsc = RC.OK, resource = resource)
+				generation = self.resourceCache.generation()	# before reading from the DB
 			resources = self.db.searchResources(ri = ri)
 
-		elif srn:	# get a resource by its structured rn
-			# L.logDebug(f'Retrieving resource srn: {srn}')
-			# get the ri via the srn from the identifers table
-			resources = self.db.searchResources(srn = srn)
-
 		elif csi:	# get the CSE by its csi
 			# L.logDebug(f'Retrieving resource csi: {csi}')
 			resources = self.db.searchResources(csi = csi)
@@ -167,7 +276,11 @@ class Storage(object):
 		# L.logDebug(resources)
 		# return CSE.dispatcher.resourceFromDict(resources[0]) if len(resources) == 1 else None,
 		if (l := len(resources)) == 1:
-			return Result(status = True, resource = resources[0]) if raw else Factory.resourceFromDict(resources[0])
+			if raw:
+				return Result(status = True, resource = resources[0])
+			if (res := Factory.resourceFromDict(resources[0])).resource and generation is not None:
+				self.resourceCache.add(res.resource, generation)
+			return res
 		elif l == 0:
 			return Result.errorResult(rsc = RC.notFound, dbg = 'resource not found')
 
@@ -181,16 +294,52 @@ class Storage(object):
 		return self.db.searchResources(ty = int(ty))
 
 
+	def retrieveResourcesByLabels(self, labels:list[str], matchAll:bool = False) -> list[Document]:
+		"""	Return all resources that have some or all of a list of labels.
+
+			Args:
+				labels: List of labels.
+				matchAll: If True then the resources must have all the labels, otherwise at least one of them.
+			Return:
+				List of resource documents.
+		"""
+		return self.db.searchResourcesByIDs(self.labelIndex.lookup(labels, matchAll))
+
+
+	def resourceIDsByLabels(self, labels:list[str], matchAll:bool = False) -> set[str]:
+		"""	Return the resource IDs of all resources that have some or all of a list of labels.
+
+			Args:
+				labels: List of labels.
+				matchAll: If True then the resources must have all the labels, otherwise at least one of them.
+			Return:
+				Set of resource IDs.
+		"""
+		return self.labelIndex.lookup(labels, matchAll)
+
+
 	def updateResource(self, resource:Resource) -> Result:
 		# ri = resource.ri
 		# L.logDebug(f'Updating resource (ty: {resource.ty}, ri: {ri}, rn: {resource.rn})')
-		return Result(status = True, resource = self.db.updateResource(resource), rsc = RC.updated)
+		resource = self.db.updateResource(resource)
+		self.resourceCache.invalidate(resource.ri)
+		if T.isInstanceResource(resource.ty):
+			self.instanceIndex.updateSize(resource.ri, resource.cs)
+		self._indexExpiration(resource)
+		self.labelIndex.add(resource.ri, resource.lbl)
+		return Result(status = True, resource = resource, rsc = RC.updated)
 
 
 	def deleteResource(self, resource:Resource) -> Result:
 		# L.logDebug(f'Removing resource (ty: {resource.ty}, ri: {ri}, rn: {resource.rn})'
 		self.db.deleteResource(resource)
+		self.resourceCache.invalidate(resource.ri)
 		self.db.deleteIdentifier(resource)
+		self.identifierCache.remove(resource.ri, resource.__srn__, subtree = True)
+		if T.isInstanceResource(resource.ty):
+			self.instanceIndex.remove(resource.ri)
+		self.expirationIndex.remove(resource.ri)
+		self.labelIndex.remove(resource.ri)
 		return Result(status = True, rsc = RC.deleted)
 
 
@@ -211,8 +360,133 @@ class Storage(object):
 		return len(self.db.searchResources(pi = pi, ty = int(ty) if ty is not None else None))
 
 
-	def countResources(self) -> int:
-		return self.db.countResources()
+	def countResources(self, ty:T = None) -> int:
+		"""	Count the resources, optionally only those of a type. 
+			This doesn't retrieve the resources.
+
+			Args:
+				ty: Optional resource type to count.
+			Return:
+				Number of resources.
+		"""
+		return self.db.countResources(int(ty) if ty is not None else None)
+
+
+	def _indexExpiration(self, resource:Resource) -> None:
+		"""	Add or update the expiration timestamp of a resource in the expiration index.
+			The expiration handler is called if the resource is now the next one to expire.
+
+			Args:
+				resource: The created or updated resource.
+		"""
+		if (et := resource.et) is None:
+			self.expirationIndex.remove(resource.ri)
+		elif self.expirationIndex.add(resource.ri, et) and self.expirationHandler:
+			self.expirationHandler(et)
+
+
+	def nextExpiration(self) -> str:
+		"""	Return the earliest expiration timestamp of all resources.
+
+			Return:
+				ISO 8601 timestamp, or None if no resource has an expiration timestamp.
+		"""
+		return self.expirationIndex.next()
+
+
+	def expiredResources(self, now:str, limit:int = None) -> list[str]:
+		"""	Return the resource IDs of resources that have expired, and remove them from the expiration index.
+
+			Args:
+				now: ISO 8601 timestamp. Resources with an expiration timestamp before this time are returned.
+				limit: Optional maximum number of resource IDs to return.
+			Return:
+				List of resource IDs, earliest expiration first.
+		"""
+		return self.expirationIndex.due(now, limit)
+
+
+	def postponeExpiration(self, ri:str, et:str) -> None:
+		"""	Add a resource to the expiration index again after it was returned by `expiredResources()`, 
+			e.g. because it could not be removed. The expiration timestamp of the resource itself is
+			not changed.
+
+			Args:
+				ri: Resource ID of the resource.
+				et: ISO 8601 timestamp when the resource should be expired again.
+		"""
+		self.expirationIndex.add(ri, et)
+
+
+	def retrieveLatestOldestInstance(self, pi:str, ty:T, oldest:bool = False) -> Result:
+		"""	Return the latest or oldest instance resource (ie. <cin>, <fci> or <tsi>) of a parent resource.
+
+			Args:
+				pi: Resource ID of the parent resource.
+				ty: Type of the instance resource.
+				oldest: Return the oldest instance instead of the latest one.
+			Return:
+				Result object with the resource, or an error result if the parent has no instance of that type.
+		"""
+		if (ri := self.instanceIndex.latestOldest(pi, ty, oldest)) is None:
+			return Result.errorResult(rsc = RC.notFound, dbg = 'no instance resource found')
+		return self.retrieveResource(ri = ri)
+
+
+	def instanceIdentifiers(self, pi:str, ty:T) -> list[str]:
+		"""	Return the resource IDs of all instance resources of a parent resource, sorted by their creation time.
+
+			Args:
+				pi: Resource ID of the parent resource.
+				ty: Type of the instance resources.
+			Return:
+				List of resource IDs, oldest first. The list may be empty.
+		"""
+		return self.instanceIndex.instances(pi, ty)
+
+
+	def instanceCounters(self, pi:str, ty:T) -> Tuple[int, int]:
+		"""	Return the number of instance resources of a parent resource and the sum of their content sizes.
+
+			The values are maintained while instances are created and deleted, so this method doesn't access the database.
+
+			Args:
+				pi: Resource ID of the parent resource.
+				ty: Type of the instance resources.
+			Return:
+				Tuple (number of instances, sum of content sizes), ie. the *cni* and *cbs* values of the parent resource.
+		"""
+		return self.instanceIndex.counters(pi, ty)
+
+
+	def rebuildInstanceCounters(self, pi:str = None) -> int:
+		"""	Rebuild the instance index, and with it the *cni* and *cbs* counters, from the instance resources
+			that are stored in the database. 
+			
+			Otherwise the counters are only rebuilt during startup, and afterwards maintained while instances 
+			are created, updated and deleted. This method is used for an explicit consistency check. Instances
+			that are created or deleted during the rebuild might not be counted correctly.
+
+			Args:
+				pi: Resource ID of a parent resource. If None then the counters of all parent resources are rebuilt.
+			Return:
+				The number of indexed instance resources.
+		"""
+		instances:list[Tuple[str, int, str, str, int]] = []
+
+		def _collect(doc:JSON) -> bool:
+			if T.isInstanceResource(doc['ty']) and (pi is None or doc['pi'] == pi):
+				instances.append((doc['pi'], doc['ty'], doc['ct'], doc['ri'], doc.get('cs')))
+			return False	# Don't collect the resource
+
+		if pi:
+			for doc in self.db.searchResources(pi = pi):
+				_collect(doc)
+		else:
+			self.db.discoverResourcesByFilter(_collect)
+		self.instanceIndex.rebuild(instances, pi)
+		L.isDebug and L.logDebug(f'Rebuilt instance counters for {pi if pi else "all resources"} ({len(instances)} instances)')
+		return len(instances)
 
 
 	def identifier(self, ri:str) -> list[Document]:
@@ -223,11 +497,46 @@ class Storage(object):
 			Return:
 				List of found resources, or an empty list
 		"""
-		return self.db.searchIdentifiers(ri = ri)
+		if (doc := self.identifierCache.byRI(ri)) is not None:
+			return [ doc ]
+		generation = self.identifierCache.generation()	# before reading from the DB
+		if len(docs := self.db.searchIdentifiers(ri = ri)) == 1:
+			self.identifierCache.add(docs[0], generation)
+		return docs
 
 
 	def structuredIdentifier(self, srn:str) -> list[Document]:
-		return self.db.searchIdentifiers(srn = srn)
+		"""	Search for the resource with the given structured resource name.
+
+			Args:
+				srn: Structured resource name for the resource to look for
+			Return:
+				List of found resources, or an empty list
+		"""
+		if (doc := self.identifierCache.bySRN(srn)) is not None:
+			return [ doc ]
+		generation = self.identifierCache.generation()	# before reading from the DB
+		if len(docs := self.db.searchIdentifiers(srn = srn)) == 1:
+			self.identifierCache.add(docs[0], generation)
+		return docs
+
+
+	def identifierCacheStatistics(self) -> Tuple[int, int, int]:
+		"""	Return the statistics of the identifier cache.
+
+			Return:
+				Tuple (number of cached identifiers, hits, misses).
+		"""
+		return (len(self.identifierCache), self.identifierCache.hits, self.identifierCache.misses)
+
+
+	def resourceCacheStatistics(self) -> Tuple[int, int, int]:
+		"""	Return the statistics of the resource cache.
+
+			Return:
+				Tuple (number of cached resources, hits, misses).
+		"""
+		return (len(self.resourceCache), self.resourceCache.hits, self.resourceCache.misses)
 
 
 	def searchByFragment(self, dct:dict, filter:Callable[[JSON], bool] = None) -> list[Resource]:
@@ -252,31 +561,47 @@ class Storage(object):
 	##
 
 	def getSubscription(self, ri:str) -> JSON:
+		"""	Return a subscription from the subscription index.
+
+			Args:
+				ri: Resource ID of the subscription.
+			Return:
+				The subscription document, or None. Its *chty* and *atr* attributes are sets. The document must not be changed.
+		"""
 		# L.logDebug(f'Retrieving subscription: {ri}')
-		subs = self.db.searchSubscriptions(ri = ri)
-		if not subs or len(subs) != 1:
-			return None
-		return subs[0]
+		return self.subscriptionIndex.get(ri)
 
 
-	def getSubscriptionsForParent(self, pi:str) -> list[Document]:
+	def getSubscriptionsForParent(self, pi:str, net:int = None) -> list[JSON]:
+		"""	Return the subscriptions of a parent resource from the subscription index.
+
+			Args:
+				pi: Resource ID of the parent resource.
+				net: Optional notification event type. If given then only the subscriptions that include this event type are returned.
+			Return:
+				List of subscription documents. Their *chty* and *atr* attributes are sets. The list must not be changed.
+		"""
 		# L.logDebug(f'Retrieving subscriptions for parent: {pi}')
-		return self.db.searchSubscriptions(pi = pi)
+		return self.subscriptionIndex.forParent(pi, net)
 
 
 	def addSubscription(self, subscription:Resource) -> bool:
 		# L.logDebug(f'Adding subscription: {ri}')
-		return self.db.upsertSubscription(subscription)
+		return self.updateSubscription(subscription)
 
 
 	def removeSubscription(self, subscription:Resource) -> bool:
 		# L.logDebug(f'Removing subscription: {subscription.ri}')
+		self.subscriptionIndex.remove(subscription.ri)
 		return self.db.removeSubscription(subscription)
 
 
 	def updateSubscription(self, subscription:Resource) -> bool:
 		# L.logDebug(f'Updating subscription: {ri}')
-		return self.db.upsertSubscription(subscription)
+		if not (doc := self.db.upsertSubscription(subscription)):
+			return False
+		self.subscriptionIndex.add(doc)
+		return True
 
 
 	#########################################################################
@@ -326,204 +651,1985 @@ class Storage(object):
 
 #########################################################################
 #
-#	DB class that implements the TinyDB binding
+#	Ordered index for instance resources
 #
-#	This class may be moved later to an own module.
 
+class InstanceIndex(object):
+	"""	In-memory index of the instance resources (ie. <cin>, <fci>, <tsi>) of their parent resources.
 
-class TinyDBBinding(object):
+		For every parent and instance type the resource IDs of the instances are kept in a list
+		that is sorted by the instances' creation time. This allows to determine the latest and 
+		oldest instance of a parent, as well as all instances in creation order, without
+		searching the database.
+		
+		Instances with the same creation time are ordered by the sequence in which they were added.
 
-	def __init__(self, path:str = None, postfix:str = '') -> None:
-		self.path = path
-		self.cacheSize = Configuration.get('db.cacheSize')
-		L.isInfo and L.log(f'Cache Size: {self.cacheSize:d}')
+		In addition, the sum of the content sizes of the instances is maintained for every parent and
+		instance type. Together with the number of instances this provides the *cni* and *cbs* values
+		of the parent resources.
+	"""
 
-		# create transaction locks
-		self.lockResources				= Lock()
-		self.lockIdentifiers			= Lock()
-		self.lockSubscriptions			= Lock()
-		self.lockBatchNotifications		= Lock()
-		self.lockStatistics 			= Lock()
+	def __init__(self) -> None:
+		self.parents:dict[Tuple[str, int], list[Tuple[str, int, str]]] = {}	# (pi, ty) -> sorted list of (ct, sequence, ri)
+		self.sizes:dict[Tuple[str, int], int] = {}								# (pi, ty) -> sum of content sizes
+		self.entries:dict[str, Tuple[Tuple[str, int], Tuple[str, int, str], int]] = {}	# ri -> (key, entry, content size)
+		self.sequence = count()
+		self.lock = Lock()
 
-		# file names
-		self.fileResources				= f'{self.path}/resources{postfix}.json'
-		self.fileIdentifiers			= f'{self.path}/identifiers{postfix}.json'
-		self.fileSubscriptions			= f'{self.path}/subscriptions{postfix}.json'
-		self.fileBatchNotifications		= f'{self.path}/batchNotifications{postfix}.json'
-		self.fileStatistics				= f'{self.path}/statistics{postfix}.json'
 
-		# All databases/tables will use the smart query cache
-		if Configuration.get('db.inMemory'):
-			L.isInfo and L.log('DB in memory')
-			self.dbResources 			= TinyDB(storage = MemoryStorage)
-			self.dbIdentifiers 			= TinyDB(storage = MemoryStorage)
-			self.dbSubscriptions 		= TinyDB(storage = MemoryStorage)
-			self.dbBatchNotifications	= TinyDB(storage = MemoryStorage)
-			self.dbStatistics			= TinyDB(storage = MemoryStorage)
-		else:
-			L.isInfo and L.log('DB in file system')
-			self.dbResources 			= TinyDB(self.fileResources)
-			self.dbIdentifiers 			= TinyDB(self.fileIdentifiers)
-			self.dbSubscriptions 		= TinyDB(self.fileSubscriptions)
-			self.dbBatchNotifications 	= TinyDB(self.fileBatchNotifications)
-			self.dbStatistics 			= TinyDB(self.fileStatistics)
-		
-		# Open/Create tables
-		self.tabResources 				= self.dbResources.table('resources', cache_size = self.cacheSize)
-		self.tabIdentifiers 			= self.dbIdentifiers.table('identifiers', cache_size = self.cacheSize)
-		self.tabSubscriptions 			= self.dbSubscriptions.table('subsriptions', cache_size = self.cacheSize)
-		self.tabBatchNotifications 		= self.dbBatchNotifications.table('batchNotifications', cache_size = self.cacheSize)
-		self.tabStatistics 				= self.dbStatistics.table('statistics', cache_size = self.cacheSize)
+	def __len__(self) -> int:
+		return len(self.entries)
 
-		# Create the Queries
-		self.resourceQuery 				= Query()
-		self.identifierQuery 			= Query()
-		self.subscriptionQuery			= Query()
-		self.batchNotificationQuery 	= Query()
 
+	def clear(self) -> None:
+		"""	Remove all entries from the index.
+		"""
+		with self.lock:
+			self.parents.clear()
+			self.sizes.clear()
+			self.entries.clear()
 
-	def closeDB(self) -> None:
-		L.isInfo and L.log('Closing DBs')
-		with self.lockResources:
-			self.dbResources.close()
-		with self.lockIdentifiers:
-			self.dbIdentifiers.close()
-		with self.lockSubscriptions:
-			self.dbSubscriptions.close()
-		with self.lockBatchNotifications:
-			self.dbBatchNotifications.close()
-		with self.lockStatistics:
-			self.dbStatistics.close()
 
+	def add(self, pi:str, ty:int, ct:str, ri:str, cs:int = None) -> None:
+		"""	Add an instance resource to the index. An already indexed resource with the same *ri* is replaced.
 
-	def purgeDB(self) -> None:
-		L.isInfo and L.log('Purging DBs')
-		self.tabResources.truncate()
-		self.tabIdentifiers.truncate()
-		self.tabSubscriptions.truncate()
-		self.tabBatchNotifications.truncate()
-		self.tabStatistics.truncate()
-	
+			Args:
+				pi: Resource ID of the parent resource.
+				ty: Type of the instance resource.
+				ct: Creation time of the instance resource.
+				ri: Resource ID of the instance resource.
+				cs: Content size of the instance resource.
+		"""
+		with self.lock:
+			self._remove(ri)
+			self._add(pi, ty, ct, ri, cs)
 
-	def backupDB(self, dir:str) -> bool:
-		shutil.copy2(self.fileResources, dir)
-		shutil.copy2(self.fileIdentifiers, dir)
-		shutil.copy2(self.fileSubscriptions, dir)
-		shutil.copy2(self.fileBatchNotifications, dir)
-		shutil.copy2(self.fileStatistics, dir)
-		return True
 
+	def _add(self, pi:str, ty:int, ct:str, ri:str, cs:int = None) -> None:
+		key = (pi, int(ty))
+		entry = (ct, next(self.sequence), ri)
+		cs = cs or 0
+		bisect.insort(self.parents.setdefault(key, []), entry)	# Usually appends at the end
+		self.sizes[key] = self.sizes.get(key, 0) + cs
+		self.entries[ri] = (key, entry, cs)
 
-	#
-	#	Resources
-	#
 
+	def rebuild(self, instances:list[Tuple[str, int, str, str, int]], pi:str = None) -> None:
+		"""	Replace the indexed instance resources of one or all parent resources.
 
-	def insertResource(self, resource: Resource) -> None:
-		with self.lockResources:
-			self.tabResources.insert(resource.dict)
-	
+			Args:
+				instances: List of (pi, ty, ct, ri, cs) tuples of the instance resources.
+				pi: Resource ID of the parent resource whose instances are replaced. If None then all indexed instances are replaced.
+		"""
+		with self.lock:
+			if pi is None:
+				self.parents.clear()
+				self.sizes.clear()
+				self.entries.clear()
+			else:
+				for key in [ key for key in self.parents if key[0] == pi ]:
+					for entry in self.parents.pop(key):
+						del self.entries[entry[2]]
+					del self.sizes[key]
+			for instance in instances:
+				self._remove(instance[3])
+				self._add(*instance)
 
-	def upsertResource(self, resource: Resource) -> None:
-		#L.logDebug(resource)
-		with self.lockResources:
-			# Update existing or insert new when overwriting
-			self.tabResources.upsert(resource.dict, self.resourceQuery.ri == resource.ri)
-	
 
-	def updateResource(self, resource: Resource) -> Resource:
-		#L.logDebug(resource)
-		with self.lockResources:
-			ri = resource.ri
-			self.tabResources.update(resource.dict, self.resourceQuery.ri == ri)
-			# remove nullified fields from db and resource
-			for k in list(resource.dict):
-				if resource.dict[k] is None:	# only remove the real None attributes, not those with 0
-					self.tabResources.update(delete(k), self.resourceQuery.ri == ri)	# type: ignore [no-untyped-call]
-					del resource.dict[k]
-			return resource
+	def updateSize(self, ri:str, cs:int) -> None:
+		"""	Update the content size of an indexed instance resource.
 
+			Args:
+				ri: Resource ID of the instance resource.
+				cs: New content size of the instance resource.
+		"""
+		with self.lock:
+			if (e := self.entries.get(ri)) is None:
+				return
+			key, entry, oldCs = e
+			cs = cs or 0
+			self.sizes[key] += cs - oldCs
+			self.entries[ri] = (key, entry, cs)
 
-	def deleteResource(self, resource: Resource) -> None:
-		with self.lockResources:
-			self.tabResources.remove(self.resourceQuery.ri == resource.ri)	
-	
 
-	def searchResources(self, ri:str = None, csi:str = None, srn:str = None, pi:str = None, ty:int = None, aei:str = None) -> list[Document]:
-		if not srn:
-			with self.lockResources:
-				if ri:
-					return self.tabResources.search(self.resourceQuery.ri == ri)
-				elif csi:
-					return self.tabResources.search(self.resourceQuery.csi == csi)	
-				elif pi:
-					if ty is not None:	# ty is an int
-						return self.tabResources.search((self.resourceQuery.pi == pi) & (self.resourceQuery.ty == ty))
-					return self.tabResources.search(self.resourceQuery.pi == pi)
-				elif ty is not None:	# ty is an int
-					return self.tabResources.search(self.resourceQuery.ty == ty)	
-				elif aei:
-					return self.tabResources.search(self.resourceQuery.aei == aei)	
-		
-		else:
-			# for SRN find the ri first and then try again recursively (outside the lock!!)
-			if len((identifiers := self.searchIdentifiers(srn=srn))) == 1:
-				return self.searchResources(ri=identifiers[0]['ri'])
+	def remove(self, ri:str) -> None:
+		"""	Remove an instance resource from the index.
 
-		return []
+			Args:
+				ri: Resource ID of the instance resource.
+		"""
+		with self.lock:
+			self._remove(ri)
 
 
-	def discoverResourcesByFilter(self, func:Callable[[JSON], bool]) -> list[Document]:
-		with self.lockResources:
-			return self.tabResources.search(func)	# type: ignore [arg-type]
+	def _remove(self, ri:str) -> None:
+		if (e := self.entries.pop(ri, None)) is None:
+			return
+		key, entry, cs = e
+		lst = self.parents[key]
+		if (i := bisect.bisect_left(lst, entry)) < len(lst) and lst[i] == entry:
+			del lst[i]
+		self.sizes[key] -= cs
+		if not lst:
+			del self.parents[key]
+			del self.sizes[key]
 
 
-	def hasResource(self, ri: str = None, csi: str = None, srn: str = None, ty: int = None) -> bool:
-		if not srn:
-			with self.lockResources:
-				if ri:
-					return self.tabResources.contains(self.resourceQuery.ri == ri)	
-				elif csi :
-					return self.tabResources.contains(self.resourceQuery.csi == csi)
-				elif ty is not None:	# ty is an int
-					return self.tabResources.contains(self.resourceQuery.ty == ty)
-		else:
-			# find the ri first and then try again recursively
-			if len((identifiers := self.searchIdentifiers(srn=srn))) == 1:
-				return self.hasResource(ri = identifiers[0]['ri'])
-		return False
+	def latestOldest(self, pi:str, ty:int, oldest:bool = False) -> str:
+		"""	Return the resource ID of the latest or oldest instance of a parent.
 
+			Args:
+				pi: Resource ID of the parent resource.
+				ty: Type of the instance resource.
+				oldest: Return the oldest instance instead of the latest one.
+			Return:
+				Resource ID, or None if the parent has no instance of this type.
+		"""
+		with self.lock:
+			if not (lst := self.parents.get((pi, int(ty)))):
+				return None
+			return lst[0][2] if oldest else lst[-1][2]
 
-	def countResources(self) -> int:
-		with self.lockResources:
-			return len(self.tabResources)
 
+	def instances(self, pi:str, ty:int) -> list[str]:
+		"""	Return the resource IDs of all instances of a parent, sorted by creation time.
 
-	def searchByFragment(self, dct:dict) -> list[Document]:
+			Args:
+				pi: Resource ID of the parent resource.
+				ty: Type of the instance resources.
+			Return:
+				List of resource IDs, oldest first.
+		"""
+		with self.lock:
+			return [ entry[2] for entry in self.parents.get((pi, int(ty)), []) ]
+
+
+	def counters(self, pi:str, ty:int) -> Tuple[int, int]:
+		"""	Return the number of instances of a parent and the sum of their content sizes.
+
+			Args:
+				pi: Resource ID of the parent resource.
+				ty: Type of the instance resources.
+			Return:
+				Tuple (number of instances, sum of content sizes).
+		"""
+		with self.lock:
+			key = (pi, int(ty))
+			return (len(self.parents.get(key, [])), self.sizes.get(key, 0))
+
+
+
+#########################################################################
+#
+#	Expiration index
+#
+
+class ExpirationIndex(object):
+	"""	In-memory index of the expiration timestamps of resources.
+
+		The timestamps are kept in a min-heap, so that the next expiring resources can be determined
+		without searching the database. Entries of removed or updated resources are not removed from
+		the heap immediately, but are skipped when they reach the top of the heap.
+	"""
+
+	def __init__(self) -> None:
+		self.heap:list[Tuple[str, str]] = []		# (et, ri)
+		self.expirations:dict[str, str] = {}		# ri -> et
+		self.lock = Lock()
+
+
+	def __len__(self) -> int:
+		return len(self.expirations)
+
+
+	def clear(self) -> None:
+		"""	Remove all entries from the index.
+		"""
+		with self.lock:
+			self.heap.clear()
+			self.expirations.clear()
+
+
+	def add(self, ri:str, et:str) -> bool:
+		"""	Add or update the expiration timestamp of a resource.
+
+			Args:
+				ri: Resource ID.
+				et: Expiration timestamp.
+			Return:
+				True if the resource is now the next resource to expire.
+		"""
+		with self.lock:
+			if self.expirations.get(ri) == et:
+				return False
+			self.expirations[ri] = et
+			heapq.heappush(self.heap, (et, ri))
+			self._compact()
+			return self.heap[0] == (et, ri)
+
+
+	def remove(self, ri:str) -> None:
+		"""	Remove a resource from the index.
+
+			Args:
+				ri: Resource ID.
+		"""
+		with self.lock:
+			if self.expirations.pop(ri, None) is not None:
+				self._compact()
+
+
+	def next(self) -> str:
+		"""	Return the earliest expiration timestamp.
+
+			Return:
+				Expiration timestamp, or None if the index is empty.
+		"""
+		with self.lock:
+			self._skipStale()
+			return self.heap[0][0] if self.heap else None
+
+
+	def due(self, now:str, limit:int = None) -> list[str]:
+		"""	Remove and return the resources that expired before *now*.
+
+			Args:
+				now: Timestamp to compare the expiration timestamps against.
+				limit: Optional maximum number of resources to return.
+			Return:
+				List of resource IDs, earliest expiration first.
+		"""
+		result:list[str] = []
+		with self.lock:
+			while (limit is None or len(result) < limit):
+				self._skipStale()
+				if not self.heap or self.heap[0][0] >= now:
+					break
+				_, ri = heapq.heappop(self.heap)
+				del self.expirations[ri]
+				result.append(ri)
+		return result
+
+
+	def _skipStale(self) -> None:
+		"""	Pop outdated entries from the top of the heap.
+		"""
+		while self.heap and self.expirations.get((top := self.heap[0])[1]) != top[0]:
+			heapq.heappop(self.heap)
+
+
+	def _compact(self) -> None:
+		"""	Rebuild the heap when it contains too many outdated entries.
+		"""
+		if len(self.heap) > 2 * len(self.expirations) + 1000:
+			self.heap = [ (et, ri) for ri, et in self.expirations.items() ]
+			heapq.heapify(self.heap)
+
+
+
+#########################################################################
+#
+#	Subscription index
+#
+
+class SubscriptionIndex(object):
+	"""	In-memory index of the subscriptions by their parent resources and notification event types.
+
+		The indexed subscription documents are the internal subscription representations, not 
+		the <sub> resources. Their *chty* and *atr* attributes are converted to sets.
+
+		For every parent resource a lookup table is kept that maps the notification event types
+		(and *None* for all subscriptions of the parent) to lists of subscription documents.
+		A lookup table is replaced as a whole when a subscription of that parent changes, so
+		it can be read without locking.
+	"""
+
+	def __init__(self) -> None:
+		self.parents:dict[str, dict[str, JSON]] = {}							# pi -> { ri -> subscription document }
+		self.lookups:dict[str, dict[int|None, list[JSON]]] = {}					# pi -> { net|None -> [ subscription documents ] }
+		self.subscriptions:dict[str, JSON] = {}									# ri -> subscription document
+		self.lock = Lock()
+
+
+	def __len__(self) -> int:
+		return len(self.subscriptions)
+
+
+	def clear(self) -> None:
+		"""	Remove all entries from the index.
+		"""
+		with self.lock:
+			self.parents.clear()
+			self.lookups.clear()
+			self.subscriptions.clear()
+
+
+	def add(self, subscription:JSON) -> None:
+		"""	Add a subscription document to the index. An already indexed subscription with the same *ri* is replaced,
+			but keeps its position for its parent.
+
+			Args:
+				subscription: The subscription document.
+		"""
+		doc = dict(subscription)
+		doc['chty'] = set(chty) if (chty := doc.get('chty')) else None
+		doc['atr'] = set(atr) if (atr := doc.get('atr')) else None
+		doc['net'] = doc.get('net') or []
+		ri = doc['ri']
+		with self.lock:
+			if (old := self.subscriptions.get(ri)) and old['pi'] != doc['pi']:
+				self._remove(ri)
+			self.subscriptions[ri] = doc
+			self.parents.setdefault(doc['pi'], {})[ri] = doc
+			self._updateLookup(doc['pi'])
+
+
+	def remove(self, ri:str) -> None:
+		"""	Remove a subscription from the index.
+
+			Args:
+				ri: Resource ID of the subscription.
+		"""
+		with self.lock:
+			self._remove(ri)
+
+
+	def get(self, ri:str) -> JSON:
+		"""	Return an indexed subscription document.
+
+			Args:
+				ri: Resource ID of the subscription.
+			Return:
+				The subscription document, or None.
+		"""
+		return self.subscriptions.get(ri)
+
+
+	def forParent(self, pi:str, net:int = None) -> list[JSON]:
+		"""	Return the subscription documents of a parent resource.
+
+			Args:
+				pi: Resource ID of the parent resource.
+				net: Optional notification event type. If given then only the subscriptions for this event type are returned.
+			Return:
+				List of subscription documents in the order they were added. This list must not be changed.
+		"""
+		if not (lookup := self.lookups.get(pi)):
+			return []
+		return lookup.get(net, [])
+
+
+	def _remove(self, ri:str) -> None:
+		if not (doc := self.subscriptions.pop(ri, None)):
+			return
+		pi = doc['pi']
+		if (subs := self.parents.get(pi)) is not None:
+			subs.pop(ri, None)
+			if not subs:
+				del self.parents[pi]
+		self._updateLookup(pi)
+
+
+	def _updateLookup(self, pi:str) -> None:
+		if not (subs := self.parents.get(pi)):
+			self.lookups.pop(pi, None)
+			return
+		lookup:dict[int|None, list[JSON]] = { None : list(subs.values()) }
+		for doc in lookup[None]:
+			for net in doc['net']:
+				lookup.setdefault(net, []).append(doc)
+		self.lookups[pi] = lookup
+
+
+#########################################################################
+#
+#	Label index
+#
+
+class LabelIndex(object):
+	"""	In-memory inverted index that maps the labels (*lbl* attribute) of resources to their resource IDs.
+	"""
+
+	def __init__(self) -> None:
+		self.labels:dict[str, set[str]] = {}			# label -> { ri }
+		self.resources:dict[str, frozenset[str]] = {}	# ri -> labels
+		self.lock = Lock()
+
+
+	def __len__(self) -> int:
+		return len(self.labels)
+
+
+	def clear(self) -> None:
+		"""	Remove all entries from the index.
+		"""
+		with self.lock:
+			self.labels.clear()
+			self.resources.clear()
+
+
+	def add(self, ri:str, labels:list[str]) -> None:
+		"""	Add or replace the labels of a resource.
+
+			Args:
+				ri: Resource ID.
+				labels: The resource's labels. May be None or empty.
+		"""
+		labelSet = frozenset(each for each in labels if isinstance(each, str)) if labels else frozenset()
+		with self.lock:
+			if (old := self.resources.get(ri, frozenset())) == labelSet:
+				return
+			self._remove(ri, old - labelSet)
+			for label in labelSet - old:
+				self.labels.setdefault(label, set()).add(ri)
+			if labelSet:
+				self.resources[ri] = labelSet
+			else:
+				self.resources.pop(ri, None)
+
+
+	def remove(self, ri:str) -> None:
+		"""	Remove a resource from the index.
+
+			Args:
+				ri: Resource ID.
+		"""
+		with self.lock:
+			if (old := self.resources.pop(ri, None)):
+				self._remove(ri, old)
+
+
+	def lookup(self, labels:list[str], matchAll:bool = False) -> set[str]:
+		"""	Return the resource IDs of the resources with some or all of a list of labels.
+
+			Args:
+				labels: List of labels.
+				matchAll: If True then the resources must have all the labels, otherwise at least one of them.
+			Return:
+				A new set of resource IDs.
+		"""
+		if not labels:
+			return set()
+		with self.lock:
+			sets = [ self.labels.get(label, set()) for label in labels ]
+			if matchAll:
+				return set.intersection(*sets)
+			return set.union(*sets)
+
+
+	def _remove(self, ri:str, labels:Iterable[str]) -> None:
+		for label in labels:
+			if (ris := self.labels.get(label)) is not None:
+				ris.discard(ri)
+				if not ris:
+					del self.labels[label]
+
+
+#########################################################################
+#
+#	Identifier cache
+#
+
+class IdentifierCache(object):
+	"""	Bounded, bidirectional LRU cache for the identifier documents (*ri*, *rn*, *srn*, *ty*) of resources.
+
+		Documents can be looked up by their resource ID as well as by their structured resource name.
+		When the cache is full then the least recently used document is removed.
+
+		The structured names of the cached documents are also kept in a tree of their path elements.
+		This allows to invalidate all cached documents below a structured name, e.g. when a parent resource 
+		is deleted.
+
+		As for the `ResourceCache`, the generation of the cache (see `generation()`) must be retrieved 
+		before reading a document from the database, and passed to `add()`. A document is not added
+		when its resource ID, its structured resource name, or one of its ancestors' structured resource
+		names was invalidated in the meantime.
+
+		The cache counts the hits and misses of the lookups.
+	"""
+
+	invalidationHistorySize = 1000
+	"""	Number of recent invalidations that are remembered for checking the generation of added documents. """
+
+
+	def __init__(self, size:int) -> None:
+		"""	Initialize the cache.
+
+			Args:
+				size: Maximum number of cached documents. 0 disables the cache.
+		"""
+		self.size = size
+		self.entries:OrderedDict[str, Document] = OrderedDict()	# ri -> identifier document, least recently used first
+		self.srns:dict[str, str] = {}								# srn -> ri
+		self.children:dict[str, set[str]] = {}						# srn -> srns of the direct children in the tree
+		self._generation = 0
+		self.invalidations:OrderedDict[str, int] = OrderedDict()	# ri or srn -> generation of the invalidation
+		self.horizon = 0											# generation of the latest forgotten invalidation
+		self.hits = 0
+		self.misses = 0
+		self.lock = Lock()
+
+
+	def __len__(self) -> int:
+		return len(self.entries)
+
+
+	def clear(self) -> None:
+		"""	Remove all entries from the cache. The counters are not reset.
+		"""
+		with self.lock:
+			self.entries.clear()
+			self.srns.clear()
+			self.children.clear()
+			self._invalidate(None)
+
+
+	def generation(self) -> int:
+		"""	Return the current generation of the cache. It changes with every invalidation.
+
+			Return:
+				Generation number.
+		"""
+		return self._generation
+
+
+	def byRI(self, ri:str) -> Document:
+		"""	Lookup an identifier document by its resource ID.
+
+			Args:
+				ri: Resource ID.
+			Return:
+				The identifier document, or None if it is not cached.
+		"""
+		with self.lock:
+			if (doc := self.entries.get(ri)) is None:
+				self.misses += 1
+				return None
+			self.entries.move_to_end(ri)
+			self.hits += 1
+			return doc
+
+
+	def bySRN(self, srn:str) -> Document:
+		"""	Lookup an identifier document by its structured resource name.
+
+			Args:
+				srn: Structured resource name.
+			Return:
+				The identifier document, or None if it is not cached.
+		"""
+		with self.lock:
+			if (ri := self.srns.get(srn)) is None:
+				self.misses += 1
+				return None
+			self.entries.move_to_end(ri)
+			self.hits += 1
+			return self.entries[ri]
+
+
+	def add(self, doc:Document, generation:int) -> None:
+		"""	Add an identifier document to the cache. Cached documents with the same resource ID or 
+			structured resource name are replaced.
+
+			Args:
+				doc: The identifier document.
+				generation: The generation of the cache before the document was read from the database.
+		"""
+		if self.size <= 0:
+			return
+		ri, srn = doc['ri'], doc['srn']
+		with self.lock:
+			if generation < self.horizon or self.invalidations.get(ri, -1) > generation:
+				return	# The document might have been changed in the meantime
+			path = srn
+			while path:
+				if self.invalidations.get(path, -1) > generation:
+					return	# The resource or one of its ancestors might have been removed in the meantime
+				path = path.rpartition('/')[0]
+			self._remove(ri)
+			if (other := self.srns.get(srn)) is not None:
+				self._remove(other)
+			self.entries[ri] = doc
+			self.srns[srn] = ri
+			self._link(srn)
+			while len(self.entries) > self.size:
+				self._remove(next(iter(self.entries)))
+
+
+	def remove(self, ri:str, srn:str = None, subtree:bool = False) -> None:
+		"""	Invalidate the cached identifier documents for a resource ID and a structured resource name.
+
+			Args:
+				ri: Resource ID.
+				srn: Optional structured resource name.
+				subtree: If True then all cached documents below *srn* are invalidated as well.
+		"""
+		with self.lock:
+			if (doc := self.entries.get(ri)) is not None:
+				srn = srn or doc['srn']
+				self._remove(ri)
+			self._invalidate(ri)
+			if not srn:
+				return
+			self._invalidate(srn)
+			if (other := self.srns.get(srn)) is not None:
+				self._remove(other)
+			if subtree:
+				stack = list(self.children.pop(srn, ()))
+				while stack:
+					child = stack.pop()
+					stack.extend(self.children.pop(child, ()))
+					if (childRI := self.srns.pop(child, None)) is not None:
+						del self.entries[childRI]
+				self._unlink(srn)
+
+
+	def _remove(self, ri:str) -> None:
+		if (doc := self.entries.pop(ri, None)) is None:
+			return
+		srn = doc['srn']
+		if self.srns.get(srn) == ri:
+			del self.srns[srn]
+			self._unlink(srn)
+
+
+	def _link(self, srn:str) -> None:
+		"""	Add a structured resource name and its ancestors to the tree.
+		"""
+		while True:
+			parent, sep, _ = srn.rpartition('/')
+			if not sep:
+				return
+			if srn in (children := self.children.setdefault(parent, set())):
+				return	# ancestors are already linked
+			children.add(srn)
+			srn = parent
+
+
+	def _unlink(self, srn:str) -> None:
+		"""	Remove a structured resource name and its ancestors from the tree, as long as they
+			neither have a cached document nor children.
+		"""
+		while srn not in self.srns and not self.children.get(srn):
+			self.children.pop(srn, None)
+			parent, sep, _ = srn.rpartition('/')
+			if not sep:
+				return
+			if (children := self.children.get(parent)) is not None:
+				children.discard(srn)
+			srn = parent
+
+
+	def _invalidate(self, key:str) -> None:
+		"""	Record the invalidation of a resource ID or structured resource name in a new generation.
+
+			Args:
+				key: Resource ID or structured resource name. If None then everything is invalidated.
+		"""
+		self._generation += 1
+		if key is None:
+			self.invalidations.clear()
+			self.horizon = self._generation
+			return
+		self.invalidations[key] = self._generation
+		self.invalidations.move_to_end(key)
+		if len(self.invalidations) > self.invalidationHistorySize:
+			self.horizon = self.invalidations.popitem(last = False)[1]
+
+
+#########################################################################
+#
+#	Resource cache
+#
+
+class ResourceCache(object):
+	"""	Bounded cache for resource instances by their resource ID.
+
+		The cache holds one instance of a resource as a prototype. This prototype is never handed out.
+		Instead, every lookup returns a copy of it that has its own attribute dictionary, so callers
+		can change the returned resource without affecting the cache.
+		This is much cheaper than creating a new instance from the database document.
+
+		The number of cached resources is limited for each resource type, and the least recently
+		used resource of a type is removed when the limit is reached. A limit of 0 disables the
+		caching for a type.
+
+		Resources must be invalidated when they are updated or deleted. To prevent that a resource
+		that was read from the database *before* an invalidation is added to the cache afterwards,
+		the generation of the cache (see `generation()`) must be retrieved before reading the resource
+		from the database, and passed to `add()`.
+
+		The cache counts the hits and misses of the lookups.
+	"""
+
+	invalidationHistorySize = 1000
+	"""	Number of recent invalidations that are remembered for checking the generation of added resources. """
+
+
+	def __init__(self, size:int, typeSizes:dict[int, int] = None) -> None:
+		"""	Initialize the cache.
+
+			Args:
+				size: Default maximum number of cached resources per resource type. 0 disables the cache.
+				typeSizes: Optional maximum number of cached resources for individual resource types.
+		"""
+		self.size = size
+		self.typeSizes = typeSizes if typeSizes else {}
+		self.types:dict[int, OrderedDict[str, Resource]] = {}	# ty -> { ri -> prototype resource }, least recently used first
+		self.resources:dict[str, int] = {}						# ri -> ty
+		self._generation = 0
+		self.invalidations:OrderedDict[str, int] = OrderedDict()	# ri -> generation of the invalidation
+		self.horizon = 0											# generation of the latest forgotten invalidation
+		self.hits = 0
+		self.misses = 0
+		self.lock = Lock()
+
+
+	def __len__(self) -> int:
+		return len(self.resources)
+
+
+	def clear(self) -> None:
+		"""	Remove all resources from the cache. The counters are not reset.
+		"""
+		with self.lock:
+			self.types.clear()
+			self.resources.clear()
+			self._invalidate(None)
+
+
+	def generation(self) -> int:
+		"""	Return the current generation of the cache. It changes with every invalidation.
+
+			Return:
+				Generation number.
+		"""
+		return self._generation
+
+
+	def get(self, ri:str) -> Resource:
+		"""	Lookup a resource.
+
+			Args:
+				ri: Resource ID.
+			Return:
+				A copy of the cached resource, or None if the resource is not cached.
+		"""
+		with self.lock:
+			if (ty := self.resources.get(ri)) is None:
+				self.misses += 1
+				return None
+			(entries := self.types[ty]).move_to_end(ri)
+			prototype = entries[ri]
+			self.hits += 1
+		return _copyResource(prototype)
+
+
+	def add(self, resource:Resource, generation:int) -> None:
+		"""	Add a copy of a resource to the cache.
+
+			Args:
+				resource: The resource. It must be unchanged since it was read from the database.
+				generation: The generation of the cache before the resource was read from the database.
+		"""
+		if (limit := self.typeSizes.get(ty := resource.ty, self.size)) <= 0:
+			return
+		ri = resource.ri
+		prototype = _copyResource(resource)
+		with self.lock:
+			if generation < self.horizon or self.invalidations.get(ri, -1) > generation:
+				return	# The resource might have been changed in the meantime
+			entries = self.types.setdefault(ty, OrderedDict())
+			entries[ri] = prototype
+			entries.move_to_end(ri)
+			self.resources[ri] = ty
+			while len(entries) > limit:
+				del self.resources[entries.popitem(last = False)[0]]
+
+
+	def invalidate(self, ri:str) -> None:
+		"""	Remove a resource from the cache, e.g. when it is updated or deleted.
+
+			Args:
+				ri: Resource ID.
+		"""
+		with self.lock:
+			if (ty := self.resources.pop(ri, None)) is not None:
+				del self.types[ty][ri]
+			self._invalidate(ri)
+
+
+	def _invalidate(self, ri:str) -> None:
+		self._generation += 1
+		if ri is None:	# everything is invalidated
+			self.invalidations.clear()
+			self.horizon = self._generation
+			return
+		self.invalidations[ri] = self._generation
+		self.invalidations.move_to_end(ri)
+		if len(self.invalidations) > self.invalidationHistorySize:
+			self.horizon = self.invalidations.popitem(last = False)[1]
+
+
+def _copyJSON(value:Any) -> Any:
+	"""	Copy a JSON-like structure. This is faster than *deepcopy()* for dictionaries and lists.
+	"""
+	if (t := type(value)) is dict:
+		return { k: _copyJSON(v) for k, v in value.items() }
+	if t is list:
+		return [ _copyJSON(v) for v in value ]
+	if value is None or isinstance(value, (str, int, float, tuple)):
+		return value
+	return deepcopy(value)
+
+
+def _copyResource(resource:Resource) -> Resource:
+	"""	Copy a resource instance with its own attribute dictionary.
+	"""
+	result = object.__new__(type(resource))	# copy() doesn't work because of Resource.__getattr__()
+	result.__dict__.update(resource.__dict__)
+	result.dict = _copyJSON(resource.dict)
+	return result
+
+
+#########################################################################
+#
+#	DB class that implements the TinyDB binding
+#
+#	This class may be moved later to an own module.
+
+
+class TinyDBBinding(object):
+
+	def __init__(self, path:str = None, postfix:str = '') -> None:
+		self.path = path
+		self.cacheSize = Configuration.get('db.cacheSize')
+		L.isInfo and L.log(f'Cache Size: {self.cacheSize:d}')
+
+		# create transaction locks
+		self.lockResources				= Lock()
+		self.lockIdentifiers			= Lock()
+		self.lockSubscriptions			= Lock()
+		self.lockBatchNotifications		= Lock()
+		self.lockStatistics 			= Lock()
+
+		# file names
+		self.fileResources				= f'{self.path}/resources{postfix}.json'
+		self.fileIdentifiers			= f'{self.path}/identifiers{postfix}.json'
+		self.fileSubscriptions			= f'{self.path}/subscriptions{postfix}.json'
+		self.fileBatchNotifications		= f'{self.path}/batchNotifications{postfix}.json'
+		self.fileStatistics				= f'{self.path}/statistics{postfix}.json'
+
+		# Write-behind mode only makes sense for databases in the file system
+		self.writeBehind				= Configuration.get('db.writeBehind') and not Configuration.get('db.inMemory')
+		self.journal:TinyDBJournal		= None
+		self.journalWorker				= None
+		self.journalSyncWorker			= None
+		self.journalMaxSize				= Configuration.get('db.journalMaxSize')
+		self.journalSync				= Configuration.get('db.journalSync')
+		self.compactionRequested		= False
+		self.memoryStorage				= Configuration.get('db.inMemory') or self.writeBehind
+
+		# All databases/tables will use the smart query cache
+		if self.memoryStorage:
+			L.isInfo and L.log('DB in memory' if not self.writeBehind else 'DB in file system (write-behind)')
+			self.dbResources 			= TinyDB(storage = MemoryStorage)
+			self.dbIdentifiers 			= TinyDB(storage = MemoryStorage)
+			self.dbSubscriptions 		= TinyDB(storage = MemoryStorage)
+			self.dbBatchNotifications	= TinyDB(storage = MemoryStorage)
+			self.dbStatistics			= TinyDB(storage = MemoryStorage)
+		else:
+			L.isInfo and L.log('DB in file system')
+			self.dbResources 			= TinyDB(self.fileResources)
+			self.dbIdentifiers 			= TinyDB(self.fileIdentifiers)
+			self.dbSubscriptions 		= TinyDB(self.fileSubscriptions)
+			self.dbBatchNotifications 	= TinyDB(self.fileBatchNotifications)
+			self.dbStatistics 			= TinyDB(self.fileStatistics)
+		
+		# Load the snapshots and replay the journal before the tables are opened
+		if self.writeBehind:
+			self.journal = TinyDBJournal(f'{self.path}/journal{postfix}.jsonl', 
+										 { 'resources'			: (self.dbResources, self.fileResources),
+										   'identifiers'		: (self.dbIdentifiers, self.fileIdentifiers),
+										   'subscriptions'		: (self.dbSubscriptions, self.fileSubscriptions),
+										   'batchNotifications'	: (self.dbBatchNotifications, self.fileBatchNotifications),
+										   'statistics'			: (self.dbStatistics, self.fileStatistics)
+										 },
+										 [ self.lockResources, self.lockIdentifiers, self.lockSubscriptions, self.lockBatchNotifications, self.lockStatistics ])
+			self.journal.load()
+			L.isInfo and L.log(f'DB journal sync: {self.journalSync}')
+
+		# Open/Create tables
+		self.tabResources 				= self.dbResources.table('resources', cache_size = self.cacheSize)
+		self.tabIdentifiers 			= self.dbIdentifiers.table('identifiers', cache_size = self.cacheSize)
+		self.tabSubscriptions 			= self.dbSubscriptions.table('subsriptions', cache_size = self.cacheSize)
+		self.tabBatchNotifications 		= self.dbBatchNotifications.table('batchNotifications', cache_size = self.cacheSize)
+		self.tabStatistics 				= self.dbStatistics.table('statistics', cache_size = self.cacheSize)
+
+		# Create the Queries
+		self.resourceQuery 				= Query()
+		self.identifierQuery 			= Query()
+		self.subscriptionQuery			= Query()
+		self.batchNotificationQuery 	= Query()
+
+		# Create and build the secondary indexes for the resources
+		self.resourceIndex				= DocumentIndex([ 'ri', 'pi', 'ty', 'csi', 'aei' ])
+		self.resourceIndex.rebuild(self.tabResources)
+
+		# Start the worker that regularly compacts the journal into the snapshot files
+		if self.writeBehind:
+			self.journalWorker = BackgroundWorkerPool.newWorker(Configuration.get('db.journalCompactionInterval'), self._compactionWorker, 'dbJournalWorker', startWithDelay = True).start()
+			if self.journalSync == 'interval':
+				self.journalSyncWorker = BackgroundWorkerPool.newWorker(Configuration.get('db.journalSyncInterval'), self._syncWorker, 'dbJournalSyncWorker', startWithDelay = True).start()
+
+
+	def closeDB(self) -> None:
+		L.isInfo and L.log('Closing DBs')
+		if self.writeBehind:
+			self.journalWorker.stop()
+			if self.journalSyncWorker:
+				self.journalSyncWorker.stop()
+			self.journal.compact()	# final compaction
+			self.journal.close()
+		with self.lockResources:
+			self.dbResources.close()
+		with self.lockIdentifiers:
+			self.dbIdentifiers.close()
+		with self.lockSubscriptions:
+			self.dbSubscriptions.close()
+		with self.lockBatchNotifications:
+			self.dbBatchNotifications.close()
+		with self.lockStatistics:
+			self.dbStatistics.close()
+
+
+	def purgeDB(self) -> None:
+		L.isInfo and L.log('Purging DBs')
+		with self._writing(self.lockResources):
+			self.tabResources.truncate()
+			self.resourceIndex.clear()
+			self._journal('resources', self.tabResources)
+		with self._writing(self.lockIdentifiers):
+			self.tabIdentifiers.truncate()
+			self._journal('identifiers', self.tabIdentifiers)
+		with self._writing(self.lockSubscriptions):
+			self.tabSubscriptions.truncate()
+			self._journal('subscriptions', self.tabSubscriptions)
+		with self._writing(self.lockBatchNotifications):
+			self.tabBatchNotifications.truncate()
+			self._journal('batchNotifications', self.tabBatchNotifications)
+		with self._writing(self.lockStatistics):
+			self.tabStatistics.truncate()
+			self._journal('statistics', self.tabStatistics)
+	
+
+	def backupDB(self, dir:str) -> bool:
+		if self.writeBehind:
+			self.journal.compact()	# Bring the snapshot files up-to-date first
+		shutil.copy2(self.fileResources, dir)
+		shutil.copy2(self.fileIdentifiers, dir)
+		shutil.copy2(self.fileSubscriptions, dir)
+		shutil.copy2(self.fileBatchNotifications, dir)
+		shutil.copy2(self.fileStatistics, dir)
+		return True
+
+
+	@contextmanager
+	def _writing(self, *locks:Lock) -> Iterator[None]:
+		"""	Hold the locks of the tables that are changed, and sync the journal after the 
+			locks are released, when operating in write-behind mode with the "always" sync policy.
+			Writers therefore don't wait for each other's disk syncs while holding a table lock.
+
+			Args:
+				locks: The locks of the changed tables, in the order in which they are acquired.
+		"""
+		for lock in locks:
+			lock.acquire()
+		try:
+			yield
+		finally:
+			for lock in reversed(locks):
+				lock.release()
+		if self.writeBehind and self.journalSync == 'always':
+			self.journal.sync()
+
+
+	def _journal(self, database:str, table:Table, docIDs:list[int] = None) -> None:
+		"""	Record changed documents in the journal when operating in write-behind mode.
+			A compaction is requested when the journal grows beyond its configured size.
+
+			This method must be called while holding the lock for the table (see `_writing()`).
+
+			Args:
+				database: Name of the database (see `TinyDBJournal`).
+				table: The changed table.
+				docIDs: List of IDs of changed documents. If this is None then the table was truncated.
+		"""
+		if not self.writeBehind:
+			return
+		size = self.journal.append(database, table, docIDs)
+		if self.journalMaxSize and size > self.journalMaxSize and not self.compactionRequested:
+			self.compactionRequested = True
+			BackgroundWorkerPool.runJob(lambda: self.journalWorker.workNow(), 'dbJournalCompaction')	# Run outside of the table lock
+
+
+	def _compactionWorker(self) -> bool:
+		"""	Worker callback to compact the journal into the snapshot files.
+
+			Return:
+				Always True to keep the worker running.
+		"""
+		self.compactionRequested = False
+		self.journal.compact()
+		return True
+
+
+	def _syncWorker(self) -> bool:
+		"""	Worker callback to sync the journal for the "interval" sync policy.
+
+			Return:
+				Always True to keep the worker running.
+		"""
+		self.journal.sync()
+		return True
+
+
+	#
+	#	Resources
+	#
+
+
+	def insertResource(self, resource: Resource) -> None:
+		with self._writing(self.lockResources):
+			docID = self.tabResources.insert(resource.dict)
+			self.resourceIndex.add(docID, resource.dict)
+			self._journal('resources', self.tabResources, [ docID ])
+	
+
+	def insertResources(self, resources:list[Resource]) -> None:
+		with self._writing(self.lockResources, self.lockIdentifiers):
+			docIDs = self.tabResources.insert_multiple([ resource.dict for resource in resources ])
+			for docID, resource in zip(docIDs, resources):
+				self.resourceIndex.add(docID, resource.dict)
+			identifierIDs = self.tabIdentifiers.insert_multiple([ {	'ri' : resource.ri, 
+																	'rn' : resource.rn, 
+																	'srn' : resource.__srn__,
+																	'ty' : resource.ty 
+																  } for resource in resources ])
+			self._journal('resources', self.tabResources, docIDs)
+			self._journal('identifiers', self.tabIdentifiers, identifierIDs)
+
+
+	def upsertResource(self, resource: Resource) -> None:
+		#L.logDebug(resource)
+		with self._writing(self.lockResources):
+			# Update existing or insert new when overwriting
+			if (docID := self.resourceIndex.lookupOne('ri', resource.ri)) is not None:
+				self.tabResources.update(resource.dict, doc_ids = [ docID ])
+			else:
+				docID = self.tabResources.insert(resource.dict)
+			self.resourceIndex.add(docID, resource.dict)
+			self._journal('resources', self.tabResources, [ docID ])
+	
+
+	def updateResource(self, resource: Resource) -> Resource:
+		#L.logDebug(resource)
+		with self._writing(self.lockResources):
+			if (docID := self.resourceIndex.lookupOne('ri', resource.ri)) is None:
+				return resource
+			self.tabResources.update(resource.dict, doc_ids = [ docID ])
+			# remove nullified fields from db and resource
+			for k in list(resource.dict):
+				if resource.dict[k] is None:	# only remove the real None attributes, not those with 0
+					self.tabResources.update(delete(k), doc_ids = [ docID ])	# type: ignore [no-untyped-call]
+					del resource.dict[k]
+			self.resourceIndex.add(docID, resource.dict)
+			self._journal('resources', self.tabResources, [ docID ])
+			return resource
+
+
+	def deleteResource(self, resource: Resource) -> None:
+		with self._writing(self.lockResources):
+			if (docID := self.resourceIndex.lookupOne('ri', resource.ri)) is not None:
+				self.tabResources.remove(doc_ids = [ docID ])
+				self.resourceIndex.remove(docID)
+				self._journal('resources', self.tabResources, [ docID ])
+	
+
+	def searchResources(self, ri:str = None, csi:str = None, srn:str = None, pi:str = None, ty:int = None, aei:str = None) -> list[Document]:
+		if not srn:
+			with self.lockResources:
+				if ri:
+					return self._resourcesByID(self.resourceIndex.lookup('ri', ri))
+				elif csi:
+					return self._resourcesByID(self.resourceIndex.lookup('csi', csi))
+				elif pi:
+					if ty is not None:	# ty is an int
+						return self._resourcesByID(self.resourceIndex.lookup('pi', pi) & self.resourceIndex.lookup('ty', ty))
+					return self._resourcesByID(self.resourceIndex.lookup('pi', pi))
+				elif ty is not None:	# ty is an int
+					return self._resourcesByID(self.resourceIndex.lookup('ty', ty))
+				elif aei:
+					return self._resourcesByID(self.resourceIndex.lookup('aei', aei))
+		
+		else:
+			# for SRN find the ri first and then try again recursively (outside the lock!!)
+			if len((identifiers := self.searchIdentifiers(srn=srn))) == 1:
+				return self.searchResources(ri=identifiers[0]['ri'])
+
+		return []
+
+
+	def searchResourcesByIDs(self, ris:Iterable[str]) -> list[Document]:
+		"""	Return the resources for a set of resource IDs, in insertion order.
+
+			Args:
+				ris: Resource IDs.
+			Return:
+				List of documents.
+		"""
+		with self.lockResources:
+			docIDs:set[int] = set()
+			for ri in ris:
+				docIDs |= self.resourceIndex.lookup('ri', ri)
+			return self._resourcesByID(docIDs)
+
+
+	def discoverResourcesByFilter(self, func:Callable[[JSON], bool]) -> list[Document]:
+		with self.lockResources:
+			return self.tabResources.search(func)	# type: ignore [arg-type]
+
+
+	def hasResource(self, ri: str = None, csi: str = None, srn: str = None, ty: int = None) -> bool:
+		if not srn:
+			with self.lockResources:
+				if ri:
+					return len(self.resourceIndex.lookup('ri', ri)) > 0
+				elif csi :
+					return len(self.resourceIndex.lookup('csi', csi)) > 0
+				elif ty is not None:	# ty is an int
+					return len(self.resourceIndex.lookup('ty', ty)) > 0
+		else:
+			# find the ri first and then try again recursively
+			if len((identifiers := self.searchIdentifiers(srn=srn))) == 1:
+				return self.hasResource(ri = identifiers[0]['ri'])
+		return False
+
+
+	def countResources(self, ty:int = None) -> int:
+		with self.lockResources:
+			if ty is not None:
+				return len(self.resourceIndex.lookup('ty', ty))
+			return len(self.tabResources)
+
+
+	def searchByFragment(self, dct:dict) -> list[Document]:
+		""" Search and return all resources that match the given dictionary/document. """
+		with self.lockResources:
+			if (docIDs := self.resourceIndex.candidates(dct)) is not None:
+				# Only check the documents that are selected by the indexed attributes
+				return [ doc for doc in self._resourcesByID(docIDs) if all(k in doc and doc[k] == v for k, v in dct.items()) ]
+			return self.tabResources.search(self.resourceQuery.fragment(dct))
+
+
+	def _resourcesByID(self, docIDs:Iterable[int]) -> list[Document]:
+		"""	Return the resource documents for a set of document IDs. The documents are returned
+			in the order of their IDs, which is the same order as the one of a full table search.
+
+			When the database is held in memory then each document is retrieved directly.
+			Otherwise, every access reads the database file, so the table is read only once
+			and searched for the documents. Lookups are therefore not accelerated by the
+			resource index in this case.
+
+			This method must be called while holding the resources lock.
+
+			Args:
+				docIDs: Document IDs to return the documents for.
+			Return:
+				List of documents.
+		"""
+		if not docIDs:
+			return []
+		if self.memoryStorage:
+			return [ cast(Document, doc) for docID in sorted(docIDs) if (doc := self.tabResources.get(doc_id = docID)) is not None ]
+		return sorted(cast(List[Document], self.tabResources.get(doc_ids = list(docIDs))), key = lambda doc: doc.doc_id)
+
+
+	#
+	#	Identifiers
+	#
+
+
+	def insertIdentifier(self, resource:Resource, ri:str, srn:str) -> None:
+		# L.isDebug and L.logDebug({'ri' : ri, 'rn' : resource.rn, 'srn' : srn, 'ty' : resource.ty})		
+		with self._writing(self.lockIdentifiers):
+			docIDs = self.tabIdentifiers.upsert(
+				{	'ri' : ri, 
+					'rn' : resource.rn, 
+					'srn' : srn,
+					'ty' : resource.ty 
+				}, 
+				self.identifierQuery.ri == ri)
+			self._journal('identifiers', self.tabIdentifiers, docIDs)
+
+
+	def deleteIdentifier(self, resource:Resource) -> None:
+		with self._writing(self.lockIdentifiers):
+			docIDs = self.tabIdentifiers.remove(self.identifierQuery.ri == resource.ri)
+			self._journal('identifiers', self.tabIdentifiers, docIDs)
+
+
+	def searchIdentifiers(self, ri:str = None, srn:str = None) -> list[Document]:
+		"""	Search for an resource ID OR for a structured name in the identifiers DB.
+
+			Either *ri* or *srn* shall be given. If both are given then *srn*
+			is taken.
+		
+			Args:
+				ri: Resource ID to search for.
+				srn: Structured path to search for.
+			Return:
+				A list of found identifier documents (see `insertIdentifier`), or an empty list if not found.
+		 """
+		with self.lockIdentifiers:
+			if srn:
+				return self.tabIdentifiers.search(self.identifierQuery.srn == srn)
+			elif ri:
+				return self.tabIdentifiers.search(self.identifierQuery.ri == ri)
+			return []
+
+
+	#
+	#	Subscriptions
+	#
+
+
+	def searchSubscriptions(self, ri:str=None, pi:str=None) -> list[Document]:
+		with self.lockSubscriptions:
+			if ri:
+				return self.tabSubscriptions.search(self.subscriptionQuery.ri == ri)
+			if pi:
+				return self.tabSubscriptions.search(self.subscriptionQuery.pi == pi)
+			return self.tabSubscriptions.all()
+
+
+	def upsertSubscription(self, subscription:Resource) -> JSON:
+		with self._writing(self.lockSubscriptions):
+			ri = subscription.ri
+			doc = {	'ri'  : ri, 
+					'pi'  : subscription.pi,
+					'nct' : subscription.nct,
+					'net' : subscription['enc/net'],	# TODO perhaps store enc as a whole?
+					'atr' : subscription['enc/atr'],
+					'chty': subscription['enc/chty'],
+					'exc' : subscription.exc,
+					'ln'  : subscription.ln,
+					'nus' : subscription.nu,
+					'bn'  : subscription.bn,
+					'cr'  : subscription.cr,
+					'ma'  : subscription.ma, # EXPERIMENTAL ma = maxAge
+				  }
+			docIDs = self.tabSubscriptions.upsert(doc, self.subscriptionQuery.ri == ri)
+			self._journal('subscriptions', self.tabSubscriptions, docIDs)
+			return doc if docIDs is not None else None
+
+
+	def removeSubscription(self, subscription:Resource) -> bool:
+		with self._writing(self.lockSubscriptions):
+			docIDs = self.tabSubscriptions.remove(self.subscriptionQuery.ri == subscription.ri)
+			self._journal('subscriptions', self.tabSubscriptions, docIDs)
+			return len(docIDs) > 0
+
+
+	#
+	#	BatchNotifications
+	#
+
+	def addBatchNotification(self, ri:str, nu:str, notificationRequest:JSON) -> bool:
+		with self._writing(self.lockBatchNotifications):
+			docID = self.tabBatchNotifications.insert(
+					{	'ri' 		: ri,
+						'nu' 		: nu,
+						'tstamp'	: DateUtils.utcTime(),
+						'request'	: notificationRequest
+					})
+			self._journal('batchNotifications', self.tabBatchNotifications, [ docID ])
+			return docID is not None
+
+
+	def countBatchNotifications(self, ri:str, nu:str) -> int:
+		with self.lockBatchNotifications:
+			return self.tabBatchNotifications.count((self.batchNotificationQuery.ri == ri) & (self.batchNotificationQuery.nu == nu))
+
+
+	def getBatchNotifications(self, ri:str, nu:str) -> list[Document]:
+		with self.lockBatchNotifications:
+			return self.tabBatchNotifications.search((self.batchNotificationQuery.ri == ri) & (self.batchNotificationQuery.nu == nu))
+
+
+	def removeBatchNotifications(self, ri:str, nu:str) -> bool:
+		with self._writing(self.lockBatchNotifications):
+			docIDs = self.tabBatchNotifications.remove((self.batchNotificationQuery.ri == ri) & (self.batchNotificationQuery.nu == nu))
+			self._journal('batchNotifications', self.tabBatchNotifications, docIDs)
+			return len(docIDs) > 0
+
+
+	#
+	#	Statistics
+	#
+
+	def searchStatistics(self) -> JSON:
+		with self.lockStatistics:
+			stats = self.tabStatistics.get(doc_id = 1)
+			# return stats if stats is not None and len(stats) > 0 else None
+			return stats if stats else None
+
+
+	def upsertStatistics(self, stats:JSON) -> bool:
+		with self._writing(self.lockStatistics):
+			if len(self.tabStatistics) > 0:
+				docIDs = self.tabStatistics.update(stats, doc_ids = [1])
+			else:
+				docIDs = [ self.tabStatistics.insert(stats) ]
+			self._journal('statistics', self.tabStatistics, docIDs)
+			return docIDs is not None
+
+
+	def purgeStatistics(self) -> None:
+		"""	Purge the statistics DB.
+		"""
+		with self._writing(self.lockStatistics):
+			self.tabStatistics.truncate()
+			self._journal('statistics', self.tabStatistics)
+
+
+
+
+#########################################################################
+#
+#	Journal for TinyDB databases in write-behind mode
+#
+
+class TinyDBJournal(object):
+	"""	Append-only journal for TinyDB databases that are held in memory, but
+		that are persisted in JSON snapshot files.
+
+		Each change to a document is appended as a single JSON line to the journal file. The file
+		is synced to the disk by `sync()`, which is called outside of the database locks. The journal
+		is regularly compacted by writing the databases to their snapshot files and starting a new
+		journal. On startup the snapshot files are loaded and the journal is replayed.
+	"""
+
+	def __init__(self, fileName:str, databases:dict[str, Tuple[TinyDB, str]], locks:list[Lock]) -> None:
+		"""	Initialize the journal.
+
+			Args:
+				fileName: Path and filename of the journal file.
+				databases: Dictionary of database names mapped to tuples (TinyDB with a *MemoryStorage*, snapshot file name).
+				locks: List of all locks that protect the databases. They are acquired in this order during a compaction.
+		"""
+		self.fileName			= fileName
+		self.previousFileName	= f'{fileName}.prev'	# The journal until the last compaction, while its snapshot files are written
+		self.databases			= databases
+		self.locks				= locks
+		self.lock				= Lock()	# Protects the journal file
+		self.syncLock			= Lock()	# Only one sync at a time. Acquired before the journal lock
+		self.compactionLock		= Lock()	# Only one compaction at a time
+		self.appended			= 0			# Number of appends to the journal
+		self.synced				= 0			# Number of appends that are synced to the disk
+		self.file:TextIO = None
+
+
+	def load(self) -> None:
+		"""	Load the snapshot files into the in-memory databases, replay the journal,
+			and then compact the journal.
+		"""
+		data:dict[str, JSON] = {}
+		for name, (_, fileName) in self.databases.items():
+			data[name] = {}
+			if os.path.isfile(fileName):
+				with open(fileName) as file:
+					if (content := file.read().strip()):	# TinyDB creates empty files for empty databases
+						data[name] = json.loads(content)
+		
+		# Replay the journals. A previous journal is left when the CSE stopped during a compaction
+		count = 0
+		for fileName in [ self.previousFileName, self.fileName ]:
+			if not os.path.isfile(fileName):
+				continue
+			with open(fileName) as file:
+				for line in file:
+					try:
+						entry = json.loads(line)
+					except ValueError:
+						L.isWarn and L.logWarn(f'Incomplete entry in DB journal (ignoring the rest): {fileName}')
+						break
+					table = data[entry['db']].setdefault(entry['tb'], {})
+					if entry.get('truncate'):
+						table.clear()
+					elif (doc := entry['doc']) is None:
+						table.pop(str(entry['id']), None)
+					else:
+						table[str(entry['id'])] = doc
+					count += 1
+		L.isInfo and L.log(f'Replayed {count} DB journal entries')
+
+		for name, (db, _) in self.databases.items():
+			db.storage.write(data[name])
+		self.file = open(self.fileName, 'a')
+		self.compact()
+
+
+	def close(self) -> None:
+		"""	Close the journal file.
+		"""
+		with self.syncLock, self.lock:
+			if self.file:
+				self.file.close()
+				self.file = None
+
+
+	def append(self, database:str, table:Table, docIDs:list[int] = None) -> int:
+		"""	Append the current state of changed documents to the journal.
+
+			Args:
+				database: Name of the database.
+				table: The table that contains the documents.
+				docIDs: List of changed document IDs. Documents that are not present in the table anymore are recorded as removed. If this is None then the table was truncated.
+			Return:
+				The size of the journal file after the append. The appended entries are not synced to the disk yet.
+		"""
+		if docIDs is None:
+			lines = json.dumps({ 'db': database, 'tb': table.name, 'truncate': True }) + '\n'
+		else:
+			lines = ''.join([ json.dumps({ 'db': database, 'tb': table.name, 'id': docID, 'doc': table.get(doc_id = docID) }) + '\n' for docID in docIDs ])
+		with self.lock:
+			self.file.write(lines)
+			self.file.flush()
+			self.appended += 1
+			return self.file.tell()
+
+
+	def sync(self) -> None:
+		"""	Sync the journal file to the disk, if there are appends that are not synced yet.
+
+			Concurrent callers share a sync (group commit): A caller that waited while another caller
+			synced the file returns without syncing again when its appends were covered by that sync.
+
+			This method must not be called while holding a database lock.
+		"""
+		with self.lock:
+			appended = self.appended
+		with self.syncLock:
+			if self.synced >= appended:
+				return
+			with self.lock:
+				if not self.file:
+					return
+				appended = self.appended
+				fileno = self.file.fileno()
+			os.fsync(fileno)	# The file can't be closed meanwhile, because this requires the sync lock
+			self.synced = appended
+
+
+	def compact(self) -> None:
+		"""	Write all databases to their snapshot files and start a new journal.
+
+			The databases are serialized and the new journal is started while all database locks
+			are held. The snapshot files are written and synced afterwards, without blocking the 
+			access to the databases. The previous journal is only removed then, so that it is
+			replayed again if the CSE stops before the snapshot files are complete.
+		"""
+		with self.compactionLock:
+			for lock in self.locks:
+				lock.acquire()
+			try:
+				with self.syncLock, self.lock:
+					if not self.file:
+						return
+					snapshots = [ (fileName, json.dumps(db.storage.read() or {})) for db, fileName in self.databases.values() ]
+					self._startNewJournal()
+			finally:
+				for lock in reversed(self.locks):
+					lock.release()
+
+			for fileName, snapshot in snapshots:
+				with open(tmpFileName := f'{fileName}.tmp', 'w') as file:
+					file.write(snapshot)
+					file.flush()
+					os.fsync(file.fileno())
+				os.replace(tmpFileName, fileName)
+			os.remove(self.previousFileName)
+		L.isDebug and L.logDebug('DB journal compacted')
+
+
+	def _startNewJournal(self) -> None:
+		"""	Keep the current journal as the previous journal and start a new, empty one.
+			If there is still a previous journal then the current journal is appended to it.
+			This method must be called while holding the sync lock and the journal lock.
+		"""
+		os.fsync(self.file.fileno())	# All appends are in the previous journal now
+		self.synced = self.appended
+		self.file.close()
+		if os.path.isfile(self.previousFileName):
+			with open(self.fileName) as current, open(self.previousFileName, 'a') as previous:
+				shutil.copyfileobj(current, previous)
+				previous.flush()
+				os.fsync(previous.fileno())
+			os.remove(self.fileName)
+		else:
+			os.replace(self.fileName, self.previousFileName)
+		self.file = open(self.fileName, 'a')
+
+
+
+#########################################################################
+#
+#	Secondary index for TinyDB tables
+#
+
+class DocumentIndex(object):
+	"""	In-memory secondary index that maps the values of some attributes of
+		the documents in a TinyDB table to the IDs of those documents.
+
+		The index must be kept in sync by the owner of the table, ie. each insert, update
+		and remove of a document must be reflected by calling `add()` or `remove()`.
+		Only attribute values that are strings or integers are indexed.
+	"""
+
+	def __init__(self, attributes:list[str]) -> None:
+		"""	Initialize the index.
+
+			Args:
+				attributes: List of attribute names to index.
+		"""
+		self.attributes = attributes
+		self.indexes:dict[str, dict[Any, set[int]]] = { a: {} for a in attributes }	# attribute -> value -> doc IDs
+		self.documents:dict[int, tuple] = {}											# doc ID -> indexed values
+
+
+	def clear(self) -> None:
+		"""	Remove all entries from the index.
+		"""
+		for index in self.indexes.values():
+			index.clear()
+		self.documents.clear()
+
+
+	def rebuild(self, table:Table) -> None:
+		"""	Rebuild the index from all the documents of a table.
+
+			Args:
+				table: The TinyDB table to index.
+		"""
+		self.clear()
+		for doc in table.all():
+			self.add(doc.doc_id, doc)
+		L.isDebug and L.logDebug(f'Rebuilt index for table: {table.name} ({len(self.documents)} documents)')
+
+
+	def add(self, docID:int, doc:JSON) -> None:
+		"""	Add or replace the index entries for a document.
+
+			Args:
+				docID: The document's ID.
+				doc: The document.
+		"""
+		self.remove(docID)	# Remove old entries first, values may have changed
+		values = tuple(v if isinstance(v := doc.get(a), (str, int)) else None for a in self.attributes)
+		self.documents[docID] = values
+		for attribute, value in zip(self.attributes, values):
+			if value is not None:
+				self.indexes[attribute].setdefault(value, set()).add(docID)
+
+
+	def remove(self, docID:int) -> None:
+		"""	Remove the index entries for a document.
+
+			Args:
+				docID: The document's ID.
+		"""
+		if (values := self.documents.pop(docID, None)) is None:
+			return
+		for attribute, value in zip(self.attributes, values):
+			if value is not None and (docIDs := self.indexes[attribute].get(value)) is not None:
+				docIDs.discard(docID)
+				if not docIDs:
+					del self.indexes[attribute][value]
+
+
+	def lookup(self, attribute:str, value:Any) -> set[int]:
+		"""	Return the IDs of the documents with a specific attribute value.
+
+			Args:
+				attribute: Name of an indexed attribute.
+				value: The value to look for.
+			Return:
+				Set of document IDs. This set must not be modified by the caller.
+		"""
+		return self.indexes[attribute].get(value, set())
+
+
+	def lookupOne(self, attribute:str, value:Any) -> int:
+		"""	Return the ID of a single document with a specific attribute value.
+
+			Args:
+				attribute: Name of an indexed attribute.
+				value: The value to look for.
+			Return:
+				A document ID, or None if no document is indexed for this value.
+		"""
+		if docIDs := self.indexes[attribute].get(value):
+			return next(iter(docIDs))
+		return None
+
+
+	def candidates(self, dct:JSON) -> set[int]:
+		"""	Determine the candidate documents for a fragment search.
+
+			Args:
+				dct: Dictionary with attribute/value pairs that all must match.
+			Return:
+				Set of document IDs that match all the indexed attributes in *dct*, or None if *dct* does not contain any indexed attribute.
+		"""
+		result:set[int] = None
+		for attribute, value in dct.items():
+			if attribute in self.indexes and isinstance(value, (str, int)):
+				docIDs = self.lookup(attribute, value)
+				result = docIDs if result is None else result & docIDs
+		return result
+
+
+
+#########################################################################
+#
+#	DB class that implements the SQLite binding
+#
+
+class SQLiteBinding(object):
+	"""	Database binding that stores the resources and the other CSE data in
+		SQLite tables. It implements the same methods as the `TinyDBBinding` class.
+
+		The attributes that are used for lookups (e.g. *ri*, *pi*, *ty*) are stored in
+		indexed columns, while the full resource is stored as JSON in the *body* column.
+		All statements are parameterized, so that they are compiled only once and then taken
+		from the connection's statement cache.
+	"""
+
+	tableNames = [ 'resources', 'identifiers', 'subscriptions', 'batchNotifications', 'statistics' ]
+	"""	Names of all tables in the database. """
+
+	# Resource columns that are stored in addition to the JSON body. 
+	# The key is the column name, the value is the attribute name in the resource.
+	resourceColumns = {	'ri'	: 'ri',
+						'pi'	: 'pi',
+						'ty'	: 'ty',
+						'srn'	: '__srn__',
+						'et'	: 'et',
+						'ct'	: 'ct',
+						'csi'	: 'csi',
+						'aei'	: 'aei',
+					  }
+
+	maxQueryParameters = 500
+	"""	Maximum number of parameters in a single *IN* query. """
+
+	def __init__(self, path:str = None, postfix:str = '') -> None:
+		self.path = path
+
+		# create transaction lock. SQLite serializes the access to the connection, 
+		# but transactions must not interleave
+		self.lockDB	= Lock()
+
+		# file name
+		self.fileDB	= f'{self.path}/acme{postfix}.db'
+
+		if Configuration.get('db.inMemory'):
+			L.isInfo and L.log('DB in memory (SQLite)')
+			self.connection = sqlite3.connect(':memory:', check_same_thread = False, cached_statements = 256)
+		else:
+			L.isInfo and L.log(f'DB in file system (SQLite): {self.fileDB}')
+			self.connection = sqlite3.connect(self.fileDB, check_same_thread = False, cached_statements = 256)
+			self.connection.execute('PRAGMA journal_mode = WAL')
+			self.connection.execute('PRAGMA synchronous = NORMAL')
+		
+		# Create tables and indexes
+		with self.lockDB, self.connection:
+			self.connection.executescript('''
+				CREATE TABLE IF NOT EXISTS resources (ri TEXT PRIMARY KEY, pi TEXT, ty INTEGER, srn TEXT, et TEXT, ct TEXT, csi TEXT, aei TEXT, body TEXT NOT NULL);
+				CREATE INDEX IF NOT EXISTS resources_pi_ty ON resources (pi, ty);
+				CREATE INDEX IF NOT EXISTS resources_ty ON resources (ty);
+				CREATE INDEX IF NOT EXISTS resources_srn ON resources (srn);
+				CREATE INDEX IF NOT EXISTS resources_et ON resources (et);
+				CREATE INDEX IF NOT EXISTS resources_ct ON resources (ct);
+				CREATE INDEX IF NOT EXISTS resources_csi ON resources (csi);
+				CREATE INDEX IF NOT EXISTS resources_aei ON resources (aei);
+				CREATE TABLE IF NOT EXISTS identifiers (ri TEXT PRIMARY KEY, rn TEXT, srn TEXT, ty INTEGER);
+				CREATE INDEX IF NOT EXISTS identifiers_srn ON identifiers (srn);
+				CREATE TABLE IF NOT EXISTS subscriptions (ri TEXT PRIMARY KEY, pi TEXT, body TEXT NOT NULL);
+				CREATE INDEX IF NOT EXISTS subscriptions_pi ON subscriptions (pi);
+				CREATE TABLE IF NOT EXISTS batchNotifications (id INTEGER PRIMARY KEY AUTOINCREMENT, ri TEXT, nu TEXT, body TEXT NOT NULL);
+				CREATE INDEX IF NOT EXISTS batchNotifications_ri_nu ON batchNotifications (ri, nu);
+				CREATE TABLE IF NOT EXISTS statistics (id INTEGER PRIMARY KEY, body TEXT NOT NULL);
+			''')
+
+
+	def closeDB(self) -> None:
+		L.isInfo and L.log('Closing DBs')
+		with self.lockDB:
+			self.connection.close()
+
+
+	def purgeDB(self) -> None:
+		L.isInfo and L.log('Purging DBs')
+		with self.lockDB, self.connection:
+			for table in self.tableNames:
+				self.connection.execute(f'DELETE FROM {table}')
+	
+
+	def backupDB(self, dir:str) -> bool:
+		if Configuration.get('db.inMemory'):
+			return True
+		with self.lockDB:
+			backup = sqlite3.connect(f'{dir}/{os.path.basename(self.fileDB)}')
+			try:
+				self.connection.backup(backup)
+			finally:
+				backup.close()
+		return True
+
+
+	def migrateFromTinyDB(self, path:str, postfix:str = '') -> bool:
+		"""	Import the content of the TinyDB database files into the SQLite tables.
+			Existing entries with the same resource IDs are replaced.
+
+			Args:
+				path: Directory of the TinyDB database files.
+				postfix: Postfix of the TinyDB database file names.
+			Return:
+				True if the migration succeeded.
+		"""
+
+		def _readTable(fileName:str, table:str) -> list[JSON]:
+			if not os.path.isfile(fn := f'{path}/{fileName}{postfix}.json'):
+				L.isWarn and L.logWarn(f'DB file not found (skipping migration): {fn}')
+				return []
+			with open(fn) as file:
+				if not (content := file.read().strip()):	# TinyDB creates empty files for empty databases
+					return []
+				docs = json.loads(content).get(table, {})
+			return [ docs[k] for k in sorted(docs, key = int) ]	# keep the insertion order of the documents
+		
+		L.isInfo and L.log(f'Migrating TinyDB files from: {path}')
+		try:
+			resources		= _readTable('resources', 'resources')
+			identifiers		= _readTable('identifiers', 'identifiers')
+			subscriptions	= _readTable('subscriptions', 'subsriptions')	# Name of the TinyDB table
+			batchNotifications = _readTable('batchNotifications', 'batchNotifications')
+			statistics		= _readTable('statistics', 'statistics')
+			with self.lockDB, self.connection:
+				self.connection.executemany(self._sqlUpsertResource, [ self._resourceRow(doc) for doc in resources ])
+				self.connection.executemany(self._sqlUpsertIdentifier, [ (doc['ri'], doc.get('rn'), doc.get('srn'), doc.get('ty')) for doc in identifiers ])
+				self.connection.executemany(self._sqlUpsertSubscription, [ (doc['ri'], doc.get('pi'), json.dumps(doc)) for doc in subscriptions ])
+				self.connection.executemany('INSERT INTO batchNotifications (ri, nu, body) VALUES (?, ?, ?)', [ (doc.get('ri'), doc.get('nu'), json.dumps(doc)) for doc in batchNotifications ])
+				if statistics:
+					self.connection.execute(self._sqlUpsertStatistics, (json.dumps(statistics[0]), ))
+		except Exception as e:
+			L.logErr(f'Error migrating TinyDB files: {e}', exc = e)
+			return False
+		L.isInfo and L.log(f'Migrated {len(resources)} resources, {len(identifiers)} identifiers, {len(subscriptions)} subscriptions, {len(batchNotifications)} batch notifications')
+		return True
+
+
+	#
+	#	Resources
+	#
+
+	_sqlInsertResource	= 'INSERT INTO resources (ri, pi, ty, srn, et, ct, csi, aei, body) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'
+	# Upserts update an existing row in place, so that its rowid (the doc_id and the insertion order) doesn't change.
+	# "INSERT OR REPLACE" would delete the row and insert it again at the end.
+	_sqlUpsertResource	= 'INSERT INTO resources (ri, pi, ty, srn, et, ct, csi, aei, body) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(ri) DO UPDATE SET pi = excluded.pi, ty = excluded.ty, srn = excluded.srn, et = excluded.et, ct = excluded.ct, csi = excluded.csi, aei = excluded.aei, body = excluded.body'
+	_sqlResourceBody	= 'SELECT body FROM resources WHERE ri = ?'
+
+
+	def _resourceRow(self, doc:JSON) -> tuple:
+		"""	Build a row for the resources table from a resource document.
+			
+			Args:
+				doc: The resource document.
+			Return:
+				Tuple with the values for the indexed columns and the JSON body.
+		"""
+		return tuple(doc.get(a) for a in self.resourceColumns.values()) + (json.dumps(doc), )
+
+
+	def _mergeResource(self, resource:Resource, insert:bool = True) -> JSON:
+		"""	Merge the resource's attributes into the stored document. Attributes
+			with a None value are removed from the stored document and the resource.
+
+			This method must be called while holding the DB lock.
+
+			Args:
+				resource: The resource to merge.
+				insert: If False then None is returned if the resource is not stored yet.
+			Return:
+				The merged document, or None.
+		"""
+		doc:JSON = {}
+		if (row := self.connection.execute(self._sqlResourceBody, (resource.ri, )).fetchone()):
+			doc = json.loads(row[0])
+		elif not insert:
+			return None
+		doc.update(resource.dict)
+		for k in list(resource.dict):
+			if resource.dict[k] is None:	# only remove the real None attributes, not those with 0
+				del doc[k]
+		return doc
+
+
+	def insertResource(self, resource: Resource) -> None:
+		with self.lockDB, self.connection:
+			self.connection.execute(self._sqlInsertResource, self._resourceRow(resource.dict))
+	
+
+	def insertResources(self, resources:list[Resource]) -> None:
+		with self.lockDB, self.connection:
+			self.connection.executemany(self._sqlInsertResource, [ self._resourceRow(resource.dict) for resource in resources ])
+			self.connection.executemany(self._sqlUpsertIdentifier, [ (resource.ri, resource.rn, resource.__srn__, resource.ty) for resource in resources ])
+
+
+	def upsertResource(self, resource: Resource) -> None:
+		with self.lockDB, self.connection:
+			self.connection.execute(self._sqlUpsertResource, self._resourceRow(self._mergeResource(resource)))
+	
+
+	def updateResource(self, resource: Resource) -> Resource:
+		with self.lockDB, self.connection:
+			if (doc := self._mergeResource(resource, insert = False)) is None:
+				return resource		# Only update existing resources
+			self.connection.execute(self._sqlUpsertResource, self._resourceRow(doc))
+		# remove nullified fields from the resource
+		for k in list(resource.dict):
+			if resource.dict[k] is None:	# only remove the real None attributes, not those with 0
+				del resource.dict[k]
+		return resource
+
+
+	def deleteResource(self, resource: Resource) -> None:
+		with self.lockDB, self.connection:
+			self.connection.execute('DELETE FROM resources WHERE ri = ?', (resource.ri, ))
+	
+
+	def searchResources(self, ri:str = None, csi:str = None, srn:str = None, pi:str = None, ty:int = None, aei:str = None) -> list[Document]:
+		if srn:
+			# for SRN find the ri first and then try again
+			if len((identifiers := self.searchIdentifiers(srn = srn))) == 1:
+				return self.searchResources(ri = identifiers[0]['ri'])
+			return []
+		if ri:
+			return self._queryResources('ri = ?', (ri, ))
+		elif csi:
+			return self._queryResources('csi = ?', (csi, ))
+		elif pi:
+			if ty is not None:	# ty is an int
+				return self._queryResources('pi = ? AND ty = ?', (pi, ty))
+			return self._queryResources('pi = ?', (pi, ))
+		elif ty is not None:	# ty is an int
+			return self._queryResources('ty = ?', (ty, ))
+		elif aei:
+			return self._queryResources('aei = ?', (aei, ))
+		return []
+
+
+	def _queryResources(self, where:str, parameters:tuple) -> list[Document]:
+		"""	Return the resources that match a WHERE clause, in insertion order.
+
+			Args:
+				where: The WHERE clause, with "?" placeholders.
+				parameters: The values for the placeholders.
+			Return:
+				List of documents.
+		"""
+		with self.lockDB:
+			rows = self.connection.execute(f'SELECT rowid, body FROM resources WHERE {where} ORDER BY rowid', parameters).fetchall()
+		return [ Document(json.loads(body), rowid) for rowid, body in rows ]
+
+
+	def searchResourcesByIDs(self, ris:Iterable[str]) -> list[Document]:
+		"""	Return the resources for a set of resource IDs, in insertion order.
+
+			Args:
+				ris: Resource IDs.
+			Return:
+				List of documents.
+		"""
+		ris = list(ris)
+		result:list[Document] = []
+		for i in range(0, len(ris), self.maxQueryParameters):
+			chunk = ris[i:i + self.maxQueryParameters]
+			result.extend(self._queryResources(f'ri IN ({",".join("?" * len(chunk))})', tuple(chunk)))
+		if len(ris) > self.maxQueryParameters:
+			result.sort(key = lambda doc: doc.doc_id)
+		return result
+
+
+	def discoverResourcesByFilter(self, func:Callable[[JSON], bool]) -> list[Document]:
+		with self.lockDB:
+			rows = self.connection.execute('SELECT rowid, body FROM resources ORDER BY rowid').fetchall()
+		return [ doc for rowid, body in rows if func(doc := Document(json.loads(body), rowid)) ]
+
+
+	def hasResource(self, ri: str = None, csi: str = None, srn: str = None, ty: int = None) -> bool:
+		if srn:
+			# find the ri first and then try again
+			if len((identifiers := self.searchIdentifiers(srn = srn))) == 1:
+				return self.hasResource(ri = identifiers[0]['ri'])
+			return False
+		with self.lockDB:
+			if ri:
+				return self.connection.execute('SELECT 1 FROM resources WHERE ri = ?', (ri, )).fetchone() is not None
+			elif csi:
+				return self.connection.execute('SELECT 1 FROM resources WHERE csi = ? LIMIT 1', (csi, )).fetchone() is not None
+			elif ty is not None:	# ty is an int
+				return self.connection.execute('SELECT 1 FROM resources WHERE ty = ? LIMIT 1', (ty, )).fetchone() is not None
+		return False
+
+
+	def countResources(self, ty:int = None) -> int:
+		with self.lockDB:
+			if ty is not None:
+				return self.connection.execute('SELECT COUNT(*) FROM resources WHERE ty = ?', (ty, )).fetchone()[0]
+			return self.connection.execute('SELECT COUNT(*) FROM resources').fetchone()[0]
+
+
+	def searchByFragment(self, dct:dict) -> list[Document]:
 		""" Search and return all resources that match the given dictionary/document. """
-		with self.lockResources:
-			return self.tabResources.search(self.resourceQuery.fragment(dct))
+		# Use the indexed columns to pre-select the resources
+		where = []
+		parameters = []
+		for column, attribute in self.resourceColumns.items():
+			if attribute in dct and isinstance(value := dct[attribute], (str, int)):
+				where.append(f'{column} = ?')
+				parameters.append(value)
+		docs = self._queryResources(' AND '.join(where), tuple(parameters)) if where else self.discoverResourcesByFilter(lambda _: True)
+		return [ doc for doc in docs if all(k in doc and doc[k] == v for k, v in dct.items()) ]
+
 
 	#
 	#	Identifiers
 	#
 
+	_sqlUpsertIdentifier = 'INSERT INTO identifiers (ri, rn, srn, ty) VALUES (?, ?, ?, ?) ON CONFLICT(ri) DO UPDATE SET rn = excluded.rn, srn = excluded.srn, ty = excluded.ty'
+
 
 	def insertIdentifier(self, resource:Resource, ri:str, srn:str) -> None:
-		# L.isDebug and L.logDebug({'ri' : ri, 'rn' : resource.rn, 'srn' : srn, 'ty' : resource.ty})		
-		with self.lockIdentifiers:
-			self.tabIdentifiers.upsert(
-				{	'ri' : ri, 
-					'rn' : resource.rn, 
-					'srn' : srn,
-					'ty' : resource.ty 
-				}, 
-				self.identifierQuery.ri == ri)
+		with self.lockDB, self.connection:
+			self.connection.execute(self._sqlUpsertIdentifier, (ri, resource.rn, srn, resource.ty))
 
 
 	def deleteIdentifier(self, resource:Resource) -> None:
-		with self.lockIdentifiers:
-			self.tabIdentifiers.remove(self.identifierQuery.ri == resource.ri)
+		with self.lockDB, self.connection:
+			self.connection.execute('DELETE FROM identifiers WHERE ri = ?', (resource.ri, ))
 
 
 	def searchIdentifiers(self, ri:str = None, srn:str = None) -> list[Document]:
@@ -538,51 +2644,57 @@ class TinyDBBinding(object):
 			Return:
 				A list of found identifier documents (see `insertIdentifier`), or an empty list if not found.
 		 """
-		with self.lockIdentifiers:
+		with self.lockDB:
 			if srn:
-				return self.tabIdentifiers.search(self.identifierQuery.srn == srn)
+				rows = self.connection.execute('SELECT rowid, ri, rn, srn, ty FROM identifiers WHERE srn = ?', (srn, )).fetchall()
 			elif ri:
-				return self.tabIdentifiers.search(self.identifierQuery.ri == ri)
-			return []
+				rows = self.connection.execute('SELECT rowid, ri, rn, srn, ty FROM identifiers WHERE ri = ?', (ri, )).fetchall()
+			else:
+				return []
+		return [ Document({ 'ri': ri, 'rn': rn, 'srn': srn, 'ty': ty }, rowid) for rowid, ri, rn, srn, ty in rows ]
 
 
 	#
 	#	Subscriptions
 	#
 
+	_sqlUpsertSubscription = 'INSERT INTO subscriptions (ri, pi, body) VALUES (?, ?, ?) ON CONFLICT(ri) DO UPDATE SET pi = excluded.pi, body = excluded.body'
+
 
 	def searchSubscriptions(self, ri:str=None, pi:str=None) -> list[Document]:
-		with self.lockSubscriptions:
+		with self.lockDB:
 			if ri:
-				return self.tabSubscriptions.search(self.subscriptionQuery.ri == ri)
-			if pi:
-				return self.tabSubscriptions.search(self.subscriptionQuery.pi == pi)
-			return None
-
-
-	def upsertSubscription(self, subscription:Resource) -> bool:
-		with self.lockSubscriptions:
-			ri = subscription.ri
-			return self.tabSubscriptions.upsert(
-					{	'ri'  : ri, 
-						'pi'  : subscription.pi,
-						'nct' : subscription.nct,
-						'net' : subscription['enc/net'],	# TODO perhaps store enc as a whole?
-						'atr' : subscription['enc/atr'],
-						'chty': subscription['enc/chty'],
-						'exc' : subscription.exc,
-						'ln'  : subscription.ln,
-						'nus' : subscription.nu,
-						'bn'  : subscription.bn,
-						'cr'  : subscription.cr,
-						'ma'  : subscription.ma, # EXPERIMENTAL ma = maxAge
-					}, 
-					self.subscriptionQuery.ri == ri) is not None
+				rows = self.connection.execute('SELECT rowid, body FROM subscriptions WHERE ri = ?', (ri, )).fetchall()
+			elif pi:
+				rows = self.connection.execute('SELECT rowid, body FROM subscriptions WHERE pi = ? ORDER BY rowid', (pi, )).fetchall()
+			else:
+				rows = self.connection.execute('SELECT rowid, body FROM subscriptions ORDER BY rowid').fetchall()
+		return [ Document(json.loads(body), rowid) for rowid, body in rows ]
+
+
+	def upsertSubscription(self, subscription:Resource) -> JSON:
+		ri = subscription.ri
+		doc = {	'ri'  : ri, 
+				'pi'  : subscription.pi,
+				'nct' : subscription.nct,
+				'net' : subscription['enc/net'],	# TODO perhaps store enc as a whole?
+				'atr' : subscription['enc/atr'],
+				'chty': subscription['enc/chty'],
+				'exc' : subscription.exc,
+				'ln'  : subscription.ln,
+				'nus' : subscription.nu,
+				'bn'  : subscription.bn,
+				'cr'  : subscription.cr,
+				'ma'  : subscription.ma, # EXPERIMENTAL ma = maxAge
+			  }
+		with self.lockDB, self.connection:
+			self.connection.execute(self._sqlUpsertSubscription, (ri, subscription.pi, json.dumps(doc)))
+		return doc
 
 
 	def removeSubscription(self, subscription:Resource) -> bool:
-		with self.lockSubscriptions:
-			return len(self.tabSubscriptions.remove(self.subscriptionQuery.ri == subscription.ri)) > 0
+		with self.lockDB, self.connection:
+			return self.connection.execute('DELETE FROM subscriptions WHERE ri = ?', (subscription.ri, )).rowcount > 0
 
 
 	#
@@ -590,52 +2702,55 @@ class TinyDBBinding(object):
 	#
 
 	def addBatchNotification(self, ri:str, nu:str, notificationRequest:JSON) -> bool:
-		with self.lockBatchNotifications:
-			return self.tabBatchNotifications.insert(
-					{	'ri' 		: ri,
-						'nu' 		: nu,
-						'tstamp'	: DateUtils.utcTime(),
-						'request'	: notificationRequest
-					}) is not None
+		doc = {	'ri' 		: ri,
+				'nu' 		: nu,
+				'tstamp'	: DateUtils.utcTime(),
+				'request'	: notificationRequest
+			  }
+		with self.lockDB, self.connection:
+			self.connection.execute('INSERT INTO batchNotifications (ri, nu, body) VALUES (?, ?, ?)', (ri, nu, json.dumps(doc)))
+		return True
 
 
 	def countBatchNotifications(self, ri:str, nu:str) -> int:
-		with self.lockBatchNotifications:
-			return self.tabBatchNotifications.count((self.batchNotificationQuery.ri == ri) & (self.batchNotificationQuery.nu == nu))
+		with self.lockDB:
+			return self.connection.execute('SELECT COUNT(*) FROM batchNotifications WHERE ri = ? AND nu = ?', (ri, nu)).fetchone()[0]
 
 
 	def getBatchNotifications(self, ri:str, nu:str) -> list[Document]:
-		with self.lockBatchNotifications:
-			return self.tabBatchNotifications.search((self.batchNotificationQuery.ri == ri) & (self.batchNotificationQuery.nu == nu))
+		with self.lockDB:
+			rows = self.connection.execute('SELECT id, body FROM batchNotifications WHERE ri = ? AND nu = ? ORDER BY id', (ri, nu)).fetchall()
+		return [ Document(json.loads(body), id) for id, body in rows ]
 
 
 	def removeBatchNotifications(self, ri:str, nu:str) -> bool:
-		with self.lockBatchNotifications:
-			return len(self.tabBatchNotifications.remove((self.batchNotificationQuery.ri == ri) & (self.batchNotificationQuery.nu == nu))) > 0
+		with self.lockDB, self.connection:
+			return self.connection.execute('DELETE FROM batchNotifications WHERE ri = ? AND nu = ?', (ri, nu)).rowcount > 0
 
 
 	#
 	#	Statistics
 	#
 
+	_sqlUpsertStatistics = 'INSERT INTO statistics (id, body) VALUES (1, ?) ON CONFLICT(id) DO UPDATE SET body = excluded.body'
+
+
 	def searchStatistics(self) -> JSON:
-		with self.lockStatistics:
-			stats = self.tabStatistics.get(doc_id = 1)
-			# return stats if stats is not None and len(stats) > 0 else None
-			return stats if stats else None
+		with self.lockDB:
+			row = self.connection.execute('SELECT body FROM statistics WHERE id = 1').fetchone()
+		return Document(stats, 1) if row and (stats := json.loads(row[0])) else None
 
 
 	def upsertStatistics(self, stats:JSON) -> bool:
-		with self.lockStatistics:
-			if len(self.tabStatistics) > 0:
-				return self.tabStatistics.update(stats, doc_ids = [1]) is not None
-			else:
-				return self.tabStatistics.insert(stats) is not None
+		with self.lockDB, self.connection:
+			if (row := self.connection.execute('SELECT body FROM statistics WHERE id = 1').fetchone()):
+				stats = { **json.loads(row[0]), **stats }	# update, same as in TinyDB
+			self.connection.execute(self._sqlUpsertStatistics, (json.dumps(stats), ))
+		return True
 
 
 	def purgeStatistics(self) -> None:
 		"""	Purge the statistics DB.
 		"""
-		with self.lockStatistics:
-			self.tabStatistics.truncate()
-
+		with self.lockDB, self.connection:
+			self.connection.execute('DELETE FROM statistics')
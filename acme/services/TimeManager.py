@@ -33,8 +33,8 @@ class TimeManager(object):
 			self.addPeriodicTimeSyncBeacon(each)
 		
 		# Register to receive events
-		CSE.event.addHandler(CSE.event.requestReceived, self.requestReveivedHandler)			# type: ignore
-		CSE.event.addHandler(CSE.event.responseReceived, self.responseReveivedHandler)			# type: ignore
+		CSE.event.addHandler(CSE.event.requestReceived, self.requestReveivedHandler, blocking = True)			# type: ignore
+		CSE.event.addHandler(CSE.event.responseReceived, self.responseReveivedHandler, blocking = True)			# type: ignore
 		
 		# Table for periodic timeSyncBeacons
 		self.periodicTimeSyncBeacons:dict[str, BackgroundWorker] = {}
@@ -0,0 +1,23 @@
+#
+#	testsDisableAsyncSubscriptionNotifications.as
+#
+#	This script is supposed to be called by the test system via the upper tester interface
+#
+
+@name disableAsyncSubscriptionNotifications
+@description (Tests) Restore the sending of subscription notifications
+@usage disableAsyncSubscriptionNotifications
+@uppertester
+
+if [> [argc] 0]
+	logError Wrong number of arguments: disableAsyncSubscriptionNotifications
+	quitWithError
+endif
+
+##################################################################
+
+# Restore the CSE's notification mode
+if [storageHas cse.operation.asyncSubscriptionNotifications]
+	setConfig cse.operation.asyncSubscriptionNotifications [storageGet cse.operation.asyncSubscriptionNotifications]
+	storageRemove cse.operation.asyncSubscriptionNotifications
+endif
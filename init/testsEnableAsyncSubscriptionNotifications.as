@@ -0,0 +1,23 @@
+#
+#	testsEnableAsyncSubscriptionNotifications.as
+#
+#	This script is supposed to be called by the test system via the upper tester interface
+#
+
+@name enableAsyncSubscriptionNotifications
+@description (Tests) Enable asynchronous sending of subscription notifications
+@usage enableAsyncSubscriptionNotifications
+@uppertester
+
+if [> [argc] 0]
+	logError Wrong number of arguments: enableAsyncSubscriptionNotifications
+	quitWithError
+endif
+
+##################################################################
+
+# Store and then set the CSE's notification mode
+storagePut cse.operation.asyncSubscriptionNotifications [cse.operation.asyncSubscriptionNotifications]
+setConfig cse.operation.asyncSubscriptionNotifications true
+
+quit [storageGet cse.operation.asyncSubscriptionNotifications]
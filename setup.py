@@ -35,7 +35,7 @@ setup(
 		'plotext',
 		'requests', 
 		'rich', 
-		'tinydb',
+		'tinydb>=4.8.0',
 		#'package1 @ git+https://github.com/CITGuru/PyInquirer.git@9d598a53fd17a9bc42efff33183cd2d141a5c949'
 	],
     entry_points={
@@ -108,3 +108,11 @@ NOTIFICATIONSERVERW	= f'{NOTIFICATIONPROTOCOL}://localhost:6666'
 UTURL = f'{CONFIGSERVER}{ROOTPATH}__ut__'
 UTCMD = 'X-M2M-UTCMD'
 UTRSP = 'X-M2M-UTRSP'
+
+
+#
+#	Statistics
+#
+
+STATSURL = f'{CONFIGSERVER}{ROOTPATH}__stats__'
+METRICSURL = f'{CONFIGSERVER}{ROOTPATH}__metrics__'
@@ -540,6 +540,20 @@ def connectionPossible(url:str) -> bool:
 		print(e)
 		return False
 
+
+def isEndpointEnabled(response:requests.Response) -> bool:
+	"""	Check whether a response was returned by an enabled extra http endpoint of the CSE, e.g.
+		the statistics endpoint. A request to an endpoint that is not enabled is handled as a
+		oneM2M request instead, and its response contains a response status code header.
+
+		Args:
+			response: The response to a request to the endpoint.
+
+		Return:
+			True if the endpoint is enabled.
+	"""
+	return response.status_code != 404 and C.hfRSC not in response.headers
+
 _lastHeaders:Parameters = None
 
 def setLastHeaders(hds:Parameters) -> None:
@@ -644,6 +658,24 @@ def isShortRequestExpirations() -> bool:
 	"""
 	return _orgRequestExpirationDelta != -1.0
 
+
+def enableAsyncSubscriptionNotifications() -> bool:
+	"""	Enable the asynchronous sending of subscription notifications in the CSE.
+
+		Return:
+			True if the CSE could be reconfigured.
+	"""
+	# Send UT request
+	resp = requests.post(UTURL, headers = { UTCMD: f'enableAsyncSubscriptionNotifications'})
+	return resp.status_code == 200
+
+
+def disableAsyncSubscriptionNotifications() -> None:
+	"""	Restore the CSE's configuration for sending subscription notifications.
+	"""
+	# Send UT request
+	requests.post(UTURL, headers = { UTCMD: f'disableAsyncSubscriptionNotifications'})
+
 ###############################################################################
 
 # Surpress warnings for insecure requests, e.g. self-signed certificates
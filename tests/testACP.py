@@ -19,6 +19,8 @@ ae1URL = f'{cseURL}/{ae1RN}'
 ae2RN = f'{aeRN}2'
 ae2URL = f'{cseURL}/{ae2RN}'
 cnt2URL = f'{ae2URL}/{cntRN}'
+acp2RN = f'{acpRN}2'
+acp2URL = f'{cseURL}/{acp2RN}'
 
 
 class TestACP(unittest.TestCase):
@@ -28,6 +30,7 @@ class TestACP(unittest.TestCase):
 	acpORIGINATOR3 			= 'CtestOriginator3'
 	acpORIGINATORWC 		= 'Canother*'
 	acpORIGINATORWC2		= 'Cyet*Originator'
+	acpORIGINATOR4 			= 'CtestOriginator4'	# Only granted by the second <ACP>
 	
 	# Originators for wildcard tests
 	acpORIGINATORWCTest 	= 'CanotherOriginator'
@@ -48,6 +51,7 @@ class TestACP(unittest.TestCase):
 	@unittest.skipIf(noCSE, 'No CSEBase')
 	def tearDownClass(cls) -> None:
 		DELETE(acpURL, ORIGINATOR)	# Just delete the AE. Ignore whether it exists or not
+		DELETE(acp2URL, ORIGINATOR)
 		DELETE(aeURL, ORIGINATOR)	# Just delete the AE. Ignore whether it exists or not
 		DELETE(ae1URL, ORIGINATOR)
 		DELETE(ae2URL, ORIGINATOR)
@@ -247,6 +251,97 @@ class TestACP(unittest.TestCase):
 		self.assertEqual(rsc, RC.originatorHasNoPrivilege, r)
 
 
+	@unittest.skipIf(noCSE, 'No CSEBase')
+	def test_updateACPChangesAccess(self) -> None:
+		"""	Update <ACP> privileges and check that access changes accordingly """
+		acr = findXPath(TestACP.acp, 'm2m:acp/pv/acr')
+		dct = 	{ 'm2m:acp' : {
+					'pv' : {
+						'acr': [ { 	'acor': [ self.acpORIGINATOR, self.acpORIGINATOR2, self.acpORIGINATOR3, self.acpORIGINATORWC, self.acpORIGINATORWC2, self.acpORIGINATORWC3Test ],
+									'acop': Permission.ALL
+								} ]
+					}
+				}}
+		r, rsc = UPDATE(acpURL, self.acpORIGINATOR, dct)
+		self.assertEqual(rsc, RC.updated, r)
+		dctAE =	{ 'm2m:ae': {
+					'lbl': [ '3Label' ]
+				}}
+		r, rsc = UPDATE(aeURL, self.acpORIGINATORWC3Test, dctAE)
+		self.assertEqual(rsc, RC.updated, r)
+
+		# Restore the original privileges
+		r, rsc = UPDATE(acpURL, self.acpORIGINATOR, { 'm2m:acp' : { 'pv' : { 'acr': acr }}})
+		self.assertEqual(rsc, RC.updated, r)
+		r, rsc = UPDATE(aeURL, self.acpORIGINATORWC3Test, dctAE)
+		self.assertEqual(rsc, RC.originatorHasNoPrivilege, r)
+
+
+	@unittest.skipIf(noCSE, 'No CSEBase')
+	def test_updateACPSelfPrivilegesChangesAccess(self) -> None:
+		"""	Update <ACP> self-privileges and check that access to the <ACP> changes accordingly """
+		r, rsc = RETRIEVE(acpURL, self.acpORIGINATOR3)
+		self.assertEqual(rsc, RC.originatorHasNoPrivilege, r)
+
+		acr = findXPath(TestACP.acp, 'm2m:acp/pvs/acr')
+		dct = 	{ 'm2m:acp' : {
+					'pvs' : {
+						'acr': [ { 	'acor': [ self.acpORIGINATOR, self.acpORIGINATOR2, self.acpORIGINATOR3 ],
+									'acop': Permission.ALL
+								} ]
+					}
+				}}
+		r, rsc = UPDATE(acpURL, self.acpORIGINATOR, dct)
+		self.assertEqual(rsc, RC.updated, r)
+		r, rsc = RETRIEVE(acpURL, self.acpORIGINATOR3)
+		self.assertEqual(rsc, RC.OK, r)
+
+		# Restore the original self-privileges
+		r, rsc = UPDATE(acpURL, self.acpORIGINATOR, { 'm2m:acp' : { 'pvs' : { 'acr': acr }}})
+		self.assertEqual(rsc, RC.updated, r)
+		r, rsc = RETRIEVE(acpURL, self.acpORIGINATOR3)
+		self.assertEqual(rsc, RC.originatorHasNoPrivilege, r)
+
+
+	@unittest.skipIf(noCSE, 'No CSEBase')
+	def test_updateAEACPIChangesAccess(self) -> None:
+		"""	Update <AE> ACPI and check that access changes accordingly """
+		dct = 	{ 'm2m:acp': {
+					'rn': acp2RN,
+					'pv': {
+						'acr': [ { 	'acor': [ self.acpORIGINATOR4 ],
+									'acop': Permission.RETRIEVE
+								} ]
+					},
+					'pvs': {
+						'acr': [ {
+							'acor': [ self.acpORIGINATOR ],
+							'acop': Permission.ALL
+						} ]
+					},
+				}}
+		acp2, rsc = CREATE(cseURL, ORIGINATOR, T.ACP, dct)
+		self.assertEqual(rsc, RC.created, acp2)
+		r, rsc = RETRIEVE(aeURL, self.acpORIGINATOR4)
+		self.assertEqual(rsc, RC.originatorHasNoPrivilege, r)
+
+		# Add the second <ACP> to the <AE>
+		acpi = [ findXPath(TestACP.acp, 'm2m:acp/ri') ]
+		r, rsc = UPDATE(aeURL, self.acpORIGINATOR, { 'm2m:ae': { 'acpi': acpi + [ findXPath(acp2, 'm2m:acp/ri') ] }})
+		self.assertEqual(rsc, RC.updated, r)
+		r, rsc = RETRIEVE(aeURL, self.acpORIGINATOR4)
+		self.assertEqual(rsc, RC.OK, r)
+
+		# Remove it again
+		r, rsc = UPDATE(aeURL, self.acpORIGINATOR, { 'm2m:ae': { 'acpi': acpi }})
+		self.assertEqual(rsc, RC.updated, r)
+		r, rsc = RETRIEVE(aeURL, self.acpORIGINATOR4)
+		self.assertEqual(rsc, RC.originatorHasNoPrivilege, r)
+
+		_, rsc = DELETE(acp2URL, ORIGINATOR)
+		self.assertEqual(rsc, RC.deleted)
+
+
 	@unittest.skipIf(noCSE, 'No CSEBase')
 	def test_updateACPEmptyPVSFail(self) -> None:
 		"""	Update <ACP> with empty PVS -> Fail """
@@ -675,6 +770,9 @@ def run(testVerbosity:int, testFailFast:bool) -> Tuple[int, int, int]:
 	suite.addTest(TestACP('test_updateAElblWithWildCardOriginator'))
 	suite.addTest(TestACP('test_updateAElblWithWildCardOriginator2'))
 	suite.addTest(TestACP('test_updateAElblWithWildCardOriginator3WrongFail'))
+	suite.addTest(TestACP('test_updateACPChangesAccess'))
+	suite.addTest(TestACP('test_updateACPSelfPrivilegesChangesAccess'))
+	suite.addTest(TestACP('test_updateAEACPIChangesAccess'))
 
 	suite.addTest(TestACP('test_createACPNoPVSFail'))
 	suite.addTest(TestACP('test_createACPEmptyPVSFail'))
@@ -0,0 +1,139 @@
+#
+#	testBackgroundWorker.py
+#
+#	(c) 2022 by Andreas Kraft
+#	License: BSD 3-Clause License. See the LICENSE file for further details.
+#
+#	Unit tests for the background worker scheduler
+#
+
+import unittest, sys, time
+if '..' not in sys.path:
+	sys.path.append('..')
+from typing import Callable, Tuple
+from threading import Event, Lock
+from acme.services import CSE	# The services must be imported via the CSE module
+from acme.helpers.BackgroundWorker import BackgroundWorkerPool
+from init import *
+
+# Maximum time in seconds to wait for a worker
+workerTimeout = 5.0
+
+
+class TestBackgroundWorker(unittest.TestCase):
+	"""	Tests for the scheduling of background workers. The workers are created in the test process,
+		independent of the CSE's workers.
+	"""
+
+	def setUp(self) -> None:
+		self.calls:list[str] = []
+		self.callsLock = Lock()
+
+
+	def tearDown(self) -> None:
+		BackgroundWorkerPool.stopWorkers('testWorker*')
+
+
+	def _callback(self, name:str, called:Event = None) -> Callable[[], bool]:
+		"""	Return a worker callback that records its calls.
+
+			Args:
+				name: Name that is recorded for each call.
+				called: Optional event that is set with each call.
+			Return:
+				The callback.
+		"""
+		def _work() -> bool:
+			with self.callsLock:
+				self.calls.append(name)
+			if called:
+				called.set()
+			return True
+		return _work
+
+
+	def test_schedulingOrder(self) -> None:
+		"""	Run workers in the order of their due times """
+		delays = [ 0.3, 0.1, 0.5, 0.2, 0.4 ]
+		called = [ Event() for _ in delays ]
+		for delay, event in zip(delays, called):
+			BackgroundWorkerPool.newWorker(delay, self._callback(str(delay), event), 'testWorker', startWithDelay = True, maxCount = 1).start()
+		for event in called:
+			self.assertTrue(event.wait(workerTimeout))
+		self.assertEqual(self.calls, [ str(delay) for delay in sorted(delays) ])
+
+
+	def test_earlierWorkerWakesScheduler(self) -> None:
+		"""	Run a worker that is queued before an already waiting, later worker """
+		BackgroundWorkerPool.newWorker(60.0, self._callback('late'), 'testWorkerLate', startWithDelay = True, maxCount = 1).start()
+		time.sleep(0.1)		# The scheduler now waits for the late worker
+		called = Event()
+		BackgroundWorkerPool.newWorker(0.1, self._callback('early', called), 'testWorkerEarly', startWithDelay = True, maxCount = 1).start()
+		self.assertTrue(called.wait(workerTimeout))
+		self.assertEqual(self.calls, [ 'early' ])
+
+
+	def test_cancelWorker(self) -> None:
+		"""	Don't run a worker that was stopped before it was due """
+		worker = BackgroundWorkerPool.newWorker(0.2, self._callback('cancelled'), 'testWorker', startWithDelay = True).start()
+		called = Event()
+		BackgroundWorkerPool.newWorker(0.4, self._callback('other', called), 'testWorker', startWithDelay = True, maxCount = 1).start()
+		worker.stop()
+		self.assertNotIn(worker.id, BackgroundWorkerPool.queuedWorkers)
+		self.assertTrue(called.wait(workerTimeout))
+		self.assertEqual(self.calls, [ 'other' ])
+
+
+	def test_rescheduleWorker(self) -> None:
+		"""	Run a worker earlier after it was restarted with a shorter interval """
+		called = Event()
+		worker = BackgroundWorkerPool.newWorker(60.0, self._callback('worker', called), 'testWorker', startWithDelay = True).start()
+		time.sleep(0.1)
+		self.assertFalse(called.is_set())
+		worker.restart(interval = 0.1)
+		self.assertTrue(called.wait(workerTimeout))
+		called.clear()
+		self.assertTrue(called.wait(workerTimeout))		# Runs again with the new interval
+		worker.stop()
+		self.assertNotIn(worker.id, BackgroundWorkerPool.queuedWorkers)
+
+
+	def test_workNow(self) -> None:
+		"""	Run a queued worker immediately """
+		called = Event()
+		worker = BackgroundWorkerPool.newWorker(60.0, self._callback('worker', called), 'testWorker', startWithDelay = True).start()
+		worker.workNow()
+		self.assertTrue(called.wait(workerTimeout))
+		self.assertTrue(worker.running)		# Continues with the normal schedule
+		worker.stop()
+
+
+	def test_cancelManyWorkers(self) -> None:
+		"""	Compact the queue after many workers were stopped, and still run the remaining workers """
+		workers = [ BackgroundWorkerPool.newWorker(60.0, self._callback('cancelled'), 'testWorker', startWithDelay = True).start() for _ in range(2500) ]
+		called = Event()
+		BackgroundWorkerPool.newWorker(0.2, self._callback('remaining', called), 'testWorker', startWithDelay = True, maxCount = 1).start()
+		for worker in workers:
+			worker.stop()
+		self.assertLess(len(BackgroundWorkerPool.workerQueue), len(workers))
+		self.assertTrue(called.wait(workerTimeout))
+		self.assertEqual(self.calls, [ 'remaining' ])
+
+
+def run(testVerbosity:int, testFailFast:bool) -> Tuple[int, int, int]:
+	suite = unittest.TestSuite()
+
+	suite.addTest(TestBackgroundWorker('test_schedulingOrder'))
+	suite.addTest(TestBackgroundWorker('test_earlierWorkerWakesScheduler'))
+	suite.addTest(TestBackgroundWorker('test_cancelWorker'))
+	suite.addTest(TestBackgroundWorker('test_rescheduleWorker'))
+	suite.addTest(TestBackgroundWorker('test_workNow'))
+	suite.addTest(TestBackgroundWorker('test_cancelManyWorkers'))
+
+	result = unittest.TextTestRunner(verbosity = testVerbosity, failfast = testFailFast).run(suite)
+	printResult(result)
+	return result.testsRun, len(result.errors + result.failures), len(result.skipped)
+
+if __name__ == '__main__':
+	_, errors, _ = run(2, True)
+	sys.exit(errors)
@@ -456,6 +456,92 @@ class TestCNT_CIN(unittest.TestCase):
 		self.assertNotEqual(findXPath(r, 'm2m:cin/ri'), findXPath(ol, 'm2m:cin/ri'))
 
 
+	@unittest.skipIf(noCSE, 'No CSEBase')
+	def test_bulkCreateCIN(self) -> None:
+		"""	Bulk CREATE 5 <CIN> under <CNT> with mni = 3 """
+		dct = 	{ 'm2m:cnt' : { 
+					'rn'  : cntRN,
+					'mni' : 3
+				}}
+		TestCNT_CIN.cnt, rsc = CREATE(aeURL, TestCNT_CIN.originator, T.CNT, dct)
+		self.assertEqual(rsc, RC.created, TestCNT_CIN.cnt)
+
+		dct = 	{ 'm2m:sub' : { 
+					'enc': {
+						'net': [ NotificationEventType.createDirectChild ]
+					},
+					'nu': [ NOTIFICATIONSERVER ]
+				}}
+		r, rsc = CREATE(cntURL, TestCNT_CIN.originator, T.SUB, dct)
+		self.assertEqual(rsc, RC.created, r)
+
+		clearLastNotification()
+		dctCIN = 	{ 'm2m:cin' : [ { 'con' : f'{i}' } for i in range(5) ] }
+		r, rsc = CREATE(cntURL, TestCNT_CIN.originator, T.CIN, dctCIN)
+		self.assertEqual(rsc, RC.OK, r)
+		self.assertIsNotNone(rsps := findXPath(r, 'm2m:agr/m2m:rsp'), r)
+		self.assertEqual(len(rsps), 5)
+		for i, rsp in enumerate(rsps):
+			self.assertEqual(findXPath(rsp, 'rsc'), RC.created, rsp)
+			self.assertEqual(findXPath(rsp, 'pc/m2m:cin/con'), f'{i}', rsp)
+			self.assertTrue(findXPath(rsp, 'to').startswith(f'{CSERN}/{aeRN}/{cntRN}/'), rsp)
+
+		# Only the latest 3 <CIN> remain
+		r, rsc = RETRIEVE(cntURL, TestCNT_CIN.originator)
+		self.assertEqual(rsc, RC.OK, r)
+		self.assertEqual(findXPath(r, 'm2m:cnt/cni'), 3, r)
+		self.assertEqual(findXPath(r, 'm2m:cnt/cbs'), 3, r)
+		r, rsc = RETRIEVE(f'{cntURL}/ol', TestCNT_CIN.originator)
+		self.assertEqual(rsc, RC.OK, r)
+		self.assertEqual(findXPath(r, 'm2m:cin/con'), '2', r)
+		r, rsc = RETRIEVE(f'{cntURL}/la', TestCNT_CIN.originator)
+		self.assertEqual(rsc, RC.OK, r)
+		self.assertEqual(findXPath(r, 'm2m:cin/con'), '4', r)
+
+		# The last notification is for the latest <CIN>
+		lastNotification = getLastNotification()
+		self.assertEqual(findXPath(lastNotification, 'm2m:sgn/nev/net'), NotificationEventType.createDirectChild, lastNotification)
+		self.assertEqual(findXPath(lastNotification, 'm2m:sgn/nev/rep/m2m:cin/con'), '4', lastNotification)
+
+
+	@unittest.skipIf(noCSE, 'No CSEBase')
+	def test_bulkCreateCINwithErrors(self) -> None:
+		"""	Bulk CREATE <CIN> with some wrong <CIN> """
+		r, rsc = RETRIEVE(cntURL, TestCNT_CIN.originator)
+		self.assertEqual(rsc, RC.OK, r)
+		st = findXPath(r, 'm2m:cnt/st')
+
+		dct = 	{ 'm2m:cin' : [ { 'con' : 'a', 'rn' : 'bulkCin' },
+								{ 'con' : 'b', 'rn' : 'bulkCin' },		# same rn
+								{ 'con' : 'c', 'wrong' : 'attribute' },	# unknown attribute
+								{ 'con' : 'd' }
+							  ] }
+		r, rsc = CREATE(cntURL, TestCNT_CIN.originator, T.CIN, dct)
+		self.assertEqual(rsc, RC.OK, r)
+		self.assertIsNotNone(rsps := findXPath(r, 'm2m:agr/m2m:rsp'), r)
+		self.assertEqual([ findXPath(rsp, 'rsc') for rsp in rsps ], [ RC.created, RC.conflict, RC.badRequest, RC.created ], r)
+		self.assertIsNotNone(findXPath(rsps[1], 'pc/m2m:dbg'), r)
+
+		# Only the created <CIN> count up the stateTags
+		self.assertEqual(findXPath(rsps[0], 'pc/m2m:cin/st'), st + 1, r)
+		self.assertEqual(findXPath(rsps[3], 'pc/m2m:cin/st'), st + 2, r)
+		r, rsc = RETRIEVE(cntURL, TestCNT_CIN.originator)
+		self.assertEqual(rsc, RC.OK, r)
+		self.assertEqual(findXPath(r, 'm2m:cnt/st'), st + 2, r)
+
+		r, rsc = RETRIEVE(f'{cntURL}/la', TestCNT_CIN.originator)
+		self.assertEqual(rsc, RC.OK, r)
+		self.assertEqual(findXPath(r, 'm2m:cin/con'), 'd', r)
+		self.assertEqual(findXPath(r, 'm2m:cin/st'), st + 2, r)
+
+
+	@unittest.skipIf(noCSE, 'No CSEBase')
+	def test_bulkCreateCINwrongTargetFail(self) -> None:
+		"""	Bulk CREATE <CIN> under <AE> -> Fail """
+		dct = 	{ 'm2m:cin' : [ { 'con' : 'a' } ] }
+		r, rsc = CREATE(aeURL, TestCNT_CIN.originator, T.CIN, dct)
+		self.assertEqual(rsc, RC.operationNotAllowed, r)
+
 
 def run(testVerbosity:int, testFailFast:bool) -> Tuple[int, int, int]:
 	suite = unittest.TestSuite()
@@ -490,6 +576,11 @@ def run(testVerbosity:int, testFailFast:bool) -> Tuple[int, int, int]:
 	suite.addTest(TestCNT_CIN('test_deleteCNTLA'))
 	suite.addTest(TestCNT_CIN('test_deleteCNT'))
 
+	suite.addTest(TestCNT_CIN('test_bulkCreateCIN'))
+	suite.addTest(TestCNT_CIN('test_bulkCreateCINwithErrors'))
+	suite.addTest(TestCNT_CIN('test_bulkCreateCINwrongTargetFail'))
+	suite.addTest(TestCNT_CIN('test_deleteCNT'))
+
 	result = unittest.TextTestRunner(verbosity=testVerbosity, failfast=testFailFast).run(suite)
 	printResult(result)
 	return result.testsRun, len(result.errors + result.failures), len(result.skipped)
@@ -425,6 +425,104 @@ class TestDiscovery(unittest.TestCase):
 		self.assertEqual(sum(x['typ'] == T.CNT for x in findXPath(r, 'm2m:rrl/rrf')), 2)
 		self.assertEqual(sum(x['typ'] == T.CIN for x in findXPath(r, 'm2m:rrl/rrf')), 10)
 
+	@unittest.skipIf(noCSE, 'No CSEBase')
+	def test_discoverCNTandCINunderAEOrder(self) -> None:
+		"""	Discover <CNT> and <CIN> under <AE> & rcn=11 in resource tree order """
+		r, rsc = RETRIEVE(f'{aeURL}?fu=1&rcn={int(RCN.discoveryResultReferences)}&ty={int(T.CNT)}&ty={int(T.CIN)}', TestDiscovery.originator)
+		self.assertEqual(rsc, RC.OK, r)
+		self.assertIsNotNone(uril := findXPath(r, 'm2m:uril'), r)
+		self.assertEqual(len(uril), 12, r)
+		self.assertEqual(uril[0].split('/')[-1], cntRN)
+		for each in uril[1:6]:
+			self.assertEqual(each.split('/')[-2], cntRN)
+		self.assertEqual(uril[6].split('/')[-1], cnt2RN)
+		for each in uril[7:]:
+			self.assertEqual(each.split('/')[-2], cnt2RN)
+
+
+	@unittest.skipIf(noCSE, 'No CSEBase')
+	def test_discoverCINunderAEWithLim(self) -> None:
+		"""	Discover <CIN> under <AE> & lim """
+		r, rsc = RETRIEVE(f'{aeURL}?fu=1&rcn={int(RCN.discoveryResultReferences)}&ty={int(T.CIN)}&lim=3', TestDiscovery.originator)
+		self.assertEqual(rsc, RC.OK, r)
+		self.assertIsNotNone(uril := findXPath(r, 'm2m:uril'), r)
+		self.assertEqual(len(uril), 3, r)
+		for each in uril:
+			self.assertEqual(each.split('/')[-2], cntRN)
+
+
+	@unittest.skipIf(noCSE, 'No CSEBase')
+	def test_discoverCINunderAEContinueWithContentOffset(self) -> None:
+		"""	Discover <CIN> under <AE> & lim, continue with returned content offset """
+		r, rsc = RETRIEVE(f'{aeURL}?fu=1&rcn={int(RCN.discoveryResultReferences)}&ty={int(T.CIN)}', TestDiscovery.originator)
+		self.assertEqual(rsc, RC.OK, r)
+		self.assertIsNotNone(allUril := findXPath(r, 'm2m:uril'), r)
+		self.assertNotIn(C.hfCTS, lastHeaders())
+		self.assertNotIn(C.hfCTO, lastHeaders())
+
+		r, rsc = RETRIEVE(f'{aeURL}?fu=1&rcn={int(RCN.discoveryResultReferences)}&ty={int(T.CIN)}&lim=3', TestDiscovery.originator)
+		self.assertEqual(rsc, RC.OK, r)
+		self.assertIsNotNone(uril := findXPath(r, 'm2m:uril'), r)
+		self.assertEqual(len(uril), 3, r)
+		self.assertEqual(lastHeaders().get(C.hfCTS), '2')	# partial content
+		self.assertIsNotNone(cto := lastHeaders().get(C.hfCTO))
+
+		r, rsc = RETRIEVE(f'{csiURL}/{uril[-1]}', TestDiscovery.originator)	# content offset is the ri of the last resource
+		self.assertEqual(rsc, RC.OK, r)
+		self.assertEqual(findXPath(r, 'm2m:cin/ri'), cto)
+
+		r, rsc = RETRIEVE(f'{aeURL}?fu=1&rcn={int(RCN.discoveryResultReferences)}&ty={int(T.CIN)}&ofst={cto}', TestDiscovery.originator)
+		self.assertEqual(rsc, RC.OK, r)
+		self.assertIsNotNone(rest := findXPath(r, 'm2m:uril'), r)
+		self.assertNotIn(C.hfCTS, lastHeaders())
+		self.assertEqual(uril + rest, allUril)
+
+
+	@unittest.skipIf(noCSE, 'No CSEBase')
+	def test_discoverCINunderAEContinueAfterDelete(self) -> None:
+		"""	Discover <CIN> under <AE> & lim, delete a returned <CIN>, continue with returned content offset """
+		dct = 	{ 'm2m:cin' : {
+					'rn'  : cinRN,
+					'con' : 'aValue'
+				}}
+		r, rsc = CREATE(cntURL, TestDiscovery.originator, T.CIN, dct)	# last <CIN> of the first <CNT>
+		self.assertEqual(rsc, RC.created, r)
+		r, rsc = RETRIEVE(f'{aeURL}?fu=1&rcn={int(RCN.discoveryResultReferences)}&ty={int(T.CIN)}', TestDiscovery.originator)
+		self.assertEqual(rsc, RC.OK, r)
+		self.assertIsNotNone(allUril := findXPath(r, 'm2m:uril'), r)
+
+		r, rsc = RETRIEVE(f'{aeURL}?fu=1&rcn={int(RCN.discoveryResultReferences)}&ty={int(T.CIN)}&lim={len(allUril) - 2}', TestDiscovery.originator)
+		self.assertEqual(rsc, RC.OK, r)
+		self.assertEqual(lastHeaders().get(C.hfCTS), '2')	# partial content
+		self.assertIsNotNone(cto := lastHeaders().get(C.hfCTO))
+
+		r, rsc = DELETE(f'{cntURL}/{cinRN}', TestDiscovery.originator)	# delete a resource of the first page
+		self.assertEqual(rsc, RC.deleted, r)
+
+		r, rsc = RETRIEVE(f'{aeURL}?fu=1&rcn={int(RCN.discoveryResultReferences)}&ty={int(T.CIN)}&ofst={cto}', TestDiscovery.originator)
+		self.assertEqual(rsc, RC.OK, r)
+		self.assertEqual(findXPath(r, 'm2m:uril'), allUril[-2:], r)	# the next page is not shifted
+
+
+	@unittest.skipIf(noCSE, 'No CSEBase')
+	def test_discoverCINunderAEWithUnknownContentOffset(self) -> None:
+		"""	Discover <CIN> under <AE> & unknown content offset -> Fail """
+		r, rsc = RETRIEVE(f'{aeURL}?fu=1&rcn={int(RCN.discoveryResultReferences)}&ty={int(T.CIN)}&ofst=unknown', TestDiscovery.originator)
+		self.assertEqual(rsc, RC.badRequest, r)
+
+
+	@unittest.skipIf(noCSE, 'No CSEBase')
+	def test_discoverCINunderAEWithOfstAndLim(self) -> None:
+		"""	Discover <CIN> under <AE> & ofst & lim """
+		r, rsc = RETRIEVE(f'{aeURL}?fu=1&rcn={int(RCN.discoveryResultReferences)}&ty={int(T.CIN)}&ofst=5&lim=3', TestDiscovery.originator)
+		self.assertEqual(rsc, RC.OK, r)
+		self.assertIsNotNone(uril := findXPath(r, 'm2m:uril'), r)
+		self.assertEqual(len(uril), 3, r)
+		self.assertEqual(uril[0].split('/')[-2], cntRN)
+		self.assertEqual(uril[1].split('/')[-2], cnt2RN)
+		self.assertEqual(uril[2].split('/')[-2], cnt2RN)
+
+
 	
 	# Find both CIN with a tag:0 label
 	@unittest.skipIf(noCSE, 'No CSEBase')
@@ -702,6 +800,26 @@ class TestDiscovery(unittest.TestCase):
 		# self.assertEqual(len(r), 0, r)
 
 
+	@unittest.skipIf(noCSE, 'No CSEBase')
+	def test_discoverCNTbyUpdatedLabel(self) -> None:
+		""" Update <CNT> lbl and discover <CNT> by old and new lbl """
+		dct = 	{ 'm2m:cnt' : { 
+					'lbl' : [ 'updatedLbl' ]
+				}}
+		_, rsc = UPDATE(f'{aeURL}/{cnt3RN}', TestDiscovery.originator, dct)
+		self.assertEqual(rsc, RC.updated)
+		r, rsc = RETRIEVE(f'{aeURL}?fu=1&rcn={int(RCN.discoveryResultReferences)}&lbl=updatedLbl', TestDiscovery.originator)
+		self.assertEqual(rsc, RC.OK, r)
+		self.assertIsNotNone(uril := findXPath(r, 'm2m:uril'), r)
+		self.assertEqual(len(uril), 1, r)
+		self.assertTrue(uril[0].endswith(f'/{cnt3RN}'), r)
+		r, rsc = RETRIEVE(f'{aeURL}?fu=1&rcn={int(RCN.discoveryResultReferences)}&lbl=test', TestDiscovery.originator)
+		self.assertEqual(rsc, RC.OK, r)
+		self.assertIsNotNone(uril := findXPath(r, 'm2m:uril'), r)
+		self.assertEqual(len(uril), 1, r)
+		self.assertTrue(uril[0].endswith(f'/{cnt4RN}'), r)
+
+
 	@unittest.skipIf(noCSE, 'No CSEBase')
 	def test_retrieveWithWrongArgument(self) -> None:
 		""" Retrieve <AE> with wrong argument & rcn=1 """
@@ -781,6 +899,12 @@ def run(testVerbosity:int, testFailFast:bool) -> Tuple[int, int, int]:
 	suite.addTest(TestDiscovery('test_retrieveCNTbyCNIunderAEEmpty2'))
 	suite.addTest(TestDiscovery('test_retrieveCNTorCINunderAE'))
 	suite.addTest(TestDiscovery('test_retrieveCNTorCINunderAE2'))
+	suite.addTest(TestDiscovery('test_discoverCNTandCINunderAEOrder'))
+	suite.addTest(TestDiscovery('test_discoverCINunderAEWithLim'))
+	suite.addTest(TestDiscovery('test_discoverCINunderAEWithOfstAndLim'))
+	suite.addTest(TestDiscovery('test_discoverCINunderAEContinueWithContentOffset'))
+	suite.addTest(TestDiscovery('test_discoverCINunderAEContinueAfterDelete'))
+	suite.addTest(TestDiscovery('test_discoverCINunderAEWithUnknownContentOffset'))
 	suite.addTest(TestDiscovery('test_retrieveCINandLBLunderAE'))
 	suite.addTest(TestDiscovery('test_retrieveCINandLBLunderAE2'))
 	suite.addTest(TestDiscovery('test_retrieveCNTorLBLunderAE'))
@@ -801,6 +925,7 @@ def run(testVerbosity:int, testFailFast:bool) -> Tuple[int, int, int]:
 	suite.addTest(TestDiscovery('test_updateCNTwithRCN9'))
 	suite.addTest(TestDiscovery('test_createCNTwithRCN0'))
 	suite.addTest(TestDiscovery('test_updateCNTwithWrongRCN2'))
+	suite.addTest(TestDiscovery('test_discoverCNTbyUpdatedLabel'))
 	suite.addTest(TestDiscovery('test_retrieveWithWrongArgument'))
 	suite.addTest(TestDiscovery('test_retrieveWithWrongFU'))
 	suite.addTest(TestDiscovery('test_retrieveWithWrongDRT'))
@@ -0,0 +1,159 @@
+#
+#	testEventManager.py
+#
+#	(c) 2022 by Andreas Kraft
+#	License: BSD 3-Clause License. See the LICENSE file for further details.
+#
+#	Unit tests for the event manager
+#
+
+import unittest, sys
+if '..' not in sys.path:
+	sys.path.append('..')
+from typing import Any, Tuple
+from threading import Event, Thread
+from acme.services import CSE	# The services must be imported via the CSE module
+from acme.helpers.EventManager import EventManager
+from init import *
+
+# Maximum time in seconds to wait for the dispatched events
+eventTimeout = 5.0
+
+
+class TestEventManager(unittest.TestCase):
+	"""	Tests for the dispatching of events. The event manager is created in the test process,
+		independent of the CSE's event manager.
+	"""
+
+	def setUp(self) -> None:
+		self.manager = EventManager(dispatchers = 2)
+
+
+	def tearDown(self) -> None:
+		self.manager.shutdown()
+
+
+	def _blockDispatchers(self) -> Event:
+		"""	Occupy all dispatcher threads until the returned event is set.
+
+			Return:
+				The event that releases the dispatcher threads.
+		"""
+		release = Event()
+		for i in range(self.manager.dispatchers):
+			# Each event is handled by a single dispatcher thread
+			event = self.manager.addEvent(f'block{i}')
+			self.manager.addHandler(event, lambda: release.wait(eventTimeout))
+			event()
+		return release
+
+
+	def test_coalescing(self) -> None:
+		"""	Coalesce events while a call of a coalescing handler is waiting """
+		calls:list[int] = []
+		called = Event()
+		def _handler(value:int) -> None:
+			calls.append(value)
+			called.set()
+		self.manager.addHandler(self.manager.addEvent('coalesced'), _handler, coalesce = True)
+
+		release = self._blockDispatchers()
+		for i in range(100):
+			self.manager.coalesced(i)	# type: ignore [attr-defined]
+		release.set()
+
+		self.assertTrue(called.wait(eventTimeout))
+		self.assertEqual(calls, [ 99 ])	# Only called once with the latest arguments
+
+
+	def test_coalescingAfterCall(self) -> None:
+		"""	Call a coalescing handler again for an event that is raised after the previous call """
+		calls:list[int] = []
+		called = Event()
+		def _handler(value:int) -> None:
+			calls.append(value)
+			called.set()
+		self.manager.addHandler(self.manager.addEvent('coalesced'), _handler, coalesce = True)
+
+		self.manager.coalesced(1)	# type: ignore [attr-defined]
+		self.assertTrue(called.wait(eventTimeout))
+		called.clear()
+		self.manager.coalesced(2)	# type: ignore [attr-defined]
+		self.assertTrue(called.wait(eventTimeout))
+		self.assertEqual(calls, [ 1, 2 ])
+
+
+	def test_orderingUnderLoad(self) -> None:
+		"""	Handle the events of several threads, each in the order in which it was raised """
+		count = 1000
+		events = 4
+		calls:dict[int, list[int]] = { e: [] for e in range(events) }
+		done = [ Event() for _ in range(events) ]
+		def _handler(e:int, value:int) -> None:
+			calls[e].append(value)
+			if value == count - 1:
+				done[e].set()
+		for e in range(events):
+			self.manager.addHandler(self.manager.addEvent(f'event{e}'), _handler)
+
+		def _raise(e:int) -> None:
+			event = getattr(self.manager, f'event{e}')
+			for i in range(count):
+				event(e, i)
+		threads = [ Thread(target = _raise, args = (e,)) for e in range(events) ]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		for e in range(events):
+			self.assertTrue(done[e].wait(eventTimeout))
+			self.assertEqual(calls[e], list(range(count)))
+
+
+	def test_blockingHandler(self) -> None:
+		"""	Don't let a blocking handler stall the dispatchers """
+		release = Event()
+		blocked = Event()
+		def _blockingHandler() -> None:
+			blocked.set()
+			release.wait(eventTimeout)
+		for i in range(self.manager.dispatchers * 2):
+			event = self.manager.addEvent(f'blocking{i}')
+			self.manager.addHandler(event, _blockingHandler, blocking = True)
+			event()
+		self.assertTrue(blocked.wait(eventTimeout))
+
+		called = Event()
+		self.manager.addHandler(self.manager.addEvent('other'), lambda: called.set())
+		self.manager.other()	# type: ignore [attr-defined]
+		self.assertTrue(called.wait(eventTimeout))	# Handled while the blocking handlers still wait
+		release.set()
+
+
+	def test_inlineHandler(self) -> None:
+		"""	Call an inline handler in the raising thread """
+		calls:list[Any] = []
+		self.manager.addHandler(self.manager.addEvent('inline'), lambda value: calls.append(value), inline = True)
+		release = self._blockDispatchers()
+		self.manager.inline(1)	# type: ignore [attr-defined]
+		self.assertEqual(calls, [ 1 ])
+		release.set()
+
+
+def run(testVerbosity:int, testFailFast:bool) -> Tuple[int, int, int]:
+	suite = unittest.TestSuite()
+
+	suite.addTest(TestEventManager('test_coalescing'))
+	suite.addTest(TestEventManager('test_coalescingAfterCall'))
+	suite.addTest(TestEventManager('test_orderingUnderLoad'))
+	suite.addTest(TestEventManager('test_blockingHandler'))
+	suite.addTest(TestEventManager('test_inlineHandler'))
+
+	result = unittest.TextTestRunner(verbosity = testVerbosity, failfast = testFailFast).run(suite)
+	printResult(result)
+	return result.testsRun, len(result.errors + result.failures), len(result.skipped)
+
+if __name__ == '__main__':
+	_, errors, _ = run(2, True)
+	sys.exit(errors)
@@ -0,0 +1,334 @@
+#
+#	testHttpEngines.py
+#
+#	(c) 2022 by Andreas Kraft
+#	License: BSD 3-Clause License. See the LICENSE file for further details.
+#
+#	Unit tests for the "pooled" and "asyncio" http server engines
+#
+
+import unittest, sys, time, socket
+if '..' not in sys.path:
+	sys.path.append('..')
+from typing import Tuple, Union
+from http.client import HTTPConnection, HTTPResponse
+from threading import Event, Thread
+from urllib.parse import urlparse
+from flask import Flask, request
+from acme.etc.Constants import Constants as C
+from acme.etc.Types import ResponseStatusCode as RC
+from acme.helpers.AsyncLoop import AsyncLoop
+from acme.services import CSE	# The services must be imported via the CSE module
+from acme.services.HttpServer import PooledWSGIServer, AsyncWSGIServer
+from init import *
+
+keepAliveTimeout		= 5.0	# Seconds
+maxKeepAliveRequests	= 5
+drainTimeout			= 5.0	# Seconds
+
+
+def _testApplication(release:Event, started:Event) -> Flask:
+	"""	Create a small flask application for testing the engines.
+
+		Args:
+			release: Event that lets a request to */slow* return.
+			started: Event that is set when a request to */slow* was received.
+		Return:
+			The application.
+	"""
+	app = Flask('testHttpEngines')
+
+	@app.route('/ok', methods = [ 'GET' ])
+	def _ok() -> str:
+		return 'ok'
+
+	@app.route('/unread', methods = [ 'POST' ])
+	def _unread() -> str:
+		return 'ok'		# The request body is not read
+
+	@app.route('/echo', methods = [ 'POST' ])
+	def _echo() -> bytes:
+		return request.get_data()
+
+	@app.route('/slow', methods = [ 'GET' ])
+	def _slow() -> str:
+		started.set()
+		release.wait(drainTimeout)
+		return 'slow'
+
+	return app
+
+
+class TestHttpEngine(unittest.TestCase):
+	"""	Tests for an http server engine. The engine is started in the test process, so that
+		the tests run for both engines, regardless of the engine that is configured for the CSE.
+		The actual engine is selected in the sub-classes.
+	"""
+
+	engine:str	= None
+	release		= Event()
+	started		= Event()
+	server:Union[PooledWSGIServer, AsyncWSGIServer]	= None
+	asyncLoop:AsyncLoop	= None
+	port:int	= None
+
+
+	@classmethod
+	def setUpClass(cls) -> None:
+		if not cls.engine:
+			raise unittest.SkipTest('No engine selected')
+		cls.release = Event()
+		cls.started = Event()
+		app = _testApplication(cls.release, cls.started)
+		if cls.engine == 'pooled':
+			cls.server = PooledWSGIServer('127.0.0.1', 0, app,
+										  workers = 4,
+										  backlog = 16,
+										  keepAliveTimeout = keepAliveTimeout,
+										  maxKeepAliveRequests = maxKeepAliveRequests)
+			cls.port = cls.server.port
+			Thread(target = cls.server.serve_forever, daemon = True).start()
+		else:
+			cls.asyncLoop = AsyncLoop(4, name = 'TestAsyncLoop').start()
+			server = AsyncWSGIServer('127.0.0.1', 0, app,
+									 asyncLoop = cls.asyncLoop,
+									 backlog = 16,
+									 keepAliveTimeout = keepAliveTimeout,
+									 maxKeepAliveRequests = maxKeepAliveRequests)
+			server.serve()
+			cls.port = server.server.sockets[0].getsockname()[1]
+			cls.server = server
+
+
+	@classmethod
+	def tearDownClass(cls) -> None:
+		if not cls.engine:
+			return
+		cls.release.set()
+		if cls.server:
+			cls.server.stop(drainTimeout)
+		if cls.asyncLoop:
+			cls.asyncLoop.stop()
+
+
+	def setUp(self) -> None:
+		self.release.clear()
+		self.started.clear()
+
+
+	def _connect(self) -> HTTPConnection:
+		connection = HTTPConnection('127.0.0.1', self.port, timeout = 10)
+		connection.connect()
+		return connection
+
+
+	def _request(self, connection:HTTPConnection, method:str, path:str, body:bytes = None, headers:dict = {}) -> Tuple[HTTPResponse, bytes]:
+		connection.request(method, path, body = body, headers = headers)
+		response = connection.getresponse()
+		return response, response.read()
+
+
+	def test_keepAlive(self) -> None:
+		"""	Send several requests over the same connection """
+		connection = self._connect()
+		sock = connection.sock
+		for _ in range(maxKeepAliveRequests - 1):
+			response, content = self._request(connection, 'GET', '/ok')
+			self.assertEqual(response.status, 200)
+			self.assertEqual(content, b'ok')
+			self.assertEqual(response.getheader('Connection'), 'keep-alive')
+			self.assertIs(connection.sock, sock)	# The connection is not closed
+		connection.close()
+
+
+	def test_maxKeepAliveRequests(self) -> None:
+		"""	Close a connection after the maximum number of requests """
+		connection = self._connect()
+		for _ in range(maxKeepAliveRequests - 1):
+			response, _ = self._request(connection, 'GET', '/ok')
+			self.assertEqual(response.getheader('Connection'), 'keep-alive')
+		response, _ = self._request(connection, 'GET', '/ok')
+		self.assertEqual(response.status, 200)
+		self.assertEqual(response.getheader('Connection'), 'close')
+		self.assertIsNone(connection.sock)
+		connection.close()
+
+
+	def test_connectionClose(self) -> None:
+		"""	Close a connection when the client requests it """
+		connection = self._connect()
+		response, _ = self._request(connection, 'GET', '/ok', headers = { 'Connection' : 'close' })
+		self.assertEqual(response.status, 200)
+		self.assertEqual(response.getheader('Connection'), 'close')
+		self.assertIsNone(connection.sock)
+		connection.close()
+
+
+	def test_drainUnreadBody(self) -> None:
+		"""	Drain an unread request body before the next request on the same connection """
+		connection = self._connect()
+		sock = connection.sock
+		response, content = self._request(connection, 'POST', '/unread', body = b'x' * 100000)
+		self.assertEqual(response.status, 200)
+		self.assertEqual(response.getheader('Connection'), 'keep-alive')
+		response, content = self._request(connection, 'POST', '/echo', body = b'next')
+		self.assertEqual(response.status, 200)
+		self.assertEqual(content, b'next')
+		self.assertIs(connection.sock, sock)
+		connection.close()
+
+
+	def test_drainActiveRequests(self) -> None:
+		"""	Wait for an active request when draining, and don't keep connections alive until resumed """
+		results:list = []
+		def _slowRequest() -> None:
+			connection = self._connect()
+			results.append(self._request(connection, 'GET', '/slow'))
+			connection.close()
+
+		thread = Thread(target = _slowRequest, daemon = True)
+		thread.start()
+		self.assertTrue(self.started.wait(drainTimeout))
+
+		# The active request is not finished before the drain timeout
+		self.assertFalse(self.server.drain(0.2))
+
+		# Connections are not kept alive while draining
+		connection = self._connect()
+		response, _ = self._request(connection, 'GET', '/ok')
+		self.assertEqual(response.status, 200)
+		self.assertEqual(response.getheader('Connection'), 'close')
+		connection.close()
+
+		# The drain finishes when the active request is finished
+		self.release.set()
+		self.assertTrue(self.server.drain(drainTimeout))
+		thread.join(drainTimeout)
+		self.assertEqual(len(results), 1)
+		self.assertEqual(results[0][0].status, 200)
+		self.assertEqual(results[0][1], b'slow')
+
+		# Connections are kept alive again after resuming
+		self.server.resume()
+		connection = self._connect()
+		response, _ = self._request(connection, 'GET', '/ok')
+		self.assertEqual(response.getheader('Connection'), 'keep-alive')
+		connection.close()
+
+
+	def test_stop(self) -> None:
+		"""	Stop the server: Finish active requests, close idle connections, and refuse new connections """
+		# An idle kept-alive connection
+		idleConnection = self._connect()
+		response, _ = self._request(idleConnection, 'GET', '/ok')
+		self.assertEqual(response.getheader('Connection'), 'keep-alive')
+
+		# An active request
+		results:list = []
+		def _slowRequest() -> None:
+			connection = self._connect()
+			results.append(self._request(connection, 'GET', '/slow'))
+			connection.close()
+		thread = Thread(target = _slowRequest, daemon = True)
+		thread.start()
+		self.assertTrue(self.started.wait(drainTimeout))
+
+		def _release() -> None:
+			time.sleep(0.5)
+			self.release.set()
+		Thread(target = _release, daemon = True).start()
+		self.server.stop(drainTimeout)
+
+		# The active request was finished
+		thread.join(drainTimeout)
+		self.assertEqual(len(results), 1)
+		self.assertEqual(results[0][0].status, 200)
+		self.assertEqual(results[0][0].getheader('Connection'), 'close')
+
+		# The idle connection was closed by the server
+		idleConnection.sock.settimeout(drainTimeout)
+		try:
+			self.assertEqual(idleConnection.sock.recv(1), b'')
+		except ConnectionError:
+			pass
+		idleConnection.close()
+
+		# New connections are refused
+		with self.assertRaises(OSError):
+			socket.create_connection(('127.0.0.1', self.port), timeout = 2).close()
+		type(self).server = None	# Already stopped
+
+
+class TestPooledEngine(TestHttpEngine):
+	engine = 'pooled'
+
+
+class TestAsyncioEngine(TestHttpEngine):
+	engine = 'asyncio'
+
+
+class TestUpperTesterReset(unittest.TestCase):
+	"""	Tests for resetting the CSE via the upper tester interface while connections are kept alive.
+		The CSE pauses and unpauses the http server during the reset.
+	"""
+
+	@classmethod
+	@unittest.skipIf(noCSE, 'No CSEBase')
+	def setUpClass(cls) -> None:
+		if PROTOCOL != 'http':
+			raise unittest.SkipTest('Only for http')
+
+
+	def _retrieveCSE(self, connection:HTTPConnection) -> HTTPResponse:
+		connection.request('GET', urlparse(cseURL).path, headers = {	C.hfOrigin : ORIGINATOR,
+																		C.hfRI : uniqueID(),
+																		C.hfRVI : RVI,
+																		'Accept' : 'application/json' })
+		response = connection.getresponse()
+		response.read()
+		return response
+
+
+	@unittest.skipIf(noCSE, 'No CSEBase')
+	def test_keepAliveAcrossReset(self) -> None:
+		"""	Keep connections alive after a CSE reset via UT interface """
+		url = urlparse(cseURL)
+		connection = HTTPConnection(url.hostname, url.port, timeout = 10)
+		response = self._retrieveCSE(connection)
+		self.assertEqual(response.status, 200)
+		self.assertEqual(response.getheader(C.hfRSC), str(RC.OK.value))
+		keepAlive = response.getheader('Connection', '').lower() == 'keep-alive'	# Not with the werkzeug engine
+
+		# Reset
+		resp = requests.post(UTURL, headers = { UTCMD: f'Reset'})
+		self.assertEqual(resp.status_code, 200)
+		self.assertEqual(resp.headers[C.hfRSC], '2000')
+
+		# The same connection, if it was kept alive, still works, and connections are kept alive again
+		for _ in range(2):
+			response = self._retrieveCSE(connection)
+			self.assertEqual(response.status, 200)
+			self.assertEqual(response.getheader(C.hfRSC), str(RC.OK.value))
+			self.assertEqual(response.getheader('Connection', '').lower() == 'keep-alive', keepAlive)
+		connection.close()
+
+
+def run(testVerbosity:int, testFailFast:bool) -> Tuple[int, int, int]:
+	suite = unittest.TestSuite()
+
+	for cls in [ TestPooledEngine, TestAsyncioEngine ]:
+		suite.addTest(cls('test_keepAlive'))
+		suite.addTest(cls('test_maxKeepAliveRequests'))
+		suite.addTest(cls('test_connectionClose'))
+		suite.addTest(cls('test_drainUnreadBody'))
+		suite.addTest(cls('test_drainActiveRequests'))
+		suite.addTest(cls('test_stop'))		# Must be the last test of an engine
+	suite.addTest(TestUpperTesterReset('test_keepAliveAcrossReset'))
+
+	result = unittest.TextTestRunner(verbosity = testVerbosity, failfast = testFailFast).run(suite)
+	printResult(result)
+	return result.testsRun, len(result.errors + result.failures), len(result.skipped)
+
+if __name__ == '__main__':
+	_, errors, _ = run(2, True)
+	sys.exit(errors)
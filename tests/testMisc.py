@@ -239,6 +239,44 @@ class TestMisc(unittest.TestCase):
 		self.assertEqual(rsc, RC.deleted, r)
 		
 
+	@unittest.skipIf(noCSE, 'No CSEBase')
+	@unittest.skipUnless(BINDING in [ 'http', 'https' ], 'Only when testing with http(s) binding')
+	def test_retrieveStatistics(self) -> None:
+		"""	Retrieve the statistics and request latencies from the statistics endpoint"""
+		_, rsc = RETRIEVE(cseURL, ORIGINATOR)
+		self.assertEqual(rsc, RC.OK)
+		r = requests.get(STATSURL, verify = verifyCertificate)
+		if not isEndpointEnabled(r):
+			self.skipTest('statistics endpoint is not enabled')
+		self.assertEqual(r.status_code, 200, r.text)
+		stats = r.json()
+		self.assertIsNotNone(findXPath(stats, 'statistics/htRet'), stats)
+		self.assertGreater(findXPath(stats, 'statistics/htRet'), 0, stats)
+		if (latency := findXPath(stats, 'measurements/requestLatency', {}).get('RETRIEVE/http')) is None:	# labels contain a slash
+			self.skipTest('statistics are disabled')
+		self.assertGreater(latency['count'], 0, latency)
+		for p in [ 'mean', 'p50', 'p95', 'p99' ]:
+			self.assertIn(p, latency)
+		self.assertLessEqual(latency['p50'], latency['p95'])
+		self.assertLessEqual(latency['p95'], latency['p99'])
+		self.assertIn('RETRIEVE/CSEBase', findXPath(stats, 'measurements/requestLatencyByType', {}), stats)
+
+
+	@unittest.skipIf(noCSE, 'No CSEBase')
+	@unittest.skipUnless(BINDING in [ 'http', 'https' ], 'Only when testing with http(s) binding')
+	def test_retrieveMetrics(self) -> None:
+		"""	Retrieve the metrics from the metrics endpoint"""
+		r = requests.get(METRICSURL, verify = verifyCertificate)
+		if not isEndpointEnabled(r):
+			self.skipTest('metrics endpoint is not enabled')
+		self.assertEqual(r.status_code, 200, r.text)
+		self.assertTrue(r.headers['Content-Type'].startswith('text/plain'), r.headers)
+		self.assertIn('# TYPE acme_requests_received_total counter', r.text)
+		self.assertIsNotNone(re.search(r'^acme_requests_received_total\{binding="http",operation="RETRIEVE"\} \d+$', r.text, re.MULTILINE), r.text)
+		self.assertIsNotNone(re.search(r'^acme_resources \d+$', r.text, re.MULTILINE), r.text)
+		self.assertIsNotNone(re.search(r'^acme_jobs\{state="running"\} \d+$', r.text, re.MULTILINE), r.text)
+
+
 # TODO test for creating a resource with missing type parameter
 # TODO test json with comments
 # TODO test for ISO8601 format validation
@@ -263,6 +301,8 @@ def run(testVerbosity:int, testFailFast:bool) -> Tuple[int, int, int]:
 	suite.addTest(TestMisc('test_validateListFail'))
 	suite.addTest(TestMisc('test_resourceWithoutRN'))
 	suite.addTest(TestMisc('test_subWithoutRN'))
+	suite.addTest(TestMisc('test_retrieveStatistics'))
+	suite.addTest(TestMisc('test_retrieveMetrics'))
 
 	result = unittest.TextTestRunner(verbosity=testVerbosity, failfast=testFailFast).run(suite)
 	printResult(result)
@@ -21,6 +21,7 @@ pch2URL = f'{ae2URL}/{pchRN}'
 pcu2URL = f'{pch2URL}/pcu'
 
 waitBetweenPollingRequests = requestExpirationDelay/2.0 # seconds
+numberOfPollingRequests = 40	# More than the worker threads of the bounded http server engines
 
 class TestPCH_PCU(unittest.TestCase):
 
@@ -269,6 +270,47 @@ class TestPCH_PCU(unittest.TestCase):
 		self._waitForPolling(thread)
 
 
+	@unittest.skipIf(noCSE, 'No CSEBase')
+	def test_createSUBunderCNTWithManyPollingRequests(self) -> None:
+		"""	CREATE <SUB> under <CNT> with <PCH> while many polling requests wait """
+		results:list[int] = []
+
+		def poll() -> None:
+			r, rsc = RETRIEVE(pcu2URL, TestPCH_PCU.originator2, headers = { C.hfRET : str(requestExpirationDelay*2.0*1000) })	# polling request
+			results.append(rsc)
+			if rsc == RC.OK:
+				dct = {
+					'm2m:rsp' : {
+						'fr'  : TestPCH_PCU.originator2,
+						'rqi' : findXPath(r, 'm2m:rqp/rqi'),
+						'rvi' : RVI,
+						'rsc' : int(RC.OK)
+					}
+				}
+				NOTIFY(pcu2URL, TestPCH_PCU.originator2, data = dct)
+
+		threads = [ Thread(target = poll) for _ in range(numberOfPollingRequests) ]
+		for thread in threads:
+			thread.start()
+		time.sleep(waitBetweenPollingRequests)
+
+		# The verification request must be received by one of the waiting polling requests
+		dct = 	{ 'm2m:sub' : { 
+					'rn' : subRN,
+			        'enc': {
+			            'net': [ NET.createDirectChild ]
+					},
+					'nu': [ TestPCH_PCU.originator2 ],
+					'su': TestPCH_PCU.originator2
+				}}
+		r, rsc = CREATE(cntURL, TestPCH_PCU.originator, T.SUB, dct)
+		self.assertEqual(rsc, RC.created, r)
+		for thread in threads:
+			thread.join()
+		self.assertEqual(results.count(RC.OK), 1, results)
+		self.assertEqual(results.count(RC.requestTimeout), numberOfPollingRequests - 1, results)
+
+
 	@unittest.skipIf(noCSE, 'No CSEBase')
 	def test_DeleteSUBunderCNT(self) -> None:
 		"""	DELETE <SUB> under <CNT> with <PCH>"""
@@ -448,6 +490,8 @@ def run(testVerbosity:int, testFailFast:bool) -> Tuple[int, int, int]:
 	suite.addTest(TestPCH_PCU('test_retrievePCUunderAE2Fail'))
 	suite.addTest(TestPCH_PCU('test_createSUBunderCNT'))
 	suite.addTest(TestPCH_PCU('test_DeleteSUBunderCNT'))
+	suite.addTest(TestPCH_PCU('test_createSUBunderCNTWithManyPollingRequests'))
+	suite.addTest(TestPCH_PCU('test_DeleteSUBunderCNT'))
 	suite.addTest(TestPCH_PCU('test_accesPCUwithWrongOriginator'))
 	suite.addTest(TestPCH_PCU('test_createSUB2underCNTAnswerWithWrongTargetFail'))
 	suite.addTest(TestPCH_PCU('test_createSUB2underCNTAnswerWithEmptyAnswerFail'))
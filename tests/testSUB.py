@@ -929,6 +929,40 @@ class TestSUB(unittest.TestCase):
 		self.assertEqual(rsc, RC.notFound)
 
 
+	@unittest.skipIf(noCSE, 'No CSEBase')
+	def test_createSUBwithEXCAsync(self) -> None:
+		""" CREATE <SUB> with EXC = 2, UPDATE <AE> 3 times with asynchronous notifications -> <SUB> removed """
+		if not enableAsyncSubscriptionNotifications():
+			self.skipTest('Asynchronous notifications cannot be enabled')
+		try:
+			dct = 	{ 'm2m:sub' : { 
+						'rn' : subRN+'EXCAsync',
+						'enc': {
+							'net': [ NET.resourceUpdate ]
+						},
+						'nu': [NOTIFICATIONSERVER ],
+						'su': NOTIFICATIONSERVER,
+						'exc': 2	# Remove after 2 notifications
+					}}
+			_, rsc = CREATE(aeURL, TestSUB.originator, T.SUB, dct)
+			self.assertEqual(rsc, RC.created)
+
+			# Update the AE 3 times without waiting for the notifications
+			clearLastNotification()
+			for i in range(3):
+				_, rsc = UPDATE(aeURL, TestSUB.originator, { 'm2m:ae' : { 'lbl' : [ f'excAsync{i}' ] }})
+				self.assertEqual(rsc, RC.updated)
+			time.sleep(durationForBatchNotifications)	# wait a moment
+
+			# The subscription is removed after the second notification
+			lastNotification = getLastNotification()
+			self.assertTrue(findXPath(lastNotification, 'm2m:sgn/sud'))
+			_, rsc = RETRIEVE(f'{aeURL}/{subRN}EXCAsync', TestSUB.originator)
+			self.assertEqual(rsc, RC.notFound)
+		finally:
+			disableAsyncSubscriptionNotifications()
+
+
 	@unittest.skipIf(noCSE, 'No CSEBase')
 	def test_createSUBwithUnknownPoa(self) -> None:
 		""" CREATE new <SUB> with NU to not-existing POA -> Fail """
@@ -1395,6 +1429,7 @@ def run(testVerbosity:int, testFailFast:bool) -> Tuple[int, int, int]:
 
 	suite.addTest(TestSUB('test_createSUBwithEXC'))
 	suite.addTest(TestSUB('test_createCNTforEXC'))
+	suite.addTest(TestSUB('test_createSUBwithEXCAsync'))
 
 	suite.addTest(TestSUB('test_createSUBwithUnknownPoa'))
 	suite.addTest(TestSUB('test_createSUBWithCreatorWrong'))
@@ -0,0 +1,380 @@
+#
+#	testStorage.py
+#
+#	(c) 2022 by Andreas Kraft
+#	License: BSD 3-Clause License. See the LICENSE file for further details.
+#
+#	Unit tests for the database bindings
+#
+
+import unittest, sys, tempfile, shutil
+if '..' not in sys.path:
+	sys.path.append('..')
+from typing import Any, Tuple
+from tinydb.table import Document
+from acme.etc.Types import ResourceTypes as T
+from acme.services import CSE	# The services must be imported via the CSE module
+from acme.services.Configuration import Configuration
+from acme.services.Storage import SQLiteBinding, TinyDBBinding, IdentifierCache, InstanceIndex
+from acme.resources.Resource import Resource
+from acme.resources import Factory
+from init import *
+
+# Configuration for the database bindings in the test process
+dbConfiguration = {	'db.inMemory'		: False,
+					'db.cacheSize'		: 0,
+				  }
+
+
+def _resource(ri:str, pi:str = 'cse', ty:T = T.CNT, **attributes:Any) -> Resource:
+	"""	Create a resource with fixed timestamps, without a running CSE.
+
+		Args:
+			ri: Resource ID, also used as the resource name.
+			pi: Parent resource ID.
+			ty: Resource type.
+			attributes: Further attributes of the resource.
+		Return:
+			The resource.
+	"""
+	dct = {	'ri'		: ri,
+			'rn'		: ri,
+			'pi'		: pi,
+			'ty'		: int(ty),
+			'ct'		: '20220101T000000,000000',
+			'lt'		: '20220101T000000,000000',
+			'et'		: '20990101T000000,000000',
+			'__srn__'	: f'cse-in/{ri}',
+		  }
+	dct.update(attributes)
+	return Factory.resourceFromDict({ ty.tpe() : dct }).resource
+
+
+class TestDBBinding(unittest.TestCase):
+	"""	Base class for tests of a database binding. The binding is created in the test process
+		in a temporary directory, independent of the database backend that is configured for the CSE.
+	"""
+
+	configuration:dict	= {}
+	originalConfiguration:dict = {}
+	path:str			= None
+
+	@classmethod
+	def setUpClass(cls) -> None:
+		config = { **dbConfiguration, **cls.configuration }
+		cls.originalConfiguration = { key : Configuration.get(key) for key in config }
+		Configuration._configuration.update(config)
+		cls.path = tempfile.mkdtemp(prefix = 'acmeTestStorage')
+
+
+	@classmethod
+	def tearDownClass(cls) -> None:
+		Configuration._configuration.update(cls.originalConfiguration)
+		shutil.rmtree(cls.path, ignore_errors = True)
+
+
+
+class TestSQLiteBinding(TestDBBinding):
+
+	db:SQLiteBinding = None
+
+	@classmethod
+	def setUpClass(cls) -> None:
+		super().setUpClass()
+		cls.db = SQLiteBinding(cls.path)
+
+
+	@classmethod
+	def tearDownClass(cls) -> None:
+		if cls.db:
+			cls.db.closeDB()
+		super().tearDownClass()
+
+
+	def test_insertResources(self) -> None:
+		"""	Insert resources and their identifiers """
+		self.db.insertResource(_resource('cnt1', lbl = [ 'a' ]))
+		self.db.insertIdentifier(_resource('cnt1'), 'cnt1', 'cse-in/cnt1')
+		self.db.insertResources([ _resource('cin1', 'cnt1', T.CIN, con = '1', csi = 'csi1'),
+								  _resource('cin2', 'cnt1', T.CIN, con = '2', aei = 'CAE1') ])
+		self.assertEqual(self.db.countResources(), 3)
+		self.assertEqual(self.db.countResources(int(T.CIN)), 2)
+
+
+	def test_searchResources(self) -> None:
+		"""	Search resources by their attributes """
+		self.assertEqual([ doc['ri'] for doc in self.db.searchResources(ri = 'cnt1') ], [ 'cnt1' ])
+		self.assertEqual([ doc['ri'] for doc in self.db.searchResources(pi = 'cnt1') ], [ 'cin1', 'cin2' ])
+		self.assertEqual([ doc['ri'] for doc in self.db.searchResources(pi = 'cnt1', ty = int(T.CIN)) ], [ 'cin1', 'cin2' ])
+		self.assertEqual([ doc['ri'] for doc in self.db.searchResources(ty = int(T.CNT)) ], [ 'cnt1' ])
+		self.assertEqual([ doc['ri'] for doc in self.db.searchResources(csi = 'csi1') ], [ 'cin1' ])
+		self.assertEqual([ doc['ri'] for doc in self.db.searchResources(aei = 'CAE1') ], [ 'cin2' ])
+		self.assertEqual([ doc['ri'] for doc in self.db.searchResources(srn = 'cse-in/cnt1') ], [ 'cnt1' ])
+		self.assertEqual(self.db.searchResources(ri = 'unknown'), [])
+		self.assertEqual([ doc['ri'] for doc in self.db.searchResourcesByIDs([ 'cin2', 'cnt1', 'unknown' ]) ], [ 'cnt1', 'cin2' ])
+		self.assertEqual([ doc['ri'] for doc in self.db.searchByFragment({ 'pi' : 'cnt1', 'con' : '2' }) ], [ 'cin2' ])
+		self.assertEqual([ doc['ri'] for doc in self.db.discoverResourcesByFilter(lambda doc: doc.get('lbl') == [ 'a' ]) ], [ 'cnt1' ])
+		self.assertTrue(self.db.hasResource(ri = 'cin1'))
+		self.assertTrue(self.db.hasResource(srn = 'cse-in/cnt1'))
+		self.assertTrue(self.db.hasResource(ty = int(T.CIN)))
+		self.assertFalse(self.db.hasResource(ri = 'unknown'))
+
+
+	def test_updateResource(self) -> None:
+		"""	Update a resource and remove a nullified attribute """
+		resource = _resource('cnt1', mni = 10)
+		resource.dict['lbl'] = None		# None values are removed when creating a resource
+		self.db.updateResource(resource)
+		self.assertNotIn('lbl', resource.dict)
+		doc = self.db.searchResources(ri = 'cnt1')[0]
+		self.assertEqual(doc['mni'], 10)
+		self.assertNotIn('lbl', doc)
+		self.assertEqual([ doc['ri'] for doc in self.db.searchResources(ty = int(T.CNT)) ], [ 'cnt1' ])	# The row order is kept
+
+		# Only existing resources are updated
+		self.db.updateResource(_resource('cnt2'))
+		self.assertFalse(self.db.hasResource(ri = 'cnt2'))
+
+
+	def test_upsertResource(self) -> None:
+		"""	Upsert an existing and a new resource """
+		self.db.upsertResource(_resource('cin1', 'cnt1', T.CIN, con = '11'))
+		self.db.upsertResource(_resource('cnt2'))
+		self.assertEqual(self.db.searchResources(ri = 'cin1')[0]['con'], '11')
+		self.assertEqual(self.db.searchResources(ri = 'cin1')[0]['csi'], 'csi1')		# merged with the stored resource
+		self.assertTrue(self.db.hasResource(ri = 'cnt2'))
+
+
+	def test_deleteResource(self) -> None:
+		"""	Delete a resource and its identifier """
+		self.db.deleteResource(_resource('cnt2'))
+		self.db.deleteIdentifier(_resource('cnt1'))
+		self.assertFalse(self.db.hasResource(ri = 'cnt2'))
+		self.assertEqual(self.db.searchIdentifiers(srn = 'cse-in/cnt1'), [])
+		self.assertEqual(len(self.db.searchIdentifiers(ri = 'cin1')), 1)	# inserted by insertResources()
+
+
+	def test_batchNotifications(self) -> None:
+		"""	Add, count and remove batch notifications """
+		self.assertTrue(self.db.addBatchNotification('sub1', 'nu1', { 'nev' : 1 }))
+		self.assertTrue(self.db.addBatchNotification('sub1', 'nu1', { 'nev' : 2 }))
+		self.assertEqual(self.db.countBatchNotifications('sub1', 'nu1'), 2)
+		self.assertEqual([ doc['request'] for doc in self.db.getBatchNotifications('sub1', 'nu1') ], [ { 'nev' : 1 }, { 'nev' : 2 } ])
+		self.assertTrue(self.db.removeBatchNotifications('sub1', 'nu1'))
+		self.assertEqual(self.db.countBatchNotifications('sub1', 'nu1'), 0)
+
+
+	def test_statistics(self) -> None:
+		"""	Store and purge statistics """
+		self.assertTrue(self.db.upsertStatistics({ 'ctRes' : 1 }))
+		self.assertTrue(self.db.upsertStatistics({ 'ctRes' : 2 }))
+		self.assertEqual(self.db.searchStatistics()['ctRes'], 2)
+		self.db.purgeStatistics()
+		self.assertIsNone(self.db.searchStatistics())
+
+
+	def test_reopen(self) -> None:
+		"""	Close and reopen the database """
+		self.db.closeDB()
+		self.__class__.db = SQLiteBinding(self.path)
+		self.assertEqual([ doc['ri'] for doc in self.db.searchResources(pi = 'cnt1') ], [ 'cin1', 'cin2' ])
+		self.assertEqual(self.db.searchResources(ri = 'cnt1')[0]['mni'], 10)
+
+
+	def test_purge(self) -> None:
+		"""	Purge the database """
+		self.db.purgeDB()
+		self.assertEqual(self.db.countResources(), 0)
+		self.assertEqual(self.db.searchIdentifiers(ri = 'cin1'), [])
+
+
+class TestTinyDBJournal(TestDBBinding):
+	"""	Tests for the write-behind mode of the file-based TinyDB binding.
+	"""
+
+	configuration = {	'db.writeBehind'				: True,
+						'db.journalCompactionInterval'	: 3600.0,	# Only compact when requested by the tests
+						'db.journalMaxSize'				: 0,
+						'db.journalSync'				: 'always',
+						'db.journalSyncInterval'		: 1.0,
+					}
+	db:TinyDBBinding = None
+
+
+	@classmethod
+	def setUpClass(cls) -> None:
+		super().setUpClass()
+		cls.db = TinyDBBinding(cls.path)
+
+
+	@classmethod
+	def tearDownClass(cls) -> None:
+		if cls.db:
+			cls.db.closeDB()
+		super().tearDownClass()
+
+
+	def _crashAndReopen(self) -> None:
+		"""	Stop the database without a final compaction, as if the CSE was killed, and open it again. """
+		self.db.journalWorker.stop()
+		self.db.journal.close()
+		self.__class__.db = TinyDBBinding(self.path)
+
+
+	def _snapshot(self, name:str = 'resources') -> str:
+		with open(f'{self.path}/{name}.json') as file:
+			return file.read()
+
+
+	def test_syncJournal(self) -> None:
+		"""	Sync the journal for each write with the "always" sync policy """
+		self.db.insertResource(_resource('cnt1', lbl = [ 'a' ]))
+		self.db.insertResources([ _resource('cin1', 'cnt1', T.CIN, con = '1'),
+								  _resource('cin2', 'cnt1', T.CIN, con = '2') ])
+		self.assertGreater(self.db.journal.appended, 0)
+		self.assertEqual(self.db.journal.synced, self.db.journal.appended)
+		self.assertNotIn('cnt1', self._snapshot())		# Not compacted yet
+
+
+	def test_replayJournal(self) -> None:
+		"""	Replay the journal after an unclean shutdown """
+		self.db.updateResource(_resource('cnt1', mni = 10))
+		self.db.deleteResource(_resource('cin2'))
+		self.db.upsertStatistics({ 'ctRes' : 1 })
+		self._crashAndReopen()
+
+		self.assertEqual([ doc['ri'] for doc in self.db.searchResources(pi = 'cnt1') ], [ 'cin1' ])
+		self.assertEqual(self.db.searchResources(ri = 'cnt1')[0]['mni'], 10)
+		self.assertEqual(self.db.searchIdentifiers(ri = 'cin1')[0]['srn'], 'cse-in/cin1')
+		self.assertEqual(self.db.searchStatistics()['ctRes'], 1)
+
+		# The journal was compacted into the snapshot files when loading
+		self.assertIn('cnt1', self._snapshot())
+		self.assertEqual(self.db.journal.appended, 0)
+
+
+	def test_replayIncompleteJournal(self) -> None:
+		"""	Ignore an incomplete entry at the end of the journal """
+		self.db.insertResource(_resource('cnt2'))
+		self.db.journal.file.write('{"db": "resources", "tb": "resou')
+		self._crashAndReopen()
+		self.assertTrue(self.db.hasResource(ri = 'cnt2'))
+		self.assertEqual(self.db.countResources(), 3)
+
+
+	def test_replayPreviousJournal(self) -> None:
+		"""	Replay the previous journal when the CSE stopped during a compaction """
+		self.db.insertResource(_resource('cnt3'))
+		self.db.journal.close()
+		shutil.move(self.db.journal.fileName, self.db.journal.previousFileName)	# The compaction started a new journal
+		self.db.journal.file = open(self.db.journal.fileName, 'a')
+		self.db.deleteResource(_resource('cnt2'))
+		self._crashAndReopen()
+		self.assertTrue(self.db.hasResource(ri = 'cnt3'))
+		self.assertFalse(self.db.hasResource(ri = 'cnt2'))
+
+
+	def test_compact(self) -> None:
+		"""	Compact the journal into the snapshot files """
+		self.db.insertResource(_resource('cnt4'))
+		self.db.journal.compact()
+		self.assertIn('cnt4', self._snapshot())
+		self.db.purgeDB()
+		self._crashAndReopen()
+		self.assertEqual(self.db.countResources(), 0)
+
+
+class TestIdentifierCache(unittest.TestCase):
+
+	def _doc(self, ri:str, srn:str) -> Document:
+		return Document({ 'ri' : ri, 'rn' : srn.rpartition('/')[2], 'srn' : srn, 'ty' : int(T.CNT) }, 1)
+
+
+	def test_addAndRemove(self) -> None:
+		"""	Add identifiers and remove them with their subtree """
+		cache = IdentifierCache(10)
+		cache.add(self._doc('cnt1', 'cse-in/cnt1'), cache.generation())
+		cache.add(self._doc('cnt2', 'cse-in/cnt1/cnt2'), cache.generation())
+		self.assertEqual(cache.byRI('cnt1')['srn'], 'cse-in/cnt1')
+		self.assertEqual(cache.bySRN('cse-in/cnt1/cnt2')['ri'], 'cnt2')
+		cache.remove('cnt1', 'cse-in/cnt1', subtree = True)
+		self.assertIsNone(cache.byRI('cnt1'))
+		self.assertIsNone(cache.bySRN('cse-in/cnt1/cnt2'))
+		self.assertEqual(len(cache), 0)
+
+
+	def test_addAfterInvalidation(self) -> None:
+		"""	Don't add identifiers that were read before they were invalidated """
+		cache = IdentifierCache(10)
+		generation = cache.generation()			# A lookup reads cnt1 and cnt2 from the DB ...
+		cache.remove('cnt1', 'cse-in/cnt1', subtree = True)	# ... while cnt1 and its children are deleted
+		cache.add(self._doc('cnt1', 'cse-in/cnt1'), generation)
+		cache.add(self._doc('cnt2', 'cse-in/cnt1/cnt2'), generation)
+		self.assertIsNone(cache.byRI('cnt1'))
+		self.assertIsNone(cache.byRI('cnt2'))
+
+		# Identifiers that are read after the invalidation are added
+		cache.add(self._doc('cnt2', 'cse-in/cnt1/cnt2'), cache.generation())
+		self.assertEqual(cache.byRI('cnt2')['srn'], 'cse-in/cnt1/cnt2')
+
+
+class TestInstanceIndex(unittest.TestCase):
+
+	def setUp(self) -> None:
+		self.index = InstanceIndex()
+		self.index.add('cnt1', T.CIN, '20220101T000001,000000', 'cin1', 10)
+		self.index.add('cnt1', T.CIN, '20220101T000002,000000', 'cin2', 20)
+		self.index.add('cnt2', T.CIN, '20220101T000001,000000', 'cin3', 30)
+
+
+	def test_rebuildParent(self) -> None:
+		"""	Rebuild the counters of a single parent and keep those of the other parents """
+		self.index.rebuild([ ('cnt1', int(T.CIN), '20220101T000003,000000', 'cin4', 5),
+							 ('cnt1', int(T.CIN), '20220101T000001,000000', 'cin1', 10) ], 'cnt1')
+		self.assertEqual(self.index.counters('cnt1', T.CIN), (2, 15))
+		self.assertEqual(self.index.instances('cnt1', T.CIN), [ 'cin1', 'cin4' ])
+		self.assertEqual(self.index.counters('cnt2', T.CIN), (1, 30))
+		self.assertEqual(len(self.index), 3)
+
+
+	def test_rebuildAll(self) -> None:
+		"""	Rebuild the counters of all parents, and remove those of parents without instances """
+		self.index.rebuild([ ('cnt1', int(T.CIN), '20220101T000002,000000', 'cin2', 20) ])
+		self.assertEqual(self.index.counters('cnt1', T.CIN), (1, 20))
+		self.assertEqual(self.index.counters('cnt2', T.CIN), (0, 0))
+		self.assertIsNone(self.index.latestOldest('cnt2', T.CIN))
+		self.assertEqual(len(self.index), 1)
+
+
+def run(testVerbosity:int, testFailFast:bool) -> Tuple[int, int, int]:
+	suite = unittest.TestSuite()
+
+	suite.addTest(TestSQLiteBinding('test_insertResources'))
+	suite.addTest(TestSQLiteBinding('test_searchResources'))
+	suite.addTest(TestSQLiteBinding('test_updateResource'))
+	suite.addTest(TestSQLiteBinding('test_upsertResource'))
+	suite.addTest(TestSQLiteBinding('test_deleteResource'))
+	suite.addTest(TestSQLiteBinding('test_batchNotifications'))
+	suite.addTest(TestSQLiteBinding('test_statistics'))
+	suite.addTest(TestSQLiteBinding('test_reopen'))
+	suite.addTest(TestSQLiteBinding('test_purge'))
+
+	suite.addTest(TestIdentifierCache('test_addAndRemove'))
+	suite.addTest(TestIdentifierCache('test_addAfterInvalidation'))
+
+	suite.addTest(TestInstanceIndex('test_rebuildParent'))
+	suite.addTest(TestInstanceIndex('test_rebuildAll'))
+
+	suite.addTest(TestTinyDBJournal('test_syncJournal'))
+	suite.addTest(TestTinyDBJournal('test_replayJournal'))
+	suite.addTest(TestTinyDBJournal('test_replayIncompleteJournal'))
+	suite.addTest(TestTinyDBJournal('test_replayPreviousJournal'))
+	suite.addTest(TestTinyDBJournal('test_compact'))
+
+	result = unittest.TextTestRunner(verbosity = testVerbosity, failfast = testFailFast).run(suite)
+	printResult(result)
+	return result.testsRun, len(result.errors + result.failures), len(result.skipped)
+
+if __name__ == '__main__':
+	_, errors, _ = run(2, True)
+	sys.exit(errors)
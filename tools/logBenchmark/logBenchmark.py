@@ -0,0 +1,108 @@
+#
+#	logBenchmark.py
+#
+#	(c) 2022 by Andreas Kraft
+#	License: BSD 3-Clause License. See the LICENSE file for further details.
+#
+#	Simple benchmark to measure the per-message overhead of the CSE's
+#	logging calls for each log level.
+#
+
+from __future__ import annotations
+import argparse, inspect, logging, sys, time
+from queue import Queue
+from typing import Callable
+from rich.console import Console
+from rich.table import Table
+
+import pathlib, os
+parent = pathlib.Path(os.path.abspath(os.path.dirname(__file__))).parent.parent
+sys.path.append(f'{parent}')
+from acme.services import CSE
+from acme.services.Logging import Logging as L, LogLevel
+from acme.services.EventManager import EventManager
+
+
+messages = 100000	# Default number of messages per measurement
+depth = 30			# Default call stack depth of the logging callers
+
+
+def _initLogging(useQueue:bool) -> None:
+	"""	Initialize only the parts of the logging system that are needed for the caller side.
+		Queued messages are not processed, and otherwise the messages are rendered to a logger without handlers.
+		Warnings and errors also raise their events, like in the CSE.
+	"""
+	CSE.event = EventManager()
+	L.loggerConsole = logging.getLogger('logBenchmark')
+	L.loggerConsole.addHandler(logging.NullHandler())
+	L.loggerConsole.propagate = False
+	L.queueSize = sys.maxsize if useQueue else 0
+	L.queueOn()
+
+
+def _atDepth(depth:int, fn:Callable[[], float]) -> float:
+	"""	Call `fn` with `depth` additional frames on the call stack.
+	"""
+	return _atDepth(depth - 1, fn) if depth > 0 else fn()
+
+
+def _measure(count:int, logFn:Callable[[], None]) -> float:
+	"""	Run `logFn` `count` times and return the time per call in microseconds.
+	"""
+	L.queue = Queue()	# Start with an empty queue
+	start = time.perf_counter()
+	for _ in range(count):
+		logFn()
+	return (time.perf_counter() - start) / count * 1_000_000
+
+
+def _legacyLog(level:int, msg:str) -> None:
+	"""	The former way of determining the caller by building the complete stack.
+	"""
+	if L.logLevel <= level:
+		caller = inspect.getframeinfo(inspect.stack()[2][0])
+		L.queue.put((level, msg, (caller.filename, caller.lineno), 'benchmark'))
+
+
+def runBenchmark(count:int, depth:int, useQueue:bool, legacy:bool) -> Table:
+	"""	Measure the logging calls for all log levels.
+
+		Args:
+			count: Number of messages per measurement.
+			depth: Call stack depth of the logging callers.
+			useQueue: Queue the messages instead of rendering them immediately.
+			legacy: Also measure the former caller determination.
+		Return:
+			A table with the results.
+	"""
+	_initLogging(useQueue)
+	calls = {
+		'logDebug()': lambda: L.isDebug and L.logDebug('benchmark message'),
+		'log()':      lambda: L.isInfo and L.log('benchmark message'),
+		'logWarn()':  lambda: L.isWarn and L.logWarn('benchmark message'),
+		'logErr()':   lambda: L.logErr('benchmark message', showStackTrace = False),
+	}
+	if legacy:
+		calls['legacy logDebug()'] = lambda: _legacyLog(logging.DEBUG, 'benchmark message')
+
+	table = Table(title = f'Logging overhead in µs per message ({count} messages, stack depth {depth}, {"queued" if useQueue else "not queued"})')
+	table.add_column('Log Level')
+	for name in calls:
+		table.add_column(name, justify = 'right')
+
+	for level in [ LogLevel.DEBUG, LogLevel.INFO, LogLevel.WARNING, LogLevel.ERROR, LogLevel.OFF ]:
+		L.setLogLevel(level)
+		results = [ _atDepth(depth, lambda: _measure(count, logFn)) for logFn in calls.values() ]
+		table.add_row(level.name, *[ f'{r:.3f}' for r in results ])
+	return table
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--count', action='store', dest='count', default=messages, type=int, help=f'number of messages per measurement (default: {messages})')
+	parser.add_argument('--depth', action='store', dest='depth', default=depth, type=int, help=f'call stack depth of the logging callers (default: {depth})')
+	parser.add_argument('--no-queue', action='store_false', dest='useQueue', default=True, help='render the messages immediately instead of queuing them')
+	parser.add_argument('--legacy', action='store_true', dest='legacy', default=False, help='also measure the former caller determination with inspect.stack()')
+	args = parser.parse_args()
+
+	Console().print(runBenchmark(args.count, args.depth, args.useQueue, args.legacy))